@@ -1,16 +1,19 @@
 from datetime import date, datetime, time
 from uuid import uuid4
+
 from sqlalchemy import (
+    JSON,
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Time,
-    Index
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
 from app.db import Base
 
 
@@ -32,6 +35,8 @@ class Assignments(Base):
     number_of_attempts: Mapped[int] = mapped_column(Integer, nullable=False)
     execution_timeout_seconds: Mapped[int] = mapped_column(Integer, nullable=False)
     grade: Mapped[int] = mapped_column(Integer, nullable=False)
+    # План проверки: тестовые ячейки блокнота преподавателя (см. GradingPlan)
+    grading_plan: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
 
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -1,13 +1,10 @@
-import io
 import csv
+import io
 import logging
 from datetime import date, datetime, time
 from typing import Optional
 from uuid import UUID
-import nbformat
-from openpyxl import Workbook
-from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import StreamingResponse
+
 from fastapi import (
     APIRouter,
     BackgroundTasks,
@@ -18,45 +15,53 @@ from fastapi import (
     HTTPException,
     Path,
     Query,
-    Response,
+    Request,
     UploadFile,
 )
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assignment.schemas import (
+    AssignmentListResponse,
+    AssignmentQueryParams,
+    AssignmentResponseSchema,
+    AssignmentUpdateSchema,
+    ExportMethod,
+    SlowestCellsResponse,
+    SortEnum,
+    StatsResponse,
+    TypeOfAssignmentFile,
+)
 from app.assignment.services.assignment_manager_service import (
     AssignmentManagerService,
 )
-from app.assignment.services.notebook_service import NotebookService
-from app.user.models import Users
-from app.user.router import refresh_token
-from app.auth.dependencies import check_tutor_role, get_current_user
 from app.assignment.services.dao_service import (
-    AssignmentFileDAO,
     AssignmentDAO,
+    AssignmentFileDAO,
     DisciplinesDAO,
 )
-from app.submissions.services.service import (
-    SubmissionFilesDAO,
-    SubmissionsDAO,
-)
-from app.assignment.schemas import (
-    AssignmentQueryParams,
-    SortEnum,
-    ExportMethod,
-    StatsResponse,
-    TypeOfAssignmentFile,
-    AssignmentUpdateSchema,
-    AssignmentListResponse,
-    AssignmentResponseSchema,
-)
+from app.assignment.services.notebook_service import NotebookService
+from app.auth.dependencies import check_tutor_role, get_current_user
+from app.db import get_db_session
 from app.exceptions import (
-    DisciplineNotFoundException,
-    WgongDateException,
-    DecodingIPYNBException,
     AssignmentNotFoundException,
+    DisciplineNotFoundException,
     IncorrectFormatAssignmentException,
+    WgongDateException,
 )
-from app.dropbox.service import dropbox_service
+from app.grading.cell_metrics import summarize_cell_metrics
 from app.logger import configure_logging
-from app.db import get_db_session
+from app.storage.cache import storage_file_cache
+from app.storage.service import get_storage
+from app.storage.streaming import stream_storage_file
+from app.submissions.services.service import (
+    SubmissionAttemptsDAO,
+    SubmissionFilesDAO,
+    SubmissionsDAO,
+)
+from app.user.models import Users
+from app.user.router import refresh_token
 
 logger = logging.getLogger("assignments_service")
 configure_logging()
@@ -185,6 +190,7 @@ async def get_assignment_resources(
     dependencies=[Depends(refresh_token), Depends(get_current_user)],
 )
 async def download_assignment_resource(
+    request: Request,
     assignment_id: str,
     resource_id: int,
     session: AsyncSession = Depends(get_db_session),
@@ -200,9 +206,9 @@ async def download_assignment_resource(
         raise AssignmentNotFoundException
 
     filename = resource.file_id.split("_resource_", 1)[-1].split("_", 1)[-1]
-    content = dropbox_service.download_file(resource.file_id)
-    return Response(
-        content=content,
+    return await stream_storage_file(
+        request,
+        resource.file_id,
         media_type="application/octet-stream",
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
@@ -263,8 +269,9 @@ async def delete_assignment_resource(
         raise AssignmentNotFoundException
 
     if resource.file_id:
+        storage_file_cache.invalidate(resource.file_id)
         try:
-            dropbox_service.delete_file(resource.file_id)
+            get_storage().delete_file(resource.file_id)
         except Exception as exc:
             logger.error("Ошибка удаления файла %s из dropbox: %s", resource.file_id, exc)
             raise HTTPException(
@@ -343,7 +350,11 @@ async def get_assignment(assignment_id: str, session: AsyncSession = Depends(get
     "/{assignment_id}/file/original",
     dependencies=[Depends(refresh_token), Depends(get_current_user)],
 )
-async def get_file_of_original_assignment(assignment_id: str, session: AsyncSession = Depends(get_db_session)):
+async def get_file_of_original_assignment(
+    request: Request,
+    assignment_id: str,
+    session: AsyncSession = Depends(get_db_session),
+):
     """Скачивание оригинального файла задания с Google dropbox"""
     original_assignment = await AssignmentFileDAO.find_one_or_none(
         session=session, assignment_id=assignment_id, file_type=TypeOfAssignmentFile.ORIGINAL
@@ -351,9 +362,9 @@ async def get_file_of_original_assignment(assignment_id: str, session: AsyncSess
     if original_assignment is None:
         raise AssignmentNotFoundException
 
-    content = dropbox_service.download_file(original_assignment.file_id)
-    return Response(
-        content=content,
+    return await stream_storage_file(
+        request,
+        original_assignment.file_id,
         media_type="application/x-jupyter-notebook",
         headers={
             "Content-Disposition": f"attachment; filename={assignment_id}_orig.ipynb"
@@ -365,7 +376,11 @@ async def get_file_of_original_assignment(assignment_id: str, session: AsyncSess
     "/{assignment_id}/file/modified",
     dependencies=[Depends(refresh_token), Depends(get_current_user)],
 )
-async def get_file_of_modified_assignment(assignment_id: str, session: AsyncSession = Depends(get_db_session)):
+async def get_file_of_modified_assignment(
+    request: Request,
+    assignment_id: str,
+    session: AsyncSession = Depends(get_db_session),
+):
     """Скачивание модифицированного файла задания с Google dropbox"""
     modified_assignment = await AssignmentFileDAO.find_one_or_none(
         session=session, assignment_id=assignment_id, file_type=TypeOfAssignmentFile.MODIFIED
@@ -373,9 +388,9 @@ async def get_file_of_modified_assignment(assignment_id: str, session: AsyncSess
     if modified_assignment is None:
         raise AssignmentNotFoundException
 
-    content = dropbox_service.download_file(modified_assignment.file_id)
-    return Response(
-        content=content,
+    return await stream_storage_file(
+        request,
+        modified_assignment.file_id,
         media_type="application/x-jupyter-notebook",
         headers={
             "Content-Disposition": f"attachment; filename={assignment_id}_mod.ipynb"
@@ -484,8 +499,9 @@ async def delete_assignment(
 
     for f in files:
         if f.file_id:
+            storage_file_cache.invalidate(f.file_id)
             try:
-                dropbox_service.delete_file(f.file_id)
+                get_storage().delete_file(f.file_id)
             except Exception as e:
                 logger.info(
                     f"Не удалось удалить файл с Dropbox: {f.file_id}, ошибка: {e}"
@@ -555,6 +571,34 @@ async def get_stats(
     )
 
 
+@router.get(
+    "/{assignment_id}/slowest-cells",
+    response_model=SlowestCellsResponse,
+    dependencies=[Depends(refresh_token), Depends(check_tutor_role)],
+)
+async def get_slowest_cells(
+    assignment_id: str,
+    limit: int = Query(10, gt=0, le=100, description="Сколько ячеек вернуть"),
+    attempts: int = Query(
+        200, gt=0, le=1000, description="Сколько последних попыток учитывать"
+    ),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Самые долгие ячейки задания по замерам последних попыток"""
+    assignment = await AssignmentDAO.find_one_or_none(
+        session=session, id=assignment_id
+    )
+    if not assignment:
+        raise AssignmentNotFoundException
+    metrics = await SubmissionAttemptsDAO.find_cell_metrics(
+        session=session, assignment_id=assignment_id, limit=attempts
+    )
+    return {
+        "execution_timeout_seconds": assignment.execution_timeout_seconds,
+        **summarize_cell_metrics(metrics, limit),
+    }
+
+
 @router.get(
     "/{assignment_id}/stats/download",
     dependencies=[Depends(refresh_token), Depends(check_tutor_role)],
@@ -635,14 +679,7 @@ async def process(assignment_file: UploadFile = File(...)):
     if not filename.endswith(".ipynb"):
         raise IncorrectFormatAssignmentException
     content = await assignment_file.read()
-    try:
-        notebook = nbformat.reads(content.decode("utf-8"), as_version=4)
-    except Exception as e:
-        raise DecodingIPYNBException from e
-    NotebookService.check_notebook(
-        notebook
-    )  # проверка, есть ли нужные блоки в файле
-    modified_notebook = NotebookService.modify_notebook(
-        notebook
-    )  # редактируем файл
-    return modified_notebook
+    notebook = NotebookService.read_notebook(content)
+    plan = NotebookService.analyze_notebook(notebook)
+    plan.check()  # проверка, есть ли нужные блоки в файле
+    return NotebookService.build_modified_notebook(notebook, plan)
@@ -80,6 +80,26 @@ class StatsResponse(BaseModel):
     total: int
 
 
+class CellMetricsResponse(BaseModel):
+    index: int
+    kind: str
+    runs: int
+    avg_wall_seconds: Optional[float] = None
+    max_wall_seconds: Optional[float] = None
+    max_cpu_seconds: Optional[float] = None
+    max_peak_rss_bytes: Optional[int] = None
+    max_output_bytes: Optional[int] = None
+
+
+class SlowestCellsResponse(BaseModel):
+    execution_timeout_seconds: int
+    attempts: int
+    max_total_seconds: Optional[float] = None
+    avg_kernel_startup_seconds: Optional[float] = None
+    max_kernel_startup_seconds: Optional[float] = None
+    cells: list[CellMetricsResponse]
+
+
 class AssignmentQueryParams:
     def __init__(
         self,
@@ -1,19 +1,21 @@
+import logging
 from datetime import date, time
 from pathlib import Path
-import nbformat
-import logging
+
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.assignment.services.notebook_service import NotebookService
-from app.dropbox.service import dropbox_service
+
+from app.assignment.schemas import TypeOfAssignmentFile
 from app.assignment.services.dao_service import (
     AssignmentDAO,
     AssignmentFileDAO,
 )
+from app.assignment.services.notebook_service import NotebookService
 from app.db import async_session_maker
-from app.assignment.schemas import TypeOfAssignmentFile
 from app.exceptions import IncorrectFormatAssignmentException
 from app.logger import configure_logging
+from app.storage.cache import storage_file_cache
+from app.storage.service import get_storage
 
 logger = logging.getLogger("assignment_manager_service")
 configure_logging()
@@ -39,14 +41,11 @@ class AssignmentManagerService:
         Обрабатывает блокнот и создает задание в БД (без загрузки на dropbox).
         Возвращает ID задания и два байтовых объекта блокнотов.
         """
-        notebook = NotebookService.read_notebook(content)
-        NotebookService.check_notebook(notebook)
-        grade = NotebookService.get_total_points(notebook)
-
         # исходный и модифицированный блокноты
-        original_assignment = nbformat.writes(notebook).encode("utf-8")
-        modified_notebook = NotebookService.modify_notebook(notebook)
-        modified_assignment = nbformat.writes(modified_notebook).encode("utf-8")
+        prepared = NotebookService.prepare_assignment(content)
+        grade = prepared.plan.total_points
+        original_assignment = prepared.original
+        modified_assignment = prepared.modified
 
         assignment = await AssignmentDAO.add(
             session=session,
@@ -59,6 +58,7 @@ class AssignmentManagerService:
             number_of_attempts=number_of_attempts,
             execution_timeout_seconds=execution_timeout_seconds,
             grade=grade,
+            grading_plan=prepared.plan.to_dict(),
             user_id=user_id,
             created_at=created_at
         )
@@ -85,11 +85,14 @@ class AssignmentManagerService:
                     upload_name = (
                         f"{assignment_id}_resource_{index}_{original_name}"
                     )
-                    uploaded = dropbox_service.upload_file(
+                    uploaded = get_storage().upload_file(
                         file_content=resource["content"],
                         filename=upload_name,
                         folder_type="assignments",
                     )
+                    # Путь мог уже использоваться: индексы ресурсов
+                    # начинаются с 1 при каждой загрузке.
+                    storage_file_cache.invalidate(uploaded["path"])
                     await AssignmentFileDAO.add(
                         session=session,
                         assignment_id=assignment_id,
@@ -110,13 +113,13 @@ class AssignmentManagerService:
             f"Файлы задания {assignment_id} начали загружаться в dropbox"
         )
         try:
-            original_file = dropbox_service.upload_file(
+            original_file = get_storage().upload_file(
                 file_content=original,
                 filename=f"{assignment_id}_original.ipynb",
                 folder_type="assignments",
             )
             logger.info(f"Оригинальный файл задания {assignment_id} загружен")
-            modified_file = dropbox_service.upload_file(
+            modified_file = get_storage().upload_file(
                 file_content=modified,
                 filename=f"{assignment_id}_modified.ipynb",
                 folder_type="assignments",
@@ -158,12 +161,9 @@ class AssignmentManagerService:
             raise IncorrectFormatAssignmentException
 
         content = await assignment_file.read()
-        notebook = NotebookService.read_notebook(content)
-        NotebookService.check_notebook(notebook)
-
-        original_assignment = nbformat.writes(notebook).encode("utf-8")
-        modified_notebook = NotebookService.modify_notebook(notebook)
-        modified_assignment = nbformat.writes(modified_notebook).encode("utf-8")
+        prepared = NotebookService.prepare_assignment(content)
+        original_assignment = prepared.original
+        modified_assignment = prepared.modified
 
         # получаем текущие записи файлов
         original_record = await AssignmentFileDAO.find_one_or_none(
@@ -186,12 +186,12 @@ class AssignmentManagerService:
 
         # загружаем новые файлы на dropbox
         try:
-            original_file = dropbox_service.upload_file(
+            original_file = get_storage().upload_file(
                 file_content=original_assignment,
                 filename=f"{assignment_id}_original.ipynb",
                 folder_type="assignments",
             )
-            modified_file = dropbox_service.upload_file(
+            modified_file = get_storage().upload_file(
                 file_content=modified_assignment,
                 filename=f"{assignment_id}_modified.ipynb",
                 folder_type="assignments",
@@ -204,6 +204,9 @@ class AssignmentManagerService:
                 status_code=500,
                 detail="Не удалось загрузить файлы на dropbox",
             ) from e
+        storage_file_cache.invalidate(
+            *old_files_to_delete, original_file["path"], modified_file["path"]
+        )
 
         # обновляем записи в БД
         await AssignmentFileDAO.update_or_create(
@@ -222,9 +225,11 @@ class AssignmentManagerService:
         )
 
         # обновляем оценку
-        grade = NotebookService.get_total_points(notebook)
         await AssignmentDAO.update(
-            model_id=assignment_id, grade=grade, session=session
+            model_id=assignment_id,
+            grade=prepared.plan.total_points,
+            grading_plan=prepared.plan.to_dict(),
+            session=session,
         )
 
         logger.info("Задание %s успешно обновлено", assignment_id)
@@ -1,19 +1,181 @@
-import nbformat
-import re
 import logging
+import re
+from dataclasses import asdict, dataclass, field
+
+import nbformat
 from nbclient import NotebookClient
+
 from app.exceptions import (
+    DecodingIPYNBException,
     NotFoundSolutionsInAssignmentException,
     NotFoundTestsInAssignmentException,
-    DecodingIPYNBException,
 )
 from app.logger import configure_logging
 
 logger = logging.getLogger(__name__)
 configure_logging()
 
+SOLUTION_BEGIN = "### BEGIN SOLUTION"
+SOLUTION_END = "### END SOLUTION"
+SOLUTION_PLACEHOLDER = "### WRITE SOLUTION HERE"
+HIDDEN_TESTS_BEGIN = "### BEGIN HIDDEN TESTS"
+HIDDEN_TESTS_END = "### END HIDDEN TESTS"
+TEST_POINTS_PATTERN = re.compile(r"# Tests (\d+) points")
+MODULE_NAME_PATTERN = re.compile(r"[A-Za-z_][\w.]*")
+IMPORT_PATTERN = re.compile(
+    r"^[ \t]*(?:from[ \t]+([A-Za-z_][\w.]*)[ \t]+import\b"
+    r"|import[ \t]+([^\n#;]+))",
+    re.MULTILINE,
+)
+# Планы другой версии перестраиваются из блокнота преподавателя при проверке
+GRADING_PLAN_VERSION = 2
+
+
+@dataclass
+class GradingTestCell:
+    """Тестовая ячейка блокнота преподавателя"""
+
+    index: int
+    points: int
+    source: str
+
+
+@dataclass
+class GradingPlan:
+    """Результат одного прохода по блокноту преподавателя
+
+    Индексы ячеек совпадают в исходном и модифицированном блокнотах.
+    Диапазоны строк - полуинтервалы [start, stop) по строкам source:
+    решения - в исходной ячейке, скрытые тесты - после замены решения.
+    """
+
+    cells: int = 0
+    total_points: int = 0
+    test_cells: list[GradingTestCell] = field(default_factory=list)
+    solution_spans: dict[int, tuple[int, int]] = field(default_factory=dict)
+    hidden_test_spans: dict[int, tuple[int, int]] = field(default_factory=dict)
+    missing_solutions: list[int] = field(default_factory=list)
+    missing_hidden_tests: list[int] = field(default_factory=list)
+    # source ячеек, которые отличаются в версии для студентов
+    modified_sources: dict[int, str] = field(default_factory=dict)
+    # Модули, импортируемые в блокноте: sandbox загружает их до старта ядра
+    preload: list[str] = field(default_factory=list)
+
+    def check(self):
+        """Бросает исключение, если в блокноте нет решений или тестов"""
+        if self.missing_solutions:
+            logger.warning("Блоки решения не найдены в блокноте")
+            raise NotFoundSolutionsInAssignmentException
+        if self.missing_hidden_tests or not self.test_cells:
+            logger.warning("Блоки тестов не найдены или тестов 0")
+            raise NotFoundTestsInAssignmentException
+
+    def to_dict(self) -> dict:
+        """План для sandbox: только то, что нужно для запуска тестов"""
+        return {
+            "version": GRADING_PLAN_VERSION,
+            "cells": self.cells,
+            "total_points": self.total_points,
+            "tests": [asdict(cell) for cell in self.test_cells],
+            "preload": self.preload,
+        }
+
+
+@dataclass
+class PreparedAssignment:
+    """Проверенный блокнот задания, готовый к загрузке в хранилище"""
+
+    plan: GradingPlan
+    original: bytes
+    modified: bytes
+
+
+def _collect_imports(plan: GradingPlan, source: str):
+    for match in IMPORT_PATTERN.finditer(source):
+        if match.group(1):
+            modules = [match.group(1)]
+        else:
+            modules = [
+                name.split()[0]
+                for name in match.group(2).split(",")
+                if name.strip()
+            ]
+        for module in modules:
+            if (
+                MODULE_NAME_PATTERN.fullmatch(module)
+                and module not in plan.preload
+            ):
+                plan.preload.append(module)
+
+
+def _analyze_cell(plan: GradingPlan, index: int, source: str):
+    _collect_imports(plan, source)
+    match = TEST_POINTS_PATTERN.search(source)
+    points = int(match.group(1)) if match else 0
+    plan.total_points += points
+
+    has_solution = SOLUTION_BEGIN in source and SOLUTION_END in source
+    if "def" in source and not has_solution:
+        plan.missing_solutions.append(index)
+    has_hidden_tests = (
+        HIDDEN_TESTS_BEGIN in source and HIDDEN_TESTS_END in source
+    )
+    if "# Tests " in source and " points." in source:
+        plan.test_cells.append(GradingTestCell(index, points, source))
+        if not has_hidden_tests:
+            plan.missing_hidden_tests.append(index)
+    if not has_solution and not has_hidden_tests:
+        return
+
+    lines = source.split("\n")
+    modified = source
+    if has_solution:
+        # Заменяется только первый блок решения в ячейке
+        begin = next(
+            i for i, line in enumerate(lines) if SOLUTION_BEGIN in line
+        )
+        end = next(i for i, line in enumerate(lines) if SOLUTION_END in line)
+        if end > 0:
+            lines[begin : end + 1] = [SOLUTION_PLACEHOLDER]
+            modified = "\n".join(lines)
+            plan.solution_spans[index] = (begin, end + 1)
+
+    if HIDDEN_TESTS_BEGIN in modified and HIDDEN_TESTS_END in modified:
+        try:
+            begin = lines.index(HIDDEN_TESTS_BEGIN)
+            end = lines.index(HIDDEN_TESTS_END)
+        except ValueError:
+            # Маркер не на отдельной строке: скрытые тесты не вырезать,
+            # поэтому блокнот не принимается
+            if index not in plan.missing_hidden_tests:
+                plan.missing_hidden_tests.append(index)
+            return
+        # Вместе с маркерами удаляется и строка после END HIDDEN TESTS
+        del lines[begin : end + 2]
+        modified = "\n".join(lines)
+        plan.hidden_test_spans[index] = (begin, end + 2)
+
+    if modified != source:
+        plan.modified_sources[index] = modified
+
 
 class NotebookService:
+    @staticmethod
+    def _parse_notebook(content: bytes):
+        """Разбирает блокнот и сообщает, был ли он сохранен в формате v4"""
+        try:
+            raw = nbformat.reader.reads(content.decode("utf-8"))
+            major, _ = nbformat.reader.get_version(raw)
+            notebook = nbformat.convert(raw, 4)
+        except Exception as e:
+            logger.error("Ошибка чтения блокнота: %s", e)
+            raise DecodingIPYNBException from e
+        try:
+            nbformat.validate(notebook)
+        except nbformat.ValidationError as e:
+            logger.error("Notebook JSON is invalid: %s", e)
+        return notebook, major == 4
+
     @staticmethod
     def read_notebook(content: bytes):
         """
@@ -28,11 +190,69 @@ class NotebookService:
         Raises:
             DecodingIPYNBException: Если не удалось прочитать или декодировать блокнот
         """
-        try:
-            return nbformat.reads(content.decode("utf-8"), as_version=4)
-        except Exception as e:
-            logger.error("Ошибка чтения блокнота: %s", e)
-            raise DecodingIPYNBException from e
+        notebook, _ = NotebookService._parse_notebook(content)
+        return notebook
+
+    @staticmethod
+    def analyze_notebook(notebook) -> GradingPlan:
+        """
+        Один проход по блокноту преподавателя: баллы, тестовые ячейки,
+        блоки решений и скрытых тестов, source ячеек для студентов
+
+        Args:
+            notebook: Загруженный Jupyter Notebook
+
+        Returns:
+            GradingPlan: План проверки, блокнот не изменяется
+        """
+        plan = GradingPlan(cells=len(notebook.cells))
+        for index, cell in enumerate(notebook.cells):
+            if cell.cell_type == "code":
+                _analyze_cell(plan, index, cell.source)
+        return plan
+
+    @staticmethod
+    def build_modified_notebook(notebook, plan: GradingPlan):
+        """Возвращает копию блокнота для студентов, не изменяя исходный"""
+        cells = list(notebook.cells)
+        for index, source in plan.modified_sources.items():
+            cells[index] = nbformat.NotebookNode(cells[index], source=source)
+        return nbformat.NotebookNode(notebook, cells=cells)
+
+    @staticmethod
+    def prepare_assignment(content: bytes) -> PreparedAssignment:
+        """
+        Разбирает, проверяет и модифицирует блокнот задания
+
+        Блокнот разбирается один раз. Исходный файл в формате v4 сохраняется
+        как есть, модифицированный повторно не валидируется - он отличается
+        от исходного только source ячеек.
+
+        Raises:
+            DecodingIPYNBException: Если не удалось прочитать блокнот
+            NotFoundSolutionsInAssignmentException: Если нет блоков решения
+            NotFoundTestsInAssignmentException: Если блоки тестов не найдены
+        """
+        notebook, is_v4 = NotebookService._parse_notebook(content)
+        plan = NotebookService.analyze_notebook(notebook)
+        plan.check()
+        if is_v4:
+            original = content
+        else:
+            original = nbformat.writes(notebook).encode("utf-8")
+        modified_notebook = NotebookService.build_modified_notebook(
+            notebook, plan
+        )
+        modified = nbformat.v4.writes(modified_notebook).encode("utf-8")
+        return PreparedAssignment(
+            plan=plan, original=original, modified=modified
+        )
+
+    @staticmethod
+    def build_grading_plan(content: bytes) -> dict:
+        """План проверки для задания, загруженного без grading_plan"""
+        notebook = NotebookService.read_notebook(content)
+        return NotebookService.analyze_notebook(notebook).to_dict()
 
     @staticmethod
     def check_notebook(notebook):
@@ -51,30 +271,7 @@ class NotebookService:
             NotFoundSolutionsInAssignmentException: Если блоки решения не найдены
             NotFoundTestsInAssignmentException: Если блоки тестов не найдены
         """
-        solution_found = True
-        tests_found = True
-        count_test = 0
-        for cell in notebook.cells:
-            if cell.cell_type == "code":
-                if "def" in cell.source:
-                    if (
-                        "### BEGIN SOLUTION" not in cell.source
-                        or "### END SOLUTION" not in cell.source
-                    ):
-                        solution_found = False
-                if "# Tests " in cell.source and " points." in cell.source:
-                    if (
-                        "### BEGIN HIDDEN TESTS" not in cell.source
-                        or "### END HIDDEN TESTS" not in cell.source
-                    ):
-                        tests_found = False
-                    count_test += 1
-        if not solution_found:
-            logger.warning("Блоки решения не найдены в блокноте")
-            raise NotFoundSolutionsInAssignmentException
-        if not tests_found or count_test == 0:
-            logger.warning("Блоки тестов не найдены или тестов 0")
-            raise NotFoundTestsInAssignmentException
+        NotebookService.analyze_notebook(notebook).check()
         return True
 
     @staticmethod
@@ -90,41 +287,9 @@ class NotebookService:
         Returns:
             NotebookNode: Модифицированный блокнот
         """
-        for cell in notebook.cells:
-            if cell.cell_type == "code":
-                source_lines = cell.source.split("\n")
-                if (
-                    "### BEGIN SOLUTION" in cell.source
-                    and "### END SOLUTION" in cell.source
-                ):
-                    # Поиск индекса начала решения с учетом возможных пробелов
-                    for i, line in enumerate(source_lines):
-                        if "### BEGIN SOLUTION" in line.strip():
-                            begin_index = i + 1
-                            break
-                    # Поиск индекса конца решения с учетом возможных пробелов
-                    for j, line in enumerate(source_lines):
-                        if "### END SOLUTION" in line.strip():
-                            end_index = j
-                            break
-                    # Проверка, что оба индекса найдены
-                    if begin_index > 0 and end_index > 0:
-                        # Удаляем строки между маркерами
-                        source_lines[begin_index - 1 : end_index + 1] = [
-                            "### WRITE SOLUTION HERE"
-                        ]
-                        cell.source = "\n".join(source_lines)
-
-                if (
-                    "### BEGIN HIDDEN TESTS" in cell.source
-                    and "### END HIDDEN TESTS" in cell.source
-                ):
-                    begin_index = source_lines.index("### BEGIN HIDDEN TESTS")
-                    end_index = source_lines.index("### END HIDDEN TESTS") + 1
-                    # Удаляем строки между маркерами и маркеры
-                    source_lines[begin_index : end_index + 1] = []
-                    cell.source = "\n".join(source_lines)
-
+        plan = NotebookService.analyze_notebook(notebook)
+        for index, source in plan.modified_sources.items():
+            notebook.cells[index].source = source
         return notebook
 
     @staticmethod
@@ -138,10 +303,9 @@ class NotebookService:
         Returns:
             int: Общая сумма баллов за все тесты в блокноте
         """
-        total = 0
-        for cell in notebook.cells:
-            if cell.cell_type == "code":
-                match = re.search(r"# Tests (\d+) points", cell.source)
-                if match:
-                    total += int(match.group(1))
-        return total
+        return sum(
+            int(match.group(1))
+            for cell in notebook.cells
+            if cell.cell_type == "code"
+            and (match := TEST_POINTS_PATTERN.search(cell.source))
+        )
@@ -1,4 +1,5 @@
 from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -27,9 +28,23 @@ class Settings(BaseSettings):
     GOOGLE_REDIRECT_URI: str
     CLIENT_SECRETS_FILE: str
 
-    DROPBOX_REFRESH_TOKEN: str
-    DROPBOX_APP_KEY: str
-    DROPBOX_APP_SECRET: str
+    STORAGE_BACKEND: Literal["dropbox", "local", "s3"] = "dropbox"
+    STORAGE_PUBLIC_BASE_URL: str = ""
+    LOCAL_STORAGE_ROOT: str = "storage"
+    S3_BUCKET: str = "autograder"
+    S3_ENDPOINT_URL: str | None = None
+    S3_ACCESS_KEY_ID: str | None = None
+    S3_SECRET_ACCESS_KEY: str | None = None
+    S3_REGION: str | None = None
+
+    DROPBOX_REFRESH_TOKEN: str | None = None
+    DROPBOX_APP_KEY: str | None = None
+    DROPBOX_APP_SECRET: str | None = None
+    STORAGE_CACHE_DIR: str = ""
+    STORAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    STORAGE_CACHE_REVALIDATE_SECONDS: int = 30
+    ASSIGNMENT_FILES_FETCH_CONCURRENCY: int = 8
+    ASSIGNMENT_FILES_FETCH_TIMEOUT_SECONDS: float = 60.0
 
     ENABLE_EMBEDDED_NOTEBOOK_EDITOR: bool = False
     JUPYTERHUB_ORIGIN: str = "http://jupyterhub:8000"
@@ -39,6 +54,38 @@ class Settings(BaseSettings):
     JUPYTERHUB_TOKEN_TTL_SECONDS: int = 300
     JUPYTER_NOTEBOOK_FILENAME: str = "work.ipynb"
     JUPYTER_NOTEBOOK_AUTOSAVE_SECONDS: int = 30
+    JUPYTERHUB_HTTP_MAX_CONNECTIONS: int = 100
+    JUPYTERHUB_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    JUPYTERHUB_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    JUPYTERHUB_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    JUPYTERHUB_HTTP_TIMEOUT_SECONDS: float = 10.0
+    JUPYTERHUB_HTTP_POOL_TIMEOUT_SECONDS: float = 5.0
+    JUPYTERHUB_POOL_SIZE: int = 0
+    JUPYTERHUB_POOL_USER_PREFIX: str = "autograder-pool-"
+    JUPYTERHUB_SPAWN_CONCURRENCY: int = 10
+    JUPYTERHUB_SPAWN_TIMEOUT_SECONDS: float = 120.0
+    JUPYTERHUB_POOL_MAINTAIN_INTERVAL_SECONDS: float = 30.0
+    JUPYTERHUB_IDLE_CULL_SECONDS: int = 3600
+
+    GRADING_QUEUE_ENABLED: bool = False
+    GRADING_WORKER_CONCURRENCY: int = 2
+    GRADING_WORKER_METRICS_PORT: int = 0
+    GRADING_WORKER_POLL_INTERVAL_SECONDS: float = 1.0
+    GRADING_JOB_LEASE_SECONDS: int = 1200
+    GRADING_JOB_MAX_ATTEMPTS: int = 3
+    GRADING_WORKER_INTERACTIVE_SLOTS: int = 1
+    GRADING_REGRADE_PROGRESS_INTERVAL_SECONDS: float = 1.0
+    GRADING_SCHEDULER_CONCURRENCY: int = 0
+    GRADING_SCHEDULER_DEADLINE_BOOST_SECONDS: int = 3600
+    GRADING_SCHEDULER_CLAIM_CANDIDATES: int = 50
+    GRADING_ADMISSION_MAX_WAIT_SECONDS: int = 120
+    GRADING_ADMISSION_MAX_LOAD_PER_CPU: float = 2.0
+    GRADING_PROGRESS_INTERVAL_SECONDS: float = 0.5
+    GRADING_PROGRESS_HEARTBEAT_SECONDS: float = 15.0
+    GRADING_PROGRESS_QUEUE_POSITION_INTERVAL_SECONDS: float = 5.0
+    GRADING_PROGRESS_STREAM_MAX_SECONDS: int = 3600
+    GRADING_RESULT_CACHE_ENABLED: bool = True
+    GRADING_RESULT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
 
 
     @property
@@ -4,13 +4,23 @@ import dropbox
 
 from app.config import settings
 from app.logger import configure_logging
+from app.storage.base import FileMetadata, StorageBackend
 
 logger = logging.getLogger(__name__)
 configure_logging()
 
 
-class DropboxService:
+class DropboxService(StorageBackend):
     def __init__(self):
+        if not (
+            settings.DROPBOX_REFRESH_TOKEN
+            and settings.DROPBOX_APP_KEY
+            and settings.DROPBOX_APP_SECRET
+        ):
+            raise RuntimeError(
+                "Для STORAGE_BACKEND=dropbox нужны DROPBOX_REFRESH_TOKEN, "
+                "DROPBOX_APP_KEY и DROPBOX_APP_SECRET"
+            )
         self.dbx = dropbox.Dropbox(
             oauth2_refresh_token=settings.DROPBOX_REFRESH_TOKEN,
             app_key=settings.DROPBOX_APP_KEY,
@@ -21,33 +31,33 @@ class DropboxService:
         """Upload file and return Dropbox path + direct link."""
         path = f"/{folder_type}/{filename}"
         try:
-            self.dbx.files_upload(
-                file_content, path, mode=dropbox.files.WriteMode("overwrite")
-            )
-            try:
-                link = self.dbx.sharing_create_shared_link_with_settings(path).url
-            except dropbox.exceptions.ApiError as e:
-                if (
-                    isinstance(
-                        e.error, dropbox.sharing.CreateSharedLinkWithSettingsError
-                    )
-                    and e.error.is_shared_link_already_exists()
-                ):
-                    links = self.dbx.sharing_list_shared_links(
-                        path=path, direct_only=True
-                    ).links
-                    if links:
-                        link = links[0].url
-                    else:
-                        raise
-                else:
-                    raise
-            link = link.replace("?dl=0", "?dl=1")
-            return {"path": path, "link": link}
+            self.upload_file_to_path(file_content, path)
+            return {"path": path, "link": self.get_link(path)}
         except Exception as e:
             logger.error("Dropbox upload failed for %s: %s", path, e)
             raise
 
+    def get_link(self, path: str) -> str:
+        try:
+            link = self.dbx.sharing_create_shared_link_with_settings(path).url
+        except dropbox.exceptions.ApiError as e:
+            if (
+                isinstance(
+                    e.error, dropbox.sharing.CreateSharedLinkWithSettingsError
+                )
+                and e.error.is_shared_link_already_exists()
+            ):
+                links = self.dbx.sharing_list_shared_links(
+                    path=path, direct_only=True
+                ).links
+                if links:
+                    link = links[0].url
+                else:
+                    raise
+            else:
+                raise
+        return link.replace("?dl=0", "?dl=1")
+
     def upload_file_to_path(self, file_content: bytes, path: str) -> dict:
         """Upload file to explicit Dropbox absolute path."""
         if not path.startswith("/"):
@@ -66,10 +76,47 @@ class DropboxService:
         except dropbox.exceptions.ApiError:
             return False
 
+    @staticmethod
+    def _to_metadata(path: str, metadata) -> FileMetadata:
+        return FileMetadata(
+            path=path,
+            size=metadata.size,
+            rev=metadata.rev,
+            content_hash=metadata.content_hash,
+        )
+
     def download_file(self, path: str) -> bytes:
         _, res = self.dbx.files_download(path)
         return res.content
 
+    def download_file_with_metadata(
+        self, path: str
+    ) -> tuple[FileMetadata, bytes]:
+        """Скачивает файл вместе с метаданными (rev, content_hash)"""
+        metadata, res = self.dbx.files_download(path)
+        return self._to_metadata(path, metadata), res.content
+
+    def get_metadata(self, path: str) -> FileMetadata:
+        return self._to_metadata(path, self.dbx.files_get_metadata(path))
+
+    def open_download(
+        self,
+        path: str,
+        rev: str | None = None,
+        byte_range: tuple[int, int] | None = None,
+    ):
+        """Открывает потоковое скачивание файла
+
+        Ответ requests возвращается с непрочитанным телом. Диапазон
+        передается в Dropbox заголовком Range.
+        """
+        dbx = self.dbx
+        if byte_range is not None:
+            start, end = byte_range
+            dbx = dbx.clone(headers={"Range": f"bytes={start}-{end}"})
+        metadata, response = dbx.files_download(path, rev=rev)
+        return self._to_metadata(path, metadata), response
+
     def delete_file(self, path: str) -> None:
         try:
             self.dbx.files_delete_v2(path)
@@ -77,6 +124,3 @@ class DropboxService:
         except Exception as e:
             logger.error("Dropbox delete failed for %s: %s", path, e)
             raise
-
-
-dropbox_service = DropboxService()
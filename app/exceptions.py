@@ -98,6 +98,11 @@ class DecodingIPYNBException(AutograderException):
     detail = "Ошибка при декодировании файла .ipynb"
 
 
+class AssignmentFilesUnavailableException(AutograderException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = "Не удалось загрузить файлы задания. Повторите попытку позже"
+
+
 class SandboxExecutionException(AutograderException):
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
     detail = "Ошибка выполнения в изолированной среде"
@@ -126,3 +131,27 @@ class NotebookEditorUnavailableException(AutograderException):
 class RateLimitExceededException(AutograderException):
     status_code = status.HTTP_429_TOO_MANY_REQUESTS
     detail = "Слишком частые запросы. Повторите попытку позже"
+
+
+class SandboxOverloadedException(AutograderException):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    detail = "Сейчас проверяется слишком много решений. Повторите попытку позже"
+
+    def __init__(self, retry_after: int):
+        super().__init__()
+        self.headers = {"Retry-After": str(retry_after)}
+
+
+class GradingJobNotFoundException(AutograderException):
+    status_code = status.HTTP_404_NOT_FOUND
+    detail = "Задача проверки не найдена"
+
+
+class GradingQueueDisabledException(AutograderException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = "Очередь проверки отключена"
+
+
+class RegradeRunNotFoundException(AutograderException):
+    status_code = status.HTTP_404_NOT_FOUND
+    detail = "Перепроверка не найдена"
@@ -0,0 +1,59 @@
+"""Самые долгие ячейки задания по замерам из попыток студентов
+
+Замеры пишет sandbox (sandbox_runner._cell_metrics) в
+submission_attempt.cell_metrics. Сводка помогает преподавателю подобрать
+execution_timeout_seconds: видно, какие ячейки и тесты занимают время,
+сколько памяти и output'а они дают и сколько длится проверка целиком.
+"""
+
+from collections import defaultdict
+
+
+def summarize_cell_metrics(attempts: list[dict], limit: int) -> dict:
+    """Сводка по ячейкам (индекс, kind) за переданные попытки
+
+    Ячейки отсортированы по максимальному времени исполнения. total -
+    сумма времени сохраненных ячеек попытки, без запуска ядра.
+    """
+    cells = defaultdict(list)
+    totals = []
+    startups = []
+    for metrics in attempts:
+        entries = metrics.get("cells") or []
+        for entry in entries:
+            cells[(entry["index"], entry["kind"])].append(entry)
+        totals.append(sum(entry.get("wall", 0.0) for entry in entries))
+        if metrics.get("kernel_startup_seconds") is not None:
+            startups.append(metrics["kernel_startup_seconds"])
+
+    summary = []
+    for (index, kind), entries in cells.items():
+        walls = [entry["wall"] for entry in entries if "wall" in entry]
+        summary.append(
+            {
+                "index": index,
+                "kind": kind,
+                "runs": len(entries),
+                "avg_wall_seconds": sum(walls) / len(walls) if walls else None,
+                "max_wall_seconds": max(walls, default=None),
+                "max_cpu_seconds": _max(entries, "cpu"),
+                "max_peak_rss_bytes": _max(entries, "peak_rss"),
+                "max_output_bytes": _max(entries, "output_bytes"),
+            }
+        )
+    summary.sort(key=lambda cell: cell["max_wall_seconds"] or 0.0, reverse=True)
+    return {
+        "attempts": len(attempts),
+        "max_total_seconds": max(totals, default=None),
+        "avg_kernel_startup_seconds": (
+            sum(startups) / len(startups) if startups else None
+        ),
+        "max_kernel_startup_seconds": max(startups, default=None),
+        "cells": summary[:limit],
+    }
+
+
+def _max(entries: list[dict], field: str):
+    return max(
+        (entry[field] for entry in entries if field in entry), default=None
+    )
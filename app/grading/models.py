@@ -0,0 +1,125 @@
+from datetime import datetime
+from uuid import uuid4
+
+from sqlalchemy import (
+    JSON,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db import Base
+
+
+class GradingJob(Base):
+    """Задача очереди проверки решений, хранится в Postgres"""
+
+    __tablename__ = "grading_job"
+    __table_args__ = (
+        Index("ix_grading_job_status_created_at", "status", "created_at"),
+        Index(
+            "ix_grading_job_status_priority_created_at",
+            "status",
+            "priority",
+            "created_at",
+        ),
+        Index(
+            "ix_grading_job_user_id_assignment_id", "user_id", "assignment_id"
+        ),
+        Index("ix_grading_job_regrade_run_id", "regrade_run_id"),
+    )
+
+    id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid4, unique=True
+    )
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)
+    # Меньше - раньше: массовая перепроверка не задерживает проверки студентов
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    regrade_run_id: Mapped[UUID | None] = mapped_column(
+        ForeignKey("regrade_run.id", ondelete="CASCADE"), nullable=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE")
+    )
+    assignment_id: Mapped[UUID] = mapped_column(
+        ForeignKey("assignment.id", ondelete="CASCADE")
+    )
+    # Notebook студента для задач, которым он нужен (загрузка, встроенный
+    # редактор)
+    submission_content: Mapped[bytes | None] = mapped_column(
+        LargeBinary, nullable=True
+    )
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # События ячеек из sandbox, которые воркер пишет по ходу проверки
+    progress: Mapped[list | None] = mapped_column(JSON, nullable=True)
+    error_status_code: Mapped[int | None] = mapped_column(
+        Integer, nullable=True
+    )
+    error_detail: Mapped[str | None] = mapped_column(String, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    worker_id: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow
+    )
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime, nullable=True
+    )
+    # Пока аренда не истекла, задачу держит воркер; после - ее можно забрать
+    # повторно (воркер упал посреди проверки)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(
+        DateTime, nullable=True
+    )
+
+
+class RegradeRun(Base):
+    """Массовая перепроверка всех решений задания
+
+    Каждое решение проверяется отдельной задачей grading_job, а новые баллы
+    записываются в submission одним запросом, когда завершены все задачи.
+    """
+
+    __tablename__ = "regrade_run"
+
+    id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid4, unique=True
+    )
+    assignment_id: Mapped[UUID] = mapped_column(
+        ForeignKey("assignment.id", ondelete="CASCADE"), index=True
+    )
+    created_by: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE")
+    )
+    status: Mapped[str] = mapped_column(String(16), nullable=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow
+    )
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime, nullable=True
+    )
+
+
+class GradingResultCache(Base):
+    """Результат проверки для набора входных данных, хранится в Postgres
+
+    key - хэш решения, notebook преподавателя, ресурсных файлов, образа
+    sandbox и лимита времени: при совпадении всех входов повторный запуск
+    контейнера даст тот же результат.
+    """
+
+    __tablename__ = "grading_result_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    total_points: Mapped[int] = mapped_column(Integer, nullable=False)
+    feedback: Mapped[list] = mapped_column(JSON, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
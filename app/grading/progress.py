@@ -0,0 +1,154 @@
+"""Прогресс проверки для страницы студента
+
+События ячеек приходят из sandbox (sandbox_progress.ProgressTail) в потоке
+проверки. Воркер очереди сохраняет их в grading_job.progress, откуда их
+отдает `GET /grading/jobs/{job_id}/events`; без очереди события идут
+прямо в ответ на запрос проверки.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+from app.config import settings
+from app.db import async_session_maker
+from app.exceptions import AutograderException
+from app.grading.service import GradingJobDAO
+
+logger = logging.getLogger(__name__)
+
+# Комментарий SSE, который не дает прокси закрыть молчащее соединение
+HEARTBEAT = ": ping\n\n"
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class JobProgressRecorder:
+    """Копит события задачи и периодически записывает их в БД
+
+    Вызывается из потока sandbox, запись идет отдельными короткими
+    транзакциями, не задевая транзакцию с результатом проверки.
+    """
+
+    def __init__(self, job_id, interval: float | None = None):
+        self.job_id = job_id
+        self.interval = interval or settings.GRADING_PROGRESS_INTERVAL_SECONDS
+        self.events: list[dict] = []
+        self._saved = 0
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    def __call__(self, event: dict):
+        with self._lock:
+            self.events.append(event)
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._flush_loop())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        with self._lock:
+            if len(self.events) == self._saved:
+                return
+            events = list(self.events)
+        try:
+            async with async_session_maker() as session:
+                async with session.begin():
+                    await GradingJobDAO.update(
+                        session=session, model_id=self.job_id, progress=events
+                    )
+        except Exception as e:
+            logger.warning(
+                "Не удалось сохранить прогресс задачи %s: %s", self.job_id, e
+            )
+            return
+        self._saved = len(events)
+
+
+class ProgressQueue:
+    """Передает события из потока sandbox в event loop запроса"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def __call__(self, event: dict):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+# Проверки, начатые потоковыми запросами: они доводятся до конца
+# (попытка фиксируется), даже если клиент закрыл соединение
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _evaluation_finished(task: asyncio.Task, channel: "ProgressQueue"):
+    _background_tasks.discard(task)
+    # События из потока sandbox поставлены в очередь раньше, чем
+    # завершилась задача, поэтому приходят до маркера конца
+    channel.close()
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None and not isinstance(error, AutograderException):
+        logger.error("Ошибка потоковой проверки: %s", error, exc_info=error)
+
+
+async def stream_evaluation(run: Callable[[ProgressQueue], Awaitable[dict]]):
+    """SSE проверки без очереди
+
+    run исполняет проверку с переданным приемником событий. Поток: job с
+    id проверки, progress на каждое событие ячейки, в конце result или
+    error.
+    """
+    channel = ProgressQueue(asyncio.get_running_loop())
+    task = asyncio.create_task(run(channel))
+    _background_tasks.add(task)
+    task.add_done_callback(lambda _: _evaluation_finished(task, channel))
+
+    yield format_event("job", {"job_id": str(uuid4())})
+    while True:
+        try:
+            event = await asyncio.wait_for(
+                channel.queue.get(), settings.GRADING_PROGRESS_HEARTBEAT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            yield HEARTBEAT
+            continue
+        if event is None:
+            break
+        yield format_event("progress", event)
+
+    try:
+        result = task.result()
+    except AutograderException as e:
+        yield format_event(
+            "error", {"status_code": e.status_code, "detail": e.detail}
+        )
+        return
+    except Exception:
+        yield format_event(
+            "error", {"status_code": 500, "detail": "Internal server error"}
+        )
+        return
+    yield format_event("result", result)
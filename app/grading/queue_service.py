@@ -0,0 +1,210 @@
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import async_session_maker
+from app.exceptions import AutograderException
+from app.grading.progress import JobProgressRecorder
+from app.grading.regrade_service import RegradeService
+from app.grading.schemas import GradingJobKind, GradingJobStatus
+from app.grading.service import GradingJobDAO
+from app.logger import configure_logging
+from app.submissions.services.notebook_service import NotebookService
+from app.submissions.services.submission_manager_service import (
+    RELEASE_SESSION_FOR_SANDBOX,
+    SubmissionManagerService,
+)
+from app.user.models import Users
+from app.user.service import UsersDAO
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+
+class GradingQueueService:
+    """Очередь проверки решений поверх таблицы grading_job
+
+    Веб-часть только ставит задачу и сразу возвращает ее id, а исполнение
+    notebook в sandbox происходит в отдельном процессе-воркере
+    (`python -m app.grading.worker`).
+    """
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return settings.GRADING_QUEUE_ENABLED
+
+    @staticmethod
+    async def enqueue(
+        session: AsyncSession,
+        kind: GradingJobKind,
+        current_user: Users,
+        assignment_id: str,
+        submission_content: bytes | None = None,
+    ):
+        """Ставит задачу в очередь и возвращает ее id
+
+        Если у студента уже есть незавершенная задача того же типа по этому
+        заданию, возвращается она: повторные нажатия не размножают проверки.
+        Задача с файлом решения объединяется только с еще не начатой (файл
+        в ней заменяется новым): уже исполняющаяся проверяет старый файл.
+        """
+        statuses = (GradingJobStatus.QUEUED,)
+        if submission_content is None:
+            statuses += (GradingJobStatus.RUNNING,)
+        pending = await GradingJobDAO.find_pending(
+            session=session,
+            user_id=current_user.id,
+            assignment_id=assignment_id,
+            kind=kind,
+            statuses=statuses,
+        )
+        if pending is not None:
+            if submission_content is not None:
+                await GradingJobDAO.update(
+                    session=session,
+                    model_id=pending.id,
+                    submission_content=submission_content,
+                )
+            return pending.id
+
+        job_id = await GradingJobDAO.add(
+            session=session,
+            kind=kind,
+            status=GradingJobStatus.QUEUED,
+            user_id=current_user.id,
+            assignment_id=assignment_id,
+            submission_content=submission_content,
+            attempts=0,
+        )
+        logger.info(
+            "User %s queued %s job %s for assignment %s",
+            current_user.email,
+            kind.value,
+            job_id,
+            assignment_id,
+        )
+        return job_id
+
+    @staticmethod
+    async def _execute(
+        session: AsyncSession, job, user: Users, progress=None
+    ) -> dict:
+        assignment_id = str(job.assignment_id)
+        manager = SubmissionManagerService
+        if job.kind == GradingJobKind.SUBMIT:
+            submission_id = (
+                await manager.process_and_upload_submission_bytes(
+                    session=session,
+                    assignment_id=assignment_id,
+                    submission_bytes=job.submission_content,
+                    user_id=user.id,
+                    user_email=user.email,
+                )
+            )
+            return {"submission_id": str(submission_id)}
+
+        if job.kind == GradingJobKind.EVALUATE:
+            submission_service = (
+                await NotebookService.check_date_and_attempts_submission(
+                    session, assignment_id, user
+                )
+            )
+            total_points, feedback = await manager.evaluate_submission(
+                session, assignment_id, user.email, submission_service, progress
+            )
+            return {"score": total_points, "feedback": feedback}
+
+        if job.kind == GradingJobKind.EMBEDDED_EVALUATE:
+            total_points, feedback = (
+                await manager.process_and_evaluate_submission_bytes(
+                    session=session,
+                    assignment_id=assignment_id,
+                    submission_bytes=job.submission_content,
+                    user_id=user.id,
+                    user_email=user.email,
+                    progress=progress,
+                )
+            )
+            return {"score": total_points, "feedback": feedback}
+
+        if job.kind == GradingJobKind.REGRADE:
+            return await manager.regrade_submission(
+                session, assignment_id, user.id
+            )
+
+        raise ValueError(f"Unknown grading job kind: {job.kind}")
+
+    @staticmethod
+    async def process_next(
+        worker_id: str, exclude_kinds: tuple[GradingJobKind, ...] = ()
+    ) -> bool:
+        """Забирает и выполняет одну задачу; False - очередь пуста"""
+        async with async_session_maker() as session:
+            async with session.begin():
+                job = await GradingJobDAO.claim_next(
+                    session=session,
+                    worker_id=worker_id,
+                    lease_seconds=settings.GRADING_JOB_LEASE_SECONDS,
+                    exclude_kinds=exclude_kinds,
+                )
+        if job is None:
+            return False
+
+        logger.info(
+            "Worker %s started job %s (%s)", worker_id, job.id, job.kind
+        )
+        try:
+            # Перед запуском sandbox транзакция фиксируется и соединение
+            # возвращается в пул; результат проверки и статус задачи пишутся
+            # в следующей транзакции: либо записаны оба, либо задача будет
+            # повторена.
+            async with async_session_maker() as session:
+                session.info[RELEASE_SESSION_FOR_SANDBOX] = True
+                user = await UsersDAO.find_one_or_none(
+                    session=session, id=job.user_id
+                )
+                async with JobProgressRecorder(job.id) as progress:
+                    result = await GradingQueueService._execute(
+                        session, job, user, progress
+                    )
+                await GradingJobDAO.finish(
+                    session=session,
+                    job_id=job.id,
+                    status=GradingJobStatus.DONE,
+                    result=result,
+                )
+                await session.commit()
+        except AutograderException as e:
+            # Доменные ошибки (дедлайн, синтаксис, лимиты) повторять
+            # бессмысленно
+            await GradingQueueService._finish_failed(
+                job.id, e.status_code, e.detail
+            )
+        except Exception as e:
+            logger.error("Job %s failed: %s", job.id, e, exc_info=True)
+            if job.attempts < settings.GRADING_JOB_MAX_ATTEMPTS:
+                async with async_session_maker() as session:
+                    async with session.begin():
+                        await GradingJobDAO.requeue(
+                            session=session, job_id=job.id
+                        )
+            else:
+                await GradingQueueService._finish_failed(
+                    job.id, 500, "Internal server error"
+                )
+        if job.regrade_run_id is not None:
+            await RegradeService.complete_finished(job.regrade_run_id)
+        return True
+
+    @staticmethod
+    async def _finish_failed(job_id, status_code: int, detail: str):
+        async with async_session_maker() as session:
+            async with session.begin():
+                await GradingJobDAO.finish(
+                    session=session,
+                    job_id=job_id,
+                    status=GradingJobStatus.FAILED,
+                    error_status_code=status_code,
+                    error_detail=detail,
+                )
@@ -0,0 +1,163 @@
+import logging
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assignment.services.dao_service import AssignmentDAO
+from app.config import settings
+from app.db import async_session_maker
+from app.exceptions import (
+    AssignmentNotFoundException,
+    GradingQueueDisabledException,
+)
+from app.grading.models import GradingJob
+from app.grading.schemas import (
+    GradingJobKind,
+    GradingJobStatus,
+    RegradeRunResponse,
+    RegradeRunStatus,
+)
+from app.grading.service import RegradeRunDAO
+from app.logger import configure_logging
+from app.submissions.services.service import SubmissionsDAO
+from app.user.models import Users
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+# Задачи перепроверки забираются после всех интерактивных (priority 0)
+REGRADE_JOB_PRIORITY = 10
+
+
+class RegradeService:
+    """Массовая перепроверка решений задания через очередь grading_job
+
+    Каждое решение - отдельная задача, поэтому перепроверку разбирают все
+    воркеры на всех хостах, а после падения воркера задача забирается
+    повторно по истечении аренды. Баллы записываются в submission одним
+    запросом, когда не осталось незавершенных задач, и только для решений,
+    которые с момента их перепроверки не сдавались заново.
+    """
+
+    @staticmethod
+    async def start(
+        session: AsyncSession, assignment_id: str, current_user: Users
+    ) -> UUID:
+        """Запускает перепроверку или возвращает уже идущую по заданию"""
+        if not settings.GRADING_QUEUE_ENABLED:
+            raise GradingQueueDisabledException
+        assignment = await AssignmentDAO.find_one_or_none(
+            session=session, id=assignment_id, user_id=current_user.id
+        )
+        if assignment is None:
+            raise AssignmentNotFoundException
+
+        running = await RegradeRunDAO.find_one_or_none(
+            session=session,
+            assignment_id=assignment_id,
+            status=RegradeRunStatus.RUNNING,
+        )
+        if running is not None:
+            return running.id
+
+        user_ids = await SubmissionsDAO.user_ids_with_files(
+            session, assignment_id
+        )
+        run_id = await RegradeRunDAO.add(
+            session=session,
+            assignment_id=assignment_id,
+            created_by=current_user.id,
+            status=(
+                RegradeRunStatus.RUNNING if user_ids else RegradeRunStatus.DONE
+            ),
+            total=len(user_ids),
+            finished_at=None if user_ids else datetime.utcnow(),
+        )
+        if user_ids:
+            await session.execute(
+                insert(GradingJob),
+                [
+                    {
+                        "kind": GradingJobKind.REGRADE,
+                        "status": GradingJobStatus.QUEUED,
+                        "priority": REGRADE_JOB_PRIORITY,
+                        "regrade_run_id": run_id,
+                        "user_id": user_id,
+                        "assignment_id": assignment_id,
+                        "attempts": 0,
+                    }
+                    for user_id in user_ids
+                ],
+            )
+        logger.info(
+            "User %s started regrade %s of assignment %s (%s submissions)",
+            current_user.email,
+            run_id,
+            assignment_id,
+            len(user_ids),
+        )
+        return run_id
+
+    @staticmethod
+    async def progress(session: AsyncSession, run) -> RegradeRunResponse:
+        counts = await RegradeRunDAO.job_counts(session, run.id)
+        return RegradeRunResponse(
+            id=run.id,
+            assignment_id=run.assignment_id,
+            status=run.status,
+            total=run.total,
+            queued=counts.get(GradingJobStatus.QUEUED, 0),
+            running=counts.get(GradingJobStatus.RUNNING, 0),
+            done=counts.get(GradingJobStatus.DONE, 0),
+            failed=counts.get(GradingJobStatus.FAILED, 0),
+            created_at=run.created_at,
+            finished_at=run.finished_at,
+        )
+
+    @staticmethod
+    async def complete_finished(run_id=None) -> int:
+        """Записывает баллы перепроверок, у которых завершены все задачи
+
+        Вызывается воркером после каждой задачи перепроверки и периодически -
+        на случай, если воркер упал между последней задачей и записью баллов.
+        Возвращает число завершенных перепроверок.
+        """
+        completed = 0
+        async with async_session_maker() as session:
+            async with session.begin():
+                runs = await RegradeRunDAO.lock_running(session, run_id)
+                for run in runs:
+                    counts = await RegradeRunDAO.job_counts(session, run.id)
+                    queued = counts.get(GradingJobStatus.QUEUED, 0)
+                    running = counts.get(GradingJobStatus.RUNNING, 0)
+                    pending = queued + running
+                    if pending:
+                        continue
+                    jobs = await RegradeRunDAO.finished_jobs(session, run.id)
+                    await SubmissionsDAO.bulk_update_scores(
+                        session,
+                        [
+                            {
+                                "id": UUID(job.result["submission_id"]),
+                                "number_of_attempts": job.result[
+                                    "number_of_attempts"
+                                ],
+                                "score": job.result["score"],
+                                "feedback": job.result["feedback"],
+                            }
+                            for job in jobs
+                            if job.result and "number_of_attempts" in job.result
+                        ],
+                    )
+                    run.status = RegradeRunStatus.DONE
+                    run.finished_at = datetime.utcnow()
+                    completed += 1
+                    logger.info(
+                        "Regrade %s finished: %s updated, %s failed",
+                        run.id,
+                        len(jobs),
+                        counts.get(GradingJobStatus.FAILED, 0),
+                    )
+        return completed
@@ -0,0 +1,252 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.dependencies import check_tutor_role, get_current_user
+from app.config import settings
+from app.db import async_session_maker, get_db_session
+from app.exceptions import (
+    GradingJobNotFoundException,
+    RegradeRunNotFoundException,
+)
+from app.grading.progress import HEARTBEAT, format_event
+from app.grading.regrade_service import RegradeService
+from app.grading.scheduler import get_sandbox_scheduler
+from app.grading.schemas import (
+    GradingJobError,
+    GradingJobResponse,
+    GradingJobStatus,
+    RegradeRunResponse,
+    RegradeRunStatus,
+    SandboxQueueResponse,
+)
+from app.grading.service import GradingJobDAO, RegradeRunDAO
+from app.user.models import Users
+from app.user.router import refresh_token
+
+router = APIRouter(prefix="/grading", tags=["Grading"])
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=GradingJobResponse,
+    dependencies=[Depends(refresh_token)],
+)
+async def get_grading_job(
+    job_id: str,
+    current_user: Users = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Статус задачи проверки"""
+    job = await GradingJobDAO.find_one_or_none(
+        session=session, id=job_id, user_id=current_user.id
+    )
+    if job is None:
+        raise GradingJobNotFoundException
+    return _job_response(job, await GradingJobDAO.queue_position(session, job))
+
+
+def _job_response(job, queue_position: int | None = None) -> GradingJobResponse:
+    error = None
+    if job.error_status_code is not None:
+        error = GradingJobError(
+            status_code=job.error_status_code, detail=job.error_detail or ""
+        )
+    return GradingJobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        result=job.result,
+        error=error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        queue_position=queue_position,
+    )
+
+
+@router.get(
+    "/jobs/{job_id}/events",
+    dependencies=[Depends(refresh_token)],
+)
+async def stream_grading_job(
+    job_id: str,
+    current_user: Users = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Ход проверки в виде Server-Sent Events до ее завершения
+
+    status - при смене статуса или места в очереди, progress - событие
+    ячейки из sandbox, result - итог задачи (как в GET /grading/jobs/{id}).
+    Место в очереди пересчитывается не чаще раза в
+    GRADING_PROGRESS_QUEUE_POSITION_INTERVAL_SECONDS.
+    """
+    job = await GradingJobDAO.find_one_or_none(
+        session=session, id=job_id, user_id=current_user.id
+    )
+    if job is None:
+        raise GradingJobNotFoundException
+
+    async def _events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.GRADING_PROGRESS_STREAM_MAX_SECONDS
+        heartbeat_seconds = settings.GRADING_PROGRESS_HEARTBEAT_SECONDS
+        quiet_since = loop.time()
+        sent = 0
+        last_status = None
+        queue_position = None
+        position_at = None
+        interval = settings.GRADING_PROGRESS_QUEUE_POSITION_INTERVAL_SECONDS
+        while loop.time() < deadline:
+            async with async_session_maker() as poll_session:
+                job = await GradingJobDAO.find_one_or_none(
+                    session=poll_session, id=job_id, user_id=current_user.id
+                )
+                if job is None:
+                    return
+                if job.status != GradingJobStatus.QUEUED:
+                    queue_position = None
+                    position_at = None
+                elif position_at is None or (
+                    loop.time() - position_at >= interval
+                ):
+                    queue_position = await GradingJobDAO.queue_position(
+                        poll_session, job
+                    )
+                    position_at = loop.time()
+            response = _job_response(job, queue_position)
+            finished = response.status in (
+                GradingJobStatus.DONE,
+                GradingJobStatus.FAILED,
+            )
+            messages = []
+            events = job.progress or []
+            if len(events) < sent:
+                # Задача перезапущена после падения воркера
+                messages.append(format_event("reset", {}))
+                sent = 0
+            messages.extend(format_event("progress", e) for e in events[sent:])
+            sent = len(events)
+            status = (response.status, response.queue_position)
+            if status != last_status:
+                last_status = status
+                messages.append(
+                    format_event(
+                        "status",
+                        {"status": status[0], "queue_position": status[1]},
+                    )
+                )
+            if finished:
+                messages.append(
+                    format_event("result", response.model_dump(mode="json"))
+                )
+            if messages:
+                quiet_since = loop.time()
+                yield "".join(messages)
+            elif loop.time() - quiet_since >= heartbeat_seconds:
+                quiet_since = loop.time()
+                yield HEARTBEAT
+            if finished:
+                return
+            await asyncio.sleep(settings.GRADING_PROGRESS_INTERVAL_SECONDS)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/queue",
+    response_model=SandboxQueueResponse,
+    dependencies=[Depends(refresh_token)],
+)
+async def get_sandbox_queue(current_user: Users = Depends(get_current_user)):
+    """Место проверок студента в очереди sandbox этого процесса
+
+    Для проверок без очереди в БД (GRADING_QUEUE_ENABLED=false): запрос
+    проверки ждет свободный слот, а клиент параллельно опрашивает этот адрес.
+    """
+    scheduler = get_sandbox_scheduler()
+    return SandboxQueueResponse(
+        queue_position=scheduler.queue_position(current_user.id),
+        **scheduler.stats(),
+    )
+
+
+@router.post(
+    "/assignments/{assignment_id}/regrade",
+    status_code=202,
+    dependencies=[Depends(refresh_token), Depends(check_tutor_role)],
+)
+async def start_regrade(
+    assignment_id: str,
+    current_user: Users = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Перепроверка всех решений задания текущими тестами"""
+    run_id = await RegradeService.start(session, assignment_id, current_user)
+    return {"regrade_id": run_id}
+
+
+@router.get(
+    "/regrades/{regrade_id}",
+    response_model=RegradeRunResponse,
+    dependencies=[Depends(refresh_token), Depends(check_tutor_role)],
+)
+async def get_regrade(
+    regrade_id: str,
+    current_user: Users = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Прогресс перепроверки"""
+    run = await RegradeRunDAO.find_one_or_none(
+        session=session, id=regrade_id, created_by=current_user.id
+    )
+    if run is None:
+        raise RegradeRunNotFoundException
+    return await RegradeService.progress(session, run)
+
+
+@router.get(
+    "/regrades/{regrade_id}/events",
+    dependencies=[Depends(refresh_token), Depends(check_tutor_role)],
+)
+async def stream_regrade(
+    regrade_id: str,
+    current_user: Users = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+):
+    """Прогресс перепроверки в виде Server-Sent Events до ее завершения"""
+    run = await RegradeRunDAO.find_one_or_none(
+        session=session, id=regrade_id, created_by=current_user.id
+    )
+    if run is None:
+        raise RegradeRunNotFoundException
+
+    async def _events():
+        while True:
+            # Отдельная короткая сессия на каждый опрос: поток может жить
+            # долго, а соединение с БД держать все это время незачем
+            async with async_session_maker() as poll_session:
+                run = await RegradeRunDAO.find_one_or_none(
+                    session=poll_session, id=regrade_id
+                )
+                if run is None:
+                    return
+                progress = await RegradeService.progress(poll_session, run)
+            yield f"event: progress\ndata: {progress.model_dump_json()}\n\n"
+            if progress.status != RegradeRunStatus.RUNNING:
+                return
+            await asyncio.sleep(
+                settings.GRADING_REGRADE_PROGRESS_INTERVAL_SECONDS
+            )
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
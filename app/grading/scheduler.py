@@ -0,0 +1,304 @@
+"""Очередь запусков sandbox с учетом дедлайнов и справедливой долей студентов
+
+Порядок задач (ключ fair_share_key, меньше - раньше):
+
+1. priority задачи (массовая перепроверка идет после проверок студентов);
+2. задачи, до дедлайна которых осталось меньше
+   GRADING_SCHEDULER_DEADLINE_BOOST_SECONDS, - раньше остальных и между собой
+   по близости дедлайна;
+3. нагрузка студента: сколько его задач уже исполняется плюс место задачи
+   среди его ожидающих. Так студент, нажимающий «проверить» много раз
+   подряд, не вытесняет остальных: его вторая задача встает после первых
+   задач всех других студентов;
+4. при равной нагрузке - студент, чья задача запускалась давнее;
+5. порядок поступления.
+
+Тот же порядок используется воркерами очереди в БД (GradingJobDAO.claim_next)
+и SandboxScheduler внутри процесса.
+
+Ожидание слота не входит в execution_timeout_seconds: таймаут notebook
+отсчитывается внутри sandbox, который запускается только после выдачи слота.
+"""
+
+import asyncio
+import itertools
+import math
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Iterable
+
+from app.config import settings
+from app.exceptions import SandboxOverloadedException
+from app.metrics import registry
+from app.submissions.services.sandbox_runner import (
+    SANDBOX_CPU_LIMIT,
+    SANDBOX_MEMORY_LIMIT,
+    parse_memory_limit,
+)
+
+sandbox_scheduler_wait_seconds = registry.histogram(
+    "sandbox_scheduler_wait_seconds",
+    "Ожидание свободного слота sandbox",
+    ("urgent",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+sandbox_admission_rejected_total = registry.counter(
+    "sandbox_admission_rejected_total",
+    "Проверки, отклоненные из-за перегрузки sandbox",
+    ("reason",),
+)
+
+# Оценка длительности запуска, пока не завершился ни один
+INITIAL_RUN_SECONDS = 10.0
+RUN_SECONDS_SMOOTHING = 0.2
+
+
+def due_datetime(due_date, due_time) -> datetime | None:
+    """Дедлайн задания (локальное время, как в check_date_submission)"""
+    if due_date is None:
+        return None
+    return datetime.combine(due_date, due_time or time.max)
+
+
+def assignment_due_at(assignment) -> datetime | None:
+    return due_datetime(
+        getattr(assignment, "due_date", None),
+        getattr(assignment, "due_time", None),
+    )
+
+
+def is_urgent(
+    due_at: datetime | None, now: datetime, boost_seconds: int
+) -> bool:
+    if due_at is None:
+        return False
+    return due_at - now <= timedelta(seconds=boost_seconds)
+
+
+def fair_share_key(
+    priority: int,
+    due_at: datetime | None,
+    user_load: int,
+    last_served: int,
+    order,
+    now: datetime,
+    boost_seconds: int,
+) -> tuple:
+    urgent = is_urgent(due_at, now, boost_seconds)
+    due_key = due_at if urgent else datetime.max
+    return (priority, not urgent, due_key, user_load, last_served, order)
+
+
+def fair_order(
+    entries: Iterable,
+    running: dict[int, int],
+    now: datetime | None = None,
+    boost_seconds: int | None = None,
+    served: dict[int, int] | None = None,
+) -> list:
+    """Сортирует ожидающие задачи
+
+    entries - объекты с полями user_id, priority, due_at и order (порядок
+    поступления), running - число исполняющихся задач по студентам,
+    served - номер последнего запуска по студентам (больше - позже).
+    """
+    served = served or {}
+    now = now or datetime.now()
+    if boost_seconds is None:
+        boost_seconds = settings.GRADING_SCHEDULER_DEADLINE_BOOST_SECONDS
+    ranks = defaultdict(int)
+    keyed = []
+    for entry in sorted(entries, key=lambda e: e.order):
+        load = running.get(entry.user_id, 0) + ranks[entry.user_id]
+        ranks[entry.user_id] += 1
+        key = fair_share_key(
+            entry.priority,
+            entry.due_at,
+            load,
+            served.get(entry.user_id, -1),
+            entry.order,
+            now,
+            boost_seconds,
+        )
+        keyed.append((key, entry))
+    keyed.sort(key=lambda item: item[0])
+    return [entry for _, entry in keyed]
+
+
+def default_capacity() -> int:
+    """Сколько sandbox помещается на хост по CPU и памяти"""
+    by_cpu = int((os.cpu_count() or 1) / float(SANDBOX_CPU_LIMIT))
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return max(1, by_cpu)
+    by_memory = memory // parse_memory_limit(SANDBOX_MEMORY_LIMIT)
+    return max(1, min(by_cpu, by_memory))
+
+
+def load_per_cpu() -> float | None:
+    """Средняя загрузка хоста за минуту на одно ядро"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return None
+
+
+@dataclass(eq=False)
+class _Ticket:
+    user_id: int
+    due_at: datetime | None
+    order: int
+    granted: asyncio.Future
+    priority: int = 0
+
+
+class SandboxScheduler:
+    """Ограничивает число одновременных sandbox в процессе
+
+    Задача ждет свободный слот в порядке fair_order, затем исполняется в
+    потоке. Слот освобождается, когда поток завершился, даже если ожидавший
+    его запрос был отменен: контейнер в это время все еще работает.
+
+    Запросы HTTP проходят через admission: если ожидание слота для новой
+    проверки превысит GRADING_ADMISSION_MAX_WAIT_SECONDS или хост
+    перегружен, запрос отклоняется с 429 и Retry-After, а не копится.
+    """
+
+    def __init__(self, capacity: int, boost_seconds: int | None = None):
+        self.capacity = capacity
+        self.boost_seconds = boost_seconds
+        self.running: dict[int, int] = defaultdict(int)
+        self.running_total = 0
+        self.waiting: list[_Ticket] = []
+        self.served: dict[int, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.run_seconds = INITIAL_RUN_SECONDS
+        self._order = itertools.count()
+        self._dispatched = itertools.count()
+
+    def _ordered(self) -> list[_Ticket]:
+        return fair_order(
+            self.waiting,
+            self.running,
+            boost_seconds=self.boost_seconds,
+            served=self.served,
+        )
+
+    def _dispatch(self):
+        while self.waiting and self.running_total < self.capacity:
+            ticket = self._ordered()[0]
+            self.waiting.remove(ticket)
+            self.running[ticket.user_id] += 1
+            self.running_total += 1
+            self.served[ticket.user_id] = next(self._dispatched)
+            ticket.granted.set_result(None)
+
+    def _release(self, user_id: int, run_seconds: float | None = None):
+        if run_seconds is not None:
+            delta = run_seconds - self.run_seconds
+            self.run_seconds += RUN_SECONDS_SMOOTHING * delta
+        self.running[user_id] -= 1
+        if self.running[user_id] <= 0:
+            del self.running[user_id]
+        self.running_total -= 1
+        self._dispatch()
+
+    def queue_position(self, user_id: int) -> int | None:
+        """Место первой ожидающей задачи студента (с 1) или None"""
+        for position, ticket in enumerate(self._ordered(), start=1):
+            if ticket.user_id == user_id:
+                return position
+        return None
+
+    def expected_wait(self) -> float:
+        """Оценка ожидания слота для новой проверки, секунды"""
+        in_flight = max(self.admitted, self.running_total + len(self.waiting))
+        ahead = in_flight + 1 - self.capacity
+        if ahead <= 0:
+            return 0.0
+        return math.ceil(ahead / self.capacity) * self.run_seconds
+
+    def _overload(self) -> tuple[str, int] | None:
+        wait = self.expected_wait()
+        max_wait = settings.GRADING_ADMISSION_MAX_WAIT_SECONDS
+        if wait > max_wait:
+            return "wait", math.ceil(wait - max_wait)
+        max_load = settings.GRADING_ADMISSION_MAX_LOAD_PER_CPU
+        load = load_per_cpu()
+        overloaded = max_load and load is not None and load > max_load
+        if self.running_total and overloaded:
+            return "load", math.ceil(self.run_seconds)
+        return None
+
+    @contextmanager
+    def admission(self):
+        """Пропускает запрос проверки или отклоняет его при перегрузке"""
+        overload = self._overload()
+        if overload is not None:
+            reason, retry_after = overload
+            self.rejected += 1
+            sandbox_admission_rejected_total.inc(reason=reason)
+            raise SandboxOverloadedException(max(1, retry_after))
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.admitted -= 1
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "running": self.running_total,
+            "queued": len(self.waiting),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expected_wait_seconds": self.expected_wait(),
+            "load_per_cpu": load_per_cpu(),
+        }
+
+    async def run(self, func, *args, user_id: int, due_at=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(
+            user_id, due_at, next(self._order), loop.create_future()
+        )
+        self.waiting.append(ticket)
+        started = loop.time()
+        self._dispatch()
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+            else:
+                self._release(user_id)
+            raise
+        boost = self.boost_seconds
+        if boost is None:
+            boost = settings.GRADING_SCHEDULER_DEADLINE_BOOST_SECONDS
+        urgent = is_urgent(due_at, datetime.now(), boost)
+        sandbox_scheduler_wait_seconds.observe(
+            loop.time() - started, urgent=str(urgent).lower()
+        )
+
+        run_started = loop.time()
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        task.add_done_callback(
+            lambda _: self._release(user_id, loop.time() - run_started)
+        )
+        return await asyncio.shield(task)
+
+
+_scheduler: SandboxScheduler | None = None
+
+
+def get_sandbox_scheduler() -> SandboxScheduler:
+    global _scheduler
+    if _scheduler is None:
+        capacity = settings.GRADING_SCHEDULER_CONCURRENCY or default_capacity()
+        _scheduler = SandboxScheduler(capacity)
+    return _scheduler
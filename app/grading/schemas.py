@@ -0,0 +1,67 @@
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class GradingJobKind(str, Enum):
+    SUBMIT = "SUBMIT"
+    EVALUATE = "EVALUATE"
+    EMBEDDED_EVALUATE = "EMBEDDED_EVALUATE"
+    REGRADE = "REGRADE"
+
+
+class GradingJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class RegradeRunStatus(str, Enum):
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+
+
+class GradingJobError(BaseModel):
+    status_code: int
+    detail: str
+
+
+class GradingJobResponse(BaseModel):
+    id: UUID
+    kind: GradingJobKind
+    status: GradingJobStatus
+    result: dict | None = None
+    error: GradingJobError | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    # Место в очереди (с 1), пока задача ждет воркера
+    queue_position: int | None = None
+
+
+class SandboxQueueResponse(BaseModel):
+    queue_position: int | None = None
+    capacity: int
+    running: int
+    queued: int
+    # Принятые запросы проверки, которые еще не завершились
+    admitted: int
+    rejected: int
+    expected_wait_seconds: float
+    load_per_cpu: float | None = None
+
+
+class RegradeRunResponse(BaseModel):
+    id: UUID
+    assignment_id: UUID
+    status: RegradeRunStatus
+    total: int
+    queued: int
+    running: int
+    done: int
+    failed: int
+    created_at: datetime
+    finished_at: datetime | None = None
@@ -0,0 +1,348 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assignment.models import Assignments
+from app.config import settings
+from app.grading.models import GradingJob, GradingResultCache, RegradeRun
+from app.grading.scheduler import due_datetime, fair_order
+from app.grading.schemas import (
+    GradingJobKind,
+    GradingJobStatus,
+    RegradeRunStatus,
+)
+from app.service.base import BaseDAO
+
+
+@dataclass
+class _QueuedJob:
+    """Задача очереди в виде, который понимает fair_order"""
+
+    job: object
+    due_at: datetime | None
+
+    @property
+    def user_id(self):
+        return self.job.user_id
+
+    @property
+    def priority(self):
+        return self.job.priority
+
+    @property
+    def order(self):
+        return self.job.created_at
+
+
+def _queue_order(now: datetime) -> tuple:
+    """Порядок очереди в SQL: priority, срочность, дедлайн, поступление
+
+    Повторяет начало fair_share_key, поэтому срочные задачи не отсекаются
+    LIMIT'ом claim_next. Дедлайн - локальное время, как в due_datetime.
+    """
+    due_time = func.coalesce(Assignments.due_time, time.max)
+    due_at = Assignments.due_date + due_time
+    urgent = due_at <= now + timedelta(
+        seconds=settings.GRADING_SCHEDULER_DEADLINE_BOOST_SECONDS
+    )
+    return (
+        GradingJob.priority,
+        case((urgent, 0), else_=1),
+        func.coalesce(case((urgent, due_at)), datetime.max),
+        GradingJob.created_at,
+    )
+
+
+class GradingJobDAO(BaseDAO):
+    model = GradingJob
+
+    @classmethod
+    async def find_pending(
+        cls,
+        session: AsyncSession,
+        user_id: int,
+        assignment_id: str,
+        kind: str,
+        statuses: tuple[GradingJobStatus, ...] = (
+            GradingJobStatus.QUEUED,
+            GradingJobStatus.RUNNING,
+        ),
+    ):
+        """Незавершенная задача студента того же типа по заданию"""
+        stmt = (
+            select(GradingJob)
+            .where(
+                GradingJob.user_id == user_id,
+                GradingJob.assignment_id == assignment_id,
+                GradingJob.kind == kind,
+                GradingJob.status.in_(statuses),
+            )
+            .order_by(GradingJob.created_at)
+            .limit(1)
+        )
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def running_counts(cls, session: AsyncSession) -> dict[int, int]:
+        """Число исполняющихся (с живой арендой) задач по студентам"""
+        stmt = (
+            select(GradingJob.user_id, func.count())
+            .where(
+                GradingJob.status == GradingJobStatus.RUNNING,
+                GradingJob.lease_expires_at >= datetime.utcnow(),
+            )
+            .group_by(GradingJob.user_id)
+        )
+        result = await session.execute(stmt)
+        return {user_id: count for user_id, count in result.all()}
+
+    @classmethod
+    async def claim_next(
+        cls,
+        session: AsyncSession,
+        worker_id: str,
+        lease_seconds: int,
+        exclude_kinds: tuple[GradingJobKind, ...] = (),
+    ):
+        """Забирает следующую задачу из очереди
+
+        `FOR UPDATE SKIP LOCKED` позволяет нескольким воркерам разбирать
+        очередь параллельно, не блокируя друг друга. Задачи с истекшей арендой
+        (воркер умер во время проверки) забираются повторно. Из первых
+        GRADING_SCHEDULER_CLAIM_CANDIDATES задач (по _queue_order) берется
+        первая в порядке fair_order: ближе к дедлайну, от студента с меньшим
+        числом исполняющихся задач.
+        """
+        now = datetime.utcnow()
+        stmt = (
+            select(GradingJob, Assignments.due_date, Assignments.due_time)
+            .join(Assignments, Assignments.id == GradingJob.assignment_id)
+            .where(
+                or_(
+                    GradingJob.status == GradingJobStatus.QUEUED,
+                    and_(
+                        GradingJob.status == GradingJobStatus.RUNNING,
+                        GradingJob.lease_expires_at < now,
+                    ),
+                )
+            )
+            .order_by(*_queue_order(datetime.now()))
+            .limit(settings.GRADING_SCHEDULER_CLAIM_CANDIDATES)
+            .with_for_update(of=GradingJob, skip_locked=True)
+        )
+        if exclude_kinds:
+            stmt = stmt.where(GradingJob.kind.not_in(exclude_kinds))
+        result = await session.execute(stmt)
+        candidates = [
+            _QueuedJob(job, due_datetime(due_date, due_time))
+            for job, due_date, due_time in result.all()
+        ]
+        if not candidates:
+            return None
+        running = await cls.running_counts(session)
+        job = fair_order(candidates, running)[0].job
+
+        job.status = GradingJobStatus.RUNNING
+        job.attempts += 1
+        job.worker_id = worker_id
+        job.started_at = now
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        await session.flush()
+        return job
+
+    @classmethod
+    async def queue_position(cls, session: AsyncSession, job) -> int | None:
+        """Примерное место задачи в очереди (с 1)
+
+        Считается одним COUNT по _queue_order, без доли студентов из
+        fair_order: так воркеры выбирают кандидатов, а не саму задачу.
+        """
+        if job.status != GradingJobStatus.QUEUED:
+            return None
+        order = _queue_order(datetime.now())
+        stmt = (
+            select(*order)
+            .join(Assignments, Assignments.id == GradingJob.assignment_id)
+            .where(GradingJob.id == job.id)
+        )
+        key = (await session.execute(stmt)).one_or_none()
+        if key is None:
+            return None
+        stmt = (
+            select(func.count())
+            .select_from(GradingJob)
+            .join(Assignments, Assignments.id == GradingJob.assignment_id)
+            .where(
+                GradingJob.status == GradingJobStatus.QUEUED,
+                tuple_(*order)
+                < tuple_(
+                    *(
+                        literal(value, column.type)
+                        for value, column in zip(key, order)
+                    )
+                ),
+            )
+        )
+        return (await session.execute(stmt)).scalar_one() + 1
+
+    @classmethod
+    async def status_counts(cls, session: AsyncSession) -> dict[str, int]:
+        """Число задач в очереди и в работе"""
+        stmt = (
+            select(GradingJob.status, func.count())
+            .where(
+                GradingJob.status.in_(
+                    [GradingJobStatus.QUEUED, GradingJobStatus.RUNNING]
+                )
+            )
+            .group_by(GradingJob.status)
+        )
+        result = await session.execute(stmt)
+        return {status: count for status, count in result.all()}
+
+    @classmethod
+    async def finish(
+        cls,
+        session: AsyncSession,
+        job_id,
+        status: str,
+        result: dict | None = None,
+        error_status_code: int | None = None,
+        error_detail: str | None = None,
+    ):
+        stmt = (
+            update(GradingJob)
+            .where(GradingJob.id == job_id)
+            .values(
+                status=status,
+                result=result,
+                error_status_code=error_status_code,
+                error_detail=error_detail,
+                finished_at=datetime.utcnow(),
+                lease_expires_at=None,
+                # Содержимое notebook больше не нужно, не держим его в БД
+                submission_content=None,
+            )
+        )
+        await session.execute(stmt)
+
+    @classmethod
+    async def requeue(cls, session: AsyncSession, job_id):
+        stmt = (
+            update(GradingJob)
+            .where(GradingJob.id == job_id)
+            .values(
+                status=GradingJobStatus.QUEUED,
+                worker_id=None,
+                lease_expires_at=None,
+            )
+        )
+        await session.execute(stmt)
+
+
+class RegradeRunDAO(BaseDAO):
+    model = RegradeRun
+
+    @classmethod
+    async def job_counts(cls, session: AsyncSession, run_id) -> dict[str, int]:
+        """Число задач перепроверки по статусам"""
+        stmt = (
+            select(GradingJob.status, func.count())
+            .where(GradingJob.regrade_run_id == run_id)
+            .group_by(GradingJob.status)
+        )
+        result = await session.execute(stmt)
+        return {status: count for status, count in result.all()}
+
+    @classmethod
+    async def lock_running(cls, session: AsyncSession, run_id=None):
+        """Незавершенные перепроверки (или одна по id) с блокировкой строк"""
+        stmt = (
+            select(RegradeRun)
+            .where(RegradeRun.status == RegradeRunStatus.RUNNING)
+            .with_for_update(skip_locked=True)
+        )
+        if run_id is not None:
+            stmt = stmt.where(RegradeRun.id == run_id)
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+    @classmethod
+    async def finished_jobs(cls, session: AsyncSession, run_id):
+        stmt = select(GradingJob).where(
+            GradingJob.regrade_run_id == run_id,
+            GradingJob.status == GradingJobStatus.DONE,
+        )
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+
+class GradingResultCacheDAO(BaseDAO):
+    model = GradingResultCache
+
+    @classmethod
+    async def get(cls, session: AsyncSession, key: str, ttl_seconds: int):
+        """Актуальный (не старше ttl_seconds) результат проверки по ключу"""
+        stmt = (
+            update(GradingResultCache)
+            .where(
+                GradingResultCache.key == key,
+                GradingResultCache.created_at
+                >= datetime.utcnow() - timedelta(seconds=ttl_seconds),
+            )
+            .values(hits=GradingResultCache.hits + 1)
+            .returning(GradingResultCache)
+        )
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @classmethod
+    async def put(
+        cls,
+        session: AsyncSession,
+        key: str,
+        total_points: int,
+        feedback: list[int],
+        ttl_seconds: int,
+    ):
+        """Сохраняет результат и удаляет устаревшие записи"""
+        now = datetime.utcnow()
+        stmt = (
+            insert(GradingResultCache)
+            .values(
+                key=key,
+                total_points=total_points,
+                feedback=feedback,
+                hits=0,
+                created_at=now,
+            )
+            .on_conflict_do_update(
+                index_elements=[GradingResultCache.key],
+                set_={
+                    "total_points": total_points,
+                    "feedback": feedback,
+                    "created_at": now,
+                },
+            )
+        )
+        await session.execute(stmt)
+        await session.execute(
+            delete(GradingResultCache).where(
+                GradingResultCache.created_at
+                < now - timedelta(seconds=ttl_seconds)
+            )
+        )
@@ -0,0 +1,137 @@
+"""Воркер очереди проверки решений
+
+Запуск: `python -m app.grading.worker --concurrency 4`
+
+Каждый воркер исполняет не больше `concurrency` проверок одновременно
+(0 - по числу ядер), поэтому мощность проверки масштабируется числом
+воркеров на хостах независимо от веб-части. Часть слотов
+(GRADING_WORKER_INTERACTIVE_SLOTS) не берет задачи массовой перепроверки,
+чтобы проверки студентов не ждали ее окончания.
+
+С GRADING_WORKER_METRICS_PORT воркер отдает свои метрики (запуски
+sandbox, хранилище) в формате Prometheus на `/metrics` этого порта.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+from app.config import settings
+from app.grading.queue_service import GradingQueueService
+from app.grading.regrade_service import RegradeService
+from app.grading.scheduler import get_sandbox_scheduler
+from app.grading.schemas import GradingJobKind
+from app.logger import configure_logging
+from app.monitoring.collectors import register_collectors
+from app.monitoring.server import start_metrics_server
+from app.submissions.services.sandbox_runner import (
+    shutdown_sandbox_pool,
+    start_sandbox_pool,
+)
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+REGRADE_SWEEP_INTERVAL_SECONDS = 60
+
+
+async def _worker_loop(
+    worker_id: str,
+    stop: asyncio.Event,
+    exclude_kinds: tuple[GradingJobKind, ...] = (),
+):
+    while not stop.is_set():
+        try:
+            processed = await GradingQueueService.process_next(
+                worker_id, exclude_kinds
+            )
+        except Exception as e:
+            logger.error("Ошибка воркера %s: %s", worker_id, e, exc_info=True)
+            processed = False
+        if not processed:
+            try:
+                await asyncio.wait_for(
+                    stop.wait(),
+                    timeout=settings.GRADING_WORKER_POLL_INTERVAL_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _regrade_sweeper(stop: asyncio.Event):
+    """Дописывает баллы перепроверок, прерванных падением воркера"""
+    while not stop.is_set():
+        try:
+            await RegradeService.complete_finished()
+        except Exception as e:
+            logger.error("Ошибка завершения перепроверок: %s", e, exc_info=True)
+        try:
+            await asyncio.wait_for(
+                stop.wait(), timeout=REGRADE_SWEEP_INTERVAL_SECONDS
+            )
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(concurrency: int):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    host = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("Воркер проверки %s запущен, concurrency=%s", host, concurrency)
+    start_sandbox_pool(owner=f"{socket.gethostname()}-grading-worker")
+    if settings.GRADING_WORKER_METRICS_PORT:
+        register_collectors()
+        start_metrics_server(settings.GRADING_WORKER_METRICS_PORT)
+    try:
+        # Текущие проверки доводятся до конца, новые после сигнала не берутся
+        interactive_slots = min(
+            settings.GRADING_WORKER_INTERACTIVE_SLOTS, concurrency - 1
+        )
+        await asyncio.gather(
+            _regrade_sweeper(stop),
+            *(
+                _worker_loop(
+                    f"{host}/{index}",
+                    stop,
+                    (
+                        (GradingJobKind.REGRADE,)
+                        if index < interactive_slots
+                        else ()
+                    ),
+                )
+                for index in range(concurrency)
+            ),
+        )
+    finally:
+        shutdown_sandbox_pool()
+    logger.info("Воркер проверки %s остановлен", host)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Воркер очереди проверки решений"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.GRADING_WORKER_CONCURRENCY,
+        help="Сколько проверок выполнять одновременно (0 - по числу ядер)",
+    )
+    args = parser.parse_args()
+    concurrency = args.concurrency or os.cpu_count() or 1
+    # Больше задач, чем слотов sandbox, не забираем: иначе задача ждала бы
+    # слот внутри процесса, а ее аренда в это время истекала
+    concurrency = min(concurrency, get_sandbox_scheduler().capacity)
+    asyncio.run(run_worker(max(1, concurrency)))
+
+
+if __name__ == "__main__":
+    main()
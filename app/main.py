@@ -1,37 +1,78 @@
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from sqladmin import Admin
 
+from app.admin.auth import authentication_backend
 from app.admin.views import (
-    AssignmentsAdmin,
-    SubmissionsAdmin,
-    UsersAdmin,
-    RefreshTokensAdmin,
     AssignmentFilesAdmin,
-    GroupsAdmin,
+    AssignmentsAdmin,
     DisciplinesAdmin,
+    GroupsAdmin,
+    RefreshTokensAdmin,
     SubmissionFilesAdmin,
+    SubmissionsAdmin,
+    UsersAdmin,
 )
-from app.exceptions import IncorrectRoleException, IncorrectTokenFormatException, TokenAbsentException, TokenExpiredException, UserIsNotPresentException
-from app.user.router import router as user_router
-from app.user.google_router import router as google_router
 from app.assignment.router import router as assignment_router
-from app.submissions.router import router as submission_router
-from app.submissions.router import sub_router as two_submission_router
+from app.config import settings
+from app.db import engine
 from app.discipline.router import router as discipline_router
+from app.exceptions import (
+    IncorrectRoleException,
+    IncorrectTokenFormatException,
+    TokenAbsentException,
+    TokenExpiredException,
+    UserIsNotPresentException,
+)
+from app.grading.router import router as grading_router
 from app.logger import configure_logging, setup_fastapi_exception_logging
+from app.monitoring.collectors import register_collectors
+from app.monitoring.middleware import MetricsMiddleware
+from app.monitoring.router import router as metrics_router
 from app.pages.router import router as frontend
-from app.admin.auth import authentication_backend
-from app.db import engine
+from app.submissions.router import router as submission_router
+from app.submissions.router import sub_router as two_submission_router
+from app.submissions.services.embedded_notebook_service import (
+    JupyterHubClient,
+    close_jupyterhub_http_client,
+    get_jupyterhub_http_client,
+)
+from app.submissions.services.jupyter_server_pool import jupyter_server_pool
+from app.submissions.services.sandbox_runner import (
+    shutdown_sandbox_pool,
+    start_sandbox_pool,
+)
+from app.user.google_router import router as google_router
+from app.user.router import router as user_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогреваем пул sandbox-контейнеров до первых проверок
+    start_sandbox_pool()
+    get_jupyterhub_http_client()
+    if (
+        settings.ENABLE_EMBEDDED_NOTEBOOK_EDITOR
+        and settings.JUPYTERHUB_ADMIN_TOKEN
+    ):
+        # Теплые серверы JupyterHub и остановка простаивающих
+        jupyter_server_pool.start(JupyterHubClient)
+    yield
+    await jupyter_server_pool.shutdown()
+    await close_jupyterhub_http_client()
+    shutdown_sandbox_pool()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 configure_logging()
 setup_fastapi_exception_logging(app)
+register_collectors()
 
 async def _auth_exception_handler(request: Request, exc: Exception):
     if request.url.path.startswith("/pages"):
@@ -56,6 +97,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(user_router)
@@ -64,6 +106,8 @@ app.include_router(assignment_router)
 app.include_router(discipline_router)
 app.include_router(submission_router)
 app.include_router(two_submission_router)
+app.include_router(grading_router)
+app.include_router(metrics_router)
 app.include_router(frontend)
 
 admin = Admin(app, engine, authentication_backend=authentication_backend)
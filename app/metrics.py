@@ -0,0 +1,260 @@
+"""Метрики процесса в формате Prometheus
+
+Метрики объявляются в модулях рядом с кодом, который их обновляет, и
+регистрируются в общем registry. Значения, которые компоненты считают
+сами (статистика пулов и кэшей), снимаются коллекторами непосредственно
+перед выдачей; render_text отдает все метрики в текстовом формате.
+"""
+
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class _Metric:
+    """Базовый класс метрики с набором меток"""
+
+    type = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name}: ожидались метки {self.labelnames}, "
+                f"получены {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Переносит счетчик, который ведет сам компонент (для коллекторов)"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            (self.name, dict(zip(self.labelnames, key)), value)
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self.set_total(value, **labels)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # ключ меток -> [счетчики по корзинам, сумма, количество]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.setdefault(
+                key, [[0] * len(self.buckets), 0.0, 0]
+            )
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет длительность блока; метки можно дополнить внутри блока"""
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self, **labels) -> dict:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return {"count": 0, "sum": 0.0, "buckets": {}}
+            counts, total, count = list(state[0]), state[1], state[2]
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        return {"count": count, "sum": total, "buckets": buckets}
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        with self._lock:
+            items = [
+                (key, list(state[0]), state[1], state[2])
+                for key, state in self._values.items()
+            ]
+        result = []
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = {**labels, "le": _format_bound(bound)}
+                result.append(
+                    (f"{self.name}_bucket", bucket_labels, cumulative)
+                )
+            result.append(
+                (f"{self.name}_bucket", {**labels, "le": "+Inf"}, count)
+            )
+            result.append((f"{self.name}_sum", labels, total))
+            result.append((f"{self.name}_count", labels, count))
+        return result
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer() and abs(value) < 2**53:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = (
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(
+                        f"Метрика {metric.name} уже зарегистрирована"
+                    )
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets=DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets=buckets)
+        )
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Функция, обновляющая метрики перед выдачей"""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            # Сбой одного источника не должен ломать выдачу остальных метрик
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(
+                    "Не удалось собрать метрики %s: %s", collector, e
+                )
+
+    def metrics(self) -> list[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_text(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        self.collect()
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            help_text = metric.documentation.replace("\\", "\\\\")
+            help_text = help_text.replace("\n", "\\n")
+            lines.append(f"# HELP {metric.name} {help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(
+                    f"{name}{_format_labels(labels)} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
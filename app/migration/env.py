@@ -1,19 +1,24 @@
 import asyncio
 from logging.config import fileConfig
 
+from alembic import context
 from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 
-from alembic import context
-
-from app.db import Base
+from app.assignment.models import AssignmentFile, Assignments
 from app.config import settings
-from app.user.models import Users
-from app.models import RefreshToken, Groups
+from app.db import Base
 from app.discipline.models import Disciplines
-from app.assignment.models import Assignments, AssignmentFile
-from app.submissions.models import Submissions, SubmissionFiles, SubmissionAttempt
+from app.grading.models import GradingJob, GradingResultCache, RegradeRun
+from app.models import Groups, RefreshToken
+from app.submissions.models import (
+    JupyterServerBinding,
+    SubmissionAttempt,
+    SubmissionFiles,
+    Submissions,
+)
+from app.user.models import Users
 
 config = context.config
 
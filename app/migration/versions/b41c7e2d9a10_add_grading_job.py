@@ -0,0 +1,65 @@
+"""add grading job
+
+Revision ID: b41c7e2d9a10
+Revises: ed95ecb31e3a
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41c7e2d9a10'
+down_revision: Union[str, None] = 'ed95ecb31e3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('grading_job',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('assignment_id', sa.UUID(), nullable=False),
+    sa.Column('submission_content', sa.LargeBinary(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error_status_code', sa.Integer(), nullable=True),
+    sa.Column('error_detail', sa.String(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(
+        ['assignment_id'], ['assignment.id'], ondelete='CASCADE'
+    ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_index(
+        'ix_grading_job_status_created_at',
+        'grading_job',
+        ['status', 'created_at'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_grading_job_user_id_assignment_id',
+        'grading_job',
+        ['user_id', 'assignment_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_grading_job_user_id_assignment_id', table_name='grading_job'
+    )
+    op.drop_index('ix_grading_job_status_created_at', table_name='grading_job')
+    op.drop_table('grading_job')
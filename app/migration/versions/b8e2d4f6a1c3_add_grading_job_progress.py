@@ -0,0 +1,29 @@
+"""add grading job progress
+
+Revision ID: b8e2d4f6a1c3
+Revises: f7c3a1d9e2b4
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2d4f6a1c3'
+down_revision: Union[str, None] = 'f7c3a1d9e2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'grading_job', sa.Column('progress', sa.JSON(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('grading_job', 'progress')
@@ -0,0 +1,30 @@
+"""add submission attempt cell metrics
+
+Revision ID: c4f1a7e9d2b5
+Revises: b8e2d4f6a1c3
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f1a7e9d2b5'
+down_revision: Union[str, None] = 'b8e2d4f6a1c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'submission_attempt',
+        sa.Column('cell_metrics', sa.JSON(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('submission_attempt', 'cell_metrics')
@@ -0,0 +1,41 @@
+"""add jupyter server binding
+
+Revision ID: c7d2e5f81a34
+Revises: b41c7e2d9a10
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e5f81a34'
+down_revision: Union[str, None] = 'b41c7e2d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('jupyter_server_binding',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('assignment_id', sa.UUID(), nullable=False),
+    sa.Column('hub_username', sa.String(length=255), nullable=False),
+    sa.Column('server_name', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(
+        ['assignment_id'], ['assignment.id'], ondelete='CASCADE'
+    ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('hub_username'),
+    sa.UniqueConstraint('user_id', 'assignment_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('jupyter_server_binding')
@@ -0,0 +1,44 @@
+"""add grading result cache
+
+Revision ID: d3a9f4c61b27
+Revises: c7d2e5f81a34
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9f4c61b27'
+down_revision: Union[str, None] = 'c7d2e5f81a34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('grading_result_cache',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('total_points', sa.Integer(), nullable=False),
+    sa.Column('feedback', sa.JSON(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(
+        op.f('ix_grading_result_cache_created_at'),
+        'grading_result_cache',
+        ['created_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f('ix_grading_result_cache_created_at'),
+        table_name='grading_result_cache',
+    )
+    op.drop_table('grading_result_cache')
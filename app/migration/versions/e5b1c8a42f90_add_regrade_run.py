@@ -0,0 +1,89 @@
+"""add regrade run
+
+Revision ID: e5b1c8a42f90
+Revises: d3a9f4c61b27
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1c8a42f90'
+down_revision: Union[str, None] = 'd3a9f4c61b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('regrade_run',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('assignment_id', sa.UUID(), nullable=False),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(
+        ['assignment_id'], ['assignment.id'], ondelete='CASCADE'
+    ),
+    sa.ForeignKeyConstraint(['created_by'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_index(
+        op.f('ix_regrade_run_assignment_id'),
+        'regrade_run',
+        ['assignment_id'],
+        unique=False,
+    )
+    op.add_column(
+        'grading_job',
+        sa.Column(
+            'priority', sa.Integer(), server_default='0', nullable=False
+        ),
+    )
+    op.add_column(
+        'grading_job',
+        sa.Column('regrade_run_id', sa.UUID(), nullable=True),
+    )
+    op.create_foreign_key(
+        'grading_job_regrade_run_id_fkey',
+        'grading_job',
+        'regrade_run',
+        ['regrade_run_id'],
+        ['id'],
+        ondelete='CASCADE',
+    )
+    op.create_index(
+        'ix_grading_job_regrade_run_id',
+        'grading_job',
+        ['regrade_run_id'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_grading_job_status_priority_created_at',
+        'grading_job',
+        ['status', 'priority', 'created_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        'ix_grading_job_status_priority_created_at', table_name='grading_job'
+    )
+    op.drop_index('ix_grading_job_regrade_run_id', table_name='grading_job')
+    op.drop_constraint(
+        'grading_job_regrade_run_id_fkey', 'grading_job', type_='foreignkey'
+    )
+    op.drop_column('grading_job', 'regrade_run_id')
+    op.drop_column('grading_job', 'priority')
+    op.drop_index(
+        op.f('ix_regrade_run_assignment_id'), table_name='regrade_run'
+    )
+    op.drop_table('regrade_run')
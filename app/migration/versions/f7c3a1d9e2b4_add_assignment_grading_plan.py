@@ -0,0 +1,29 @@
+"""add assignment grading plan
+
+Revision ID: f7c3a1d9e2b4
+Revises: e5b1c8a42f90
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c3a1d9e2b4'
+down_revision: Union[str, None] = 'e5b1c8a42f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'assignment', sa.Column('grading_plan', sa.JSON(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('assignment', 'grading_plan')
@@ -0,0 +1,115 @@
+"""Метрики, которые снимаются со статистики компонентов при выдаче
+
+Пулы и кэши считают свою статистику сами (stats()), поэтому на горячем
+пути ничего не добавляется: значения переносятся в registry только
+при запросе /metrics.
+"""
+
+from app.db import engine
+from app.grading.scheduler import get_sandbox_scheduler
+from app.metrics import registry
+from app.storage.cache import storage_file_cache
+from app.submissions.services.jupyter_server_pool import jupyter_server_pool
+from app.submissions.services.sandbox_runner import sandbox_pool_stats
+
+db_pool_connections = registry.gauge(
+    "db_pool_connections",
+    "Соединения пула БД: size, checked_out, idle, overflow",
+    ("state",),
+)
+sandbox_scheduler_tasks = registry.gauge(
+    "sandbox_scheduler_tasks",
+    "Очередь sandbox процесса: capacity, running, queued, admitted",
+    ("state",),
+)
+sandbox_scheduler_expected_wait_seconds = registry.gauge(
+    "sandbox_scheduler_expected_wait_seconds",
+    "Оценка ожидания слота sandbox для новой проверки",
+)
+sandbox_pool_containers = registry.gauge(
+    "sandbox_pool_containers",
+    "Контейнеры пула sandbox: idle, total",
+    ("state",),
+)
+sandbox_pool_requests_total = registry.counter(
+    "sandbox_pool_requests_total",
+    "Запросы контейнера из пула: hit - взят готовый, miss - нет",
+    ("result",),
+)
+storage_cache_requests_total = registry.counter(
+    "storage_cache_requests_total",
+    "Обращения к локальному кэшу файлов хранилища",
+    ("result",),
+)
+storage_cache_bytes = registry.gauge(
+    "storage_cache_bytes",
+    "Размер локального кэша файлов хранилища",
+)
+jupyterhub_pool_servers = registry.gauge(
+    "jupyterhub_pool_servers",
+    "Серверы пула JupyterHub: warm, spawning",
+    ("state",),
+)
+jupyterhub_pool_claims_total = registry.counter(
+    "jupyterhub_pool_claims_total",
+    "Запросы сервера из пула JupyterHub: hit - выдан теплый, miss - нет",
+    ("result",),
+)
+
+
+def collect_db_pool():
+    pool = engine.sync_engine.pool
+    # NullPool (MODE=TEST) соединения не хранит
+    if not hasattr(pool, "checkedout"):
+        return
+    db_pool_connections.set(pool.size(), state="size")
+    db_pool_connections.set(pool.checkedout(), state="checked_out")
+    db_pool_connections.set(pool.checkedin(), state="idle")
+    db_pool_connections.set(max(0, pool.overflow()), state="overflow")
+
+
+def collect_sandbox_scheduler():
+    stats = get_sandbox_scheduler().stats()
+    for state in ("capacity", "running", "queued", "admitted"):
+        sandbox_scheduler_tasks.set(stats[state], state=state)
+    sandbox_scheduler_expected_wait_seconds.set(stats["expected_wait_seconds"])
+
+
+def collect_sandbox_pool():
+    stats = sandbox_pool_stats()
+    if stats is None:
+        return
+    sandbox_pool_containers.set(stats["idle"], state="idle")
+    sandbox_pool_containers.set(stats["total"], state="total")
+    sandbox_pool_requests_total.set_total(stats["hits"], result="hit")
+    sandbox_pool_requests_total.set_total(stats["misses"], result="miss")
+
+
+def collect_storage_cache():
+    if not storage_file_cache.enabled:
+        return
+    stats = storage_file_cache.stats()
+    storage_cache_requests_total.set_total(stats["hits"], result="hit")
+    storage_cache_requests_total.set_total(stats["misses"], result="miss")
+    storage_cache_bytes.set(stats["size_bytes"])
+
+
+def collect_jupyterhub_pool():
+    if not jupyter_server_pool.enabled:
+        return
+    stats = jupyter_server_pool.stats()
+    jupyterhub_pool_servers.set(stats["warm"], state="warm")
+    jupyterhub_pool_servers.set(stats["spawning"], state="spawning")
+    jupyterhub_pool_claims_total.set_total(stats["claims"], result="hit")
+    jupyterhub_pool_claims_total.set_total(stats["claim_misses"], result="miss")
+
+
+def register_collectors():
+    for collector in (
+        collect_db_pool,
+        collect_sandbox_scheduler,
+        collect_sandbox_pool,
+        collect_storage_cache,
+        collect_jupyterhub_pool,
+    ):
+        registry.add_collector(collector)
@@ -0,0 +1,62 @@
+import time
+
+from app.metrics import registry
+
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Время ответа HTTP до начала тела (для потоков SSE - до заголовков)",
+    ("method", "route", "status"),
+)
+
+# Путь без совпавшего маршрута в метку не попадает: иначе каждый
+# несуществующий адрес давал бы новый ряд
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _route_label(scope: dict) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Смонтированные приложения (static, admin) - по префиксу монтирования
+    return scope.get("root_path") or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware: длительность запросов по шаблону маршрута
+
+    Замер заканчивается на отправке заголовков ответа, поэтому долгие
+    потоки не искажают гистограмму, а тело ответа не буферизуется.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        observed = False
+
+        def observe(status):
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            http_request_duration_seconds.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=_route_label(scope),
+                status=status,
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            observe(500)
+            raise
@@ -0,0 +1,41 @@
+import logging
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.db import async_session_maker
+from app.grading.schemas import GradingJobStatus
+from app.grading.service import GradingJobDAO
+from app.metrics import CONTENT_TYPE, registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Metrics"])
+
+grading_jobs = registry.gauge(
+    "grading_jobs",
+    "Задачи очереди проверки в БД: QUEUED, RUNNING",
+    ("status",),
+)
+
+
+async def collect_grading_jobs():
+    """Глубина очереди в БД; запрашивается только при включенной очереди"""
+    if not settings.GRADING_QUEUE_ENABLED:
+        return
+    try:
+        async with async_session_maker() as session:
+            counts = await GradingJobDAO.status_counts(session)
+    except Exception as e:
+        logger.warning("Не удалось получить размер очереди проверки: %s", e)
+        return
+    for status in (GradingJobStatus.QUEUED, GradingJobStatus.RUNNING):
+        grading_jobs.set(counts.get(status, 0), status=status.value)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Метрики процесса в формате Prometheus"""
+    await collect_grading_jobs()
+    return PlainTextResponse(registry.render_text(), media_type=CONTENT_TYPE)
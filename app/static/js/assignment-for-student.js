@@ -51,6 +51,128 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
+  const GRADING_JOB_POLL_INTERVAL_MS = 1500;
+
+  // Ход проверки по событиям ячеек из sandbox: какой шаг выполняется
+  // и сколько баллов уже набрано.
+  function createProgressReporter(element) {
+    let steps = null;
+    let points = 0;
+
+    return function (event) {
+      if (event.steps) steps = event.steps;
+      if (event.event === "restored") {
+        showMessage(element, `Шаги 1-${event.steps} взяты из прошлой проверки`, "success");
+        return;
+      }
+      if (event.event === "finished" && event.points) points += event.points;
+      if (event.index === undefined) return;
+
+      const step = steps ? `${event.index + 1} из ${steps}` : `${event.index + 1}`;
+      const text = event.event === "started"
+        ? `Выполняется шаг ${step}`
+        : `Шаг ${step} ${event.event === "failed" ? "не пройден" : "выполнен"}`;
+      showMessage(element, `${text}. Набрано баллов: ${points}`, "success");
+    };
+  }
+
+  // Разбирает поток Server-Sent Events из тела ответа fetch.
+  async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const chunk = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let eventName = "message";
+        const data = [];
+        for (const line of chunk.split("\n")) {
+          if (line.startsWith("event: ")) eventName = line.slice(7);
+          else if (line.startsWith("data: ")) data.push(line.slice(6));
+        }
+        if (data.length) onEvent(eventName, JSON.parse(data.join("\n")));
+      }
+    }
+  }
+
+  // Проверка без очереди отвечает потоком: progress по ячейкам,
+  // в конце result или error.
+  async function readEvaluationStream(response, onProgress) {
+    let result = null;
+    let error = null;
+
+    await readEventStream(response, (eventName, data) => {
+      if (eventName === "progress") onProgress(data);
+      else if (eventName === "result") result = data;
+      else if (eventName === "error") error = data;
+    });
+
+    if (error) throw new Error(error.detail || "Проверка завершилась ошибкой");
+    if (!result) throw new Error("Соединение с сервером прервано");
+    return result;
+  }
+
+  // Если проверка поставлена в очередь, сервер отвечает 202 и id задачи:
+  // слушаем ее события, а если поток недоступен - опрашиваем статус,
+  // пока воркер не вернет результат или ошибку.
+  async function waitForGradingJob(data, onProgress = () => {}, onStatus = () => {}) {
+    if (!data.job_id) return data;
+
+    if (window.EventSource) {
+      const job = await new Promise((resolve) => {
+        const source = new EventSource(`/grading/jobs/${data.job_id}/events`);
+        source.addEventListener("progress", (e) => onProgress(JSON.parse(e.data)));
+        source.addEventListener("status", (e) => onStatus(JSON.parse(e.data)));
+        source.addEventListener("result", (e) => {
+          source.close();
+          resolve(JSON.parse(e.data));
+        });
+        source.onerror = () => {
+          source.close();
+          resolve(null);
+        };
+      });
+      if (job) return gradingJobResult(job);
+    }
+
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, GRADING_JOB_POLL_INTERVAL_MS));
+
+      const response = await fetch(`/grading/jobs/${data.job_id}`);
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || "Не удалось получить статус проверки");
+      }
+
+      const job = await response.json();
+      onStatus(job);
+      if (job.status === "DONE" || job.status === "FAILED") return gradingJobResult(job);
+    }
+  }
+
+  function gradingJobResult(job) {
+    if (job.status === "FAILED") {
+      throw new Error((job.error && job.error.detail) || "Проверка завершилась ошибкой");
+    }
+    return job.result;
+  }
+
+  function createStatusReporter(element) {
+    return function (status) {
+      if (status.status === "QUEUED" && status.queue_position) {
+        showMessage(element, `Решение в очереди на проверку: ${status.queue_position}`, "success");
+      }
+    };
+  }
+
   function disableEmbeddedEditorActions() {
     if (saveNotebookButton) saveNotebookButton.disabled = true;
     if (evaluateNotebookButton) evaluateNotebookButton.disabled = true;
@@ -95,6 +217,13 @@ document.addEventListener("DOMContentLoaded", function () {
         return;
       }
 
+      try {
+        await waitForGradingJob(await uploadResponse.json());
+      } catch (error) {
+        showMessage(uploadMessageBlock, "Ошибка при загрузке файла: " + error.message, "error");
+        return;
+      }
+
       showMessage(uploadMessageBlock, "Файл загружен. Проверяем решение...", "success");
 
       const evaluateResponse = await fetch(`/assignments/${assignmentId}/submissions/evaluate`, {
@@ -113,7 +242,17 @@ document.addEventListener("DOMContentLoaded", function () {
         return;
       }
 
-      const data = await evaluateResponse.json();
+      let data;
+      try {
+        data = await waitForGradingJob(
+          await evaluateResponse.json(),
+          createProgressReporter(uploadMessageBlock),
+          createStatusReporter(uploadMessageBlock)
+        );
+      } catch (error) {
+        showMessage(uploadMessageBlock, "Ошибка при проверке: " + error.message, "error");
+        return;
+      }
 
       showMessage(
         uploadMessageBlock,
@@ -277,7 +416,10 @@ document.addEventListener("DOMContentLoaded", function () {
 
       const response = await fetch(`/assignments/${assignmentId}/notebook/evaluate`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          Accept: "text/event-stream, application/json",
+        },
         body: JSON.stringify({ jupyter_token: jupyterToken }),
       });
 
@@ -293,7 +435,21 @@ document.addEventListener("DOMContentLoaded", function () {
         return;
       }
 
-      const data = await response.json();
+      const onProgress = createProgressReporter(editorMessageBlock);
+      const contentType = response.headers.get("content-type") || "";
+      let data;
+      try {
+        data = contentType.startsWith("text/event-stream")
+          ? await readEvaluationStream(response, onProgress)
+          : await waitForGradingJob(
+            await response.json(),
+            onProgress,
+            createStatusReporter(editorMessageBlock)
+          );
+      } catch (error) {
+        showMessage(editorMessageBlock, "Ошибка проверки: " + error.message, "error");
+        return;
+      }
 
       showMessage(
         editorMessageBlock,
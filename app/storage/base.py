@@ -0,0 +1,88 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterator, Protocol
+
+
+@dataclass
+class FileMetadata:
+    """Метаданные файла в хранилище
+
+    rev меняется при каждой перезаписи файла, content_hash (если backend
+    его знает) зависит только от содержимого.
+    """
+
+    path: str
+    size: int
+    rev: str
+    content_hash: str | None = None
+
+
+class StorageStream(Protocol):
+    """Открытое скачивание: тело читается кусками и обязательно закрывается
+
+    status_code равен 206, если backend отдал только запрошенный диапазон.
+    """
+
+    status_code: int
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]: ...
+
+    def close(self) -> None: ...
+
+
+class StorageBackend(ABC):
+    """Хранилище файлов заданий и решений
+
+    Пути абсолютные в стиле Dropbox: `/<folder_type>/<filename>`.
+    """
+
+    @abstractmethod
+    def upload_file_to_path(self, file_content: bytes, path: str) -> dict:
+        """Сохраняет файл по явному пути и возвращает {"path": path}"""
+
+    @abstractmethod
+    def get_link(self, path: str) -> str:
+        """Ссылка для прямого скачивания файла"""
+
+    @abstractmethod
+    def file_exists(self, path: str) -> bool: ...
+
+    @abstractmethod
+    def get_metadata(self, path: str) -> FileMetadata: ...
+
+    @abstractmethod
+    def open_download(
+        self,
+        path: str,
+        rev: str | None = None,
+        byte_range: tuple[int, int] | None = None,
+    ) -> tuple[FileMetadata, StorageStream]:
+        """Открывает потоковое скачивание файла
+
+        byte_range - включительные границы (start, end). rev, если передан,
+        фиксирует ревизию, по которой считались метаданные.
+        """
+
+    @abstractmethod
+    def delete_file(self, path: str) -> None: ...
+
+    def upload_file(
+        self, file_content: bytes, filename: str, folder_type: str
+    ) -> dict:
+        """Сохраняет файл и возвращает путь и ссылку на скачивание"""
+        path = f"/{folder_type}/{filename}"
+        self.upload_file_to_path(file_content, path)
+        return {"path": path, "link": self.get_link(path)}
+
+    def download_file_with_metadata(
+        self, path: str
+    ) -> tuple[FileMetadata, bytes]:
+        metadata, stream = self.open_download(path)
+        try:
+            content = b"".join(stream.iter_content(chunk_size=1024 * 1024))
+        finally:
+            stream.close()
+        return metadata, content
+
+    def download_file(self, path: str) -> bytes:
+        return self.download_file_with_metadata(path)[1]
@@ -0,0 +1,282 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.config import settings
+from app.logger import configure_logging
+from app.storage.service import get_storage
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+
+_SAFE_BLOB_NAME = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+@dataclass
+class _PathEntry:
+    content_hash: str
+    validated_at: float
+
+
+class StorageFileCache:
+    """Локальный кэш файлов хранилища, адресуемый по content_hash
+
+    Содержимое хранится на диске в `<root>/blobs/<content_hash>`, поэтому
+    одинаковые файлы по разным путям занимают место один раз, а кэш
+    переживает перезапуск процесса. Для каждого пути помним, какой хэш у него
+    был и когда это проверялось: в течение revalidate_seconds файл отдается
+    без обращения к хранилищу, после - сверяется по метаданным
+    (без скачивания). Если backend не знает content_hash, ключом служит rev.
+    При превышении max_bytes вытесняются давно не использованные файлы.
+
+    Одновременные запросы одного пути ждут единственную загрузку.
+    """
+
+    def __init__(
+        self,
+        service=None,
+        root: Path = Path(tempfile.gettempdir()) / "autograder-storage-cache",
+        max_bytes: int = 0,
+        revalidate_seconds: float = 0,
+    ):
+        # service=None - используется хранилище из настроек
+        self._service = service
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+
+        self._lock = threading.Lock()
+        self._paths: dict[str, _PathEntry] = {}
+        self._blobs: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self._inflight: dict[str, Future] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidations": 0,
+            "bytes_saved": 0,
+            "bytes_downloaded": 0,
+            "evictions": 0,
+        }
+
+    @property
+    def service(self):
+        return self._service or get_storage()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, path: str) -> bytes:
+        """Возвращает содержимое файла, скачивая его только при изменении"""
+        if not self.enabled:
+            return self.service.download_file(path)
+
+        with self._lock:
+            self._load_existing_blobs()
+            future = self._inflight.get(path)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[path] = future
+
+        if not leader:
+            content = future.result()
+            self._record_hit(len(content))
+            return content
+
+        try:
+            content = self._get(path, future)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(content)
+            return content
+        finally:
+            with self._lock:
+                if self._inflight.get(path) is future:
+                    del self._inflight[path]
+
+    def invalidate(self, *paths: str):
+        """Забывает пути, файлы по которым были перезаписаны или удалены"""
+        with self._lock:
+            for path in paths:
+                self._paths.pop(path, None)
+                # Текущая загрузка могла начаться до изменения файла:
+                # новые запросы не должны ее дожидаться.
+                self._inflight.pop(path, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._blobs)
+            stats["size_bytes"] = self._size
+        requests = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / requests if requests else 0.0
+        return stats
+
+    def _get(self, path: str, future: Future) -> bytes:
+        with self._lock:
+            entry = self._paths.get(path)
+        if (
+            entry is not None
+            and time.monotonic() - entry.validated_at < self.revalidate_seconds
+        ):
+            content = self._read_blob(entry.content_hash)
+            if content is not None:
+                self._record_hit(len(content))
+                return content
+
+        with self._lock:
+            self._stats["revalidations"] += 1
+        content_hash = self._content_hash(self.service.get_metadata(path))
+        content = self._read_blob(content_hash)
+        if content is not None:
+            self._remember(path, content_hash, future)
+            self._record_hit(len(content))
+            return content
+
+        metadata, content = self.service.download_file_with_metadata(path)
+        content_hash = self._content_hash(metadata)
+        with self._lock:
+            self._stats["misses"] += 1
+            self._stats["bytes_downloaded"] += len(content)
+        if self._store_blob(content_hash, content):
+            self._remember(path, content_hash, future)
+        return content
+
+    @staticmethod
+    def _content_hash(metadata) -> str:
+        key = getattr(metadata, "content_hash", None) or f"rev-{metadata.rev}"
+        if not _SAFE_BLOB_NAME.match(key):
+            # Ключ становится именем файла на диске
+            key = hashlib.sha256(key.encode()).hexdigest()
+        return key
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.root / "blobs" / content_hash
+
+    def _read_blob(self, content_hash: str) -> bytes | None:
+        try:
+            content = self._blob_path(content_hash).read_bytes()
+        except FileNotFoundError:
+            # Файл мог вытеснить другой процесс с тем же каталогом кэша
+            with self._lock:
+                size = self._blobs.pop(content_hash, None)
+                if size is not None:
+                    self._size -= size
+            return None
+        with self._lock:
+            if content_hash not in self._blobs:
+                self._blobs[content_hash] = len(content)
+                self._size += len(content)
+            self._blobs.move_to_end(content_hash)
+        return content
+
+    def _store_blob(self, content_hash: str, content: bytes) -> bool:
+        if len(content) > self.max_bytes:
+            return False
+        blob_path = self._blob_path(content_hash)
+        tmp_path = blob_path.with_name(
+            f".{content_hash}.{uuid.uuid4().hex}.tmp"
+        )
+        try:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, blob_path)
+        except OSError as e:
+            logger.warning("Не удалось сохранить файл в кэш хранилища: %s", e)
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+        with self._lock:
+            previous = self._blobs.pop(content_hash, None)
+            if previous is not None:
+                self._size -= previous
+            self._blobs[content_hash] = len(content)
+            self._size += len(content)
+            evicted = self._pop_lru_over_limit(keep=content_hash)
+        self._remove_blobs(evicted)
+        return True
+
+    def _remember(self, path: str, content_hash: str, future: Future):
+        with self._lock:
+            # Если путь инвалидировали во время загрузки, результат
+            # не запоминаем
+            if self._inflight.get(path) is future:
+                self._paths[path] = _PathEntry(content_hash, time.monotonic())
+
+    def _record_hit(self, size: int):
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["bytes_saved"] += size
+
+    def _pop_lru_over_limit(self, keep: str | None = None) -> list[str]:
+        evicted = []
+        for content_hash in list(self._blobs):
+            if self._size <= self.max_bytes:
+                break
+            if content_hash == keep:
+                continue
+            self._size -= self._blobs.pop(content_hash)
+            self._stats["evictions"] += 1
+            evicted.append(content_hash)
+        if evicted:
+            evicted_set = set(evicted)
+            for path, entry in list(self._paths.items()):
+                if entry.content_hash in evicted_set:
+                    del self._paths[path]
+        return evicted
+
+    def _remove_blobs(self, content_hashes: list[str]):
+        for content_hash in content_hashes:
+            self._blob_path(content_hash).unlink(missing_ok=True)
+
+    def _load_existing_blobs(self):
+        # Вызывается под self._lock: подхватываем файлы, оставшиеся
+        # от предыдущего запуска, в порядке последнего изменения.
+        if self._loaded:
+            return
+        self._loaded = True
+        blobs_dir = self.root / "blobs"
+        try:
+            blobs_dir.mkdir(parents=True, exist_ok=True)
+            files = []
+            for blob in blobs_dir.iterdir():
+                if blob.name.startswith("."):
+                    blob.unlink(missing_ok=True)
+                    continue
+                stat = blob.stat()
+                files.append((stat.st_mtime, blob.name, stat.st_size))
+        except OSError as e:
+            logger.warning("Не удалось прочитать каталог кэша хранилища: %s", e)
+            return
+        for _, content_hash, size in sorted(files):
+            self._blobs[content_hash] = size
+            self._size += size
+        self._remove_blobs(self._pop_lru_over_limit())
+
+
+def _cache_root() -> Path:
+    if settings.STORAGE_CACHE_DIR:
+        return Path(settings.STORAGE_CACHE_DIR)
+    return Path(tempfile.gettempdir()) / "autograder-storage-cache"
+
+
+storage_file_cache = StorageFileCache(
+    root=_cache_root(),
+    max_bytes=settings.STORAGE_CACHE_MAX_BYTES,
+    revalidate_seconds=settings.STORAGE_CACHE_REVALIDATE_SECONDS,
+)
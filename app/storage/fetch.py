@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from typing import Callable, Sequence
+
+from app.config import settings
+from app.exceptions import (
+    AssignmentFilesUnavailableException,
+    AutograderException,
+)
+from app.logger import configure_logging
+from app.storage.cache import storage_file_cache
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+
+async def fetch_files(
+    paths: Sequence[str],
+    fetch: Callable[[str], bytes] | None = None,
+    concurrency: int | None = None,
+    timeout_seconds: float | None = None,
+) -> list[bytes]:
+    """Параллельно скачивает файлы хранилища, сохраняя порядок paths
+
+    Одновременно выполняется не больше concurrency загрузок, а на все
+    загрузки вместе отводится timeout_seconds. Любая ошибка отменяет
+    оставшиеся загрузки и превращается в AssignmentFilesUnavailableException.
+    """
+    if not paths:
+        return []
+    fetch = fetch or storage_file_cache.get
+    if concurrency is None:
+        concurrency = settings.ASSIGNMENT_FILES_FETCH_CONCURRENCY
+    if timeout_seconds is None:
+        timeout_seconds = settings.ASSIGNMENT_FILES_FETCH_TIMEOUT_SECONDS
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _fetch_one(path: str) -> bytes:
+        async with semaphore:
+            return await asyncio.to_thread(fetch, path)
+
+    tasks = [asyncio.create_task(_fetch_one(path)) for path in paths]
+    try:
+        async with asyncio.timeout(timeout_seconds):
+            return list(await asyncio.gather(*tasks))
+    except AutograderException:
+        raise
+    except TimeoutError as e:
+        logger.error(
+            "Загрузка %s файлов не уложилась в %s с",
+            len(paths),
+            timeout_seconds,
+        )
+        raise AssignmentFilesUnavailableException from e
+    except Exception as e:
+        logger.error("Не удалось загрузить файлы %s: %s", list(paths), e)
+        raise AssignmentFilesUnavailableException from e
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+
+from app.metrics import registry
+from app.storage.base import FileMetadata, StorageBackend, StorageStream
+
+storage_request_duration_seconds = registry.histogram(
+    "storage_request_duration_seconds",
+    "Длительность вызовов хранилища файлов (open_download - до начала тела)",
+    ("backend", "operation", "outcome"),
+)
+storage_errors_total = registry.counter(
+    "storage_errors_total",
+    "Ошибки вызовов хранилища файлов по типу исключения",
+    ("backend", "operation", "error"),
+)
+
+
+class InstrumentedStorage(StorageBackend):
+    """Хранилище, замеряющее длительность и ошибки каждого вызова
+
+    Вызовы передаются backend'у как есть, поэтому его собственные
+    реализации (например, загрузка через Dropbox SDK) сохраняются.
+    """
+
+    def __init__(self, backend: StorageBackend, name: str):
+        self.backend = backend
+        self.name = name
+
+    @contextmanager
+    def _measure(self, operation: str):
+        with storage_request_duration_seconds.time(
+            backend=self.name, operation=operation, outcome="error"
+        ) as labels:
+            try:
+                yield
+            except Exception as e:
+                storage_errors_total.inc(
+                    backend=self.name,
+                    operation=operation,
+                    error=type(e).__name__,
+                )
+                raise
+            labels["outcome"] = "ok"
+
+    def upload_file_to_path(self, file_content: bytes, path: str) -> dict:
+        with self._measure("upload"):
+            return self.backend.upload_file_to_path(file_content, path)
+
+    def get_link(self, path: str) -> str:
+        with self._measure("get_link"):
+            return self.backend.get_link(path)
+
+    def file_exists(self, path: str) -> bool:
+        with self._measure("file_exists"):
+            return self.backend.file_exists(path)
+
+    def get_metadata(self, path: str) -> FileMetadata:
+        with self._measure("get_metadata"):
+            return self.backend.get_metadata(path)
+
+    def open_download(
+        self,
+        path: str,
+        rev: str | None = None,
+        byte_range: tuple[int, int] | None = None,
+    ) -> tuple[FileMetadata, StorageStream]:
+        with self._measure("open_download"):
+            return self.backend.open_download(
+                path, rev=rev, byte_range=byte_range
+            )
+
+    def delete_file(self, path: str) -> None:
+        with self._measure("delete"):
+            self.backend.delete_file(path)
+
+    def upload_file(
+        self, file_content: bytes, filename: str, folder_type: str
+    ) -> dict:
+        with self._measure("upload"):
+            return self.backend.upload_file(file_content, filename, folder_type)
+
+    def download_file_with_metadata(
+        self, path: str
+    ) -> tuple[FileMetadata, bytes]:
+        with self._measure("download"):
+            return self.backend.download_file_with_metadata(path)
+
+    def download_file(self, path: str) -> bytes:
+        with self._measure("download"):
+            return self.backend.download_file(path)
@@ -0,0 +1,106 @@
+import hashlib
+import logging
+import os
+import uuid
+from pathlib import Path
+from urllib.parse import quote
+
+from app.logger import configure_logging
+from app.storage.base import FileMetadata, StorageBackend
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+
+class _LocalFileStream:
+    def __init__(self, handle, length: int, status_code: int):
+        self._handle = handle
+        self._remaining = length
+        self.status_code = status_code
+
+    def iter_content(self, chunk_size: int):
+        while self._remaining > 0:
+            chunk = self._handle.read(min(chunk_size, self._remaining))
+            if not chunk:
+                break
+            self._remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self._handle.close()
+
+
+class LocalStorage(StorageBackend):
+    """Хранилище в локальном каталоге
+
+    Подходит для разработки, нагрузочных тестов без внешних сервисов
+    и для хранения файлов на быстром локальном диске.
+    """
+
+    def __init__(self, root: str | Path, public_base_url: str = ""):
+        self.root = Path(root).resolve()
+        self.public_base_url = public_base_url.rstrip("/")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _resolve(self, path: str) -> Path:
+        if not path.startswith("/"):
+            raise ValueError("Storage path must start with '/'")
+        parts = [part for part in Path(path).parts[1:] if part not in ("", ".")]
+        if not parts or ".." in parts:
+            raise ValueError(f"Unsafe storage path: {path}")
+        return self.root.joinpath(*parts)
+
+    def upload_file_to_path(self, file_content: bytes, path: str) -> dict:
+        target = self._resolve(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp_path.write_bytes(file_content)
+            os.replace(tmp_path, target)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return {"path": path}
+
+    def get_link(self, path: str) -> str:
+        # Ссылка сохраняется в БД и отдается клиентам, file:// им бесполезен
+        if not self.public_base_url:
+            raise RuntimeError(
+                "Для STORAGE_BACKEND=local нужен STORAGE_PUBLIC_BASE_URL"
+            )
+        self._resolve(path)
+        return f"{self.public_base_url}{quote(path)}"
+
+    def file_exists(self, path: str) -> bool:
+        return self._resolve(path).is_file()
+
+    def get_metadata(self, path: str) -> FileMetadata:
+        target = self._resolve(path)
+        stat = target.stat()
+        # Ревизия уникальна для пути и версии файла, но содержимое не читаем
+        rev = hashlib.sha256(
+            f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode()
+        ).hexdigest()[:32]
+        return FileMetadata(path=path, size=stat.st_size, rev=rev)
+
+    def open_download(
+        self,
+        path: str,
+        rev: str | None = None,
+        byte_range: tuple[int, int] | None = None,
+    ):
+        target = self._resolve(path)
+        handle = target.open("rb")
+        try:
+            metadata = self.get_metadata(path)
+            if byte_range is None:
+                return metadata, _LocalFileStream(handle, metadata.size, 200)
+            start, end = byte_range
+            handle.seek(start)
+            return metadata, _LocalFileStream(handle, end - start + 1, 206)
+        except BaseException:
+            handle.close()
+            raise
+
+    def delete_file(self, path: str) -> None:
+        self._resolve(path).unlink(missing_ok=True)
+        logger.info("Local storage file deleted: %s", path)
@@ -0,0 +1,126 @@
+import logging
+from urllib.parse import quote
+
+from app.logger import configure_logging
+from app.storage.base import FileMetadata, StorageBackend
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 нужен только для STORAGE_BACKEND=s3
+    boto3 = None
+    ClientError = Exception
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+
+class _S3BodyStream:
+    def __init__(self, response: dict):
+        self._body = response["Body"]
+        self.status_code = response["ResponseMetadata"]["HTTPStatusCode"]
+
+    def iter_content(self, chunk_size: int):
+        return self._body.iter_chunks(chunk_size=chunk_size)
+
+    def close(self):
+        self._body.close()
+
+
+class S3Storage(StorageBackend):
+    """S3-совместимое хранилище (AWS S3, MinIO и т.п.)"""
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        access_key_id: str | None = None,
+        secret_access_key: str | None = None,
+        region: str | None = None,
+        public_base_url: str = "",
+    ):
+        if boto3 is None:
+            raise RuntimeError("Для STORAGE_BACKEND=s3 нужен пакет boto3")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.public_base_url = public_base_url.rstrip("/")
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            region_name=region,
+        )
+
+    @staticmethod
+    def _key(path: str) -> str:
+        if not path.startswith("/"):
+            raise ValueError("Storage path must start with '/'")
+        return path.lstrip("/")
+
+    @staticmethod
+    def _is_not_found(error) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def upload_file_to_path(self, file_content: bytes, path: str) -> dict:
+        self.client.put_object(
+            Bucket=self.bucket, Key=self._key(path), Body=file_content
+        )
+        return {"path": path}
+
+    def get_link(self, path: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}{quote(path)}"
+        endpoint = (self.endpoint_url or "https://s3.amazonaws.com").rstrip("/")
+        return f"{endpoint}/{self.bucket}{quote(path)}"
+
+    def file_exists(self, path: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(path))
+            return True
+        except ClientError as e:
+            if self._is_not_found(e):
+                return False
+            raise
+
+    @staticmethod
+    def _to_metadata(path: str, response: dict) -> FileMetadata:
+        etag = response["ETag"].strip('"')
+        return FileMetadata(
+            path=path,
+            size=response["ContentLength"],
+            rev=etag,
+            content_hash=etag,
+        )
+
+    def get_metadata(self, path: str) -> FileMetadata:
+        response = self.client.head_object(
+            Bucket=self.bucket, Key=self._key(path)
+        )
+        return self._to_metadata(path, response)
+
+    def open_download(
+        self,
+        path: str,
+        rev: str | None = None,
+        byte_range: tuple[int, int] | None = None,
+    ):
+        kwargs = {"Bucket": self.bucket, "Key": self._key(path)}
+        if rev:
+            kwargs["IfMatch"] = f'"{rev}"'
+        if byte_range is not None:
+            start, end = byte_range
+            kwargs["Range"] = f"bytes={start}-{end}"
+        response = self.client.get_object(**kwargs)
+        metadata = self._to_metadata(path, response)
+        if byte_range is not None:
+            # Для диапазона ContentLength - длина куска, а не всего файла
+            total = response.get("ContentRange", "").rsplit("/", 1)[-1]
+            if total.isdigit():
+                metadata.size = int(total)
+        return metadata, _S3BodyStream(response)
+
+    def delete_file(self, path: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(path))
+        logger.info("S3 file deleted: %s", path)
@@ -0,0 +1,53 @@
+import threading
+
+from app.config import settings
+from app.storage.base import StorageBackend
+from app.storage.instrumented import InstrumentedStorage
+
+_storage: StorageBackend | None = None
+_storage_lock = threading.Lock()
+
+
+def _build_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        from app.storage.local import LocalStorage
+
+        if not settings.STORAGE_PUBLIC_BASE_URL:
+            raise RuntimeError(
+                "Для STORAGE_BACKEND=local нужен STORAGE_PUBLIC_BASE_URL"
+            )
+        return LocalStorage(
+            settings.LOCAL_STORAGE_ROOT,
+            public_base_url=settings.STORAGE_PUBLIC_BASE_URL,
+        )
+    if settings.STORAGE_BACKEND == "s3":
+        from app.storage.s3 import S3Storage
+
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            region=settings.S3_REGION,
+            public_base_url=settings.STORAGE_PUBLIC_BASE_URL,
+        )
+    from app.dropbox.service import DropboxService
+
+    return DropboxService()
+
+
+def get_storage() -> StorageBackend:
+    """Хранилище файлов, выбранное STORAGE_BACKEND
+
+    Создается при первом обращении, поэтому приложение импортируется
+    и стартует без учетных данных неиспользуемых backend'ов. Вызовы
+    замеряются для метрик storage_*.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = InstrumentedStorage(
+                    _build_storage(), settings.STORAGE_BACKEND
+                )
+    return _storage
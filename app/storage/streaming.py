@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import re
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.logger import configure_logging
+from app.storage.service import get_storage
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None | bool:
+    """Разбирает заголовок Range для файла размера size
+
+    Возвращает включительные границы (start, end), None - если диапазон
+    не задан или не поддерживается (несколько диапазонов), и False - если
+    диапазон лежит за пределами файла.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N - последние N байт
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or any(
+        value.removeprefix("W/") == etag for value in candidates
+    )
+
+
+async def _iter_body(stream, skip: int, length: int):
+    """Читает тело файла кусками в отдельном потоке"""
+    chunks = stream.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+    try:
+        while length > 0:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            if skip:
+                # Backend вернул файл целиком вместо диапазона
+                if len(chunk) <= skip:
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            chunk = chunk[:length]
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(stream.close)
+
+
+async def stream_storage_file(
+    request: Request,
+    path: str,
+    media_type: str,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Отдает файл хранилища потоком с поддержкой Range и ETag/If-None-Match
+
+    Файл не загружается в память целиком: куски передаются клиенту
+    по мере чтения, а блокирующие вызовы backend'а выполняются вне
+    event loop.
+    """
+    storage = get_storage()
+    metadata = await asyncio.to_thread(storage.get_metadata, path)
+    etag = f'"{metadata.content_hash or metadata.rev}"'
+    size = metadata.size
+    response_headers = {
+        **(headers or {}),
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    byte_range = parse_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range.strip() != etag:
+        # Файл изменился с момента частичной загрузки - отдаем целиком
+        byte_range = None
+    if byte_range is False:
+        return Response(
+            status_code=416, headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    # Скачиваем ту же ревизию, по которой посчитан ETag
+    _, stream = await asyncio.to_thread(
+        storage.open_download, path, metadata.rev, byte_range
+    )
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    length = end - start + 1 if size else 0
+    response_headers["Content-Length"] = str(length)
+
+    skip = 0
+    if byte_range is not None and stream.status_code != 206:
+        skip = start
+    return StreamingResponse(
+        _iter_body(stream, skip, length),
+        status_code=status_code,
+        media_type=media_type,
+        headers=response_headers,
+    )
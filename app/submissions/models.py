@@ -1,8 +1,18 @@
 from datetime import datetime
-from sqlalchemy import JSON, DateTime, ForeignKey, Integer, Index, String
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.dialects.postgresql import UUID
 from uuid import uuid4
+
+from sqlalchemy import (
+    JSON,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
 from app.db import Base
 
 
@@ -79,8 +89,35 @@ class SubmissionAttempt(Base):
     attempt_number: Mapped[int] = mapped_column(Integer, nullable=False)
     score: Mapped[int] = mapped_column(Integer, nullable=False)
     feedback: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # Замеры ячеек в sandbox: время, CPU, пик памяти, размер output'ов
+    cell_metrics: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     file_id: Mapped[str] = mapped_column(String, nullable=False)
     file_link: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
-    submission = relationship("Submissions", back_populates="attempts")
\ No newline at end of file
+    submission = relationship("Submissions", back_populates="attempts")
+
+
+class JupyterServerBinding(Base):
+    """Сервер из пула JupyterHub, выданный студенту под задание"""
+
+    __tablename__ = "jupyter_server_binding"
+    __table_args__ = (
+        UniqueConstraint("user_id", "assignment_id"),
+        UniqueConstraint("hub_username"),
+    )
+
+    id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=True
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE")
+    )
+    assignment_id: Mapped[UUID] = mapped_column(
+        ForeignKey("assignment.id", ondelete="CASCADE")
+    )
+    hub_username: Mapped[str] = mapped_column(String(255), nullable=False)
+    server_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow
+    )
@@ -1,18 +1,23 @@
 import logging
 
-from fastapi import APIRouter, Depends, File, Query, Response, UploadFile
+from fastapi import APIRouter, Depends, File, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.assignment.schemas import SortEnum
 from app.auth.dependencies import check_student_role, get_current_user
 from app.config import settings
-from app.db import get_db_session
-from app.dropbox.service import dropbox_service
+from app.db import async_session_maker, get_db_session
 from app.exceptions import (
     NotebookEditorUnavailableException,
     SolutionNotFoundException,
 )
+from app.grading.progress import stream_evaluation
+from app.grading.queue_service import GradingQueueService
+from app.grading.scheduler import get_sandbox_scheduler
+from app.grading.schemas import GradingJobKind
 from app.logger import configure_logging
+from app.storage.streaming import stream_storage_file
 from app.submissions.schemas import NotebookSaveRequest, SubmissionQueryParams
 from app.submissions.services.embedded_notebook_service import (
     EmbeddedNotebookService,
@@ -26,7 +31,10 @@ from app.submissions.services.service import (
 from app.submissions.services.submission_manager_service import (
     SubmissionManagerService,
 )
-from app.submissions.utils import enforce_submission_evaluate_rate_limit
+from app.submissions.utils import (
+    enforce_sandbox_admission,
+    enforce_submission_evaluate_rate_limit,
+)
 from app.user.models import Users
 from app.user.router import refresh_token
 
@@ -38,6 +46,59 @@ router = APIRouter(prefix="/assignments", tags=["Submissions"])
 sub_router = APIRouter(prefix="/submissions", tags=["Submissions"])
 
 
+async def _enqueue_grading_job(
+    session: AsyncSession,
+    kind: GradingJobKind,
+    assignment_id: str,
+    current_user: Users,
+    submission_content: bytes | None = None,
+) -> JSONResponse:
+    """Ставит проверку в очередь и сразу отвечает клиенту id задачи"""
+    job_id = await GradingQueueService.enqueue(
+        session=session,
+        kind=kind,
+        current_user=current_user,
+        assignment_id=assignment_id,
+        submission_content=submission_content,
+    )
+    return JSONResponse(
+        status_code=202,
+        content={"status": "queued", "job_id": str(job_id)},
+    )
+
+
+def _stream_embedded_evaluation(
+    assignment_id: str, notebook_bytes: bytes, current_user: Users
+) -> StreamingResponse:
+    """Оценивает решение, передавая события ячеек по мере исполнения (SSE)
+
+    Зависимости запроса завершаются до начала передачи ответа, поэтому
+    сессия БД и место в admission берутся заново внутри проверки.
+    """
+
+    evaluate = SubmissionManagerService.process_and_evaluate_submission_bytes
+
+    async def _run(progress) -> dict:
+        with get_sandbox_scheduler().admission():
+            async with async_session_maker() as session:
+                async with session.begin():
+                    total_points, feedback = await evaluate(
+                        session=session,
+                        assignment_id=assignment_id,
+                        submission_bytes=notebook_bytes,
+                        user_id=current_user.id,
+                        user_email=current_user.email,
+                        progress=progress,
+                    )
+        return {"message": "ok", "score": total_points, "feedback": feedback}
+
+    return StreamingResponse(
+        stream_evaluation(_run),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post(
     "/{assignment_id}/notebook/session",
     dependencies=[Depends(refresh_token), Depends(check_student_role)],
@@ -86,15 +147,21 @@ async def save_notebook_draft(
         Depends(refresh_token),
         Depends(check_student_role),
         Depends(enforce_submission_evaluate_rate_limit),
+        Depends(enforce_sandbox_admission),
     ],
 )
 async def evaluate_embedded_notebook(
     assignment_id: str,
     body: NotebookSaveRequest,
+    request: Request,
     current_user: Users = Depends(get_current_user),
     session: AsyncSession = Depends(get_db_session),
 ):
-    """Оцениваем решение, написанное в JupyterHub"""
+    """Оцениваем решение, написанное в JupyterHub
+
+    С `Accept: text/event-stream` (и без очереди) ответ - поток событий
+    проверки: job, progress по ячейкам и в конце result или error.
+    """
     # Сначала получаем актуальную версию блокнота из Jupyter
     # и сохраняем ее в серверной части системы
     notebook_bytes = await EmbeddedNotebookService.save_draft(
@@ -103,24 +170,28 @@ async def evaluate_embedded_notebook(
         current_user=current_user,
         jupyter_token=body.jupyter_token,
     )
-    # Передаем файл решения в подсистему проверки,
-    # которая выполняет подготовку и загрузку решения в среду проверки
-    await SubmissionManagerService.process_and_upload_submission_bytes(
-        session=session,
-        assignment_id=assignment_id,
-        submission_bytes=notebook_bytes,
-        user_id=current_user.id,
-        user_email=current_user.email,
-    )
-    # Проверяем срок сдачи задания и доступное количество попыток отправки
-    submission_service = (
-        await NotebookService.check_date_and_attempts_submission(
-            session, assignment_id, current_user
+    if GradingQueueService.is_enabled():
+        return await _enqueue_grading_job(
+            session,
+            GradingJobKind.EMBEDDED_EVALUATE,
+            assignment_id,
+            current_user,
+            submission_content=notebook_bytes,
+        )
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return _stream_embedded_evaluation(
+            assignment_id, notebook_bytes, current_user
+        )
+    # Исполняем решение и запускаем тесты преподавателя в одном контейнере:
+    # notebook сохраняется с output'ами, попытка фиксируется сразу
+    total_points, feedback = (
+        await SubmissionManagerService.process_and_evaluate_submission_bytes(
+            session=session,
+            assignment_id=assignment_id,
+            submission_bytes=notebook_bytes,
+            user_id=current_user.id,
+            user_email=current_user.email,
         )
-    )
-    # Запускаем автоматическую проверку решения в изолированной среде
-    total_points, feedback = await SubmissionManagerService.evaluate_submission(
-        session, assignment_id, current_user.email, submission_service
     )
     return {"message": "ok", "score": total_points, "feedback": feedback}
 
@@ -128,7 +199,11 @@ async def evaluate_embedded_notebook(
 @router.post(
     "/{assignment_id}/submissions",
     status_code=201,
-    dependencies=[Depends(refresh_token), Depends(check_student_role)],
+    dependencies=[
+        Depends(refresh_token),
+        Depends(check_student_role),
+        Depends(enforce_sandbox_admission),
+    ],
 )
 async def add_submission(
     assignment_id: str,
@@ -137,6 +212,19 @@ async def add_submission(
     session: AsyncSession = Depends(get_db_session),
 ):
     """Загрузка решения"""
+    if GradingQueueService.is_enabled():
+        submission_bytes = (
+            await SubmissionManagerService.read_submission_upload(
+                submission_file
+            )
+        )
+        return await _enqueue_grading_job(
+            session,
+            GradingJobKind.SUBMIT,
+            assignment_id,
+            current_user,
+            submission_content=submission_bytes,
+        )
     submission_id = (
         await SubmissionManagerService.process_and_upload_submission(
             session,
@@ -159,6 +247,7 @@ async def add_submission(
         Depends(refresh_token),
         Depends(check_student_role),
         Depends(enforce_submission_evaluate_rate_limit),
+        Depends(enforce_sandbox_admission),
     ],
 )
 async def evaluate_submission(
@@ -173,6 +262,10 @@ async def evaluate_submission(
             session, assignment_id, current_user
         )
     )
+    if GradingQueueService.is_enabled():
+        return await _enqueue_grading_job(
+            session, GradingJobKind.EVALUATE, assignment_id, current_user
+        )
 
     total_points, feedback = await SubmissionManagerService.evaluate_submission(
         session, assignment_id, current_user.email, submission_service
@@ -253,7 +346,9 @@ async def get_submission(
     dependencies=[Depends(refresh_token), Depends(get_current_user)],
 )
 async def get_file_of_submission(
-    submission_id: str, session: AsyncSession = Depends(get_db_session)
+    request: Request,
+    submission_id: str,
+    session: AsyncSession = Depends(get_db_session),
 ):
     """Скачивание файла с решением"""
     submission = await SubmissionsDAO.find_one_or_none(
@@ -266,9 +361,9 @@ async def get_file_of_submission(
         session=session, submission_id=submission_id
     )
 
-    content = dropbox_service.download_file(submission.file_id)
-    return Response(
-        content=content,
+    return await stream_storage_file(
+        request,
+        submission.file_id,
         media_type="application/x-jupyter-notebook",
         headers={
             "Content-Disposition": f"attachment; filename={submission.submission_id}_mod.ipynb"
@@ -281,6 +376,7 @@ async def get_file_of_submission(
     dependencies=[Depends(refresh_token), Depends(check_student_role)],
 )
 async def get_file_of_submission_attempt(
+    request: Request,
     attempt_id: str,
     current_user: Users = Depends(get_current_user),
     session: AsyncSession = Depends(get_db_session),
@@ -292,9 +388,9 @@ async def get_file_of_submission_attempt(
     if not attempt:
         raise SolutionNotFoundException
 
-    content = dropbox_service.download_file(attempt.file_id)
-    return Response(
-        content=content,
+    return await stream_storage_file(
+        request,
+        attempt.file_id,
         media_type="application/x-jupyter-notebook",
         headers={
             "Content-Disposition": f"attachment; filename={attempt.assignment_id}_{attempt.attempt_number}.ipynb"
@@ -0,0 +1,245 @@
+"""Проверка кода ячеек notebook до запуска sandbox
+
+Режим regex (по умолчанию) ищет опасные конструкции одним проходом
+объединенного выражения по каждой ячейке. Режим ast разбирает ячейку
+и находит вызовы os.remove, shutil.rmtree, subprocess и т.п. по дереву,
+поэтому не срабатывает на те же слова в строках и комментариях; SQL
+ищется только в строковых литералах. Ячейки, которые не разбираются
+как Python, проверяются regex-режимом.
+"""
+
+import ast
+import os
+import re
+import time
+from dataclasses import dataclass
+
+SANDBOX_CODE_SCAN_MODE = os.getenv("SANDBOX_CODE_SCAN_MODE", "regex")
+SANDBOX_CODE_SCAN_MAX_CHARS = int(
+    os.getenv("SANDBOX_CODE_SCAN_MAX_CHARS", str(2 * 1024 * 1024))
+)
+SANDBOX_CODE_SCAN_TIMEOUT_SECONDS = float(
+    os.getenv("SANDBOX_CODE_SCAN_TIMEOUT_SECONDS", "2")
+)
+
+REGEX_MODE = "regex"
+AST_MODE = "ast"
+
+MALICIOUS_CELL_PATTERNS: tuple[tuple[str, str], ...] = (
+    (r"\brm\s+-rf\b", "rm_rf"),
+    (r"\bos\.remove\s*\(", "os_remove"),
+    (r"\bos\.rmdir\s*\(", "os_rmdir"),
+    (r"\bshutil\.rmtree\s*\(", "shutil_rmtree"),
+    (r"\bDROP\s+TABLE\b", "sql_drop_table"),
+    (r"\bTRUNCATE\s+TABLE\b", "sql_truncate_table"),
+    (r"\bDELETE\s+FROM\b", "sql_delete_from"),
+    (r"\bALTER\s+TABLE\b", "sql_alter_table"),
+)
+# rm -rf внутри os.system(...) / subprocess.*(...) уточняется по тексту перед
+# совпадением, а не шаблоном вида os\.system\([^)]*rm: тот перебирает
+# хвост строки от каждого "os.system(" и квадратичен на "os.system(" * n
+_SHELL_CALL_PREFIX = re.compile(
+    r"\b(?:(?P<os_system_rm_rf>os\.system)"
+    r"|(?P<subprocess_rm_rf>subprocess\.(?:run|call|Popen|check_call|check_output)))"
+    r"\s*\(",
+    re.IGNORECASE,
+)
+SHELL_CALL_ARGS_CHARS = 256
+
+MALICIOUS_CELL_REGEX = re.compile(
+    "|".join(
+        f"(?P<{kind}>{pattern})" for pattern, kind in MALICIOUS_CELL_PATTERNS
+    ),
+    re.IGNORECASE | re.MULTILINE,
+)
+_RM_RF = re.compile(r"\brm\s+-rf\b", re.IGNORECASE)
+_SQL = re.compile(
+    "|".join(
+        f"(?P<{kind}>{pattern})"
+        for pattern, kind in MALICIOUS_CELL_PATTERNS
+        if kind.startswith("sql_")
+    ),
+    re.IGNORECASE,
+)
+
+# Вызовы, опасные сами по себе, и вызовы, опасные с rm -rf в аргументах
+_DANGEROUS_CALLS = {
+    "os.remove": "os_remove",
+    "os.unlink": "os_remove",
+    "os.rmdir": "os_rmdir",
+    "os.removedirs": "os_rmdir",
+    "shutil.rmtree": "shutil_rmtree",
+}
+_SHELL_CALLS = {
+    "os.system": "os_system_rm_rf",
+    "os.popen": "os_system_rm_rf",
+    "subprocess.run": "subprocess_rm_rf",
+    "subprocess.call": "subprocess_rm_rf",
+    "subprocess.Popen": "subprocess_rm_rf",
+    "subprocess.check_call": "subprocess_rm_rf",
+    "subprocess.check_output": "subprocess_rm_rf",
+    "subprocess.getoutput": "subprocess_rm_rf",
+    "subprocess.getstatusoutput": "subprocess_rm_rf",
+}
+
+
+@dataclass(frozen=True)
+class CodeFinding:
+    """Найденная опасная конструкция: индекс ячейки и ее вид"""
+
+    cell_index: int
+    kind: str
+
+
+def _shell_call_kind(source: str, position: int) -> str | None:
+    """Вид вызова, внутри аргументов которого стоит position, если он есть"""
+    window = source[max(0, position - SHELL_CALL_ARGS_CHARS) : position]
+    window = window[window.rfind(")") + 1 :]
+    last = None
+    for last in _SHELL_CALL_PREFIX.finditer(window):
+        pass
+    return last.lastgroup if last is not None else None
+
+
+def _scan_regex(index: int, source: str, deadline: float) -> list[CodeFinding]:
+    kinds = []
+    has_shell_calls = None
+    for match in MALICIOUS_CELL_REGEX.finditer(source):
+        kind = match.lastgroup
+        if kind == "rm_rf":
+            if has_shell_calls is None:
+                has_shell_calls = _SHELL_CALL_PREFIX.search(source) is not None
+            if has_shell_calls:
+                kind = _shell_call_kind(source, match.start()) or kind
+        if kind not in kinds:
+            kinds.append(kind)
+        if time.monotonic() > deadline:
+            break
+    return [CodeFinding(index, kind) for kind in kinds]
+
+
+def _split_magics(source: str) -> tuple[str, list[str]]:
+    """Отделяет команды IPython (!cmd, %magic) от Python-кода ячейки
+
+    Строки команд заменяются на pass с тем же отступом, чтобы
+    номера строк и вложенность блоков не менялись.
+    """
+    lines = source.split("\n")
+    if lines and lines[0].lstrip().startswith("%%"):
+        return "", [source]
+    commands = []
+    for number, line in enumerate(lines):
+        stripped = line.lstrip()
+        if stripped.startswith(("!", "%")):
+            commands.append(stripped)
+            lines[number] = line[: len(line) - len(stripped)] + "pass"
+    return "\n".join(lines), commands
+
+
+class _CallVisitor(ast.NodeVisitor):
+    def __init__(self, aliases: dict[str, str]):
+        self.kinds: list[str] = []
+        # Локальное имя -> полное имя модуля или функции. Общий для всех
+        # ячеек: импорт из одной ячейки виден в следующих
+        self.aliases = aliases
+
+    def add(self, kind: str):
+        if kind not in self.kinds:
+            self.kinds.append(kind)
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self.aliases[alias.asname or alias.name.split(".")[0]] = (
+                alias.name if alias.asname else alias.name.split(".")[0]
+            )
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        for alias in node.names:
+            if node.module:
+                self.aliases[alias.asname or alias.name] = (
+                    f"{node.module}.{alias.name}"
+                )
+
+    def _qualified_name(self, node) -> str | None:
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            return None
+        parts.append(self.aliases.get(node.id, node.id))
+        return ".".join(reversed(parts))
+
+    def visit_Call(self, node: ast.Call):
+        name = self._qualified_name(node.func)
+        if name in _DANGEROUS_CALLS:
+            self.add(_DANGEROUS_CALLS[name])
+        elif name in _SHELL_CALLS:
+            arguments = [
+                *node.args,
+                *(keyword.value for keyword in node.keywords),
+            ]
+            if any(
+                isinstance(child, ast.Constant)
+                and isinstance(child.value, str)
+                and _RM_RF.search(child.value)
+                for argument in arguments
+                for child in ast.walk(argument)
+            ):
+                self.add(_SHELL_CALLS[name])
+        self.generic_visit(node)
+
+    def visit_Constant(self, node: ast.Constant):
+        if isinstance(node.value, str):
+            for match in _SQL.finditer(node.value):
+                self.add(match.lastgroup)
+
+
+def _scan_ast(
+    index: int, source: str, deadline: float, aliases: dict[str, str]
+) -> list[CodeFinding]:
+    code, commands = _split_magics(source)
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, RecursionError):
+        return _scan_regex(index, source, deadline)
+    visitor = _CallVisitor(aliases)
+    visitor.visit(tree)
+    for command in commands:
+        if _RM_RF.search(command):
+            visitor.add("rm_rf")
+    return [CodeFinding(index, kind) for kind in visitor.kinds]
+
+
+def scan_notebook(
+    notebook,
+    mode: str = SANDBOX_CODE_SCAN_MODE,
+    max_chars: int = SANDBOX_CODE_SCAN_MAX_CHARS,
+    timeout_seconds: float = SANDBOX_CODE_SCAN_TIMEOUT_SECONDS,
+) -> list[CodeFinding]:
+    """Возвращает все находки во всех code-ячейках notebook
+
+    Если кода больше max_chars или проверка не уложилась в timeout_seconds,
+    возвращается находка too_large / scan_timeout для ячейки, на которой
+    это произошло: непроверенный код не пропускается.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    aliases: dict[str, str] = {}
+    scanned_chars = 0
+    findings: list[CodeFinding] = []
+    for index, cell in enumerate(notebook.cells):
+        if cell.get("cell_type") != "code":
+            continue
+        source = cell.get("source", "")
+        scanned_chars += len(source)
+        if scanned_chars > max_chars:
+            findings.append(CodeFinding(index, "too_large"))
+            break
+        if mode == AST_MODE:
+            findings.extend(_scan_ast(index, source, deadline, aliases))
+        else:
+            findings.extend(_scan_regex(index, source, deadline))
+        if time.monotonic() > deadline:
+            findings.append(CodeFinding(index, "scan_timeout"))
+            break
+    return findings
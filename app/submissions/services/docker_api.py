@@ -0,0 +1,276 @@
+"""Клиент Docker Engine API через unix-сокет
+
+Используется вместо `docker run` при SANDBOX_DOCKER_BACKEND=api: контейнер
+создается, запускается, ожидается и удаляется HTTP-запросами к демону
+без запуска docker CLI на каждую проверку. Соединение с сокетом
+переиспользуется (keep-alive, отдельное на каждый поток).
+"""
+
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import quote, urlencode
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_DOCKER_BACKEND = os.getenv("SANDBOX_DOCKER_BACKEND", "cli")
+SANDBOX_DOCKER_SOCKET = os.getenv(
+    "SANDBOX_DOCKER_SOCKET", "/var/run/docker.sock"
+)
+SANDBOX_DOCKER_API_VERSION = os.getenv("SANDBOX_DOCKER_API_VERSION", "v1.41")
+
+CLI_BACKEND = "cli"
+API_BACKEND = "api"
+
+_STDOUT = 1
+_STDERR = 2
+
+
+class DockerApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+@dataclass
+class ContainerResult:
+    """Итог запуска контейнера
+
+    stats - снимок /stats перед принудительной остановкой по таймауту:
+    у завершившегося контейнера демон статистику уже не отдает.
+    start_seconds - создание и запуск, duration_seconds - работа до
+    выхода, teardown_seconds - удаление контейнера.
+    """
+
+    exit_code: int
+    stdout: str
+    stderr: str
+    oom_killed: bool = False
+    timed_out: bool = False
+    duration_seconds: float = 0.0
+    stats: dict = field(default_factory=dict)
+    start_seconds: float = 0.0
+    teardown_seconds: float = 0.0
+
+
+def _demultiplex(payload: bytes) -> tuple[str, str]:
+    """Разбирает поток логов контейнера без TTY на stdout и stderr"""
+    streams = {_STDOUT: bytearray(), _STDERR: bytearray()}
+    position = 0
+    while position + 8 <= len(payload):
+        stream = payload[position]
+        size = int.from_bytes(payload[position + 4 : position + 8], "big")
+        chunk = payload[position + 8 : position + 8 + size]
+        streams.get(stream, streams[_STDOUT]).extend(chunk)
+        position += 8 + size
+    return (
+        streams[_STDOUT].decode("utf-8", errors="replace"),
+        streams[_STDERR].decode("utf-8", errors="replace"),
+    )
+
+
+class DockerEngineClient:
+    def __init__(
+        self,
+        socket_path: str = SANDBOX_DOCKER_SOCKET,
+        api_version: str = SANDBOX_DOCKER_API_VERSION,
+        timeout: float = 60,
+    ):
+        self.socket_path = socket_path
+        self.api_version = api_version
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> _UnixHTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _UnixHTTPConnection(self.socket_path, self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: dict | None = None,
+        query: dict | None = None,
+        timeout: float | None = None,
+    ) -> tuple[int, bytes]:
+        url = f"/{self.api_version}{path}"
+        if query:
+            url += "?" + urlencode(query)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {}
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(2):
+            connection = self._connection()
+            reused = connection.sock is not None
+            connection.timeout = timeout or self.timeout
+            if reused:
+                connection.sock.settimeout(connection.timeout)
+            try:
+                connection.request(method, url, body=payload, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (
+                http.client.RemoteDisconnected,
+                ConnectionResetError,
+                BrokenPipeError,
+            ):
+                # Демон закрыл простаивавшее соединение - повторяем на новом
+                self.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except (OSError, http.client.HTTPException):
+                self.close()
+                raise
+            if response.will_close:
+                self.close()
+            return response.status, data
+        raise AssertionError("unreachable")
+
+    def _call(
+        self, method: str, path: str, ok=(200, 201, 204), **kwargs
+    ) -> bytes:
+        status, data = self.request(method, path, **kwargs)
+        if status not in ok:
+            try:
+                message = json.loads(data).get("message", "")
+            except ValueError:
+                message = data.decode("utf-8", errors="replace")
+            raise DockerApiError(status, message)
+        return data
+
+    def image_id(self, image: str) -> str:
+        data = self._call("GET", f"/images/{quote(image, safe='')}/json")
+        return json.loads(data)["Id"]
+
+    def create_container(self, config: dict) -> str:
+        data = self._call("POST", "/containers/create", body=config)
+        return json.loads(data)["Id"]
+
+    def start_container(self, container_id: str):
+        self._call("POST", f"/containers/{container_id}/start", ok=(204, 304))
+
+    def wait_container(self, container_id: str, timeout: float) -> int:
+        data = self._call(
+            "POST", f"/containers/{container_id}/wait", timeout=timeout
+        )
+        return json.loads(data)["StatusCode"]
+
+    def kill_container(self, container_id: str):
+        # 409 - контейнер уже остановился сам
+        self._call("POST", f"/containers/{container_id}/kill", ok=(204, 409))
+
+    def remove_container(self, container_id: str):
+        self._call(
+            "DELETE",
+            f"/containers/{container_id}",
+            ok=(204, 404),
+            query={"force": "true"},
+        )
+
+    def inspect_container(self, container_id: str) -> dict:
+        return json.loads(self._call("GET", f"/containers/{container_id}/json"))
+
+    def container_logs(self, container_id: str) -> tuple[str, str]:
+        data = self._call(
+            "GET",
+            f"/containers/{container_id}/logs",
+            query={"stdout": "1", "stderr": "1"},
+        )
+        return _demultiplex(data)
+
+    def container_stats(self, container_id: str) -> dict:
+        data = self._call(
+            "GET",
+            f"/containers/{container_id}/stats",
+            query={"stream": "false", "one-shot": "true"},
+        )
+        return json.loads(data)
+
+    def run(self, config: dict, timeout_seconds: float) -> ContainerResult:
+        """Создает, запускает и дожидается контейнера, затем удаляет его
+
+        По истечении timeout_seconds контейнер принудительно
+        останавливается (kill), а не продолжает работать в фоне.
+        """
+        creating = time.monotonic()
+        container_id = self.create_container(config)
+        try:
+            self.start_container(container_id)
+            started = time.monotonic()
+            timed_out = False
+            stats = {}
+            try:
+                exit_code = self.wait_container(container_id, timeout_seconds)
+            except socket.timeout:
+                timed_out = True
+                try:
+                    stats = self.container_stats(container_id)
+                except (OSError, DockerApiError, ValueError):
+                    stats = {}
+                self.kill_container(container_id)
+                exit_code = -1
+            duration = time.monotonic() - started
+            stdout, stderr = self.container_logs(container_id)
+            state = self.inspect_container(container_id).get("State", {})
+            if not timed_out:
+                exit_code = state.get("ExitCode", exit_code)
+            result = ContainerResult(
+                exit_code=exit_code,
+                stdout=stdout,
+                stderr=stderr,
+                oom_killed=bool(state.get("OOMKilled")),
+                timed_out=timed_out,
+                duration_seconds=duration,
+                stats=stats,
+                start_seconds=started - creating,
+            )
+        finally:
+            removing = time.monotonic()
+            try:
+                self.remove_container(container_id)
+            except (OSError, DockerApiError) as e:
+                logger.error(
+                    "Не удалось удалить контейнер %s: %s", container_id, e
+                )
+        result.teardown_seconds = time.monotonic() - removing
+        return result
+
+
+_client: DockerEngineClient | None = None
+
+
+def get_docker_client() -> DockerEngineClient:
+    global _client
+    if _client is None:
+        _client = DockerEngineClient()
+    return _client
@@ -1,12 +1,12 @@
-import re
-import json
-import httpx
 import asyncio
+import json
 import logging
-from typing import Any
+import re
 from pathlib import PurePosixPath
+from typing import Any
 from urllib.parse import quote
 
+import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.assignment.schemas import TypeOfAssignmentFile
@@ -17,12 +17,57 @@ from app.exceptions import (
     EmbeddedEditorDisabledException,
     NotebookEditorUnavailableException,
 )
-from app.dropbox.service import dropbox_service
+from app.metrics import registry
+from app.storage.cache import storage_file_cache
+from app.storage.fetch import fetch_files
+from app.storage.service import get_storage
+from app.submissions.services.jupyter_server_pool import jupyter_server_pool
 from app.submissions.services.notebook_service import NotebookService
 from app.user.models import Users
 
 logger = logging.getLogger(__name__)
 
+JUPYTERHUB_REQUEST_DURATION = registry.histogram(
+    "jupyterhub_request_duration_seconds",
+    "Длительность запросов к JupyterHub и пользовательским серверам",
+    ("endpoint", "method", "status"),
+)
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    # httpx не использует pipelining: на соединение приходится один запрос,
+    # поэтому параллелизм к hub ограничивается числом соединений в пуле.
+    limits = httpx.Limits(
+        max_connections=settings.JUPYTERHUB_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.JUPYTERHUB_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.JUPYTERHUB_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=httpx.Timeout(
+            settings.JUPYTERHUB_HTTP_TIMEOUT_SECONDS,
+            connect=settings.JUPYTERHUB_HTTP_CONNECT_TIMEOUT_SECONDS,
+            pool=settings.JUPYTERHUB_HTTP_POOL_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+def get_jupyterhub_http_client() -> httpx.AsyncClient:
+    """Общий для процесса HTTP-клиент с пулом keep-alive соединений"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+async def close_jupyterhub_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 
 class JupyterHubClient:
     """Клиент для взаимодействия бэкенда с JupyterHub
@@ -48,11 +93,33 @@ class JupyterHubClient:
         """Заголовки авторизации для запросов к API JupyterHub"""
         return {"Authorization": f"token {self.admin_token}"}
 
+    @staticmethod
+    async def _send(
+        method: str, url: str, endpoint: str, **kwargs: Any
+    ) -> httpx.Response:
+        """Отправляет запрос через общий клиент и замеряет его длительность
+
+        endpoint - короткое имя вызова для метрик (без пользователя и пути)
+        """
+        with JUPYTERHUB_REQUEST_DURATION.time(
+            endpoint=endpoint, method=method, status="error"
+        ) as labels:
+            try:
+                response = await get_jupyterhub_http_client().request(
+                    method, url, **kwargs
+                )
+            except httpx.HTTPError as e:
+                logger.error("Ошибка запроса к JupyterHub: %s %s", method, url)
+                raise NotebookEditorUnavailableException from e
+            labels["status"] = response.status_code
+        return response
+
     async def _request(
         self,
         method: str,
         url: str,
         expected_codes: tuple[int, ...],
+        endpoint: str,
         **kwargs: Any,
     ) -> httpx.Response:
         """Унифицированный метод отправки HTTP-запросов в API JupyterHub
@@ -60,14 +127,9 @@ class JupyterHubClient:
         Выполняет запрос, проверяет код ответа и в случае ошибки
         генерирует исключение недоступности редактора
         """
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.request(
-                    method, url, headers=self._headers, **kwargs
-                )
-        except httpx.HTTPError as e:
-            logger.error("Ошибка запроса к JupyterHub: %s %s", method, url)
-            raise NotebookEditorUnavailableException from e
+        response = await self._send(
+            method, url, endpoint, headers=self._headers, **kwargs
+        )
 
         if response.status_code not in expected_codes:
             logger.error(
@@ -83,27 +145,104 @@ class JupyterHubClient:
     async def ensure_user(self, username: str):
         """Проверяет существование пользователя в JupyterHub и при необходимости создаёт его"""
         user_url = f"{self.api_base}/users/{username}"
-        res = await self._request("GET", user_url, expected_codes=(200, 404))
+        res = await self._request(
+            "GET", user_url, expected_codes=(200, 404), endpoint="hub.user"
+        )
         if res.status_code == 404:
-            await self._request("POST", user_url, expected_codes=(201,))
+            await self._request(
+                "POST", user_url, expected_codes=(201,), endpoint="hub.user"
+            )
 
-    async def ensure_server_ready(self, username: str, server_name: str):
-        """Запускает пользовательский сервер и ожидает его готовности"""
-        server_url = f"{self.api_base}/users/{username}/servers/{quote(server_name, safe='')}"
-        await self._request("POST", server_url, expected_codes=(201, 202, 400, 409))
+    def _server_url(self, username: str, server_name: str) -> str:
+        server = quote(server_name, safe="")
+        return f"{self.api_base}/users/{username}/servers/{server}"
 
+    async def start_server(self, username: str, server_name: str):
+        """Запрашивает запуск сервера пользователя, не дожидаясь готовности"""
+        await self._request(
+            "POST",
+            self._server_url(username, server_name),
+            expected_codes=(201, 202, 400, 409),
+            endpoint="hub.server",
+        )
 
-        user_url = f"{self.api_base}/users/{username}"
-        # Периодически проверяем состояние сервера
-        for _ in range(40):
-            res = await self._request("GET", user_url, expected_codes=(200,))
-            payload = res.json()
-            ready = payload.get("servers", {}).get(server_name, {}).get("ready", False)
-            if ready:
+    async def server_status(
+        self, username: str, server_name: str
+    ) -> dict | None:
+        """Состояние сервера (ready, pending, last_activity) или None"""
+        res = await self._request(
+            "GET",
+            f"{self.api_base}/users/{username}",
+            expected_codes=(200, 404),
+            endpoint="hub.user",
+        )
+        if res.status_code == 404:
+            return None
+        return res.json().get("servers", {}).get(server_name)
+
+    async def wait_server_ready(
+        self, username: str, server_name: str, timeout_seconds: float = 20.0
+    ):
+        """Периодически проверяет состояние сервера, пока он не станет готов"""
+        for _ in range(max(1, int(timeout_seconds / 0.5))):
+            status = await self.server_status(username, server_name)
+            if status and status.get("ready", False):
                 return
             await asyncio.sleep(0.5)
         raise NotebookEditorUnavailableException
 
+    async def ensure_server_ready(self, username: str, server_name: str):
+        """Запускает пользовательский сервер и ожидает его готовности"""
+        await self.start_server(username, server_name)
+        await self.wait_server_ready(username, server_name)
+
+    async def stop_server(self, username: str, server_name: str):
+        await self._request(
+            "DELETE",
+            self._server_url(username, server_name),
+            expected_codes=(202, 204, 404),
+            endpoint="hub.server",
+        )
+
+    async def delete_user(self, username: str):
+        await self._request(
+            "DELETE",
+            f"{self.api_base}/users/{username}",
+            expected_codes=(204, 404),
+            endpoint="hub.user",
+        )
+
+    async def list_users(self, page_size: int = 200) -> list[dict]:
+        """Все пользователи hub вместе с их серверами"""
+        users = []
+        offset = 0
+        while True:
+            res = await self._request(
+                "GET",
+                f"{self.api_base}/users",
+                expected_codes=(200,),
+                endpoint="hub.users",
+                params={"offset": offset, "limit": page_size},
+            )
+            page = res.json()
+            users.extend(page)
+            if len(page) < page_size:
+                return users
+            offset += len(page)
+
+    async def share_server(self, owner: str, server_name: str, username: str):
+        """Открывает пользователю доступ к чужому серверу
+
+        Использует sharing из JupyterHub 5.
+        """
+        await self._request(
+            "POST",
+            f"{self.api_base}/shares/{owner}/{quote(server_name, safe='')}",
+            expected_codes=(200, 201),
+            endpoint="hub.share",
+            json={"user": username},
+        )
+
     async def create_user_token(self, username: str) -> str:
         """Создаёт временный токен пользователя для работы в браузере и обращения к Contents API"""
         token_url = f"{self.api_base}/users/{username}/tokens"
@@ -111,6 +250,7 @@ class JupyterHubClient:
             "POST",
             token_url,
             expected_codes=(200, 201),
+            endpoint="hub.token",
             json={
                 "note": "autograder-embedded-editor",
                 "expires_in": self.token_ttl_seconds,
@@ -172,15 +312,13 @@ class JupyterHubClient:
             raise NotebookEditorUnavailableException from e
 
         headers = {"Authorization": f"token {user_token}"}
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.put(
-                    contents_url,
-                    headers=headers,
-                    json={"type": "notebook", "format": "json", "content": content},
-                )
-        except httpx.HTTPError as e:
-            raise NotebookEditorUnavailableException from e
+        response = await self._send(
+            "PUT",
+            contents_url,
+            "contents.notebook",
+            headers=headers,
+            json={"type": "notebook", "format": "json", "content": content},
+        )
 
         if response.status_code not in (200, 201):
             logger.error(
@@ -211,15 +349,13 @@ class JupyterHubClient:
         headers = {"Authorization": f"token {user_token}"}
         text_content = file_bytes.decode("utf-8", errors="replace")
 
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.put(
-                    contents_url,
-                    headers=headers,
-                    json={"type": "file", "format": "text", "content": text_content},
-                )
-        except httpx.HTTPError as e:
-            raise NotebookEditorUnavailableException from e
+        response = await self._send(
+            "PUT",
+            contents_url,
+            "contents.file",
+            headers=headers,
+            json={"type": "file", "format": "text", "content": text_content},
+        )
 
         if response.status_code not in (200, 201):
             logger.error(
@@ -243,37 +379,39 @@ class JupyterHubClient:
         )
         headers = {"Authorization": f"token {user_token}"}
         current = []
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                for part in parts:
-                    current.append(part)
-                    dir_path = "/".join(current)
-                    dir_url = f"{user_server_base}/api/contents/{quote(dir_path, safe='/')}"
-                    check = await client.get(dir_url, headers=headers)
-                    if check.status_code == 200:
-                        continue
-                    if check.status_code != 404:
-                        logger.error(
-                            "Ошибка проверки каталога Jupyter: %s, body=%s",
-                            check.status_code,
-                            check.text,
-                        )
-                        raise NotebookEditorUnavailableException
-
-                    create = await client.put(
-                        dir_url,
-                        headers=headers,
-                        json={"type": "directory"},
-                    )
-                    if create.status_code not in (200, 201):
-                        logger.error(
-                            "Ошибка создания каталога Jupyter: %s, body=%s",
-                            create.status_code,
-                            create.text,
-                        )
-                        raise NotebookEditorUnavailableException
-        except httpx.HTTPError as e:
-            raise NotebookEditorUnavailableException from e
+        for part in parts:
+            current.append(part)
+            dir_path = "/".join(current)
+            dir_url = (
+                f"{user_server_base}/api/contents/{quote(dir_path, safe='/')}"
+            )
+            check = await self._send(
+                "GET", dir_url, "contents.directory", headers=headers
+            )
+            if check.status_code == 200:
+                continue
+            if check.status_code != 404:
+                logger.error(
+                    "Ошибка проверки каталога Jupyter: %s, body=%s",
+                    check.status_code,
+                    check.text,
+                )
+                raise NotebookEditorUnavailableException
+
+            create = await self._send(
+                "PUT",
+                dir_url,
+                "contents.directory",
+                headers=headers,
+                json={"type": "directory"},
+            )
+            if create.status_code not in (200, 201):
+                logger.error(
+                    "Ошибка создания каталога Jupyter: %s, body=%s",
+                    create.status_code,
+                    create.text,
+                )
+                raise NotebookEditorUnavailableException
 
     async def get_notebook(
         self,
@@ -288,11 +426,9 @@ class JupyterHubClient:
         )
         contents_url = f"{user_server_base}/api/contents/{quote(notebook_path, safe='/')}"
         headers = {"Authorization": f"token {user_token}"}
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(contents_url, headers=headers)
-        except httpx.HTTPError as e:
-            raise NotebookEditorUnavailableException from e
+        response = await self._send(
+            "GET", contents_url, "contents.notebook", headers=headers
+        )
 
         if response.status_code != 200:
             logger.error(
@@ -367,9 +503,11 @@ class EmbeddedNotebookService:
             file_type=TypeOfAssignmentFile.RESOURCE,
         )
         base_dir = f"assignments/{assignment_id}"
-        for resource in resources:
+        contents = await fetch_files(
+            [resource.file_id for resource in resources]
+        )
+        for resource, resource_bytes in zip(resources, contents):
             resource_name = cls._resource_file_name(assignment_id, resource.file_id)
-            resource_bytes = dropbox_service.download_file(resource.file_id)
             await client.put_file(
                 username=username,
                 server_name=server_name,
@@ -390,8 +528,8 @@ class EmbeddedNotebookService:
 
         draft_path = cls.draft_dropbox_path(assignment_id, user_id)
         # Если черновик уже существует - используем его
-        if dropbox_service.file_exists(draft_path):
-            return dropbox_service.download_file(draft_path)
+        if get_storage().file_exists(draft_path):
+            return get_storage().download_file(draft_path)
         # Иначе берём файл задания
         assignment_file = await AssignmentFileDAO.find_one_or_none(
             session=session,
@@ -407,11 +545,49 @@ class EmbeddedNotebookService:
         if not assignment_file:
             raise AssignmentNotFoundException
 
-        content = dropbox_service.download_file(assignment_file.file_id)
+        content = storage_file_cache.get(assignment_file.file_id)
         # Первичное заполнение черновика, чтобы студент видел стартовый блокнот
-        dropbox_service.upload_file_to_path(content, draft_path)
+        get_storage().upload_file_to_path(content, draft_path)
         return content
 
+    @classmethod
+    async def _acquire_server(
+        cls,
+        session: AsyncSession,
+        assignment_id: str,
+        current_user: Users,
+        client: JupyterHubClient,
+    ) -> tuple[str, str]:
+        """Возвращает (пользователь hub, сервер), на котором откроется блокнот
+
+        Сначала используется сервер из пула (ранее выданный или свободный),
+        иначе запускается собственный сервер студента.
+        """
+        hub_username = cls.hub_username(current_user)
+        if jupyter_server_pool.enabled:
+            server = await jupyter_server_pool.resolve(
+                session, current_user.id, assignment_id, client
+            )
+            if server is None:
+                server = await jupyter_server_pool.claim(
+                    session,
+                    current_user.id,
+                    assignment_id,
+                    hub_username,
+                    client,
+                )
+            if server is not None:
+                return server
+
+        server_name = cls.server_name(assignment_id)
+        await client.ensure_user(hub_username)
+        status = await client.server_status(hub_username, server_name)
+        if not status or not status.get("ready", False):
+            # Ограничиваем число одновременных запусков контейнеров
+            async with jupyter_server_pool.spawn_semaphore:
+                await client.ensure_server_ready(hub_username, server_name)
+        return hub_username, server_name
+
     @classmethod
     async def create_session(
         cls,
@@ -427,12 +603,11 @@ class EmbeddedNotebookService:
             session, assignment_id, current_user.id
         )
         notebook_path = cls.notebook_path(assignment_id)
-        server_name = cls.server_name(assignment_id)
-        username = cls.hub_username(current_user)
-        # Последовательность: пользователь - сервер - токен - загрузка notebook
+        # Последовательность: сервер - токен - загрузка notebook
         client = JupyterHubClient()
-        await client.ensure_user(username)
-        await client.ensure_server_ready(username, server_name)
+        username, server_name = await cls._acquire_server(
+            session, assignment_id, current_user, client
+        )
         user_token = await client.create_user_token(username)
         await client.put_notebook(
             username, server_name, notebook_path, notebook_bytes, user_token
@@ -466,16 +641,23 @@ class EmbeddedNotebookService:
         cls.ensure_enabled()
         await NotebookService.check_date_submission(session, assignment_id)
 
-        username = cls.hub_username(current_user)
-        server_name = cls.server_name(assignment_id)
+        server = None
+        if jupyter_server_pool.enabled:
+            server = await jupyter_server_pool.find_binding(
+                session, current_user.id, assignment_id
+            )
+        username, server_name = server or (
+            cls.hub_username(current_user),
+            cls.server_name(assignment_id),
+        )
         notebook_path = cls.notebook_path(assignment_id)
-        
+
         client = JupyterHubClient()
         notebook_bytes = await client.get_notebook(
             username, server_name, notebook_path, jupyter_token
         )
         # сохраняем черновик
-        dropbox_service.upload_file_to_path(
+        get_storage().upload_file_to_path(
             notebook_bytes, cls.draft_dropbox_path(assignment_id, current_user.id)
         )
         return notebook_bytes
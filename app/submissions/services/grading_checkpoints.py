@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_INCREMENTAL_GRADING = (
+    os.getenv("SANDBOX_INCREMENTAL_GRADING", "0") == "1"
+)
+SANDBOX_CHECKPOINT_DIR = os.getenv(
+    "SANDBOX_CHECKPOINT_DIR",
+    str(Path(tempfile.gettempdir()) / "autograder-checkpoints"),
+)
+SANDBOX_CHECKPOINT_MAX_BYTES = int(
+    os.getenv("SANDBOX_CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024))
+)
+SANDBOX_CHECKPOINT_MIN_STEP_SECONDS = float(
+    os.getenv("SANDBOX_CHECKPOINT_MIN_STEP_SECONDS", "2")
+)
+SANDBOX_CHECKPOINT_MAX_SNAPSHOTS = int(
+    os.getenv("SANDBOX_CHECKPOINT_MAX_SNAPSHOTS", "3")
+)
+SANDBOX_CHECKPOINT_TTL_SECONDS = int(
+    os.getenv("SANDBOX_CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600))
+)
+
+DATA_DIR = "checkpoint"
+STEPS_FILE = "steps.json"
+
+
+def _checkpoint_size(path: Path) -> int | None:
+    """Размер каталога или None, если в нем есть что-то кроме файлов и каталогов
+
+    Каталог пишется кодом студента, поэтому ссылки не разыменовываются:
+    symlink на файл хоста иначе попал бы в хранилище и в следующий запуск.
+    """
+    total = 0
+    for root, dirs, files in os.walk(path, followlinks=False):
+        for name in dirs + files:
+            mode = os.lstat(os.path.join(root, name)).st_mode
+            if stat.S_ISDIR(mode):
+                continue
+            if not stat.S_ISREG(mode):
+                return None
+            total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+
+class GradingCheckpointStore:
+    """Чекпоинты инкрементальной проверки между запусками sandbox
+
+    Чекпоинт - каталог checkpoint из workspace проверки (output'ы шагов
+    и снимки пространства имен ядра) и список шагов с баллами тестов
+    из результата driver'а. Каталог пишется кодом студента, поэтому
+    баллы хранятся отдельно от него, в steps.json рядом. Ключ включает
+    задание и студента, поэтому снимок, созданный кодом одного студента,
+    загружается только в ядро его же следующей проверки. Сервер каталог
+    не разбирает и снимки не десериализует - он только копирует его.
+    """
+
+    def __init__(
+        self,
+        root: str | Path = SANDBOX_CHECKPOINT_DIR,
+        enabled: bool = SANDBOX_INCREMENTAL_GRADING,
+        max_bytes: int = SANDBOX_CHECKPOINT_MAX_BYTES,
+        ttl_seconds: int = SANDBOX_CHECKPOINT_TTL_SECONDS,
+    ):
+        self.root = Path(root)
+        self.enabled = enabled and max_bytes > 0
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / hashlib.sha256(key.encode()).hexdigest()
+
+    def load(self, key: str, target: Path) -> list[dict] | None:
+        """Копирует сохраненный чекпоинт в target и возвращает его шаги"""
+        entry = self._path(key)
+        with self._lock:
+            try:
+                steps = json.loads((entry / STEPS_FILE).read_text())
+            except (OSError, ValueError):
+                return None
+            if not isinstance(steps, list) or not (entry / DATA_DIR).is_dir():
+                return None
+            if _checkpoint_size(entry / DATA_DIR) is None:
+                return None
+            shutil.copytree(
+                entry / DATA_DIR, target, symlinks=True, dirs_exist_ok=True
+            )
+            os.utime(entry)
+        return steps
+
+    def save(self, key: str, source: Path, steps: list[dict]):
+        """Сохраняет каталог чекпоинта и шаги после успешной проверки
+
+        Каталог сначала копируется без разыменования ссылок и проверяется
+        уже копия: оставшийся процесс студента не подменит файл после
+        проверки.
+        """
+        if not source.is_dir():
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copytree(source, staging / DATA_DIR, symlinks=True)
+        except (OSError, shutil.Error) as e:
+            logger.warning("Чекпоинт %s не сохранен: %s", key, e)
+            shutil.rmtree(staging, ignore_errors=True)
+            self.discard(key)
+            return
+        size = _checkpoint_size(staging / DATA_DIR)
+        if size is None or size > self.max_bytes:
+            if size is None:
+                logger.warning(
+                    "Чекпоинт %s не сохранен: ссылки или особые файлы", key
+                )
+            else:
+                logger.info("Чекпоинт %s не сохранен: %s байт", key, size)
+            shutil.rmtree(staging, ignore_errors=True)
+            self.discard(key)
+            return
+        (staging / STEPS_FILE).write_text(json.dumps(steps))
+        target = self._path(key)
+        with self._lock:
+            if target.exists():
+                shutil.rmtree(target, ignore_errors=True)
+            os.replace(staging, target)
+        self.cleanup()
+
+    def discard(self, key: str):
+        with self._lock:
+            shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def cleanup(self):
+        """Удаляет чекпоинты, к которым давно не обращались"""
+        if self.ttl_seconds <= 0 or not self.root.is_dir():
+            return
+        deadline = time.time() - self.ttl_seconds
+        with self._lock:
+            for entry in self.root.iterdir():
+                try:
+                    if entry.stat().st_mtime < deadline:
+                        shutil.rmtree(entry, ignore_errors=True)
+                except OSError:
+                    continue
+
+
+grading_checkpoints = GradingCheckpointStore()
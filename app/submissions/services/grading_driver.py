@@ -0,0 +1,585 @@
+"""Проверка notebook внутри sandbox-контейнера
+
+Файл копируется в workspace и запускается там отдельным процессом,
+поэтому зависит только от стандартной библиотеки, nbformat и nbclient.
+Параметры запуска читаются из grading.json, результат печатается
+последней строкой stdout в виде JSON.
+
+Тесты преподавателя приходят в grading_plan.json - плане проверки,
+составленном при загрузке задания: число ячеек блокнота преподавателя
+и для каждой тестовой ячейки ее индекс, баллы и исходник. Сам блокнот
+преподавателя с решениями и output'ами в sandbox не попадает.
+
+Инкрементальный режим: для каждого шага (ячейка студента + тест
+из плана с тем же индексом) считается цепочка хэшей от
+исходников всех предыдущих шагов и ресурсных файлов. Output'ы шагов
+сохраняются в каталоге checkpoint вместе со снимками пространства имен
+ядра после "тяжелых" шагов, а хэши шагов и результаты тестов попадают
+в "steps" результата. Каталог доступен коду студента, поэтому баллы
+восстановленных шагов берутся не из него, а из "trusted_steps"
+grading.json - шагов прошлой проверки, сохраненных сервером. При
+следующей проверке ядро восстанавливается из последнего снимка с
+неизменным префиксом, а исполнение продолжается с первого шага после
+него. Если снимок не восстанавливается, notebook исполняется целиком.
+
+По ходу проверки в progress.jsonl пишутся события шагов (started,
+finished, failed, restored) с индексом, временем и баллами теста; сервер
+читает файл, пока контейнер работает, и передает события клиенту.
+
+Для каждой исполненной ячейки студента и теста (kind "cell"/"test")
+замеряются время, CPU-время и пик памяти процесса ядра (по /proc) и
+размер output'ов; результат содержит их в "metrics" вместе со временем
+запуска ядра. Ячейки, взятые из чекпоинта, не замеряются.
+
+Режим execute исполняет notebook студента без тестов (план не нужен)
+и сохраняет output'ы, как execute_and_grade.
+
+Модули из "preload" плана импортируются в ядре до начала отсчета
+лимита, без имен в пространстве студента. Лимит timeout_seconds
+отсчитывается от готовности ядра, а не от старта контейнера; при его
+превышении вместо результата печатается {"timed_out": true,
+"metrics": ...} с замерами ячеек до и включая прерванную.
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+
+import nbformat
+from nbclient import NotebookClient
+from nbclient.exceptions import CellExecutionError, CellTimeoutError
+
+CONFIG_FILE = "grading.json"
+PLAN_FILE = "grading_plan.json"
+CHECKPOINT_DIR = "checkpoint"
+STATE_FILE = os.path.join(CHECKPOINT_DIR, "state.json")
+RESULT_FILE = os.path.join(CHECKPOINT_DIR, "result.json")
+STATE_VERSION = 1
+PROGRESS_FILE = "progress.jsonl"
+
+GRADE = "grade"
+EXECUTE_AND_GRADE = "execute_and_grade"
+EXECUTE = "execute"
+
+# Код выполняется в ядре через exec() с отдельными globals, поэтому
+# не оставляет служебных имен в пространстве имен студента.
+SNAPSHOT_SOURCE = """
+import json, os, pickle, random, sys, types
+from IPython import get_ipython
+try:
+    import cloudpickle as pickler
+except ImportError:
+    try:
+        from joblib.externals import cloudpickle as pickler
+    except ImportError:
+        pickler = pickle
+error = None
+try:
+    shell = get_ipython()
+    hidden = shell.user_ns_hidden
+    state = {"modules": {}, "values": {}, "rng": {"random": random.getstate()}}
+    for name, value in list(shell.user_ns.items()):
+        if name.startswith("_") or name in hidden:
+            continue
+        if isinstance(value, types.ModuleType):
+            state["modules"][name] = value.__name__
+        else:
+            state["values"][name] = pickler.dumps(value)
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        state["rng"]["numpy"] = numpy.random.get_state()
+    payload = pickle.dumps(state)
+    if len(payload) > ARGS["max_bytes"]:
+        raise ValueError("snapshot is too large")
+    with open(ARGS["path"] + ".tmp", "wb") as f:
+        f.write(payload)
+    os.replace(ARGS["path"] + ".tmp", ARGS["path"])
+except Exception as e:
+    error = repr(e)
+with open(RESULT_PATH, "w") as f:
+    json.dump({"ok": error is None, "error": error}, f)
+"""
+
+PID_SOURCE = """
+import json, os
+with open(RESULT_PATH, "w") as f:
+    json.dump({"ok": True, "pid": os.getpid()}, f)
+"""
+
+PRELOAD_SOURCE = """
+import importlib, json
+for name in ARGS["modules"]:
+    try:
+        importlib.import_module(name)
+    except Exception:
+        pass
+with open(RESULT_PATH, "w") as f:
+    json.dump({"ok": True}, f)
+"""
+
+RESTORE_SOURCE = """
+import importlib, json, pickle, random
+from IPython import get_ipython
+error = None
+try:
+    with open(ARGS["path"], "rb") as f:
+        state = pickle.loads(f.read())
+    namespace = {}
+    for name, module in state["modules"].items():
+        namespace[name] = importlib.import_module(module)
+    for name, payload in state["values"].items():
+        namespace[name] = pickle.loads(payload)
+    get_ipython().user_ns.update(namespace)
+    random.setstate(state["rng"]["random"])
+    if "numpy" in state["rng"]:
+        importlib.import_module("numpy").random.set_state(state["rng"]["numpy"])
+except Exception as e:
+    error = repr(e)
+with open(RESULT_PATH, "w") as f:
+    json.dump({"ok": error is None, "error": error}, f)
+"""
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def step_hashes(submission, tests: dict, steps: int, seed: str) -> list[str]:
+    """Цепочка хэшей: шаг i зависит от исходников всех шагов до него"""
+    hashes = []
+    current = hashlib.sha256(seed.encode()).hexdigest()
+    for index in range(steps):
+        digest = hashlib.sha256(current.encode())
+        if index < len(submission.cells):
+            cell = submission.cells[index]
+            if cell.cell_type == "code":
+                digest.update(b"\0submission\0" + cell.source.encode())
+        if index in tests:
+            digest.update(b"\0tutor\0" + tests[index]["source"].encode())
+        current = digest.hexdigest()
+        hashes.append(current)
+    return hashes
+
+
+def _process_usage(pid: int | None) -> tuple[float, int] | None:
+    """CPU-время процесса с дочерними (с) и пик RSS (байт) из /proc"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Имя процесса в скобках может содержать пробелы
+            fields = f.read().rsplit(")", 1)[1].split()
+        ticks = sum(int(value) for value in fields[11:15])
+        peak_rss = None
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    peak_rss = int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    if peak_rss is None:
+        return None
+    return ticks / os.sysconf("SC_CLK_TCK"), peak_rss
+
+
+def _reset_peak_rss(pid: int | None):
+    """Сбрасывает VmHWM процесса, чтобы пик считался по одной ячейке"""
+    if pid is None:
+        return
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _workspace_files() -> dict[str, tuple[int, int]]:
+    files = {}
+    for root, dirs, names in os.walk("."):
+        dirs[:] = [
+            d
+            for d in dirs
+            if d != "__pycache__"
+            and os.path.join(root, d) != f"./{CHECKPOINT_DIR}"
+        ]
+        for name in names:
+            path = os.path.join(root, name)
+            if path == f"./{PROGRESS_FILE}":
+                continue
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class Grader:
+    def __init__(self, client, submission, plan: dict, config: dict):
+        self.client = client
+        self.submission = submission
+        self.tests = {test["index"]: test for test in plan["tests"]}
+        self.mode = config["mode"]
+        self.incremental = config.get("incremental", False)
+        self.trusted_steps = config.get("trusted_steps") or []
+        self.snapshot_min_seconds = config.get("snapshot_min_seconds", 0)
+        self.snapshot_max_bytes = config.get("snapshot_max_bytes", 0)
+        self.max_snapshots = config.get("max_snapshots", 0)
+        self.deadline = None
+        self.progress = None
+        self.kernel_pid = None
+        self.kernel_startup_seconds = None
+        self.cell_metrics: list[dict] = []
+        if self.mode == GRADE:
+            self.steps = plan["cells"]
+        else:
+            self.steps = max(len(submission.cells), plan["cells"])
+        self.hashes = step_hashes(
+            submission,
+            self.tests,
+            self.steps,
+            f"{STATE_VERSION}:{self.mode}:{config.get('resources_digest', '')}",
+        )
+
+    def preload(self, modules: list[str]):
+        """Импортирует модули задания до начала отсчета лимита"""
+        if modules:
+            self._run_hidden(PRELOAD_SOURCE, {"modules": modules})
+
+    def kernel_ready(self, startup_seconds: float):
+        """Запоминает время запуска ядра и pid его процесса для замеров"""
+        self.kernel_startup_seconds = round(startup_seconds, 3)
+        pid = self._run_hidden(PID_SOURCE, {}).get("pid")
+        self.kernel_pid = pid if isinstance(pid, int) else None
+
+    def metrics(self) -> dict:
+        return {
+            "kernel_startup_seconds": self.kernel_startup_seconds,
+            "cells": self.cell_metrics,
+        }
+
+    @contextmanager
+    def _measure(self, index: int, kind: str, cell):
+        """Замеряет исполнение ячейки; запись остается и при таймауте"""
+        entry = {"index": index, "kind": kind}
+        self.cell_metrics.append(entry)
+        _reset_peak_rss(self.kernel_pid)
+        before = _process_usage(self.kernel_pid)
+        started = time.monotonic()
+        try:
+            yield
+        except CellTimeoutError:
+            entry["timed_out"] = True
+            raise
+        finally:
+            entry["wall"] = round(time.monotonic() - started, 3)
+            after = _process_usage(self.kernel_pid)
+            if before is not None and after is not None:
+                entry["cpu"] = round(after[0] - before[0], 3)
+                entry["peak_rss"] = after[1]
+            entry["output_bytes"] = len(json.dumps(cell.get("outputs", [])))
+
+    def start_deadline(self, timeout_seconds):
+        """Начинает отсчет лимита времени: вызывается, когда ядро готово"""
+        if timeout_seconds:
+            self.deadline = time.monotonic() + timeout_seconds
+
+    def _emit(self, event: str, **fields):
+        if self.progress is None:
+            self.progress = open(PROGRESS_FILE, "w", buffering=1)
+        self.progress.write(json.dumps({"event": event, **fields}) + "\n")
+
+    def _check_deadline(self):
+        if self.deadline is None:
+            return
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded
+        # Лимит nbclient на ячейку - остаток общего лимита
+        self.client.timeout = math.ceil(remaining)
+
+    def run(self) -> dict:
+        total_points = 0
+        feedback = []
+        records = []
+        snapshots = []
+        skipped_cells = 0
+        start = 0
+
+        if self.incremental:
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            restored = self._restore()
+            if restored is not None:
+                position, previous_steps, snapshots = restored
+                for index in range(position + 1):
+                    record = {
+                        **previous_steps[index],
+                        "test": self.trusted_steps[index]["test"],
+                    }
+                    self._apply_record(index, record)
+                    records.append(record)
+                    skipped_cells += record["cells"]
+                    if record["test"] is not None:
+                        if record["test"]["passed"]:
+                            total_points += record["test"]["points"]
+                        else:
+                            feedback.append(index)
+                if records:
+                    self.client.code_cells_executed = records[-1][
+                        "code_cells_executed"
+                    ]
+                start = position + 1
+                self._emit("restored", steps=start, cells=skipped_cells)
+
+        baseline_files = _workspace_files() if self.incremental else None
+        since_snapshot = 0.0
+        for index in range(start, self.steps):
+            self._emit("started", index=index, steps=self.steps)
+            started = time.monotonic()
+            try:
+                record = self._run_step(index)
+            except CellExecutionError:
+                elapsed = round(time.monotonic() - started, 3)
+                self._emit("failed", index=index, elapsed=elapsed)
+                raise
+            elapsed = time.monotonic() - started
+            since_snapshot += elapsed
+            records.append(record)
+            test = record["test"]
+            if test is not None:
+                if test["passed"]:
+                    total_points += test["points"]
+                else:
+                    feedback.append(index)
+                self._emit(
+                    "finished" if test["passed"] else "failed",
+                    index=index,
+                    elapsed=round(elapsed, 3),
+                    points=test["points"] if test["passed"] else 0,
+                    max_points=test["points"],
+                )
+            else:
+                self._emit("finished", index=index, elapsed=round(elapsed, 3))
+
+            if (
+                baseline_files is not None
+                and self.max_snapshots > 0
+                and since_snapshot >= self.snapshot_min_seconds
+            ):
+                # Файлы, созданные пропущенными ячейками, не восстановить
+                if _workspace_files() != baseline_files:
+                    baseline_files = None
+                elif self._snapshot(index):
+                    snapshots.append(index)
+                    since_snapshot = 0.0
+                    while len(snapshots) > self.max_snapshots:
+                        _remove(self._snapshot_path(snapshots.pop(0)))
+
+        result = {
+            "total_points": total_points,
+            "feedback": feedback,
+            "skipped_cells": skipped_cells,
+            "metrics": self.metrics(),
+        }
+        if self.incremental:
+            self._save_state(records, snapshots)
+            result["steps"] = [
+                {"hash": record["hash"], "test": record["test"]}
+                for record in records
+            ]
+        return result
+
+    def _run_step(self, index: int) -> dict:
+        record = {
+            "hash": self.hashes[index],
+            "cells": 0,
+            "cell": None,
+            "test": None,
+        }
+        if index < len(self.submission.cells):
+            submission_cell = self.submission.cells[index]
+            if submission_cell.cell_type == "code":
+                record["cells"] += 1
+                self._check_deadline()
+                with self._measure(index, "cell", submission_cell):
+                    self._execute_submission_cell(submission_cell, index)
+                if self.mode != GRADE:
+                    record["cell"] = {
+                        "outputs": submission_cell.get("outputs", []),
+                        "execution_count": submission_cell.get(
+                            "execution_count"
+                        ),
+                        "execution": submission_cell.metadata.get(
+                            "execution"
+                        ),
+                    }
+        test = self.tests.get(index)
+        if test is not None:
+            record["cells"] += 1
+            self._check_deadline()
+            test_cell = nbformat.v4.new_code_cell(test["source"])
+            try:
+                with self._measure(index, "test", test_cell):
+                    self.client.execute_cell(test_cell, index)
+                passed = True
+            except CellExecutionError:
+                passed = False
+            record["test"] = {"points": test["points"], "passed": passed}
+        record["code_cells_executed"] = self.client.code_cells_executed
+        return record
+
+    def _execute_submission_cell(self, cell, index: int):
+        if self.mode == GRADE:
+            try:
+                self.client.execute_cell(
+                    cell, cell_index=index, store_history=True
+                )
+            except CellExecutionError:
+                pass
+            return
+        try:
+            self.client.execute_cell(
+                cell,
+                index,
+                execution_count=self.client.code_cells_executed + 1,
+            )
+        except CellExecutionError as e:
+            if "AssertionError" not in str(e):
+                raise
+
+    def _apply_record(self, index: int, record: dict):
+        if record["cell"] is None:
+            return
+        cell = self.submission.cells[index]
+        saved = record["cell"]
+        cell.outputs = [nbformat.from_dict(output) for output in saved["outputs"]]
+        cell.execution_count = saved["execution_count"]
+        if saved["execution"] is not None:
+            cell.metadata["execution"] = nbformat.from_dict(saved["execution"])
+
+    @staticmethod
+    def _snapshot_path(index: int) -> str:
+        return os.path.join(CHECKPOINT_DIR, f"ns-{index}.pkl")
+
+    def _run_hidden(self, source: str, args: dict) -> dict:
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        _remove(RESULT_FILE)
+        code = (
+            f"exec({source!r}, "
+            f"{{'ARGS': {args!r}, 'RESULT_PATH': {RESULT_FILE!r}}})"
+        )
+        msg_id = self.client.kc.execute(code, silent=True, store_history=False)
+        self.client.wait_for_reply(msg_id)
+        try:
+            with open(RESULT_FILE) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        finally:
+            _remove(RESULT_FILE)
+        return result if isinstance(result, dict) else {}
+
+    def _snapshot(self, index: int) -> bool:
+        result = self._run_hidden(
+            SNAPSHOT_SOURCE,
+            {
+                "path": self._snapshot_path(index),
+                "max_bytes": self.snapshot_max_bytes,
+            },
+        )
+        return bool(result.get("ok"))
+
+    def _restore(self):
+        try:
+            with open(STATE_FILE) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return None
+        try:
+            previous_steps = state["steps"]
+            limit = min(
+                self.steps, len(previous_steps), len(self.trusted_steps)
+            )
+            candidates = [
+                index
+                for index in state["snapshots"]
+                if isinstance(index, int)
+                and 0 <= index < limit
+                and self.trusted_steps[index]["hash"] == self.hashes[index]
+                and previous_steps[index]["hash"] == self.hashes[index]
+                and os.path.exists(self._snapshot_path(index))
+            ]
+        except (KeyError, TypeError):
+            return None
+        for position in sorted(candidates, reverse=True):
+            result = self._run_hidden(
+                RESTORE_SOURCE, {"path": self._snapshot_path(position)}
+            )
+            if result.get("ok"):
+                kept = [index for index in candidates if index <= position]
+                return position, previous_steps, sorted(kept)
+        return None
+
+    def _save_state(self, records: list[dict], snapshots: list[int]):
+        for name in os.listdir(CHECKPOINT_DIR):
+            if name.startswith("ns-") and name.endswith(".pkl"):
+                index = int(name[3:-4]) if name[3:-4].isdigit() else -1
+                if index not in snapshots:
+                    _remove(os.path.join(CHECKPOINT_DIR, name))
+        with open(STATE_FILE, "w") as f:
+            json.dump(
+                {
+                    "version": STATE_VERSION,
+                    "steps": records,
+                    "snapshots": snapshots,
+                },
+                f,
+            )
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    with open(CONFIG_FILE) as f:
+        config = json.load(f)
+    submission = nbformat.read("submission.ipynb", as_version=4)
+    if config["mode"] == EXECUTE and not os.path.exists(PLAN_FILE):
+        plan = {"cells": 0, "tests": []}
+    else:
+        with open(PLAN_FILE) as f:
+            plan = json.load(f)
+    client = NotebookClient(submission, kernel_name="python3")
+    grader = Grader(client, submission, plan, config)
+    started = time.monotonic()
+    try:
+        with client.setup_kernel():
+            grader.preload(plan.get("preload", []))
+            grader.kernel_ready(time.monotonic() - started)
+            if config["mode"] != GRADE:
+                info_msg = client.wait_for_reply(client.kc.kernel_info())
+                content = info_msg["content"] if info_msg is not None else {}
+                if "language_info" in content:
+                    submission.metadata["language_info"] = content[
+                        "language_info"
+                    ]
+            grader.start_deadline(config.get("timeout_seconds"))
+            result = grader.run()
+            if config["mode"] != GRADE:
+                client.set_widgets_metadata()
+    except (CellTimeoutError, DeadlineExceeded):
+        print(json.dumps({"timed_out": True, "metrics": grader.metrics()}))
+        return
+    if config["mode"] != GRADE:
+        nbformat.write(submission, "submission.ipynb")
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import uuid
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import async_session_maker
+from app.exceptions import NotebookEditorUnavailableException
+from app.logger import configure_logging
+from app.submissions.services.service import JupyterServerBindingDAO
+
+logger = logging.getLogger(__name__)
+configure_logging()
+
+POOL_SERVER_NAME = "editor"
+
+
+class JupyterServerPool:
+    """Пул заранее запущенных серверов JupyterHub
+
+    Сервер принадлежит пользователю hub, поэтому пул состоит из служебных
+    пользователей `<prefix><id>` с одним сервером POOL_SERVER_NAME у каждого.
+    При открытии редактора студент получает готовый сервер: привязка
+    (студент, задание) -> сервер сохраняется в БД, а доступ студенту
+    открывается через sharing JupyterHub. После использования сервер
+    в пул не возвращается - служебный пользователь удаляется при простое.
+
+    Фоновая задача держит в пуле size готовых серверов (не более
+    spawn_concurrency запусков одновременно) и останавливает серверы,
+    простаивающие дольше idle_cull_seconds, в том числе обычные серверы
+    студентов, запущенные без пула.
+    """
+
+    def __init__(
+        self,
+        size: int = settings.JUPYTERHUB_POOL_SIZE,
+        user_prefix: str = settings.JUPYTERHUB_POOL_USER_PREFIX,
+        spawn_concurrency: int = settings.JUPYTERHUB_SPAWN_CONCURRENCY,
+        spawn_timeout: float = settings.JUPYTERHUB_SPAWN_TIMEOUT_SECONDS,
+        maintain_interval: float = (
+            settings.JUPYTERHUB_POOL_MAINTAIN_INTERVAL_SECONDS
+        ),
+        idle_cull_seconds: int = settings.JUPYTERHUB_IDLE_CULL_SECONDS,
+    ):
+        self.size = size
+        self.user_prefix = user_prefix
+        self.spawn_timeout = spawn_timeout
+        self.maintain_interval = maintain_interval
+        self.idle_cull_seconds = idle_cull_seconds
+        # Общий лимит запусков: и для пула, и для серверов студентов
+        self.spawn_semaphore = asyncio.Semaphore(max(1, spawn_concurrency))
+
+        self._warm: deque[str] = deque()
+        self._spawning: set[str] = set()
+        self._claim_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._spawn_tasks: set[asyncio.Task] = set()
+        self._stats = {
+            "claims": 0,
+            "claim_misses": 0,
+            "spawned": 0,
+            "spawn_failures": 0,
+            "culled": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def is_pool_user(self, username: str) -> bool:
+        return username.startswith(self.user_prefix)
+
+    def start(self, client_factory: Callable):
+        """Запускает пополнение пула и остановку простаивающих серверов"""
+        if self._task is not None:
+            return
+        if not self.enabled and self.idle_cull_seconds <= 0:
+            return
+        self._task = asyncio.create_task(self._maintain_loop(client_factory))
+
+    async def shutdown(self):
+        tasks = [task for task in (self._task, *self._spawn_tasks) if task]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._task = None
+        self._spawn_tasks.clear()
+
+    async def resolve(
+        self, session: AsyncSession, user_id: int, assignment_id: str, client
+    ) -> tuple[str, str] | None:
+        """Сервер, уже выданный студенту под задание, если он еще работает"""
+        binding = await JupyterServerBindingDAO.find_one_or_none(
+            session=session, user_id=user_id, assignment_id=assignment_id
+        )
+        if binding is None:
+            return None
+        status = await client.server_status(
+            binding.hub_username, binding.server_name
+        )
+        if status and status.get("ready", False):
+            return binding.hub_username, binding.server_name
+        # Сервер остановлен (простой или перезапуск hub) - привязка устарела
+        await JupyterServerBindingDAO.delete(session=session, id=binding.id)
+        await self._retire(client, binding.hub_username)
+        return None
+
+    async def find_binding(
+        self, session: AsyncSession, user_id: int, assignment_id: str
+    ) -> tuple[str, str] | None:
+        binding = await JupyterServerBindingDAO.find_one_or_none(
+            session=session, user_id=user_id, assignment_id=assignment_id
+        )
+        if binding is None:
+            return None
+        return binding.hub_username, binding.server_name
+
+    async def claim(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        assignment_id: str,
+        hub_username: str,
+        client,
+    ) -> tuple[str, str] | None:
+        """Выдает студенту готовый сервер из пула или None, если пул пуст"""
+        async with self._claim_lock:
+            while self._warm:
+                pool_user = self._warm.popleft()
+                status = await client.server_status(pool_user, POOL_SERVER_NAME)
+                if not status or not status.get("ready", False):
+                    continue
+                try:
+                    async with session.begin_nested():
+                        await JupyterServerBindingDAO.add(
+                            session=session,
+                            user_id=user_id,
+                            assignment_id=assignment_id,
+                            hub_username=pool_user,
+                            server_name=POOL_SERVER_NAME,
+                        )
+                except IntegrityError:
+                    # Сервер уже забрал другой процесс бэкенда
+                    continue
+                await client.ensure_user(hub_username)
+                await client.share_server(
+                    pool_user, POOL_SERVER_NAME, hub_username
+                )
+                self._stats["claims"] += 1
+                self._wakeup.set()
+                return pool_user, POOL_SERVER_NAME
+
+        self._stats["claim_misses"] += 1
+        self._wakeup.set()
+        return None
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "warm": len(self._warm),
+            "spawning": len(self._spawning),
+        }
+
+    async def maintain(self, client):
+        """Один проход обслуживания: остановка простоя и пополнение пула"""
+        users = await client.list_users()
+        async with async_session_maker() as session:
+            bound = await JupyterServerBindingDAO.bound_usernames(session)
+        await self.cull(client, users, bound)
+        if self.enabled:
+            await self.refill(client, users, bound)
+
+    async def refill(self, client, users: list[dict], bound: set[str]):
+        warm = []
+        pending = 0
+        for user in users:
+            name = user.get("name", "")
+            if (
+                not self.is_pool_user(name)
+                or name in bound
+                or name in self._spawning
+            ):
+                continue
+            server = (user.get("servers") or {}).get(POOL_SERVER_NAME)
+            if server and server.get("ready"):
+                warm.append(name)
+            elif server and server.get("pending"):
+                pending += 1
+            else:
+                # Сервер не запустился или был остановлен извне
+                await self._retire(client, name)
+        self._warm = deque(warm)
+
+        missing = self.size - len(warm) - pending - len(self._spawning)
+        for _ in range(max(0, missing)):
+            task = asyncio.create_task(self._spawn_one(client))
+            self._spawn_tasks.add(task)
+            task.add_done_callback(self._spawn_tasks.discard)
+
+    async def cull(self, client, users: list[dict], bound: set[str]):
+        if self.idle_cull_seconds <= 0:
+            return
+        now = datetime.now(timezone.utc)
+        for user in users:
+            name = user.get("name", "")
+            is_pool_user = self.is_pool_user(name)
+            if is_pool_user and name not in bound:
+                # Теплый резерв простаивает намеренно
+                continue
+            servers = user.get("servers") or {}
+            for server_name, server in list(servers.items()):
+                last_activity = _parse_timestamp(
+                    server.get("last_activity") or user.get("last_activity")
+                )
+                if last_activity is None:
+                    continue
+                idle = (now - last_activity).total_seconds()
+                if idle < self.idle_cull_seconds:
+                    continue
+                logger.info(
+                    "Остановка простаивающего сервера %s/%s", name, server_name
+                )
+                if is_pool_user:
+                    async with async_session_maker() as session:
+                        async with session.begin():
+                            await JupyterServerBindingDAO.delete(
+                                session=session, hub_username=name
+                            )
+                    await self._retire(client, name)
+                    self._stats["culled"] += 1
+                    break
+                await client.stop_server(name, server_name)
+                self._stats["culled"] += 1
+
+    async def _spawn_one(self, client):
+        name = f"{self.user_prefix}{uuid.uuid4().hex[:12]}"
+        self._spawning.add(name)
+        try:
+            async with self.spawn_semaphore:
+                await client.ensure_user(name)
+                await client.start_server(name, POOL_SERVER_NAME)
+                await client.wait_server_ready(
+                    name, POOL_SERVER_NAME, timeout_seconds=self.spawn_timeout
+                )
+        except NotebookEditorUnavailableException:
+            self._stats["spawn_failures"] += 1
+            logger.warning("Не удалось запустить сервер пула %s", name)
+            await self._retire(client, name)
+        else:
+            self._stats["spawned"] += 1
+            self._warm.append(name)
+        finally:
+            self._spawning.discard(name)
+
+    async def _retire(self, client, username: str):
+        """Удаляет служебного пользователя пула вместе с его сервером"""
+        try:
+            await client.stop_server(username, POOL_SERVER_NAME)
+            await client.delete_user(username)
+        except NotebookEditorUnavailableException:
+            logger.warning("Не удалось удалить сервер пула %s", username)
+
+    async def _maintain_loop(self, client_factory: Callable):
+        while True:
+            try:
+                await self.maintain(client_factory())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Ошибка обслуживания пула JupyterHub: %s", e)
+            with suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.maintain_interval
+                )
+            self._wakeup.clear()
+
+
+def _parse_timestamp(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+jupyter_server_pool = JupyterServerPool()
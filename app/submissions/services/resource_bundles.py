@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_RESOURCE_BUNDLES = os.getenv("SANDBOX_RESOURCE_BUNDLES", "1") == "1"
+SANDBOX_RESOURCE_BUNDLE_DIR = os.getenv("SANDBOX_RESOURCE_BUNDLE_DIR", "")
+# Путь каталога бандлов на хосте Docker, если сервер сам работает в контейнере:
+# тогда каталог дополнительно монтируется в sandbox только для чтения
+SANDBOX_RESOURCE_BUNDLE_HOST_DIR = os.getenv(
+    "SANDBOX_RESOURCE_BUNDLE_HOST_DIR", ""
+)
+SANDBOX_RESOURCE_BUNDLE_TTL_SECONDS = int(
+    os.getenv("SANDBOX_RESOURCE_BUNDLE_TTL_SECONDS", str(7 * 24 * 3600))
+)
+RESOURCE_BUNDLE_MOUNT_POINT = "/resources"
+
+
+def resources_digest(resources: Iterable[tuple[str, bytes]]) -> str:
+    digest = hashlib.sha256()
+    for filename, content in sorted(resources):
+        digest.update(filename.encode() + b"\0")
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def write_resources(target_dir: Path, resources: Iterable[tuple[str, bytes]]):
+    """Создает файлы задания, сохраняя относительные подкаталоги"""
+    for filename, content in resources:
+        resource_path = Path(filename)
+        if resource_path.is_absolute() or ".." in resource_path.parts:
+            logger.warning("Skipping unsafe resource path: %s", filename)
+            continue
+        safe_parts = [
+            part for part in resource_path.parts if part not in ("", ".")
+        ]
+        if not safe_parts:
+            continue
+        target = target_dir.joinpath(*safe_parts)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+
+
+def _set_read_only(path: Path):
+    for item in path.rglob("*"):
+        item.chmod(0o555 if item.is_dir() else 0o444)
+    path.chmod(0o555)
+
+
+def _remove_tree(path: Path):
+    # Каталоги бандла без права записи: иначе rmtree не удалит их содержимое
+    def _on_error(function, failed_path, _):
+        os.chmod(os.path.dirname(failed_path), stat.S_IRWXU)
+        function(failed_path)
+
+    shutil.rmtree(path, onerror=_on_error)
+
+
+class ResourceBundleStore:
+    """Ресурсные файлы заданий, разложенные на диске один раз
+
+    Бандл - каталог с именем по хэшу содержимого ресурсов, поэтому
+    новая версия файлов задания получает новый каталог, а старый удаляется
+    по TTL. Файлы бандла доступны только для чтения; в workspace проверки
+    на них ставятся символьные ссылки вместо копирования файлов, и
+    параллельные sandbox читают одни и те же страницы из page cache.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        ttl_seconds: int = SANDBOX_RESOURCE_BUNDLE_TTL_SECONDS,
+    ):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    def ensure_root(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root
+
+    def stage(self, resources: list[tuple[str, bytes]]) -> Path | None:
+        """Возвращает каталог бандла, создавая его при первом обращении"""
+        if not resources:
+            return None
+        bundle = self.root / resources_digest(resources)
+        with self._lock:
+            if bundle.is_dir():
+                os.utime(bundle)
+                return bundle
+            staging = self.ensure_root() / f".{uuid.uuid4().hex}.tmp"
+            try:
+                staging.mkdir()
+                write_resources(staging, resources)
+                _set_read_only(staging)
+                os.replace(staging, bundle)
+            except OSError:
+                # Бандл мог создать другой процесс с тем же корнем
+                if staging.exists():
+                    _remove_tree(staging)
+                if not bundle.is_dir():
+                    raise
+        logger.info("Подготовлен бандл ресурсов %s", bundle.name)
+        self.cleanup(keep=bundle)
+        return bundle
+
+    @staticmethod
+    def link(bundle: Path, workspace: Path, target_dir: str):
+        """Ставит в workspace ссылки на файлы бандла
+
+        target_dir - путь к бандлу внутри sandbox: ссылки разрешаются
+        уже в контейнере.
+        """
+        for entry in bundle.iterdir():
+            link = workspace / entry.name
+            if link.exists() or link.is_symlink():
+                logger.warning(
+                    "Ресурс %s совпадает с файлом проверки", entry.name
+                )
+                continue
+            link.symlink_to(f"{target_dir}/{entry.name}")
+
+    def cleanup(self, keep: Path | None = None):
+        """Удаляет бандлы, к которым давно не обращались"""
+        if self.ttl_seconds <= 0 or not self.root.is_dir():
+            return
+        deadline = time.time() - self.ttl_seconds
+        with self._lock:
+            for entry in self.root.iterdir():
+                if entry == keep:
+                    continue
+                try:
+                    if entry.stat().st_mtime < deadline:
+                        _remove_tree(entry)
+                except OSError:
+                    continue
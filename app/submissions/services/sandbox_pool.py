@@ -0,0 +1,418 @@
+import logging
+import os
+import queue
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", "0"))
+SANDBOX_POOL_MAX_JOBS_PER_CONTAINER = int(
+    os.getenv("SANDBOX_POOL_MAX_JOBS_PER_CONTAINER", "1")
+)
+SANDBOX_POOL_HEALTHCHECK_INTERVAL_SECONDS = int(
+    os.getenv("SANDBOX_POOL_HEALTHCHECK_INTERVAL_SECONDS", "30")
+)
+SANDBOX_POOL_ACQUIRE_TIMEOUT_SECONDS = float(
+    os.getenv("SANDBOX_POOL_ACQUIRE_TIMEOUT_SECONDS", "10")
+)
+SANDBOX_POOL_OWNER = os.getenv("SANDBOX_POOL_OWNER", socket.gethostname())
+SANDBOX_POOL_LABEL = "autograder.sandbox-pool"
+SANDBOX_POOL_PROCESS_LABEL = "autograder.sandbox-pool.process"
+
+sandbox_container_phase_seconds = registry.histogram(
+    "sandbox_container_phase_seconds",
+    "Этапы контейнера sandbox: start, exec, teardown; "
+    "run - docker run --rm целиком",
+    ("backend", "phase"),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+
+def _process_id(pid: int) -> str:
+    """pid и время старта процесса: pid может достаться новому процессу"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            started = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        started = ""
+    return f"{pid}:{started}"
+
+
+def _process_alive(process_id: str) -> bool:
+    pid = process_id.partition(":")[0]
+    if not pid.isdigit() or int(pid) <= 0:
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return _process_id(int(pid)) == process_id
+
+
+@dataclass
+class PooledContainer:
+    container_id: str
+    name: str = ""
+    created_at: float = field(default_factory=time.monotonic)
+    checked_at: float = field(default_factory=time.monotonic)
+    jobs: int = 0
+
+
+class SandboxContainerPool:
+    """Пул заранее запущенных sandbox-контейнеров
+
+    Контейнеры стартуют с теми же ограничениями, что и одноразовый
+    `docker run --rm`, и простаивают в `sleep infinity`. Проверка получает
+    контейнер из пула и выполняет команду через `docker exec`, после чего
+    контейнер либо возвращается в пул, либо уничтожается (по достижении
+    лимита задач или при ошибке). Недостающие контейнеры досоздаются в фоне.
+    """
+
+    def __init__(
+        self,
+        run_args: list[str] | Callable[[str], list[str]],
+        size: int = SANDBOX_POOL_SIZE,
+        max_jobs_per_container: int = SANDBOX_POOL_MAX_JOBS_PER_CONTAINER,
+        healthcheck_interval: float = SANDBOX_POOL_HEALTHCHECK_INTERVAL_SECONDS,
+        acquire_timeout: float = SANDBOX_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        owner: str = SANDBOX_POOL_OWNER,
+        on_destroy: Callable[[str], None] | None = None,
+    ):
+        # run_args - аргументы `docker run` после `-d`: лимиты, монтирование,
+        # образ и команда ожидания внутри контейнера. Функция получает имя
+        # контейнера, если у каждого контейнера свои каталоги; on_destroy
+        # вызывается с тем же именем после удаления контейнера.
+        self.run_args = run_args
+        self.on_destroy = on_destroy
+        # owner и процесс попадают в метки контейнеров: при старте
+        # удаляются только контейнеры этого owner, чей процесс уже завершился,
+        # поэтому несколько процессов на одном docker-хосте не удаляют
+        # контейнеры друг друга.
+        self.owner = owner
+        self.process_id = _process_id(os.getpid())
+        self.size = size
+        self.max_jobs_per_container = max(1, max_jobs_per_container)
+        self.healthcheck_interval = healthcheck_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: queue.Queue[PooledContainer] = queue.Queue()
+        self._lock = threading.Lock()
+        self._total = 0
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._maintainer: threading.Thread | None = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "fallbacks": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "started": 0,
+            "start_failures": 0,
+            "destroyed": 0,
+            "recycled": 0,
+            "unhealthy": 0,
+        }
+
+    def start(self):
+        """Запускает фоновый поток, который поддерживает пул заполненным"""
+        if self._maintainer is not None:
+            return
+        self._remove_orphans()
+        self._maintainer = threading.Thread(
+            target=self._maintain_loop, name="sandbox-pool", daemon=True
+        )
+        self._maintainer.start()
+
+    def shutdown(self):
+        """Останавливает пул и удаляет все простаивающие контейнеры"""
+        self._closed = True
+        self._wakeup.set()
+        while True:
+            try:
+                container = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(container)
+
+    def acquire(self) -> PooledContainer | None:
+        """Выдает контейнер под одну задачу
+
+        Возвращает None, если за acquire_timeout свободный контейнер так и не
+        появился - в этом случае вызывающая сторона запускает одноразовый
+        контейнер, как без пула.
+        """
+        started_at = time.monotonic()
+        container = self._take_idle()
+        if container is not None:
+            self._record_wait(started_at, hit=True)
+            return container
+
+        # Свободных нет: если пул еще не заполнен, запускаем контейнер сами,
+        # иначе ждем, пока кто-то вернет контейнер в пул.
+        if self._reserve_slot():
+            container = self._start_container()
+            if container is None:
+                with self._lock:
+                    self._stats["fallbacks"] += 1
+            self._record_wait(started_at, hit=False)
+            return container
+
+        deadline = started_at + self.acquire_timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                container = self._idle.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if self._is_healthy(container):
+                self._record_wait(started_at, hit=False)
+                return container
+            self._discard(container, unhealthy=True)
+
+        with self._lock:
+            self._stats["fallbacks"] += 1
+        self._record_wait(started_at, hit=False)
+        logger.warning(
+            "Sandbox pool exhausted for %.1f s, fallback to one-shot container",
+            self.acquire_timeout,
+        )
+        return None
+
+    def release(self, container: PooledContainer, healthy: bool = True):
+        """Возвращает контейнер после задачи или уничтожает его"""
+        container.jobs += 1
+        if (
+            healthy
+            and not self._closed
+            and container.jobs < self.max_jobs_per_container
+        ):
+            with self._lock:
+                self._stats["recycled"] += 1
+            self._idle.put(container)
+            return
+        self._discard(container, unhealthy=not healthy)
+
+    @staticmethod
+    def exec_command(
+        container: PooledContainer, command: list[str], workdir: str
+    ) -> list[str]:
+        """Команда запуска задачи внутри контейнера пула"""
+        return [
+            "docker", "exec", "-w", workdir, container.container_id, *command
+        ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = self._idle.qsize()
+            stats["total"] = self._total
+        requests = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / requests if requests else 0.0
+        stats["wait_seconds_avg"] = (
+            stats["wait_seconds_total"] / requests if requests else 0.0
+        )
+        return stats
+
+    def fill(self):
+        """Досоздает контейнеры до целевого размера пула"""
+        while not self._closed and self._reserve_slot():
+            container = self._start_container()
+            if container is None:
+                break
+            self._idle.put(container)
+
+    def check_idle(self):
+        """Проверяет простаивающие контейнеры и удаляет неработающие"""
+        for _ in range(self._idle.qsize()):
+            try:
+                container = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_healthy(container, force=True):
+                self._idle.put(container)
+            else:
+                self._discard(container, unhealthy=True)
+
+    def _maintain_loop(self):
+        next_check = time.monotonic() + self.healthcheck_interval
+        while not self._closed:
+            self.fill()
+            if time.monotonic() >= next_check:
+                self.check_idle()
+                next_check = time.monotonic() + self.healthcheck_interval
+            self._wakeup.wait(timeout=self.healthcheck_interval)
+            self._wakeup.clear()
+
+    def _take_idle(self) -> PooledContainer | None:
+        while True:
+            try:
+                container = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if self._is_healthy(container):
+                return container
+            self._discard(container, unhealthy=True)
+
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self._closed or self._total >= self.size:
+                return False
+            self._total += 1
+            return True
+
+    def _free_slot(self):
+        with self._lock:
+            self._total -= 1
+        self._wakeup.set()
+
+    def _record_wait(self, started_at: float, hit: bool):
+        waited = time.monotonic() - started_at
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(
+                self._stats["wait_seconds_max"], waited
+            )
+
+    def _start_container(self) -> PooledContainer | None:
+        name = f"autograder-sandbox-{uuid.uuid4().hex[:12]}"
+        run_args = self.run_args
+        if callable(run_args):
+            run_args = run_args(name)
+        command = [
+            "docker",
+            "run",
+            "-d",
+            "--rm",
+            "--name",
+            name,
+            "--label",
+            f"{SANDBOX_POOL_LABEL}={self.owner}",
+            "--label",
+            f"{SANDBOX_POOL_PROCESS_LABEL}={self.process_id}",
+            *run_args,
+        ]
+        started = time.monotonic()
+        try:
+            result = subprocess.run(
+                command, capture_output=True, text=True, timeout=60, check=True
+            )
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            logger.error("Не удалось запустить контейнер пула: %s", e)
+            with self._lock:
+                self._stats["start_failures"] += 1
+            self._cleanup(name)
+            self._free_slot()
+            return None
+        sandbox_container_phase_seconds.observe(
+            time.monotonic() - started, backend="pool", phase="start"
+        )
+        with self._lock:
+            self._stats["started"] += 1
+        return PooledContainer(
+            container_id=result.stdout.strip() or name, name=name
+        )
+
+    def _is_healthy(
+        self, container: PooledContainer, force: bool = False
+    ) -> bool:
+        now = time.monotonic()
+        if not force and now - container.checked_at < self.healthcheck_interval:
+            return True
+        try:
+            result = subprocess.run(
+                [
+                    "docker",
+                    "inspect",
+                    "-f",
+                    "{{.State.Running}}",
+                    container.container_id,
+                ],
+                capture_output=True,
+                text=True,
+                timeout=10,
+            )
+        except (subprocess.SubprocessError, FileNotFoundError):
+            return False
+        container.checked_at = now
+        return result.returncode == 0 and result.stdout.strip() == "true"
+
+    def _discard(self, container: PooledContainer, unhealthy: bool = False):
+        if unhealthy:
+            with self._lock:
+                self._stats["unhealthy"] += 1
+        self._destroy(container)
+        self._free_slot()
+
+    def _destroy(self, container: PooledContainer):
+        started = time.monotonic()
+        try:
+            subprocess.run(
+                ["docker", "rm", "-f", container.container_id],
+                capture_output=True,
+                text=True,
+                timeout=30,
+            )
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            logger.error(
+                "Не удалось удалить контейнер пула %s: %s",
+                container.container_id,
+                e,
+            )
+        self._cleanup(container.name)
+        sandbox_container_phase_seconds.observe(
+            time.monotonic() - started, backend="pool", phase="teardown"
+        )
+        with self._lock:
+            self._stats["destroyed"] += 1
+
+    def _cleanup(self, name: str):
+        if self.on_destroy is not None and name:
+            self.on_destroy(name)
+
+    def _remove_orphans(self):
+        # Контейнеры, оставшиеся от завершившегося процесса (например, после
+        # аварийного завершения), заново в пул не берем. Контейнеры живых
+        # процессов с тем же owner не трогаем.
+        try:
+            result = subprocess.run(
+                [
+                    "docker",
+                    "ps",
+                    "-a",
+                    "--filter",
+                    f"label={SANDBOX_POOL_LABEL}={self.owner}",
+                    "--format",
+                    "{{.ID}} {{.Names}} "
+                    f'{{{{.Label "{SANDBOX_POOL_PROCESS_LABEL}"}}}}',
+                ],
+                capture_output=True,
+                text=True,
+                timeout=30,
+            )
+            orphans = {}
+            for line in result.stdout.splitlines():
+                container_id, name, process_id = (line.split() + ["", ""])[:3]
+                if container_id and not _process_alive(process_id):
+                    orphans[container_id] = name
+            if orphans:
+                subprocess.run(
+                    ["docker", "rm", "-f", *orphans],
+                    capture_output=True,
+                    text=True,
+                    timeout=60,
+                )
+            for name in orphans.values():
+                self._cleanup(name)
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            logger.warning("Не удалось очистить старые контейнеры пула: %s", e)
@@ -0,0 +1,140 @@
+"""События проверки, которые grading_driver пишет в progress.jsonl
+
+Файл лежит в workspace, куда пишет и код студента, поэтому содержимое
+не считается доверенным: из строки берутся только известные поля
+известных типов, длина строки и число событий ограничены. Баллы
+проверки все равно берутся из результата driver'а, а не из событий.
+Файл открывается без перехода по ссылкам и только если это обычный
+файл, а всего читается не больше max_events * MAX_LINE_BYTES байт.
+"""
+
+import json
+import logging
+import os
+import stat
+import threading
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_PROGRESS_MAX_EVENTS = int(
+    os.getenv("SANDBOX_PROGRESS_MAX_EVENTS", "1000")
+)
+SANDBOX_PROGRESS_POLL_SECONDS = float(
+    os.getenv("SANDBOX_PROGRESS_POLL_SECONDS", "0.2")
+)
+MAX_LINE_BYTES = 512
+MAX_READ_BYTES = 64 * 1024
+
+EVENT_TYPES = {"started", "finished", "failed", "restored"}
+EVENT_FIELDS = {
+    "index": int,
+    "steps": int,
+    "cells": int,
+    "elapsed": float,
+    "points": float,
+    "max_points": float,
+}
+
+
+def parse_event(line: bytes) -> dict | None:
+    """Событие из строки progress.jsonl или None, если строка не подходит"""
+    if len(line) > MAX_LINE_BYTES:
+        return None
+    try:
+        raw = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(raw, dict) or raw.get("event") not in EVENT_TYPES:
+        return None
+    event = {"event": raw["event"]}
+    for name, kind in EVENT_FIELDS.items():
+        value = raw.get(name)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        event[name] = value if kind is float else int(value)
+    return event
+
+
+class ProgressTail:
+    """Читает progress.jsonl, пока работает контейнер, и передает события
+
+    callback вызывается из отдельного потока; после выхода из контекста
+    файл дочитывается до конца.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        callback: Callable[[dict], None],
+        max_events: int = SANDBOX_PROGRESS_MAX_EVENTS,
+        poll_seconds: float = SANDBOX_PROGRESS_POLL_SECONDS,
+    ):
+        self.path = path
+        self.callback = callback
+        self.max_events = max_events
+        self.poll_seconds = poll_seconds
+        self.sent = 0
+        self.max_bytes = max_events * MAX_LINE_BYTES
+        self._offset = 0
+        self._buffer = b""
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        while self.read():
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            self.read()
+
+    def _read_chunk(self, size: int) -> bytes:
+        # Код студента может подменить файл ссылкой на /dev/zero или FIFO
+        fd = os.open(self.path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        try:
+            if not stat.S_ISREG(os.fstat(fd).st_mode):
+                return b""
+            return os.pread(fd, size, self._offset)
+        finally:
+            os.close(fd)
+
+    def read(self) -> bool:
+        """Читает новую порцию файла; True, если прочитано что-то"""
+        with self._lock:
+            if self.sent >= self.max_events or self._offset >= self.max_bytes:
+                return False
+            size = min(MAX_READ_BYTES, self.max_bytes - self._offset)
+            try:
+                chunk = self._read_chunk(size)
+            except OSError:
+                return False
+            if not chunk:
+                return False
+            self._offset += len(chunk)
+            *lines, self._buffer = (self._buffer + chunk).split(b"\n")
+            if len(self._buffer) > MAX_LINE_BYTES:
+                # Строка без конца длиннее лимита - событием она не станет
+                self._buffer = b""
+            for line in lines:
+                event = parse_event(line)
+                if event is None:
+                    continue
+                try:
+                    self.callback(event)
+                except Exception as e:
+                    logger.warning(
+                        "Не удалось передать событие проверки: %s", e
+                    )
+                self.sent += 1
+                if self.sent >= self.max_events:
+                    break
+            return True
@@ -1,12 +1,16 @@
+import hashlib
 import json
 import logging
 import os
-from contextlib import contextmanager
 import re
+import shutil
 import subprocess
 import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Callable
 
 from app.exceptions import (
     ResourceLimitExceededException,
@@ -14,6 +18,50 @@ from app.exceptions import (
     SyntaxException,
     UnsafeNotebookCodeException,
 )
+from app.metrics import registry
+from app.submissions.services.code_scanner import scan_notebook
+from app.submissions.services.docker_api import (
+    API_BACKEND,
+    SANDBOX_DOCKER_BACKEND,
+    DockerApiError,
+    get_docker_client,
+)
+from app.submissions.services.grading_checkpoints import (
+    SANDBOX_CHECKPOINT_MAX_BYTES,
+    SANDBOX_CHECKPOINT_MAX_SNAPSHOTS,
+    SANDBOX_CHECKPOINT_MIN_STEP_SECONDS,
+    grading_checkpoints,
+)
+from app.submissions.services.grading_driver import (
+    CHECKPOINT_DIR,
+    CONFIG_FILE,
+    EXECUTE,
+    EXECUTE_AND_GRADE,
+    GRADE,
+    PLAN_FILE,
+    PROGRESS_FILE,
+)
+from app.submissions.services.resource_bundles import (
+    RESOURCE_BUNDLE_MOUNT_POINT,
+    SANDBOX_RESOURCE_BUNDLE_DIR,
+    SANDBOX_RESOURCE_BUNDLE_HOST_DIR,
+    SANDBOX_RESOURCE_BUNDLES,
+    ResourceBundleStore,
+    resources_digest,
+    write_resources,
+)
+from app.submissions.services.sandbox_pool import (
+    SANDBOX_POOL_SIZE,
+    PooledContainer,
+    SandboxContainerPool,
+    sandbox_container_phase_seconds,
+)
+from app.submissions.services.sandbox_progress import ProgressTail
+from app.submissions.services.sandbox_workspaces import (
+    SANDBOX_WORKSPACE_TMPFS_DIR,
+    TmpfsWorkspaceQuota,
+    directory_size,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,17 +72,60 @@ SANDBOX_PIDS_LIMIT = "256"
 SANDBOX_STARTUP_GRACE_SECONDS = int(os.getenv("SANDBOX_STARTUP_GRACE_SECONDS", "5"))
 SANDBOX_VOLUMES_FROM = os.getenv("SANDBOX_VOLUMES_FROM", "autograder_app")
 SANDBOX_CONTAINER_USER = os.getenv("SANDBOX_CONTAINER_USER", "0:0")
-MALICIOUS_CELL_PATTERNS: tuple[tuple[str, str], ...] = (
-    (r"\brm\s+-rf\b", "rm_rf"),
-    (r"\bos\.remove\s*\(", "os_remove"),
-    (r"\bos\.rmdir\s*\(", "os_rmdir"),
-    (r"\bshutil\.rmtree\s*\(", "shutil_rmtree"),
-    (r"\bos\.system\s*\([^)]*\brm\s+-rf\b", "os_system_rm_rf"),
-    (r"\bsubprocess\.(?:run|call|Popen|check_call|check_output)\s*\([^)]*\brm\s+-rf\b", "subprocess_rm_rf"),
-    (r"\bDROP\s+TABLE\b", "sql_drop_table"),
-    (r"\bTRUNCATE\s+TABLE\b", "sql_truncate_table"),
-    (r"\bDELETE\s+FROM\b", "sql_delete_from"),
-    (r"\bALTER\s+TABLE\b", "sql_alter_table"),
+GRADING_DRIVER_PATH = Path(__file__).with_name("grading_driver.py")
+# Время на старт ядра и предзагрузку сверх лимита задания
+SANDBOX_KERNEL_STARTUP_SECONDS = int(
+    os.getenv("SANDBOX_KERNEL_STARTUP_SECONDS", "30")
+)
+SANDBOX_IMAGE_ID_TTL_SECONDS = 60
+# Сколько самых долгих ячеек проверки сохраняется в попытке
+SANDBOX_CELL_METRICS_MAX = int(os.getenv("SANDBOX_CELL_METRICS_MAX", "200"))
+CELL_METRIC_KINDS = ("cell", "test")
+CELL_METRIC_FIELDS = {
+    "wall": float,
+    "cpu": float,
+    "peak_rss": int,
+    "output_bytes": int,
+}
+TMPFS_POOL_MOUNT_POINT = "/workspace-tmpfs"
+POOL_SLOTS_DIR = "pool"
+
+grading_runs_total = registry.counter(
+    "grading_incremental_runs_total",
+    "Инкрементальные проверки: resumed=true, если ядро восстановлено "
+    "из чекпоинта",
+    ("resumed",),
+)
+grading_skipped_cells_total = registry.counter(
+    "grading_skipped_cells_total",
+    "Ячейки, не исполненные повторно благодаря чекпоинтам",
+)
+sandbox_workspace_bytes = registry.histogram(
+    "sandbox_workspace_bytes",
+    "Размер workspace проверки после запуска (без ресурсов из бандлов)",
+    ("storage",),
+    buckets=tuple(float(2**power) for power in range(10, 31, 2)),
+)
+sandbox_workspace_fallback_total = registry.counter(
+    "sandbox_workspace_tmpfs_fallback_total",
+    "Workspace'ы, созданные на диске вместо tmpfs",
+    ("reason",),
+)
+sandbox_cell_seconds = registry.histogram(
+    "sandbox_cell_duration_seconds",
+    "Время исполнения ячейки студента (cell) или теста (test) в sandbox",
+    ("kind",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+sandbox_kernel_startup_seconds = registry.histogram(
+    "sandbox_kernel_startup_seconds",
+    "Время запуска ядра в sandbox до первой ячейки",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+sandbox_container_seconds = registry.histogram(
+    "sandbox_container_duration_seconds",
+    "Время работы одноразового контейнера sandbox (Docker Engine API)",
+    ("outcome",),
 )
 
 
@@ -57,58 +148,207 @@ def _workspace_root() -> Path | None:
         root = Path('/app/.sandbox')
         root.mkdir(parents=True, exist_ok=True)
         return root
+    if SANDBOX_POOL_SIZE > 0:
+        # Каталоги контейнеров пула (_pool_slot) лежат внутри этого корня.
+        root = Path(tempfile.gettempdir()) / 'autograder-sandbox'
+        root.mkdir(parents=True, exist_ok=True)
+        return root
     return None
 
 
+def _bundle_root() -> Path:
+    if SANDBOX_RESOURCE_BUNDLE_DIR:
+        return Path(SANDBOX_RESOURCE_BUNDLE_DIR)
+    if _is_running_in_docker():
+        return Path('/app/.sandbox/bundles')
+    return Path(tempfile.gettempdir()) / 'autograder-resource-bundles'
+
+
+_resource_bundles: ResourceBundleStore | None = None
+
+
+def get_resource_bundles() -> ResourceBundleStore | None:
+    """Хранилище бандлов ресурсов, если оно включено (SANDBOX_RESOURCE_BUNDLES)
+
+    В Docker бандлы используются, только если задан их путь на хосте
+    (SANDBOX_RESOURCE_BUNDLE_HOST_DIR): иначе через --volumes-from они
+    доступны sandbox'у на запись, и файлы пишутся в каждый workspace.
+    """
+    global _resource_bundles
+    if not SANDBOX_RESOURCE_BUNDLES:
+        return None
+    if _is_running_in_docker() and not SANDBOX_RESOURCE_BUNDLE_HOST_DIR:
+        return None
+    if _resource_bundles is None:
+        _resource_bundles = ResourceBundleStore(_bundle_root())
+    return _resource_bundles
+
+
+def _bundle_mount() -> tuple[str, str] | None:
+    """Источник и точка монтирования каталога бандлов (только для чтения)
+
+    Вне Docker каталог монтируется в /resources. Если сервер работает
+    в контейнере, каталог с хоста (SANDBOX_RESOURCE_BUNDLE_HOST_DIR)
+    монтируется read-only по тому же пути поверх --volumes-from.
+    """
+    bundles = get_resource_bundles()
+    if bundles is None:
+        return None
+    root = bundles.ensure_root()
+    if _is_running_in_docker():
+        return SANDBOX_RESOURCE_BUNDLE_HOST_DIR, str(root)
+    return _docker_mount_source(root), RESOURCE_BUNDLE_MOUNT_POINT
+
+
+def _bundle_mount_args() -> list[str]:
+    mount = _bundle_mount()
+    if mount is None:
+        return []
+    source, target = mount
+    return ['--mount', f'type=bind,source={source},target={target},readonly']
+
+
+def _bundle_sandbox_path(bundle: Path) -> str:
+    if _is_running_in_docker():
+        return str(bundle)
+    return f'{RESOURCE_BUNDLE_MOUNT_POINT}/{bundle.name}'
+
+
+def _write_resources(workspace: Path, resources: list[tuple[str, bytes]]):
+    """Подкладывает файлы задания в workspace
+
+    При включенных бандлах файлы раскладываются на диск один раз на версию
+    ресурсов задания, а в workspace появляются только ссылки на них.
+    """
+    bundles = get_resource_bundles()
+    if bundles is None:
+        write_resources(workspace, resources)
+        return
+    bundle = bundles.stage(resources)
+    if bundle is not None:
+        bundles.link(bundle, workspace, _bundle_sandbox_path(bundle))
+
+
+_tmpfs_quota: TmpfsWorkspaceQuota | None = None
+
+
+def get_tmpfs_quota() -> TmpfsWorkspaceQuota | None:
+    """Квота tmpfs для workspace'ов, если задан SANDBOX_WORKSPACE_TMPFS_DIR"""
+    global _tmpfs_quota
+    if not SANDBOX_WORKSPACE_TMPFS_DIR:
+        return None
+    if _tmpfs_quota is None:
+        _tmpfs_quota = TmpfsWorkspaceQuota(SANDBOX_WORKSPACE_TMPFS_DIR)
+    return _tmpfs_quota
+
+
+def _workspace_input_bytes(*contents: bytes, resources=()) -> int:
+    """Объем файлов, которые будут записаны в workspace перед запуском"""
+    total = sum(len(content) for content in contents)
+    if get_resource_bundles() is None:
+        total += sum(len(content) for _, content in resources)
+    return total
+
+
+@dataclass
+class _PoolLease:
+    container: PooledContainer
+    workdir: str
+    healthy: bool = True
+
+
+# Контейнеры пула, выданные под workspace'ы текущих запусков
+_pool_leases: dict[Path, _PoolLease] = {}
+
+
 @contextmanager
-def _workspace_context():
+def _workspace_context(input_bytes: int = 0):
     # Каждый запуск получает отдельный временный workspace и не делит файлы
     # с соседними проверками. После выхода директория удаляется.
-    root = _workspace_root()
-    with tempfile.TemporaryDirectory(dir=root) as tmp_dir:
-        yield Path(tmp_dir)
+    # Контейнер пула выдается до создания workspace: вне Docker workspace
+    # создается в каталоге этого контейнера, другие контейнеры его не видят.
+    pool = get_sandbox_pool()
+    container = None
+    lease = None
+    quota = get_tmpfs_quota()
+    reserved = 0
+    try:
+        if pool is not None:
+            container = pool.acquire()
+        reserved, reason = (
+            quota.reserve(input_bytes) if quota else (0, "disabled")
+        )
+        if reason is None:
+            root, storage = quota.root, "tmpfs"
+        else:
+            root, storage = _workspace_root(), "disk"
+            if quota is not None:
+                sandbox_workspace_fallback_total.inc(reason=reason)
+                logger.info("Workspace на диске вместо tmpfs: %s", reason)
+        mount_point = (
+            TMPFS_POOL_MOUNT_POINT if storage == "tmpfs" else "/workspace"
+        )
+        in_docker = _is_running_in_docker()
+        if container is not None and not in_docker:
+            root = _pool_slot(root, container.name)
+            root.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=root) as tmp_dir:
+            workspace = Path(tmp_dir)
+            if container is not None:
+                workdir = (
+                    str(workspace)
+                    if in_docker
+                    else f"{mount_point}/{workspace.name}"
+                )
+                lease = _pool_leases[workspace] = _PoolLease(container, workdir)
+            try:
+                yield workspace
+            finally:
+                _pool_leases.pop(workspace, None)
+                sandbox_workspace_bytes.observe(
+                    directory_size(workspace), storage=storage
+                )
+    finally:
+        if reserved:
+            quota.release(reserved)
+        # После таймаута или падения процесс в контейнере мог остаться
+        # живым, поэтому такой контейнер в пул не возвращаем.
+        if container is not None:
+            pool.release(container, healthy=lease is None or lease.healthy)
 
 
-def _scan_notebook_for_malicious_code(notebook_content: bytes):
+def _scan_notebook_for_malicious_code(notebook_content: bytes, notebook=None):
     # Дополнительный pre-check до старта контейнера:
     # блокируем очевидно опасные команды на уровне исходного кода ячеек.
-    try:
-        import nbformat
-    except Exception:
-        return
-
-    try:
-        notebook = nbformat.reads(notebook_content.decode("utf-8"), as_version=4)
-    except Exception:
-        return
+    # notebook - уже разобранный notebook_content, если вызывающий его разбирал.
+    if notebook is None:
+        try:
+            import nbformat
+        except Exception:
+            return
 
-    findings: list[tuple[int, str]] = []
-    for index, cell in enumerate(notebook.cells):
-        if cell.get("cell_type") != "code":
-            continue
-        source = cell.get("source", "")
-        for pattern, kind in MALICIOUS_CELL_PATTERNS:
-            if re.search(pattern, source, re.IGNORECASE | re.MULTILINE):
-                findings.append((index, kind))
-                break
+        try:
+            notebook = nbformat.reads(
+                notebook_content.decode("utf-8"), as_version=4
+            )
+        except Exception:
+            return
 
+    findings = scan_notebook(notebook)
     if findings:
         logger.warning(
             "Rejected notebook due to potentially malicious code. Findings: %s",
-            findings,
+            [(finding.cell_index, finding.kind) for finding in findings],
         )
         raise UnsafeNotebookCodeException
 
 
-def _build_docker_run_command(command: list[str], workspace: Path) -> list[str]:
+def _sandbox_limit_args() -> list[str]:
     # Базовые ограничения sandbox-контейнера:
     # - без сетевого доступа;
     # - c лимитами CPU/RAM/PIDs;
     # - без Linux capabilities и эскалации привилегий.
-    docker_command = [
-        'docker',
-        'run',
-        '--rm',
+    return [
         '--user',
         SANDBOX_CONTAINER_USER,
         '--network',
@@ -125,6 +365,10 @@ def _build_docker_run_command(command: list[str], workspace: Path) -> list[str]:
         'no-new-privileges',
     ]
 
+
+def _build_docker_run_command(command: list[str], workspace: Path) -> list[str]:
+    docker_command = ['docker', 'run', '--rm', *_sandbox_limit_args()]
+
     if _is_running_in_docker():
         docker_command.extend(['--volumes-from', SANDBOX_VOLUMES_FROM, '-w', str(workspace)])
     else:
@@ -134,38 +378,283 @@ def _build_docker_run_command(command: list[str], workspace: Path) -> list[str]:
             '-w',
             '/workspace',
         ])
+    docker_command.extend(_bundle_mount_args())
 
     docker_command.extend([SANDBOX_DOCKER_IMAGE, *command])
     return docker_command
 
-def _write_resources(workspace: Path, resources: Iterable[tuple[str, bytes]]):
-    """Создает файлы задания, сохраняя относительные подкаталоги"""
-    for filename, content in resources:
-        resource_path = Path(filename)
-        if resource_path.is_absolute() or ".." in resource_path.parts:
-            logger.warning("Skipping unsafe resource path: %s", filename)
-            continue
-        safe_parts = [part for part in resource_path.parts if part not in ("", ".")]
-        if not safe_parts:
-            continue
-        target = workspace.joinpath(*safe_parts)
-        target.parent.mkdir(parents=True, exist_ok=True)
-        target.write_bytes(content)
+
+def parse_memory_limit(limit: str) -> int:
+    """Переводит лимит памяти в формате docker CLI (512m, 1g) в байты"""
+    units = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
+    suffix = limit[-1].lower()
+    if suffix in units:
+        return int(float(limit[:-1]) * units[suffix])
+    return int(limit)
+
+
+def _build_container_config(command: list[str], workspace: Path) -> dict:
+    """Конфигурация POST /containers/create
+
+    Эквивалентна аргументам _build_docker_run_command.
+    """
+    host_config = {
+        "NetworkMode": "none",
+        "NanoCpus": int(float(SANDBOX_CPU_LIMIT) * 1_000_000_000),
+        "Memory": parse_memory_limit(SANDBOX_MEMORY_LIMIT),
+        "PidsLimit": int(SANDBOX_PIDS_LIMIT),
+        "CapDrop": ["ALL"],
+        "SecurityOpt": ["no-new-privileges"],
+    }
+    if _is_running_in_docker():
+        host_config["VolumesFrom"] = [SANDBOX_VOLUMES_FROM]
+        workdir = str(workspace)
+    else:
+        host_config["Mounts"] = [{
+            "Type": "bind",
+            "Source": _docker_mount_source(workspace),
+            "Target": "/workspace",
+        }]
+        workdir = "/workspace"
+    bundle_mount = _bundle_mount()
+    if bundle_mount is not None:
+        source, target = bundle_mount
+        host_config.setdefault("Mounts", []).append({
+            "Type": "bind",
+            "Source": source,
+            "Target": target,
+            "ReadOnly": True,
+        })
+    return {
+        "Image": SANDBOX_DOCKER_IMAGE,
+        "Cmd": command,
+        "User": SANDBOX_CONTAINER_USER,
+        "WorkingDir": workdir,
+        "NetworkDisabled": True,
+        "AttachStdout": True,
+        "AttachStderr": True,
+        "HostConfig": host_config,
+    }
+
+
+def _pool_slot(root: Path, name: str) -> Path:
+    return root / POOL_SLOTS_DIR / name
+
+
+def _pool_mounts() -> list[tuple[Path, str]]:
+    """Корни workspace'ов на хосте и точки их монтирования в контейнере"""
+    mounts = [(_workspace_root(), '/workspace')]
+    quota = get_tmpfs_quota()
+    if quota is not None:
+        mounts.append((quota.root, TMPFS_POOL_MOUNT_POINT))
+    return mounts
+
+
+def _build_pool_run_args(name: str) -> list[str]:
+    """Аргументы запуска долгоживущего контейнера для пула
+
+    Лимиты совпадают с одноразовым запуском. Вне Docker контейнер монтирует
+    не общий корень, а только свои каталоги (_pool_slot) на диске и в tmpfs:
+    workspace задачи создается в них, а задается при `docker exec`.
+    """
+    run_args = _sandbox_limit_args()
+    if _is_running_in_docker():
+        run_args.extend(['--volumes-from', SANDBOX_VOLUMES_FROM])
+    else:
+        for root, target in _pool_mounts():
+            slot = _pool_slot(root, name)
+            slot.mkdir(parents=True, exist_ok=True)
+            source = _docker_mount_source(slot)
+            run_args.extend([
+                '--mount',
+                f'type=bind,source={source},target={target}',
+            ])
+    run_args.extend(_bundle_mount_args())
+    run_args.extend([SANDBOX_DOCKER_IMAGE, 'sleep', 'infinity'])
+    return run_args
+
+
+def _remove_pool_slots(name: str):
+    if _is_running_in_docker():
+        return
+    for root, _ in _pool_mounts():
+        shutil.rmtree(_pool_slot(root, name), ignore_errors=True)
+
+
+_image_id: tuple[float, str | None] | None = None
+
+
+def _sandbox_image_id() -> str | None:
+    global _image_id
+    now = time.monotonic()
+    if (
+        _image_id is not None
+        and now - _image_id[0] < SANDBOX_IMAGE_ID_TTL_SECONDS
+    ):
+        return _image_id[1]
+    try:
+        if SANDBOX_DOCKER_BACKEND == API_BACKEND:
+            client = get_docker_client()
+            image_id = client.image_id(SANDBOX_DOCKER_IMAGE) or None
+        else:
+            result = subprocess.run(
+                [
+                    "docker", "image", "inspect",
+                    "--format", "{{.Id}}", SANDBOX_DOCKER_IMAGE,
+                ],
+                capture_output=True,
+                text=True,
+                timeout=10,
+                check=True,
+            )
+            image_id = result.stdout.strip() or None
+    except (
+        subprocess.SubprocessError,
+        OSError,
+        DockerApiError,
+        ValueError,
+        KeyError,
+    ) as e:
+        logger.warning("Не удалось получить id образа sandbox: %s", e)
+        image_id = None
+    _image_id = (now, image_id)
+    return image_id
+
+
+def sandbox_fingerprint() -> str | None:
+    """Версия окружения проверки: id образа sandbox и хэш логики проверки
+
+    Хэш покрывает grading_driver.py, поэтому меняется при пересборке
+    образа или изменении driver'а. None, если образ определить не удалось.
+    """
+    image_id = _sandbox_image_id()
+    if image_id is None:
+        return None
+    digest = hashlib.sha256()
+    digest.update(GRADING_DRIVER_PATH.read_bytes())
+    return f"{image_id}:{digest.hexdigest()}"
+
+
+_sandbox_pool: SandboxContainerPool | None = None
+
+
+def get_sandbox_pool(owner: str | None = None) -> SandboxContainerPool | None:
+    """Пул контейнеров, если он включен (SANDBOX_POOL_SIZE > 0)"""
+    global _sandbox_pool
+    if SANDBOX_POOL_SIZE <= 0:
+        return None
+    if _sandbox_pool is None:
+        kwargs = {"owner": owner} if owner else {}
+        _sandbox_pool = SandboxContainerPool(
+            _build_pool_run_args, on_destroy=_remove_pool_slots, **kwargs
+        )
+    return _sandbox_pool
+
+
+def sandbox_pool_stats() -> dict | None:
+    """Статистика пула, если он уже создан (сам пул не создается)"""
+    if _sandbox_pool is None:
+        return None
+    return _sandbox_pool.stats()
+
+
+def start_sandbox_pool(owner: str | None = None):
+    pool = get_sandbox_pool(owner)
+    if pool is not None:
+        pool.start()
+
+
+def shutdown_sandbox_pool():
+    if _sandbox_pool is not None:
+        _sandbox_pool.shutdown()
+
+def _run_via_engine_api(
+    command: list[str], workspace: Path, timeout_seconds: int
+):
+    """Одноразовый контейнер через Docker Engine API
+
+    Результат и ошибки совпадают с запуском через CLI: CompletedProcess
+    при успехе, CalledProcessError в __cause__ при ненулевом коде возврата.
+    По таймауту контейнер убивается, а не остается работать в фоне.
+    """
+    effective_timeout = timeout_seconds + SANDBOX_STARTUP_GRACE_SECONDS
+    config = _build_container_config(command, workspace)
+    try:
+        result = get_docker_client().run(config, effective_timeout)
+    except (OSError, DockerApiError, ValueError, KeyError) as e:
+        logger.error("Ошибка Docker Engine API при запуске sandbox: %s", e)
+        raise SandboxExecutionException from e
+
+    if result.timed_out:
+        outcome = "timeout"
+    elif result.oom_killed:
+        outcome = "oom"
+    else:
+        outcome = "ok" if result.exit_code == 0 else "error"
+    sandbox_container_seconds.observe(result.duration_seconds, outcome=outcome)
+    sandbox_container_phase_seconds.observe(
+        result.start_seconds, backend="api", phase="start"
+    )
+    sandbox_container_phase_seconds.observe(
+        result.duration_seconds, backend="api", phase="exec"
+    )
+    sandbox_container_phase_seconds.observe(
+        result.teardown_seconds, backend="api", phase="teardown"
+    )
+
+    if result.timed_out or result.oom_killed:
+        memory = result.stats.get("memory_stats", {})
+        logger.error(
+            "Sandbox остановлен: timeout=%s (%s s), oom_killed=%s, "
+            "memory=%s/%s. cmd=%s",
+            result.timed_out,
+            effective_timeout,
+            result.oom_killed,
+            memory.get("usage"),
+            memory.get("limit"),
+            command,
+        )
+        raise ResourceLimitExceededException
+    if result.exit_code != 0:
+        error = subprocess.CalledProcessError(
+            result.exit_code, command, result.stdout, result.stderr
+        )
+        logger.error(
+            "Контейнер sandbox завершился с кодом %s. stderr: %s",
+            result.exit_code,
+            result.stderr,
+        )
+        raise SandboxExecutionException from error
+    return subprocess.CompletedProcess(command, 0, result.stdout, result.stderr)
 
 
 def _run_in_container(command: list[str], workspace: Path, timeout_seconds: int):
     # Централизованный запуск и маппинг ошибок subprocess
-    # в доменные исключения приложения.
-    docker_command = _build_docker_run_command(command, workspace)
+    # в доменные исключения приложения. Контейнер пула выдается вместе
+    # с workspace (_workspace_context) и возвращается после него.
+    lease = _pool_leases.get(workspace)
+    container = lease.container if lease is not None else None
+    if container is None and SANDBOX_DOCKER_BACKEND == API_BACKEND:
+        return _run_via_engine_api(command, workspace, timeout_seconds)
+    if container is not None:
+        docker_command = SandboxContainerPool.exec_command(
+            container, command, lease.workdir
+        )
+    else:
+        docker_command = _build_docker_run_command(command, workspace)
     effective_timeout = timeout_seconds + SANDBOX_STARTUP_GRACE_SECONDS
+    healthy = False
+    started = time.monotonic()
     try:
-        return subprocess.run(
+        result = subprocess.run(
             docker_command,
             capture_output=True,
             text=True,
             timeout=effective_timeout,
             check=True,
         )
+        healthy = True
+        return result
     except subprocess.TimeoutExpired as e:
         logger.error(
             (
@@ -184,6 +673,203 @@ def _run_in_container(command: list[str], workspace: Path, timeout_seconds: int)
     except (subprocess.SubprocessError, FileNotFoundError) as e:
         logger.error("Ошибка выполнения в песочнице: %s", e)
         raise SandboxExecutionException from e
+    finally:
+        sandbox_container_phase_seconds.observe(
+            time.monotonic() - started,
+            backend="pool" if container is not None else "cli",
+            phase="exec" if container is not None else "run",
+        )
+        if lease is not None:
+            lease.healthy = healthy
+
+
+def _raise_for_kernel_failure(
+    e: SandboxExecutionException, syntax_on_error: bool
+):
+    """Уточняет причину падения контейнера по stderr и коду возврата"""
+    cause = e.__cause__
+    if isinstance(cause, subprocess.CalledProcessError):
+        stderr = (cause.stderr or "").lower()
+        if any(
+            marker in stderr
+            for marker in ("deadkernelerror", "kernel died", "killed")
+        ):
+            raise ResourceLimitExceededException from e
+        if syntax_on_error and cause.returncode == 1:
+            raise SyntaxException from e
+
+
+def _parse_result_payload(stdout: str) -> dict:
+    try:
+        return json.loads(stdout.strip().splitlines()[-1])
+    except (json.JSONDecodeError, IndexError) as e:
+        raise SandboxExecutionException from e
+
+
+def _number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _cell_metrics(payload: dict) -> dict:
+    """Замеры ячеек из результата driver'а
+
+    Берутся только известные поля; ячейки отсортированы от самой долгой,
+    их число ограничено SANDBOX_CELL_METRICS_MAX.
+    """
+    raw = payload.get("metrics")
+    if not isinstance(raw, dict):
+        raw = {}
+    cells = []
+    for entry in raw.get("cells") or []:
+        if (
+            not isinstance(entry, dict)
+            or entry.get("kind") not in CELL_METRIC_KINDS
+            or not isinstance(entry.get("index"), int)
+        ):
+            continue
+        cell = {"index": entry["index"], "kind": entry["kind"]}
+        for name, kind in CELL_METRIC_FIELDS.items():
+            if _number(entry.get(name)):
+                cell[name] = kind(entry[name])
+        if entry.get("timed_out") is True:
+            cell["timed_out"] = True
+        cells.append(cell)
+    cells.sort(key=lambda cell: cell.get("wall", 0.0), reverse=True)
+    startup = raw.get("kernel_startup_seconds")
+    return {
+        "kernel_startup_seconds": float(startup) if _number(startup) else None,
+        "cells": cells[:SANDBOX_CELL_METRICS_MAX],
+    }
+
+
+def _observe_cell_metrics(metrics: dict):
+    if metrics["kernel_startup_seconds"] is not None:
+        sandbox_kernel_startup_seconds.observe(metrics["kernel_startup_seconds"])
+    for cell in metrics["cells"]:
+        if "wall" in cell:
+            sandbox_cell_seconds.observe(cell["wall"], kind=cell["kind"])
+
+
+def _checkpoint_steps(payload: dict) -> list[dict]:
+    """Хэши шагов и результаты тестов из результата driver'а для чекпоинта
+
+    Пригодные записи идут подряд с начала; первая некорректная обрывает
+    список, и следующая проверка восстановит не дальше нее.
+    """
+    steps = []
+    for step in payload.get("steps") or []:
+        if not isinstance(step, dict) or not isinstance(step.get("hash"), str):
+            break
+        test = step.get("test")
+        if test is not None and not (
+            isinstance(test, dict)
+            and isinstance(test.get("passed"), bool)
+            and isinstance(test.get("points"), (int, float))
+        ):
+            break
+        steps.append(
+            {
+                "hash": step["hash"],
+                "test": None
+                if test is None
+                else {"points": test["points"], "passed": test["passed"]},
+            }
+        )
+    return steps
+
+
+def _run_grading_driver(
+    workspace: Path,
+    mode: str,
+    resources: list[tuple[str, bytes]],
+    timeout_seconds: int,
+    checkpoint_key: str | None,
+    progress: Callable[[dict], None] | None = None,
+    cell_metrics: Callable[[dict], None] | None = None,
+) -> dict:
+    """Запускает grading_driver.py в sandbox и возвращает его результат
+
+    С checkpoint_key (и включенной инкрементальной проверкой) в workspace
+    подкладывается чекпоинт прошлой проверки, а после успешного запуска
+    сохраняется обновленный.
+
+    progress получает события шагов проверки (см. sandbox_progress), пока
+    контейнер еще работает.
+
+    cell_metrics получает замеры ячеек (см. _cell_metrics) после успешной
+    проверки; при таймауте они только пишутся в лог.
+
+    timeout_seconds отсчитывает сам driver с момента готовности ядра;
+    контейнеру дополнительно дается SANDBOX_KERNEL_STARTUP_SECONDS на
+    запуск ядра и импорт предзагружаемых модулей.
+    """
+    incremental = checkpoint_key is not None and grading_checkpoints.enabled
+    store_key = f"{mode}/{checkpoint_key}"
+    trusted_steps = None
+    if incremental:
+        trusted_steps = grading_checkpoints.load(
+            store_key, workspace / CHECKPOINT_DIR
+        )
+    (workspace / GRADING_DRIVER_PATH.name).write_bytes(
+        GRADING_DRIVER_PATH.read_bytes()
+    )
+    (workspace / CONFIG_FILE).write_text(
+        json.dumps(
+            {
+                "mode": mode,
+                "incremental": incremental,
+                "trusted_steps": trusted_steps or [],
+                "resources_digest": resources_digest(resources),
+                "snapshot_min_seconds": SANDBOX_CHECKPOINT_MIN_STEP_SECONDS,
+                "snapshot_max_bytes": SANDBOX_CHECKPOINT_MAX_BYTES,
+                "max_snapshots": SANDBOX_CHECKPOINT_MAX_SNAPSHOTS,
+                "timeout_seconds": timeout_seconds,
+            }
+        )
+    )
+
+    tail = (
+        ProgressTail(workspace / PROGRESS_FILE, progress)
+        if progress is not None
+        else nullcontext()
+    )
+    with tail:
+        result = _run_in_container(
+            ["python", GRADING_DRIVER_PATH.name],
+            workspace,
+            timeout_seconds + SANDBOX_KERNEL_STARTUP_SECONDS,
+        )
+    payload = _parse_result_payload(result.stdout)
+    metrics = _cell_metrics(payload)
+    _observe_cell_metrics(metrics)
+    if payload.get("timed_out"):
+        logger.error(
+            "Notebook не уложился в %s секунд после готовности ядра "
+            "(запуск ядра %s с, самая долгая ячейка %s)",
+            timeout_seconds,
+            metrics["kernel_startup_seconds"],
+            metrics["cells"][0] if metrics["cells"] else None,
+        )
+        raise ResourceLimitExceededException
+
+    if incremental:
+        skipped_cells = payload.get("skipped_cells", 0)
+        grading_runs_total.inc(resumed=str(skipped_cells > 0).lower())
+        grading_skipped_cells_total.inc(skipped_cells)
+        logger.info(
+            "Инкрементальная проверка: пропущено ячеек %s", skipped_cells
+        )
+        try:
+            grading_checkpoints.save(
+                store_key,
+                workspace / CHECKPOINT_DIR,
+                _checkpoint_steps(payload),
+            )
+        except OSError as e:
+            logger.warning("Не удалось сохранить чекпоинт проверки: %s", e)
+    if cell_metrics is not None:
+        cell_metrics(metrics)
+    return payload
 
 
 class SandboxNotebookRunner:
@@ -192,38 +878,31 @@ class SandboxNotebookRunner:
         notebook_content: bytes,
         resources: list[tuple[str, bytes]],
         timeout_seconds: int,
+        notebook=None,
+        cell_metrics: Callable[[dict], None] | None = None,
     ) -> bytes:
         # Выполняем все ячейки notebook в изоляции и возвращаем уже исполненный
         # ipynb (с output'ами), который затем сохраняется как submission.
-        _scan_notebook_for_malicious_code(notebook_content)
-        with _workspace_context() as workspace:
+        _scan_notebook_for_malicious_code(notebook_content, notebook)
+        input_bytes = _workspace_input_bytes(
+            notebook_content, resources=resources
+        )
+        with _workspace_context(input_bytes) as workspace:
             (workspace / "submission.ipynb").write_bytes(notebook_content)
             _write_resources(workspace, resources)
 
-            script = (
-                "import nbformat\n"
-                "from nbclient import NotebookClient\n"
-                "from nbclient.exceptions import CellExecutionError\n"
-                "nb = nbformat.read('submission.ipynb', as_version=4)\n"
-                "client = NotebookClient(nb, kernel_name='python3')\n"
-                "try:\n"
-                "    client.execute()\n"
-                "except CellExecutionError as e:\n"
-                "    if 'AssertionError' not in str(e):\n"
-                "        raise\n"
-                "nbformat.write(nb, 'submission.ipynb')\n"
-            )
             try:
                 logger.info("Началась проверка блокнота")
-                _run_in_container(["python", "-c", script], workspace, timeout_seconds)
+                _run_grading_driver(
+                    workspace,
+                    EXECUTE,
+                    resources,
+                    timeout_seconds,
+                    None,
+                    cell_metrics=cell_metrics,
+                )
             except SandboxExecutionException as e:
-                cause = e.__cause__
-                if isinstance(cause, subprocess.CalledProcessError):
-                    stderr = (cause.stderr or "").lower()
-                    if "deadkernelerror" in stderr or "kernel died" in stderr or "killed" in stderr:
-                        raise ResourceLimitExceededException from e
-                    if cause.returncode == 1:
-                        raise SyntaxException from e
+                _raise_for_kernel_failure(e, syntax_on_error=True)
                 raise
             except ResourceLimitExceededException:
                 raise
@@ -235,65 +914,88 @@ class SandboxNotebookRunner:
     @staticmethod
     def grade_notebook(
         submission_content: bytes,
-        tutor_content: bytes,
+        grading_plan: bytes,
         resources: list[tuple[str, bytes]],
         timeout_seconds: int,
+        checkpoint_key: str | None = None,
+        notebook=None,
+        progress: Callable[[dict], None] | None = None,
+        cell_metrics: Callable[[dict], None] | None = None,
     ) -> tuple[int, list[int]]:
         # Оценка строится на подмене test-cell source:
-        # ячейка студента исполняется, затем тестовая часть берется из tutor.ipynb.
-        _scan_notebook_for_malicious_code(submission_content)
-        with _workspace_context() as workspace:
+        # ячейка студента исполняется, затем тест с тем же индексом
+        # берется из плана проверки задания (grading_plan.json).
+        _scan_notebook_for_malicious_code(submission_content, notebook)
+        input_bytes = _workspace_input_bytes(
+            submission_content, grading_plan, resources=resources
+        )
+        with _workspace_context(input_bytes) as workspace:
             (workspace / "submission.ipynb").write_bytes(submission_content)
-            (workspace / "tutor.ipynb").write_bytes(tutor_content)
+            (workspace / PLAN_FILE).write_bytes(grading_plan)
             _write_resources(workspace, resources)
 
-            script = (
-                "import json\n"
-                "import re\n"
-                "import nbformat\n"
-                "from nbclient import NotebookClient\n"
-                "from nbclient.exceptions import CellExecutionError\n"
-                "submission = nbformat.read('submission.ipynb', as_version=4)\n"
-                "tutor = nbformat.read('tutor.ipynb', as_version=4)\n"
-                "client = NotebookClient(submission, kernel_name='python3')\n"
-                "total_points = 0\n"
-                "feedback = []\n"
-                "with client.setup_kernel():\n"
-                "    for index, tutor_cell in enumerate(tutor.cells):\n"
-                "        if index < len(submission.cells):\n"
-                "            submission_cell = submission.cells[index]\n"
-                "            if submission_cell.cell_type == 'code':\n"
-                "                try:\n"
-                "                    client.execute_cell(submission_cell, cell_index=index, store_history=True)\n"
-                "                except CellExecutionError:\n"
-                "                    pass\n"
-                "        if tutor_cell.cell_type != 'code':\n"
-                "            continue\n"
-                "        if '# Tests ' in tutor_cell.source and ' points.' in tutor_cell.source:\n"
-                "            points = 0\n"
-                "            match = re.search(r'# Tests (\\d+) points', tutor_cell.source)\n"
-                "            if match:\n"
-                "                points = int(match.group(1))\n"
-                "            try:\n"
-                "                client.execute_cell(tutor_cell, index)\n"
-                "                total_points += points\n"
-                "            except CellExecutionError:\n"
-                "                feedback.append(index)\n"
-                "print(json.dumps({'total_points': total_points, 'feedback': feedback}))\n"
-            )
             try:
                 logger.info("Началась оценка блокнота")
-                result = _run_in_container(["python", "-c", script], workspace, timeout_seconds)
+                payload = _run_grading_driver(
+                    workspace,
+                    GRADE,
+                    resources,
+                    timeout_seconds,
+                    checkpoint_key,
+                    progress,
+                    cell_metrics,
+                )
             except SandboxExecutionException as e:
-                cause = e.__cause__
-                if isinstance(cause, subprocess.CalledProcessError):
-                    stderr = (cause.stderr or "").lower()
-                    if "deadkernelerror" in stderr or "kernel died" in stderr or "killed" in stderr:
-                        raise ResourceLimitExceededException from e
+                _raise_for_kernel_failure(e, syntax_on_error=False)
                 raise
-            try:
-                payload = json.loads(result.stdout.strip().splitlines()[-1])
-            except (json.JSONDecodeError, IndexError) as e:
-                raise SandboxExecutionException from e
 
             return payload["total_points"], payload["feedback"]
+
+    @staticmethod
+    def execute_and_grade_notebook(
+        submission_content: bytes,
+        grading_plan: bytes,
+        resources: list[tuple[str, bytes]],
+        timeout_seconds: int,
+        checkpoint_key: str | None = None,
+        notebook=None,
+        progress: Callable[[dict], None] | None = None,
+        cell_metrics: Callable[[dict], None] | None = None,
+    ) -> tuple[bytes, int, list[int]]:
+        # Один контейнер и одно ядро на отправку и проверку:
+        # ячейки студента исполняются с сохранением output'ов, а после каждой
+        # тестовой ячейки тут же запускается тест из плана проверки
+        # против того же состояния ядра.
+        _scan_notebook_for_malicious_code(submission_content, notebook)
+        input_bytes = _workspace_input_bytes(
+            submission_content, grading_plan, resources=resources
+        )
+        with _workspace_context(input_bytes) as workspace:
+            (workspace / "submission.ipynb").write_bytes(submission_content)
+            (workspace / PLAN_FILE).write_bytes(grading_plan)
+            _write_resources(workspace, resources)
+
+            try:
+                logger.info("Началось исполнение и оценка блокнота")
+                payload = _run_grading_driver(
+                    workspace,
+                    EXECUTE_AND_GRADE,
+                    resources,
+                    timeout_seconds,
+                    checkpoint_key,
+                    progress,
+                    cell_metrics,
+                )
+            except SandboxExecutionException as e:
+                _raise_for_kernel_failure(e, syntax_on_error=True)
+                raise
+            except ResourceLimitExceededException:
+                raise
+            except Exception as e:
+                raise SyntaxException from e
+
+            return (
+                (workspace / "submission.ipynb").read_bytes(),
+                payload["total_points"],
+                payload["feedback"],
+            )
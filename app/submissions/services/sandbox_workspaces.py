@@ -0,0 +1,86 @@
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Каталог на tmpfs для workspace'ов проверки; пустая строка - только диск.
+# Если сервер работает в контейнере, каталог должен быть томом, который
+# sandbox получает через --volumes-from (см. docker-compose.yaml)
+SANDBOX_WORKSPACE_TMPFS_DIR = os.getenv("SANDBOX_WORKSPACE_TMPFS_DIR", "")
+SANDBOX_WORKSPACE_TMPFS_MAX_BYTES = int(
+    os.getenv("SANDBOX_WORKSPACE_TMPFS_MAX_BYTES", str(64 * 1024 * 1024))
+)
+# Квота этого процесса на одновременные workspace'ы; 0 - размер файловой
+# системы, поэтому процессы с общим tmpfs должны делить его явно
+SANDBOX_WORKSPACE_TMPFS_TOTAL_BYTES = int(
+    os.getenv("SANDBOX_WORKSPACE_TMPFS_TOTAL_BYTES", "0")
+)
+# Исполненный notebook с output'ами пишется обратно в workspace,
+# поэтому место резервируется с запасом относительно входных файлов
+WORKSPACE_SIZE_FACTOR = 2
+
+
+def directory_size(path: Path) -> int:
+    """Размер файлов каталога без перехода по символьным ссылкам"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class TmpfsWorkspaceQuota:
+    """Учет места на tmpfs, занятого workspace'ами проверок
+
+    До создания workspace резервируется размер входных файлов
+    (notebook, план, ресурсы) с запасом WORKSPACE_SIZE_FACTOR. Если входные
+    файлы больше лимита одного запуска, квота исчерпана или на tmpfs
+    фактически меньше свободного места, reserve возвращает причину отказа,
+    и workspace создается на диске.
+
+    Квота рекомендательная: то, что код студента пишет во время запуска,
+    не ограничивается. Проверка свободного места уводит следующие запуски
+    на диск, когда tmpfs уже заполнен.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        max_run_bytes: int = SANDBOX_WORKSPACE_TMPFS_MAX_BYTES,
+        total_bytes: int = SANDBOX_WORKSPACE_TMPFS_TOTAL_BYTES,
+    ):
+        self.root = Path(root)
+        self.max_run_bytes = max_run_bytes
+        self.total_bytes = total_bytes
+        self.reserved = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, input_bytes: int) -> tuple[int, str | None]:
+        """Возвращает (зарезервировано байт, причина отказа или None)"""
+        if input_bytes > self.max_run_bytes:
+            return 0, "too_large"
+        size = input_bytes * WORKSPACE_SIZE_FACTOR
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            usage = shutil.disk_usage(self.root)
+        except OSError as e:
+            logger.warning("tmpfs для workspace недоступен: %s", e)
+            return 0, "unavailable"
+        capacity = self.total_bytes if self.total_bytes > 0 else usage.total
+        if usage.free < size:
+            return 0, "full"
+        with self._lock:
+            if self.reserved + size > capacity:
+                return 0, "quota"
+            self.reserved += size
+        return size, None
+
+    def release(self, size: int):
+        with self._lock:
+            self.reserved = max(0, self.reserved - size)
@@ -1,10 +1,16 @@
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy import asc, bindparam, desc, func, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import desc, select, func, asc, or_
+from sqlalchemy.orm import joinedload, selectinload
+
 from app.assignment.models import Assignments
-from app.service.base import BaseDAO
-from app.submissions.models import Submissions, SubmissionFiles, SubmissionAttempt
 from app.db import async_session_maker
+from app.service.base import BaseDAO
+from app.submissions.models import (
+    JupyterServerBinding,
+    SubmissionAttempt,
+    SubmissionFiles,
+    Submissions,
+)
 from app.user.models import Users
 
 
@@ -120,6 +126,58 @@ class SubmissionsDAO(BaseDAO):
         result = await session.execute(stmt)
         return result.scalar()
 
+    @classmethod
+    async def user_ids_with_files(
+        cls, session: AsyncSession, assignment_id
+    ) -> list[int]:
+        """Студенты, у которых по заданию сохранен файл решения"""
+        stmt = (
+            select(Submissions.user_id)
+            .join(
+                SubmissionFiles, SubmissionFiles.submission_id == Submissions.id
+            )
+            .where(Submissions.assignment_id == assignment_id)
+            .distinct()
+        )
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+    @classmethod
+    async def bulk_update_scores(
+        cls, session: AsyncSession, scores: list[dict]
+    ):
+        """Записывает баллы многих решений одним executemany
+
+        Элементы scores - словари с ключами id, score, feedback
+        и number_of_attempts. Балл записывается, только если число попыток
+        не изменилось: иначе студент уже сдал и проверил новое решение.
+        """
+        if not scores:
+            return
+        table = Submissions.__table__
+        stmt = (
+            update(table)
+            .where(
+                table.c.id == bindparam("b_id"),
+                table.c.number_of_attempts == bindparam("b_attempts"),
+            )
+            .values(
+                score=bindparam("b_score"), feedback=bindparam("b_feedback")
+            )
+        )
+        await session.execute(
+            stmt,
+            [
+                {
+                    "b_id": item["id"],
+                    "b_attempts": item["number_of_attempts"],
+                    "b_score": item["score"],
+                    "b_feedback": item["feedback"],
+                }
+                for item in scores
+            ],
+        )
+
 
 
 class SubmissionFilesDAO(BaseDAO):
@@ -166,3 +224,34 @@ class SubmissionAttemptsDAO(BaseDAO):
         )
         result = await session.execute(stmt)
         return result.scalar_one_or_none()
+
+    @classmethod
+    async def find_cell_metrics(
+        cls,
+        session: AsyncSession,
+        assignment_id: str,
+        limit: int,
+    ) -> list[dict]:
+        """Замеры ячеек последних попыток по заданию"""
+        stmt = (
+            select(SubmissionAttempt.cell_metrics)
+            .where(
+                SubmissionAttempt.assignment_id == assignment_id,
+                SubmissionAttempt.cell_metrics.is_not(None),
+            )
+            .order_by(desc(SubmissionAttempt.created_at))
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+
+class JupyterServerBindingDAO(BaseDAO):
+    model = JupyterServerBinding
+
+    @classmethod
+    async def bound_usernames(cls, session: AsyncSession) -> set[str]:
+        result = await session.execute(
+            select(JupyterServerBinding.hub_username)
+        )
+        return set(result.scalars().all())
@@ -1,24 +1,55 @@
-import logging
 import asyncio
+import hashlib
+import json
+import logging
+
 import nbformat
 
 from app.assignment.schemas import TypeOfAssignmentFile
 from app.assignment.services.dao_service import AssignmentDAO, AssignmentFileDAO
-from app.dropbox.service import dropbox_service
+from app.assignment.services.notebook_service import (
+    GRADING_PLAN_VERSION,
+)
+from app.assignment.services.notebook_service import (
+    NotebookService as AssignmentNotebookService,
+)
+from app.config import settings
 from app.exceptions import (
     AssignmentNotFoundException,
     DecodingIPYNBException,
+    EndedAttemptsException,
     IncorrectFormatAssignmentException,
     SolutionNotFoundException,
 )
+from app.grading.scheduler import assignment_due_at, get_sandbox_scheduler
+from app.grading.service import GradingResultCacheDAO
 from app.logger import configure_logging
+from app.metrics import registry
+from app.storage.fetch import fetch_files
+from app.storage.service import get_storage
 from app.submissions.services.notebook_service import NotebookService
-from app.submissions.services.sandbox_runner import SandboxNotebookRunner
-from app.submissions.services.service import SubmissionFilesDAO, SubmissionsDAO, SubmissionAttemptsDAO
+from app.submissions.services.sandbox_runner import (
+    SandboxNotebookRunner,
+    sandbox_fingerprint,
+)
+from app.submissions.services.service import (
+    SubmissionAttemptsDAO,
+    SubmissionFilesDAO,
+    SubmissionsDAO,
+)
 
 logger = logging.getLogger(__name__)
 configure_logging()
 
+# Ключ session.info: фиксировать транзакцию перед запуском sandbox
+RELEASE_SESSION_FOR_SANDBOX = "release_for_sandbox"
+
+grading_result_cache_total = registry.counter(
+    "grading_result_cache_total",
+    "Обращения к кэшу результатов проверки",
+    ("result",),
+)
+
 
 class SubmissionManagerService:
 
@@ -31,80 +62,164 @@ class SubmissionManagerService:
         """
         return await asyncio.to_thread(func, *args, **kwargs)
 
-
     @staticmethod
-    async def process_and_upload_submission(
-        session,
-        assignment_id: str,
-        submission_file,
-        user_id: int,
-        user_email: str,
+    async def _run_sandbox(
+        session, assignment, user_id: int, func, *args, **kwargs
     ):
-        filename = submission_file.filename or "submission.ipynb"
-        if not filename.lower().endswith(".ipynb"):
-            raise IncorrectFormatAssignmentException
-        submission_bytes = await submission_file.read()
-        # Делегируем в bytes-вариант, чтобы upload-файл и embedded-ветка
-        # проходили один и тот же pipeline исполнения/сохранения.
-        return await SubmissionManagerService.process_and_upload_submission_bytes(
-            session=session,
-            assignment_id=assignment_id,
-            submission_bytes=submission_bytes,
+        """Запускает sandbox через общую очередь процесса
+
+        Число одновременных контейнеров ограничено, а порядок учитывает
+        дедлайн задания и число уже запущенных проверок студента.
+
+        Если в session.info стоит RELEASE_SESSION_FOR_SANDBOX (сессия без
+        session.begin()), транзакция фиксируется до запуска: соединение с БД
+        не держится, пока контейнер работает, а результат пишется уже в
+        новой транзакции.
+        """
+        if session.info.get(RELEASE_SESSION_FOR_SANDBOX):
+            await session.commit()
+        return await get_sandbox_scheduler().run(
+            func,
+            *args,
             user_id=user_id,
-            user_email=user_email,
+            due_at=assignment_due_at(assignment),
+            **kwargs,
         )
 
     @staticmethod
-    async def process_and_upload_submission_bytes(
-        session,
-        assignment_id: str,
-        submission_bytes: bytes,
-        user_id: int,
-        user_email: str,
-    ):
-        # 1) Проверяем доступность задания по датам и получаем его настройки.
-        assignment = await NotebookService.check_date_submission(session, assignment_id)
+    def _read_notebook(content: bytes):
+        """Разбирает и валидирует notebook студента
 
-        # 2) Проверяем, что payload действительно декодируется как notebook.
+        Это единственный разбор на хосте: дальше notebook передается
+        байтами, а разобранный объект нужен только для проверки кода ячеек.
+        """
         try:
-            notebook = nbformat.reads(submission_bytes.decode("utf-8"), as_version=4)
+            return nbformat.reads(content.decode("utf-8"), as_version=4)
         except Exception as e:
             raise DecodingIPYNBException from e
 
-        # 3) Загружаем ресурсные файлы задания, которые нужны в sandbox.
-        assignment_resources = await AssignmentFileDAO.find_all(
+    @staticmethod
+    def _resource_name(file_id: str) -> str:
+        return file_id.split("_resource_", 1)[-1].split("_", 1)[-1]
+
+    @staticmethod
+    async def _find_resource_files(session, assignment_id: str):
+        return await AssignmentFileDAO.find_all(
             session=session,
             assignment_id=assignment_id,
             file_type=TypeOfAssignmentFile.RESOURCE,
         )
-        resources = [
-            (
-                resource.file_id.split("_resource_", 1)[-1].split("_", 1)[-1],
-                await SubmissionManagerService._run_blocking(
-                    dropbox_service.download_file, resource.file_id
-                ),
+
+    @staticmethod
+    async def _load_resources(
+        session, assignment_id: str
+    ) -> list[tuple[str, bytes]]:
+        """Загружает ресурсные файлы задания, которые нужны в sandbox"""
+        assignment_resources = (
+            await SubmissionManagerService._find_resource_files(
+                session, assignment_id
             )
-            for resource in assignment_resources
+        )
+        contents = await fetch_files(
+            [resource.file_id for resource in assignment_resources]
+        )
+        return [
+            (SubmissionManagerService._resource_name(resource.file_id), content)
+            for resource, content in zip(assignment_resources, contents)
         ]
 
-        # 4) Выполняем notebook в изолированном Docker-контейнере.
-        notebook_bytes = nbformat.writes(notebook).encode("utf-8")
-        executed_notebook = nbformat.reads(
-            (
-                await SubmissionManagerService._run_blocking(
-                    SandboxNotebookRunner.execute_notebook,
-                    notebook_bytes,
-                    resources,
-                    timeout_seconds=assignment.execution_timeout_seconds,
-                )
-            ).decode("utf-8"),
-            as_version=4,
+    @staticmethod
+    async def _load_grading_files(
+        session, assignment
+    ) -> tuple[bytes, list[tuple[str, bytes]]]:
+        """Возвращает план проверки задания (JSON) и ресурсные файлы
+
+        План хранится вместе с заданием, поэтому notebook преподавателя
+        скачивается только для заданий без плана или с планом старой версии
+        (GRADING_PLAN_VERSION) - построенный по нему план сохраняется для
+        следующих проверок.
+        Файлы скачиваются параллельно с общим дедлайном.
+        """
+        assignment_resources = (
+            await SubmissionManagerService._find_resource_files(
+                session, assignment.id
+            )
         )
+        file_ids = [resource.file_id for resource in assignment_resources]
 
-        # 5) Ищем существующую submission-запись студента для assignment.
-        submission = await SubmissionsDAO.find_one_or_none(
-            session=session, user_id=user_id, assignment_id=assignment_id
+        grading_plan = assignment.grading_plan
+        if (
+            not isinstance(grading_plan, dict)
+            or grading_plan.get("version") != GRADING_PLAN_VERSION
+        ):
+            assignment_file = await AssignmentFileDAO.find_one_or_none(
+                session=session,
+                assignment_id=assignment.id,
+                file_type=TypeOfAssignmentFile.ORIGINAL,
+            )
+            if assignment_file is None:
+                raise AssignmentNotFoundException
+            assignment_content, *contents = await fetch_files(
+                [assignment_file.file_id] + file_ids
+            )
+            grading_plan = await SubmissionManagerService._run_blocking(
+                AssignmentNotebookService.build_grading_plan, assignment_content
+            )
+            await AssignmentDAO.update(
+                session=session,
+                model_id=assignment.id,
+                grading_plan=grading_plan,
+            )
+        else:
+            contents = await fetch_files(file_ids)
+
+        resources = [
+            (SubmissionManagerService._resource_name(resource.file_id), content)
+            for resource, content in zip(assignment_resources, contents)
+        ]
+        plan_bytes = json.dumps(grading_plan, sort_keys=True).encode("utf-8")
+        return plan_bytes, resources
+
+    @staticmethod
+    async def _grading_cache_key(
+        submission_content: bytes,
+        grading_plan: bytes,
+        resources: list[tuple[str, bytes]],
+        timeout_seconds: int,
+    ) -> str | None:
+        """Ключ кэша результатов или None, если кэш использовать нельзя"""
+        if not settings.GRADING_RESULT_CACHE_ENABLED:
+            return None
+        fingerprint = await SubmissionManagerService._run_blocking(
+            sandbox_fingerprint
         )
+        if fingerprint is None:
+            return None
+        digest = hashlib.sha256()
+        for part in (
+            fingerprint.encode(),
+            str(timeout_seconds).encode(),
+            hashlib.sha256(submission_content).digest(),
+            hashlib.sha256(grading_plan).digest(),
+        ):
+            digest.update(part + b"\0")
+        for filename, content in sorted(resources):
+            digest.update(filename.encode() + b"\0")
+            digest.update(hashlib.sha256(content).digest())
+        return digest.hexdigest()
+
+    @staticmethod
+    async def _save_submission_file(
+        session,
+        assignment_id: str,
+        submission_notebook: bytes,
+        user_id: int,
+        submission=None,
+    ):
+        """Сохраняет исполненный notebook и делает upsert submission-записей
+
+        Возвращает id решения и результат загрузки (путь и ссылку на файл).
+        """
         if submission is None:
             submission_id = await SubmissionsDAO.add(
                 session=session,
@@ -116,16 +231,13 @@ class SubmissionManagerService:
         else:
             submission_id = submission.id
 
-        # 6) Сохраняем уже исполненный notebook в хранилище submissions.
-        submission_notebook = nbformat.writes(executed_notebook).encode("utf-8")
         upload_info = await SubmissionManagerService._run_blocking(
-            dropbox_service.upload_file,
+            get_storage().upload_file,
             submission_notebook,
             filename=f"{user_id}_{assignment_id}.ipynb",
             folder_type="submissions",
         )
 
-        # 7) Upsert записи о файле решения (SubmissionFiles).
         sub_file = await SubmissionFilesDAO.find_one_or_none(
             session=session, submission_id=submission_id
         )
@@ -144,6 +256,125 @@ class SubmissionManagerService:
                 file_id=upload_info["path"],
                 file_link=upload_info["link"],
             )
+        return submission_id, upload_info
+
+    @staticmethod
+    async def _record_attempt(
+        session,
+        assignment_id: str,
+        submission_id,
+        user_id: int,
+        previous_attempts: int,
+        total_points: int,
+        feedback: list[int],
+        file_id: str,
+        file_link: str,
+        cell_metrics: dict | None = None,
+    ):
+        """Фиксирует результат проверки и историю попыток"""
+        next_attempt_number = previous_attempts + 1
+        await SubmissionsDAO.update(
+            session=session,
+            model_id=submission_id,
+            score=total_points,
+            number_of_attempts=next_attempt_number,
+            feedback=feedback,
+        )
+        await SubmissionAttemptsDAO.add(
+            session=session,
+            submission_id=submission_id,
+            assignment_id=assignment_id,
+            user_id=user_id,
+            attempt_number=next_attempt_number,
+            score=total_points,
+            feedback=feedback,
+            file_id=file_id,
+            file_link=file_link,
+            cell_metrics=cell_metrics,
+        )
+
+
+    @staticmethod
+    async def read_submission_upload(submission_file) -> bytes:
+        """Проверяет расширение загруженного файла и возвращает содержимое"""
+        filename = submission_file.filename or "submission.ipynb"
+        if not filename.lower().endswith(".ipynb"):
+            raise IncorrectFormatAssignmentException
+        return await submission_file.read()
+
+    @staticmethod
+    async def process_and_upload_submission(
+        session,
+        assignment_id: str,
+        submission_file,
+        user_id: int,
+        user_email: str,
+    ):
+        submission_bytes = (
+            await SubmissionManagerService.read_submission_upload(
+                submission_file
+            )
+        )
+        # Делегируем в bytes-вариант, чтобы upload-файл и embedded-ветка
+        # проходили один и тот же pipeline исполнения/сохранения.
+        return await SubmissionManagerService.process_and_upload_submission_bytes(
+            session=session,
+            assignment_id=assignment_id,
+            submission_bytes=submission_bytes,
+            user_id=user_id,
+            user_email=user_email,
+        )
+
+    @staticmethod
+    async def process_and_upload_submission_bytes(
+        session,
+        assignment_id: str,
+        submission_bytes: bytes,
+        user_id: int,
+        user_email: str,
+    ):
+        # 1) Проверяем доступность задания по датам и получаем его настройки.
+        assignment = await NotebookService.check_date_submission(session, assignment_id)
+
+        # 2) Проверяем, что payload действительно декодируется как notebook.
+        notebook = await SubmissionManagerService._run_blocking(
+            SubmissionManagerService._read_notebook, submission_bytes
+        )
+
+        # 3) Загружаем ресурсные файлы задания, которые нужны в sandbox.
+        resources = await SubmissionManagerService._load_resources(
+            session, assignment_id
+        )
+
+        # 4) Выполняем notebook в изолированном Docker-контейнере.
+        # В контейнер уходят исходные байты, исполненный notebook
+        # сохраняется в том виде, в каком его записал контейнер.
+        submission_notebook = await SubmissionManagerService._run_sandbox(
+            session,
+            assignment,
+            user_id,
+            SandboxNotebookRunner.execute_notebook,
+            submission_bytes,
+            resources,
+            timeout_seconds=assignment.execution_timeout_seconds,
+            notebook=notebook,
+        )
+
+        # 5) Ищем существующую submission-запись студента для assignment.
+        submission = await SubmissionsDAO.find_one_or_none(
+            session=session, user_id=user_id, assignment_id=assignment_id
+        )
+
+        # 6) Сохраняем уже исполненный notebook и upsert SubmissionFiles.
+        submission_id, upload_info = (
+            await SubmissionManagerService._save_submission_file(
+                session=session,
+                assignment_id=assignment_id,
+                submission_notebook=submission_notebook,
+                user_id=user_id,
+                submission=submission,
+            )
+        )
 
         logger.info(
             "User %s uploaded submission for assignment %s (%s)",
@@ -153,9 +384,85 @@ class SubmissionManagerService:
         )
         return submission_id
 
+    @staticmethod
+    async def _grade_submission_file(
+        session,
+        assignment_id: str,
+        user_id: int,
+        file_id: str,
+        progress=None,
+        cell_metrics=None,
+    ) -> tuple[int, list[int]]:
+        """Оценивает сохраненный notebook студента тестами преподавателя
+
+        progress (если передан) получает события ячеек из sandbox,
+        cell_metrics - замеры ячеек; при ответе из кэша он не вызывается.
+        """
+        # Загружаем и валидируем notebook студента.
+        file_content = await SubmissionManagerService._run_blocking(
+            get_storage().download_file,
+            file_id,
+        )
+        notebook = await SubmissionManagerService._run_blocking(
+            SubmissionManagerService._read_notebook, file_content
+        )
+
+        # Берем план проверки задания (тесты преподавателя с hidden-частью)
+        # и ресурсные файлы, доступные при запуске тестов.
+        assignment = await AssignmentDAO.find_one_or_none(session=session, id=assignment_id)
+        if assignment is None:
+            raise AssignmentNotFoundException
+        load_grading_files = SubmissionManagerService._load_grading_files
+        grading_plan, resources = await load_grading_files(session, assignment)
+
+        # Запускаем sandbox grading (подмена test-cell на tutor tests).
+        # Для байт-в-байт тех же входов результат берется из кэша без запуска
+        # контейнера.
+        cache_key = await SubmissionManagerService._grading_cache_key(
+            file_content,
+            grading_plan,
+            resources,
+            assignment.execution_timeout_seconds,
+        )
+        if cache_key is not None:
+            cached = await GradingResultCacheDAO.get(
+                session, cache_key, settings.GRADING_RESULT_CACHE_TTL_SECONDS
+            )
+            grading_result_cache_total.inc(result="hit" if cached else "miss")
+            if cached is not None:
+                return cached.total_points, list(cached.feedback)
+
+        total_points, feedback = await SubmissionManagerService._run_sandbox(
+            session,
+            assignment,
+            user_id,
+            SandboxNotebookRunner.grade_notebook,
+            file_content,
+            grading_plan,
+            resources,
+            timeout_seconds=assignment.execution_timeout_seconds,
+            checkpoint_key=f"{assignment_id}/{user_id}",
+            notebook=notebook,
+            progress=progress,
+            cell_metrics=cell_metrics,
+        )
+        if cache_key is not None:
+            await GradingResultCacheDAO.put(
+                session,
+                cache_key,
+                total_points,
+                feedback,
+                settings.GRADING_RESULT_CACHE_TTL_SECONDS,
+            )
+        return total_points, feedback
+
     @staticmethod
     async def evaluate_submission(
-        session, assignment_id: str, user_email: str, submission_service
+        session,
+        assignment_id: str,
+        user_email: str,
+        submission_service,
+        progress=None,
     ):
         # 1) Получаем сохраненный файл решения студента.
         submission_file = await SubmissionFilesDAO.find_one_or_none(
@@ -164,85 +471,161 @@ class SubmissionManagerService:
         if not submission_file or not submission_service:
             raise SolutionNotFoundException
 
-        # 2) Загружаем и валидируем notebook студента.
-        file_content = await SubmissionManagerService._run_blocking(
-            dropbox_service.download_file,
+        # 2) Оцениваем его в sandbox (или берем результат из кэша -
+        # попытка при этом все равно засчитывается, но без замеров ячеек).
+        cell_metrics = {}
+        grade = SubmissionManagerService._grade_submission_file
+        total_points, feedback = await grade(
+            session,
+            assignment_id,
+            submission_service.user_id,
             submission_file.file_id,
+            progress=progress,
+            cell_metrics=cell_metrics.update,
         )
-        try:
-            nbformat.reads(file_content.decode("utf-8"), as_version=4)
-        except Exception as e:
-            raise DecodingIPYNBException from e
 
-        # 3) Загружаем оригинальный notebook преподавателя для hidden-тестов.
-        assignment_file = await AssignmentFileDAO.find_one_or_none(
+        # 3) Фиксируем результат: баллы, число попыток, индексы упавших тестов,
+        # и сохраняем историю попыток со ссылкой на файл решения.
+        await SubmissionManagerService._record_attempt(
             session=session,
             assignment_id=assignment_id,
-            file_type=TypeOfAssignmentFile.ORIGINAL,
+            submission_id=submission_service.id,
+            user_id=submission_service.user_id,
+            previous_attempts=submission_service.number_of_attempts,
+            total_points=total_points,
+            feedback=feedback,
+            file_id=submission_file.file_id,
+            file_link=submission_file.file_link,
+            cell_metrics=cell_metrics or None,
         )
-        assignment = await AssignmentDAO.find_one_or_none(session=session, id=assignment_id)
-        if assignment is None or assignment_file is None:
-            raise AssignmentNotFoundException
 
-        assignment_content = await SubmissionManagerService._run_blocking(
-            dropbox_service.download_file,
-            assignment_file.file_id,
+        logger.info(
+            "User %s evaluated submission for assignment %s",
+            user_email,
+            assignment_id,
         )
-        try:
-            nbformat.reads(assignment_content.decode("utf-8"), as_version=4)
-        except Exception as e:
-            raise DecodingIPYNBException from e
+        return (total_points, feedback)
 
-        # 4) Подтягиваем ресурсные файлы, доступные при запуске тестов.
-        assignment_resources = await AssignmentFileDAO.find_all(
-            session=session,
-            assignment_id=assignment_id,
-            file_type=TypeOfAssignmentFile.RESOURCE,
+    @staticmethod
+    async def regrade_submission(
+        session, assignment_id: str, user_id: int
+    ) -> dict:
+        """Перепроверяет последнее решение студента для массовой перепроверки
+
+        Попытка не засчитывается и баллы не записываются: результат
+        возвращается и применяется ко всем решениям задания разом. Число
+        попыток в результате защищает от записи баллов поверх нового решения.
+        """
+        submission = await SubmissionsDAO.find_one_or_none(
+            session=session, user_id=user_id, assignment_id=assignment_id
         )
-        resources = [
-            (
-                resource.file_id.split("_resource_", 1)[-1].split("_", 1)[-1],
-                await SubmissionManagerService._run_blocking(
-                    dropbox_service.download_file, resource.file_id
-                ),
-            )
-            for resource in assignment_resources
-        ]
+        if submission is None:
+            raise SolutionNotFoundException
+        submission_file = await SubmissionFilesDAO.find_one_or_none(
+            session=session, submission_id=submission.id
+        )
+        if submission_file is None:
+            raise SolutionNotFoundException
 
-        # 5) Запускаем sandbox grading (подмена test-cell на tutor tests).
-        total_points, feedback = await SubmissionManagerService._run_blocking(
-            SandboxNotebookRunner.grade_notebook,
-            file_content,
-            assignment_content,
-            resources,
-            timeout_seconds=assignment.execution_timeout_seconds,
+        grade = SubmissionManagerService._grade_submission_file
+        total_points, feedback = await grade(
+            session, assignment_id, user_id, submission_file.file_id
         )
+        return {
+            "submission_id": str(submission.id),
+            "number_of_attempts": submission.number_of_attempts,
+            "score": total_points,
+            "feedback": feedback,
+        }
 
-        # 6) Фиксируем результат: баллы, число попыток, индексы упавших тестов.
-        next_attempt_number = submission_service.number_of_attempts + 1
-        await SubmissionsDAO.update(
-            session=session,
-            model_id=submission_service.id,
-            score=total_points,
-            number_of_attempts=next_attempt_number,
-            feedback=feedback,
+    @staticmethod
+    async def process_and_evaluate_submission_bytes(
+        session,
+        assignment_id: str,
+        submission_bytes: bytes,
+        user_id: int,
+        user_email: str,
+        progress=None,
+    ):
+        """Сохраняет и оценивает решение за один запуск sandbox
+
+        В отличие от последовательного вызова
+        process_and_upload_submission_bytes и evaluate_submission, notebook
+        исполняется один раз: тесты
+        преподавателя запускаются в том же ядре сразу после ячеек студента.
+        """
+        # 1) Проверяем доступность задания по датам и получаем его настройки.
+        assignment = await NotebookService.check_date_submission(
+            session, assignment_id
         )
 
-        # 7) Сохраняем историю попыток с метаданными и ссылкой на файл решения.
-        await SubmissionAttemptsDAO.add(
+        # 2) Проверяем, что payload действительно декодируется как notebook.
+        notebook = await SubmissionManagerService._run_blocking(
+            SubmissionManagerService._read_notebook, submission_bytes
+        )
+
+        # 3) Проверяем попытки до запуска контейнера, а не после.
+        submission = await SubmissionsDAO.find_one_or_none(
+            session=session, user_id=user_id, assignment_id=assignment_id
+        )
+        if (
+            submission is not None
+            and submission.number_of_attempts == assignment.number_of_attempts
+        ):
+            raise EndedAttemptsException
+
+        # 4) Загружаем план проверки задания и ресурсные файлы.
+        load_grading_files = SubmissionManagerService._load_grading_files
+        grading_plan, resources = await load_grading_files(session, assignment)
+
+        # 5) Исполняем и оцениваем notebook в одном контейнере.
+        cell_metrics = {}
+        submission_notebook, total_points, feedback = (
+            await SubmissionManagerService._run_sandbox(
+                session,
+                assignment,
+                user_id,
+                SandboxNotebookRunner.execute_and_grade_notebook,
+                submission_bytes,
+                grading_plan,
+                resources,
+                timeout_seconds=assignment.execution_timeout_seconds,
+                checkpoint_key=f"{assignment_id}/{user_id}",
+                notebook=notebook,
+                progress=progress,
+                cell_metrics=cell_metrics.update,
+            )
+        )
+
+        # 6) Сохраняем исполненный notebook и upsert SubmissionFiles.
+        submission_id, upload_info = (
+            await SubmissionManagerService._save_submission_file(
+                session=session,
+                assignment_id=assignment_id,
+                submission_notebook=submission_notebook,
+                user_id=user_id,
+                submission=submission,
+            )
+        )
+
+        # 7) Фиксируем результат и историю попыток.
+        await SubmissionManagerService._record_attempt(
             session=session,
-            submission_id=submission_service.id,
             assignment_id=assignment_id,
-            user_id=submission_service.user_id,
-            attempt_number=next_attempt_number,
-            score=total_points,
+            submission_id=submission_id,
+            user_id=user_id,
+            previous_attempts=(
+                submission.number_of_attempts if submission else 0
+            ),
+            total_points=total_points,
             feedback=feedback,
-            file_id=submission_file.file_id,
-            file_link=submission_file.file_link,
+            file_id=upload_info["path"],
+            file_link=upload_info["link"],
+            cell_metrics=cell_metrics or None,
         )
 
         logger.info(
-            "User %s evaluated submission for assignment %s",
+            "User %s submitted and evaluated notebook for assignment %s",
             user_email,
             assignment_id,
         )
@@ -6,10 +6,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth.dependencies import get_current_user
 from app.db import get_db_session
 from app.exceptions import RateLimitExceededException
+from app.grading.queue_service import GradingQueueService
+from app.grading.scheduler import get_sandbox_scheduler
 from app.submissions.services.service import SubmissionAttemptsDAO
 from app.user.models import Users
 
-
 EVALUATE_COOLDOWN_SECONDS = 10
 
 
@@ -28,3 +29,17 @@ async def enforce_submission_evaluate_rate_limit(
 
     if datetime.utcnow() < last_attempt_at + timedelta(seconds=EVALUATE_COOLDOWN_SECONDS):
         raise RateLimitExceededException
+
+
+async def enforce_sandbox_admission():
+    """Не принимает проверку без очереди в БД, если sandbox перегружены
+
+    Запрос учитывается как принятый до конца обработки, в том числе пока
+    он загружает файлы и еще не встал в очередь sandbox. С очередью в БД
+    проверки ждут воркеров, и ограничивать прием не нужно.
+    """
+    if GradingQueueService.is_enabled():
+        yield
+        return
+    with get_sandbox_scheduler().admission():
+        yield
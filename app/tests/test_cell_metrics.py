@@ -0,0 +1,65 @@
+from app.grading.cell_metrics import summarize_cell_metrics
+from app.submissions.services import sandbox_runner
+from app.submissions.services.sandbox_runner import _cell_metrics
+
+
+def test_cell_metrics_keep_known_fields_and_slowest_cells(monkeypatch):
+    monkeypatch.setattr(sandbox_runner, "SANDBOX_CELL_METRICS_MAX", 2)
+    payload = {
+        "metrics": {
+            "kernel_startup_seconds": 0.4,
+            "cells": [
+                {"index": 0, "kind": "cell", "wall": 0.1, "cpu": 0.1},
+                {"index": 1, "kind": "cell", "wall": 3, "note": "x" * 100},
+                {"index": 2, "kind": "test", "wall": 1.5, "peak_rss": True},
+                {"index": "3", "kind": "cell", "wall": 10},
+                {"index": 4, "kind": "other", "wall": 10},
+            ],
+        }
+    }
+
+    assert _cell_metrics(payload) == {
+        "kernel_startup_seconds": 0.4,
+        "cells": [
+            {"index": 1, "kind": "cell", "wall": 3.0},
+            {"index": 2, "kind": "test", "wall": 1.5},
+        ],
+    }
+    assert _cell_metrics({"metrics": "broken"}) == {
+        "kernel_startup_seconds": None,
+        "cells": [],
+    }
+
+
+def test_summary_orders_cells_by_max_wall():
+    attempts = [
+        {
+            "kernel_startup_seconds": 1.0,
+            "cells": [
+                {"index": 0, "kind": "cell", "wall": 2.0, "peak_rss": 100},
+                {"index": 1, "kind": "test", "wall": 0.5},
+            ],
+        },
+        {
+            "kernel_startup_seconds": 3.0,
+            "cells": [
+                {"index": 0, "kind": "cell", "wall": 4.0, "peak_rss": 50},
+                {"index": 1, "kind": "test", "wall": 6.0, "output_bytes": 10},
+            ],
+        },
+    ]
+
+    summary = summarize_cell_metrics(attempts, limit=10)
+
+    assert summary["attempts"] == 2
+    assert summary["max_total_seconds"] == 10.0
+    assert summary["avg_kernel_startup_seconds"] == 2.0
+    assert [(c["index"], c["kind"]) for c in summary["cells"]] == [
+        (1, "test"),
+        (0, "cell"),
+    ]
+    slowest_cell = summary["cells"][1]
+    assert slowest_cell["avg_wall_seconds"] == 3.0
+    assert slowest_cell["max_peak_rss_bytes"] == 100
+    assert summary["cells"][0]["max_cpu_seconds"] is None
+    assert summarize_cell_metrics(attempts, limit=1)["cells"][0]["index"] == 1
@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import socketserver
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse
+
+import pytest
+
+from app.exceptions import (
+    ResourceLimitExceededException,
+    SandboxExecutionException,
+)
+from app.submissions.services import sandbox_runner
+from app.submissions.services.docker_api import (
+    DockerApiError,
+    DockerEngineClient,
+)
+
+
+def _frame(stream: int, data: bytes) -> bytes:
+    return bytes([stream, 0, 0, 0]) + len(data).to_bytes(4, "big") + data
+
+
+class _FakeEngine:
+    """Состояние фейкового демона Docker, общее для всех соединений"""
+
+    def __init__(self):
+        self.requests: list[tuple[str, str]] = []
+        self.connections = 0
+        self.created: list[dict] = []
+        self.removed: list[str] = []
+        self.killed = threading.Event()
+        self.exit_code = 0
+        self.oom_killed = False
+        self.hang = False
+        self.image_missing = False
+        self.stdout = b'{"score": 1}\n'
+        self.stderr = b""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.engine.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, payload=b""):
+        if isinstance(payload, dict):
+            payload = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self):
+        engine = self.server.engine
+        path = urlparse(self.path).path
+        engine.requests.append((self.command, path))
+        parts = path.split("/")[2:]
+        if parts == ["containers", "create"]:
+            length = int(self.headers.get("Content-Length", 0))
+            engine.created.append(json.loads(self.rfile.read(length)))
+            return self._reply(201, {"Id": "c1"})
+        if parts[:1] == ["images"]:
+            if engine.image_missing:
+                return self._reply(404, {"message": "No such image"})
+            return self._reply(200, {"Id": "sha256:image"})
+        action = parts[2] if len(parts) > 2 else None
+        if self.command == "DELETE":
+            engine.removed.append(parts[1])
+            return self._reply(204)
+        if action == "start":
+            return self._reply(204)
+        if action == "wait":
+            if engine.hang:
+                engine.killed.wait(5)
+                return None
+            return self._reply(200, {"StatusCode": engine.exit_code})
+        if action == "kill":
+            engine.killed.set()
+            return self._reply(204)
+        if action == "stats":
+            return self._reply(
+                200, {"memory_stats": {"usage": 10, "limit": 20}}
+            )
+        if action == "logs":
+            return self._reply(
+                200, _frame(1, engine.stdout) + _frame(2, engine.stderr)
+            )
+        if action == "json":
+            exit_code = 137 if engine.hang else engine.exit_code
+            return self._reply(
+                200,
+                {
+                    "State": {
+                        "ExitCode": exit_code,
+                        "OOMKilled": engine.oom_killed,
+                    }
+                },
+            )
+        return self._reply(404, {"message": "not found"})
+
+    do_GET = do_POST = do_DELETE = _route
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@pytest.fixture
+def engine():
+    directory = tempfile.mkdtemp()
+    socket_path = os.path.join(directory, "docker.sock")
+    fake = _FakeEngine()
+    server = _Server(socket_path, _Handler)
+    server.engine = fake
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.client = DockerEngineClient(socket_path, timeout=5)
+    yield fake
+    fake.client.close()
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(directory)
+
+
+def test_run_reuses_connection_and_removes_container(engine):
+    engine.stderr = b"warning\n"
+
+    result = engine.client.run({"Image": "img"}, timeout_seconds=5)
+
+    assert result.exit_code == 0
+    assert result.stdout == '{"score": 1}\n'
+    assert result.stderr == "warning\n"
+    assert not result.timed_out and not result.oom_killed
+    assert engine.removed == ["c1"]
+    assert engine.connections == 1
+    assert [method for method, _ in engine.requests] == [
+        "POST", "POST", "POST", "GET", "GET", "DELETE"
+    ]
+
+
+def test_run_kills_container_on_deadline(engine):
+    engine.hang = True
+
+    result = engine.client.run({"Image": "img"}, timeout_seconds=0.2)
+
+    assert result.timed_out
+    assert engine.killed.is_set()
+    assert engine.removed == ["c1"]
+    assert result.stats["memory_stats"]["usage"] == 10
+
+
+def test_client_raises_docker_error_on_unexpected_status(engine):
+    assert engine.client.image_id("autograder-ipynb:latest") == "sha256:image"
+    engine.image_missing = True
+
+    with pytest.raises(DockerApiError) as error:
+        engine.client.image_id("autograder-ipynb:latest")
+
+    assert error.value.status == 404
+    assert error.value.message == "No such image"
+
+
+@pytest.fixture
+def api_backend(engine, monkeypatch):
+    monkeypatch.setattr(sandbox_runner, "SANDBOX_DOCKER_BACKEND", "api")
+    monkeypatch.setattr(sandbox_runner, "get_sandbox_pool", lambda: None)
+    monkeypatch.setattr(
+        sandbox_runner, "get_docker_client", lambda: engine.client
+    )
+    monkeypatch.setattr(sandbox_runner, "_is_running_in_docker", lambda: False)
+
+    def no_cli(*args, **kwargs):
+        raise AssertionError("docker CLI не должен вызываться")
+
+    monkeypatch.setattr(sandbox_runner.subprocess, "run", no_cli)
+    return engine
+
+
+def test_run_in_container_uses_engine_api(api_backend, tmp_path):
+    result = sandbox_runner._run_in_container(
+        ["python", "driver.py"], tmp_path, 5
+    )
+
+    assert result.returncode == 0
+    assert result.stdout == '{"score": 1}\n'
+    config = api_backend.created[0]
+    assert config["Cmd"] == ["python", "driver.py"]
+    assert config["HostConfig"]["Memory"] == 1024**3
+    assert config["HostConfig"]["NanoCpus"] == 1_000_000_000
+    assert config["HostConfig"]["NetworkMode"] == "none"
+    mount = config["HostConfig"]["Mounts"][0]
+    assert mount["Source"] == str(Path(tmp_path).resolve())
+
+
+def test_run_in_container_maps_oom_to_resource_limit(api_backend, tmp_path):
+    api_backend.exit_code = 137
+    api_backend.oom_killed = True
+
+    with pytest.raises(ResourceLimitExceededException):
+        sandbox_runner._run_in_container(["python", "driver.py"], tmp_path, 5)
+
+
+def test_run_in_container_keeps_cli_error_contract(api_backend, tmp_path):
+    api_backend.exit_code = 1
+    api_backend.stderr = b"SyntaxError: invalid syntax\n"
+
+    with pytest.raises(SandboxExecutionException) as error:
+        sandbox_runner._run_in_container(["python", "driver.py"], tmp_path, 5)
+
+    cause = error.value.__cause__
+    assert isinstance(cause, subprocess.CalledProcessError)
+    assert cause.returncode == 1
+    assert "SyntaxError" in cause.stderr
@@ -1,7 +1,14 @@
+import httpx
 import pytest
 
-from app.exceptions import EmbeddedEditorDisabledException
-from app.submissions.services.embedded_notebook_service import EmbeddedNotebookService
+from app.exceptions import (
+    EmbeddedEditorDisabledException,
+    NotebookEditorUnavailableException,
+)
+from app.submissions.services import embedded_notebook_service as module
+from app.submissions.services.embedded_notebook_service import (
+    EmbeddedNotebookService,
+)
 
 
 def test_embedded_notebook_service_paths():
@@ -23,3 +30,56 @@ def test_embedded_notebook_service_disabled_flag(monkeypatch):
     )
     with pytest.raises(EmbeddedEditorDisabledException):
         EmbeddedNotebookService.ensure_enabled()
+
+
+@pytest.mark.asyncio
+async def test_jupyterhub_client_reuses_shared_http_client(monkeypatch):
+    requests = []
+
+    def _handler(request):
+        requests.append((request.method, request.url.path))
+        if request.method == "GET":
+            return httpx.Response(404)
+        return httpx.Response(201)
+
+    monkeypatch.setattr(
+        module.settings, "JUPYTERHUB_ADMIN_TOKEN", "admin-token"
+    )
+    monkeypatch.setattr(
+        module,
+        "_http_client",
+        httpx.AsyncClient(transport=httpx.MockTransport(_handler)),
+    )
+    shared = module.get_jupyterhub_http_client()
+    before = module.JUPYTERHUB_REQUEST_DURATION.snapshot(
+        endpoint="hub.user", method="POST", status=201
+    )["count"]
+
+    await module.JupyterHubClient().ensure_user("student@example.com")
+
+    assert module.get_jupyterhub_http_client() is shared
+    assert [method for method, _ in requests] == ["GET", "POST"]
+    after = module.JUPYTERHUB_REQUEST_DURATION.snapshot(
+        endpoint="hub.user", method="POST", status=201
+    )["count"]
+    assert after == before + 1
+    await module.close_jupyterhub_http_client()
+
+
+@pytest.mark.asyncio
+async def test_jupyterhub_transport_error_is_domain_error(monkeypatch):
+    def _handler(request):
+        raise httpx.ConnectError("hub is down", request=request)
+
+    monkeypatch.setattr(
+        module.settings, "JUPYTERHUB_ADMIN_TOKEN", "admin-token"
+    )
+    monkeypatch.setattr(
+        module,
+        "_http_client",
+        httpx.AsyncClient(transport=httpx.MockTransport(_handler)),
+    )
+
+    with pytest.raises(NotebookEditorUnavailableException):
+        await module.JupyterHubClient().ensure_user("student@example.com")
+    await module.close_jupyterhub_http_client()
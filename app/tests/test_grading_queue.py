@@ -0,0 +1,255 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.exceptions import SyntaxException
+from app.grading import queue_service as module
+from app.grading import regrade_service, service
+from app.grading.queue_service import GradingQueueService
+from app.grading.regrade_service import RegradeService
+from app.grading.schemas import (
+    GradingJobKind,
+    GradingJobStatus,
+    RegradeRunStatus,
+)
+from app.submissions.services.service import SubmissionsDAO
+from app.user.models import Users  # noqa: F401 - нужен мапперу Assignments
+
+
+class _FakeSession:
+    def __init__(self):
+        self.info = {}
+
+    async def commit(self):
+        pass
+
+    def begin(self):
+        @asynccontextmanager
+        async def _transaction():
+            yield self
+
+        return _transaction()
+
+
+@asynccontextmanager
+async def _fake_session_maker():
+    yield _FakeSession()
+
+
+@pytest.mark.asyncio
+async def test_enqueue_reuses_pending_job(monkeypatch):
+    pending = SimpleNamespace(id="job-1", status=GradingJobStatus.RUNNING)
+
+    async def _find_pending(*args, **kwargs):
+        return pending
+
+    async def _add(*args, **kwargs):
+        raise AssertionError("duplicate job must not be created")
+
+    monkeypatch.setattr(module.GradingJobDAO, "find_pending", _find_pending)
+    monkeypatch.setattr(module.GradingJobDAO, "add", _add)
+
+    job_id = await GradingQueueService.enqueue(
+        session=None,
+        kind=GradingJobKind.EVALUATE,
+        current_user=SimpleNamespace(id=1, email="student@example.com"),
+        assignment_id="assignment-id",
+    )
+
+    assert job_id == "job-1"
+
+
+@pytest.mark.asyncio
+async def test_enqueue_with_content_skips_running_job(monkeypatch):
+    queued = SimpleNamespace(id="job-1", status=GradingJobStatus.QUEUED)
+    calls = []
+
+    async def _find_pending(*args, statuses, **kwargs):
+        calls.append(statuses)
+        return queued if len(calls) == 1 else None
+
+    async def _update(session, model_id, **values):
+        calls.append((model_id, values))
+
+    async def _add(*args, **kwargs):
+        return "job-2"
+
+    monkeypatch.setattr(module.GradingJobDAO, "find_pending", _find_pending)
+    monkeypatch.setattr(module.GradingJobDAO, "update", _update)
+    monkeypatch.setattr(module.GradingJobDAO, "add", _add)
+    enqueue = dict(
+        session=None,
+        kind=GradingJobKind.SUBMIT,
+        current_user=SimpleNamespace(id=1, email="student@example.com"),
+        assignment_id="assignment-id",
+    )
+
+    assert await GradingQueueService.enqueue(
+        submission_content=b"v2", **enqueue
+    ) == "job-1"
+    assert await GradingQueueService.enqueue(
+        submission_content=b"v3", **enqueue
+    ) == "job-2"
+    assert calls == [
+        (GradingJobStatus.QUEUED,),
+        ("job-1", {"submission_content": b"v2"}),
+        (GradingJobStatus.QUEUED,),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_process_next_records_domain_error(monkeypatch):
+    job = SimpleNamespace(
+        id="job-1",
+        kind=GradingJobKind.EVALUATE,
+        user_id=1,
+        assignment_id="assignment-id",
+        attempts=1,
+        regrade_run_id=None,
+    )
+    finished = {}
+
+    async def _claim(*args, **kwargs):
+        return job
+
+    async def _user(*args, **kwargs):
+        return SimpleNamespace(id=1, email="student@example.com")
+
+    async def _execute(*args, **kwargs):
+        raise SyntaxException
+
+    async def _finish(session, job_id, status, **kwargs):
+        finished.update(job_id=job_id, status=status, **kwargs)
+
+    monkeypatch.setattr(module, "async_session_maker", _fake_session_maker)
+    monkeypatch.setattr(module.GradingJobDAO, "claim_next", _claim)
+    monkeypatch.setattr(module.GradingJobDAO, "finish", _finish)
+    monkeypatch.setattr(module.UsersDAO, "find_one_or_none", _user)
+    monkeypatch.setattr(GradingQueueService, "_execute", _execute)
+
+    assert await GradingQueueService.process_next("worker-1") is True
+    assert finished["status"] == GradingJobStatus.FAILED
+    assert finished["error_status_code"] == SyntaxException.status_code
+
+
+@pytest.mark.asyncio
+async def test_regrade_writes_scores_once_all_jobs_finished(monkeypatch):
+    finished_run = SimpleNamespace(
+        id="run-1", status=RegradeRunStatus.RUNNING, finished_at=None
+    )
+    pending_run = SimpleNamespace(
+        id="run-2", status=RegradeRunStatus.RUNNING, finished_at=None
+    )
+    counts = {
+        "run-1": {GradingJobStatus.DONE: 1, GradingJobStatus.FAILED: 1},
+        "run-2": {GradingJobStatus.DONE: 1, GradingJobStatus.QUEUED: 1},
+    }
+    submission_id = "6f1c3c7e-0a6b-4c55-9a43-3b2d7a1f0c11"
+    updates = []
+
+    async def _lock_running(session, run_id=None):
+        return [finished_run, pending_run]
+
+    async def _job_counts(session, run_id):
+        return counts[run_id]
+
+    async def _finished_jobs(session, run_id):
+        result = {
+            "submission_id": submission_id,
+            "number_of_attempts": 2,
+            "score": 9,
+            "feedback": [4],
+        }
+        return [SimpleNamespace(result=result)]
+
+    async def _bulk_update(session, scores):
+        updates.append(scores)
+
+    monkeypatch.setattr(
+        regrade_service, "async_session_maker", _fake_session_maker
+    )
+    monkeypatch.setattr(
+        regrade_service.RegradeRunDAO, "lock_running", _lock_running
+    )
+    monkeypatch.setattr(
+        regrade_service.RegradeRunDAO, "job_counts", _job_counts
+    )
+    monkeypatch.setattr(
+        regrade_service.RegradeRunDAO, "finished_jobs", _finished_jobs
+    )
+    monkeypatch.setattr(
+        regrade_service.SubmissionsDAO, "bulk_update_scores", _bulk_update
+    )
+
+    assert await RegradeService.complete_finished() == 1
+    assert finished_run.status == RegradeRunStatus.DONE
+    assert pending_run.status == RegradeRunStatus.RUNNING
+    assert len(updates) == 1
+    assert updates[0][0]["score"] == 9
+    assert updates[0][0]["number_of_attempts"] == 2
+    assert str(updates[0][0]["id"]) == submission_id
+
+
+class _RecordingSession:
+    """Запоминает запросы и отдает заранее заданные результаты"""
+
+    def __init__(self, *results):
+        self.statements = []
+        self._results = list(results)
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        self.params = params
+        return self._results.pop(0)
+
+
+def _sql(stmt) -> str:
+    from sqlalchemy.dialects import postgresql
+
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_claim_orders_candidates_by_urgency_before_limit():
+    session = _RecordingSession(SimpleNamespace(all=lambda: []))
+
+    job = await service.GradingJobDAO.claim_next(session, "worker-1", 60)
+
+    assert job is None
+    sql = _sql(session.statements[0])
+    order_by = sql[sql.index("ORDER BY") : sql.index("LIMIT")]
+    urgency = order_by.index("CASE WHEN")
+    assert order_by.index("grading_job.priority") < urgency
+    assert urgency < order_by.index("grading_job.created_at")
+
+
+@pytest.mark.asyncio
+async def test_queue_position_counts_jobs_ahead():
+    session = _RecordingSession(
+        SimpleNamespace(one_or_none=lambda: (0, 1, None, None)),
+        SimpleNamespace(scalar_one=lambda: 3),
+    )
+    job = SimpleNamespace(id="job-1", status=GradingJobStatus.QUEUED)
+
+    assert await service.GradingJobDAO.queue_position(session, job) == 4
+    assert "count(*)" in _sql(session.statements[1])
+    assert await service.GradingJobDAO.queue_position(
+        session, SimpleNamespace(id="job-2", status=GradingJobStatus.RUNNING)
+    ) is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_scores_skips_resubmitted():
+    session = _RecordingSession(None)
+    scores = [
+        {"id": "s-1", "number_of_attempts": 2, "score": 9, "feedback": []}
+    ]
+
+    await SubmissionsDAO.bulk_update_scores(session, scores)
+
+    (stmt,) = session.statements
+    assert "submission.number_of_attempts = %(b_attempts)s" in _sql(stmt)
+    assert session.params == [
+        {"b_id": "s-1", "b_attempts": 2, "b_score": 9, "b_feedback": []}
+    ]
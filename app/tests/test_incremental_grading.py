@@ -0,0 +1,266 @@
+import json
+import subprocess
+import sys
+
+import nbformat
+import pytest
+
+from app.assignment.services.notebook_service import NotebookService
+from app.exceptions import ResourceLimitExceededException
+from app.submissions.services import sandbox_runner
+from app.submissions.services.grading_checkpoints import GradingCheckpointStore
+from app.submissions.services.sandbox_runner import SandboxNotebookRunner
+
+pytest.importorskip("ipykernel")
+
+
+def _notebook_bytes(*sources: str) -> bytes:
+    notebook = nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell(source) for source in sources]
+    )
+    return nbformat.writes(notebook).encode("utf-8")
+
+
+TUTOR_PLAN = json.dumps(
+    NotebookService.build_grading_plan(
+        _notebook_bytes(
+            "data = list(range(10))",
+            "answer = None",
+            "# Tests 5 points.\nassert answer == 45",
+        )
+    )
+).encode("utf-8")
+
+
+@pytest.fixture
+def local_sandbox(monkeypatch, tmp_path):
+    """Запускает driver локально вместо Docker и запоминает его результаты"""
+    payloads = []
+
+    def _run_locally(command, workspace, timeout_seconds):
+        result = subprocess.run(
+            [sys.executable, *command[1:]],
+            cwd=workspace,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            check=True,
+        )
+        payloads.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        return result
+
+    store = GradingCheckpointStore(tmp_path / "checkpoints", enabled=True)
+    monkeypatch.setattr(sandbox_runner, "_run_in_container", _run_locally)
+    monkeypatch.setattr(sandbox_runner, "grading_checkpoints", store)
+    monkeypatch.setattr(
+        sandbox_runner, "SANDBOX_CHECKPOINT_MIN_STEP_SECONDS", 0
+    )
+    return store, payloads
+
+
+def test_grade_resumes_from_unchanged_prefix(local_sandbox):
+    _, payloads = local_sandbox
+    first = _notebook_bytes("data = list(range(10))", "answer = sum(data)", "")
+    changed = _notebook_bytes(
+        "data = list(range(10))", "answer = sum(data) + 1", ""
+    )
+
+    assert SandboxNotebookRunner.grade_notebook(
+        first, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    ) == (5, [])
+    assert SandboxNotebookRunner.grade_notebook(
+        changed, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    ) == (0, [2])
+    assert SandboxNotebookRunner.grade_notebook(
+        changed, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    ) == (0, [2])
+
+    # Первый прогон полный, второй пропускает загрузку данных,
+    # третий берет из чекпоинта все ячейки, включая тест
+    assert [payload["skipped_cells"] for payload in payloads] == [0, 1, 4]
+
+
+def test_broken_snapshot_falls_back_to_full_run(local_sandbox):
+    store, payloads = local_sandbox
+    submission = _notebook_bytes(
+        "data = list(range(10))", "answer = sum(data)", ""
+    )
+
+    SandboxNotebookRunner.grade_notebook(
+        submission, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    )
+    for snapshot in store.root.rglob("ns-*.pkl"):
+        snapshot.write_bytes(b"broken")
+
+    assert SandboxNotebookRunner.grade_notebook(
+        submission, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    ) == (5, [])
+    assert payloads[-1]["skipped_cells"] == 0
+
+
+def test_execute_and_grade_restores_cached_outputs(local_sandbox):
+    _, payloads = local_sandbox
+    submission = _notebook_bytes(
+        "data = list(range(10))\nprint('loaded')", "answer = sum(data)", ""
+    )
+
+    SandboxNotebookRunner.execute_and_grade_notebook(
+        submission, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    )
+    executed, total_points, feedback = (
+        SandboxNotebookRunner.execute_and_grade_notebook(
+            submission, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+        )
+    )
+
+    notebook = nbformat.reads(executed.decode("utf-8"), as_version=4)
+    assert (total_points, feedback) == (5, [])
+    assert payloads[-1]["skipped_cells"] == 4
+    assert notebook.cells[0].outputs[0]["text"] == "loaded\n"
+    assert notebook.cells[0].execution_count == 1
+
+
+def test_plan_modules_are_preloaded_outside_student_namespace(local_sandbox):
+    plan = json.dumps(
+        NotebookService.build_grading_plan(
+            _notebook_bytes(
+                "import colorsys",
+                "answer = None",
+                "# Tests 5 points.\nassert answer == 45",
+            )
+        )
+    ).encode("utf-8")
+    submission = _notebook_bytes(
+        "import sys\nprint('colorsys' in sys.modules, 'colorsys' in dir())",
+        "answer = 45",
+        "",
+    )
+
+    execute = SandboxNotebookRunner.execute_and_grade_notebook
+    executed, total_points, _ = execute(submission, plan, [], 30)
+
+    notebook = nbformat.reads(executed.decode("utf-8"), as_version=4)
+    assert total_points == 5
+    assert notebook.cells[0].outputs[0]["text"] == "True False\n"
+
+
+def test_timeout_counts_from_kernel_ready(local_sandbox, monkeypatch):
+    monkeypatch.setattr(sandbox_runner, "SANDBOX_KERNEL_STARTUP_SECONDS", 30)
+    submission = _notebook_bytes(
+        "import time\ntime.sleep(30)", "answer = 45", ""
+    )
+
+    with pytest.raises(ResourceLimitExceededException):
+        SandboxNotebookRunner.grade_notebook(submission, TUTOR_PLAN, [], 1)
+
+
+def test_driver_reports_cell_progress(local_sandbox):
+    events = []
+    submission = _notebook_bytes(
+        "data = list(range(10))", "answer = sum(data)", ""
+    )
+
+    assert SandboxNotebookRunner.grade_notebook(
+        submission, TUTOR_PLAN, [], 30, progress=events.append
+    ) == (5, [])
+
+    assert [(e["event"], e["index"]) for e in events] == [
+        ("started", 0),
+        ("finished", 0),
+        ("started", 1),
+        ("finished", 1),
+        ("started", 2),
+        ("finished", 2),
+    ]
+    assert events[-1]["points"] == events[-1]["max_points"] == 5
+    assert all(e["elapsed"] >= 0 for e in events if e["event"] == "finished")
+
+
+def test_driver_measures_cells(local_sandbox):
+    _, payloads = local_sandbox
+    received = []
+    submission = _notebook_bytes(
+        "data = list(range(10))", "answer = sum(data)\nprint('x' * 1000)", ""
+    )
+
+    SandboxNotebookRunner.grade_notebook(
+        submission, TUTOR_PLAN, [], 30, cell_metrics=received.append
+    )
+
+    (metrics,) = received
+    assert metrics["kernel_startup_seconds"] > 0
+    assert sorted((c["index"], c["kind"]) for c in metrics["cells"]) == [
+        (0, "cell"),
+        (1, "cell"),
+        (2, "cell"),
+        (2, "test"),
+    ]
+    walls = [cell["wall"] for cell in metrics["cells"]]
+    assert walls == sorted(walls, reverse=True)
+    printed = next(c for c in metrics["cells"] if c["index"] == 1)
+    assert printed["output_bytes"] > 1000
+    assert all(c["peak_rss"] > 0 and c["cpu"] >= 0 for c in metrics["cells"])
+    assert payloads[-1]["metrics"]["cells"]
+
+
+def test_execute_notebook_runs_driver_without_plan(local_sandbox):
+    received = []
+    submission = _notebook_bytes("print('hello')", "x = 1")
+
+    executed = SandboxNotebookRunner.execute_notebook(
+        submission, [], 30, cell_metrics=received.append
+    )
+
+    notebook = nbformat.reads(executed.decode("utf-8"), as_version=4)
+    assert notebook.cells[0].outputs[0]["text"] == "hello\n"
+    assert [c["kind"] for c in received[0]["cells"]] == ["cell", "cell"]
+
+
+def test_checkpoint_with_symlink_is_not_saved(tmp_path):
+    store = GradingCheckpointStore(tmp_path / "checkpoints", enabled=True)
+    secret = tmp_path / "secret.env"
+    secret.write_text("TOKEN=1")
+    source = tmp_path / "workspace" / "checkpoint"
+    source.mkdir(parents=True)
+    (source / "state.json").write_text("{}")
+    (source / "leak").symlink_to(secret)
+
+    store.save("a/1", source, [])
+
+    assert not store.root.exists() or not any(store.root.iterdir())
+
+
+def test_checkpoint_with_symlink_is_not_loaded(tmp_path):
+    store = GradingCheckpointStore(tmp_path / "checkpoints", enabled=True)
+    source = tmp_path / "workspace" / "checkpoint"
+    source.mkdir(parents=True)
+    (source / "state.json").write_text("{}")
+    store.save("a/1", source, [])
+    secret = tmp_path / "secret.env"
+    secret.write_text("TOKEN=1")
+    (entry,) = store.root.iterdir()
+    (entry / "checkpoint" / "leak").symlink_to(secret)
+    target = tmp_path / "next" / "checkpoint"
+
+    assert store.load("a/1", target) is None
+    assert not target.exists()
+
+
+def test_restored_points_ignore_forged_state(local_sandbox):
+    store, payloads = local_sandbox
+    submission = _notebook_bytes("data = list(range(10))", "answer = 0", "")
+
+    assert SandboxNotebookRunner.grade_notebook(
+        submission, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    ) == (0, [2])
+    (state_path,) = store.root.rglob("state.json")
+    state = json.loads(state_path.read_text())
+    for step in state["steps"]:
+        if step["test"] is not None:
+            step["test"] = {"points": 100, "passed": True}
+    state_path.write_text(json.dumps(state))
+
+    assert SandboxNotebookRunner.grade_notebook(
+        submission, TUTOR_PLAN, [], 30, checkpoint_key="a/1"
+    ) == (0, [2])
+    assert payloads[-1]["skipped_cells"] == 4
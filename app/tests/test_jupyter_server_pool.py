@@ -0,0 +1,186 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.submissions.services import jupyter_server_pool as module
+from app.submissions.services.jupyter_server_pool import (
+    POOL_SERVER_NAME,
+    JupyterServerPool,
+)
+
+
+class _FakeHub:
+    def __init__(self):
+        self.users: dict[str, dict] = {}
+        self.shares: list[tuple[str, str]] = []
+        self.stopped: list[tuple[str, str]] = []
+        self.active_spawns = 0
+        self.peak_spawns = 0
+
+    async def ensure_user(self, username):
+        self.users.setdefault(username, {"name": username, "servers": {}})
+
+    async def start_server(self, username, server_name):
+        self.active_spawns += 1
+        self.peak_spawns = max(self.peak_spawns, self.active_spawns)
+        self.users[username]["servers"][server_name] = {
+            "ready": False,
+            "pending": "spawn",
+        }
+
+    async def wait_server_ready(
+        self, username, server_name, timeout_seconds=20
+    ):
+        await asyncio.sleep(0.01)
+        self.users[username]["servers"][server_name] = {"ready": True}
+        self.active_spawns -= 1
+
+    async def server_status(self, username, server_name):
+        return self.users.get(username, {}).get("servers", {}).get(server_name)
+
+    async def stop_server(self, username, server_name):
+        self.stopped.append((username, server_name))
+        self.users.get(username, {}).get("servers", {}).pop(server_name, None)
+
+    async def delete_user(self, username):
+        self.users.pop(username, None)
+
+    async def list_users(self):
+        return list(self.users.values())
+
+    async def share_server(self, owner, server_name, username):
+        self.shares.append((owner, username))
+
+
+class _FakeSession:
+    @asynccontextmanager
+    async def begin_nested(self):
+        yield self
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self
+
+
+@pytest.fixture
+def bindings(monkeypatch):
+    rows: dict[str, dict] = {}
+
+    async def _add(session, **data):
+        rows[data["hub_username"]] = data
+
+    async def _find_one_or_none(session, **filter_by):
+        return None
+
+    async def _delete(session, **filter_by):
+        rows.pop(filter_by.get("hub_username"), None)
+
+    async def _bound_usernames(session):
+        return set(rows)
+
+    @asynccontextmanager
+    async def _session_maker():
+        yield _FakeSession()
+
+    dao = module.JupyterServerBindingDAO
+    monkeypatch.setattr(dao, "add", _add)
+    monkeypatch.setattr(dao, "find_one_or_none", _find_one_or_none)
+    monkeypatch.setattr(dao, "delete", _delete)
+    monkeypatch.setattr(dao, "bound_usernames", _bound_usernames)
+    monkeypatch.setattr(module, "async_session_maker", _session_maker)
+    return rows
+
+
+def _pool(**kwargs):
+    defaults = dict(
+        size=3,
+        user_prefix="pool-",
+        spawn_concurrency=2,
+        spawn_timeout=5,
+        maintain_interval=60,
+        idle_cull_seconds=600,
+    )
+    defaults.update(kwargs)
+    return JupyterServerPool(**defaults)
+
+
+async def _drain(pool):
+    await asyncio.gather(*list(pool._spawn_tasks))
+
+
+@pytest.mark.asyncio
+async def test_refill_spawns_up_to_size_with_limited_concurrency(bindings):
+    hub = _FakeHub()
+    pool = _pool()
+
+    await pool.maintain(hub)
+    await _drain(pool)
+
+    assert pool.stats()["warm"] == 3
+    assert hub.peak_spawns <= 2
+    # Повторный проход не запускает лишних серверов
+    await pool.maintain(hub)
+    assert not pool._spawn_tasks
+    assert len(hub.users) == 3
+
+
+@pytest.mark.asyncio
+async def test_claim_binds_warm_server_and_shares_it(bindings):
+    hub = _FakeHub()
+    pool = _pool(size=1)
+    await pool.maintain(hub)
+    await _drain(pool)
+
+    server = await pool.claim(
+        _FakeSession(), 1, "assignment-id", "student@example.com", hub
+    )
+
+    assert server is not None
+    pool_user, server_name = server
+    assert server_name == POOL_SERVER_NAME
+    assert bindings[pool_user]["user_id"] == 1
+    assert hub.shares == [(pool_user, "student@example.com")]
+    assert await pool.claim(
+        _FakeSession(), 2, "assignment-id", "other@example.com", hub
+    ) is None
+    assert pool.stats()["claim_misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cull_stops_idle_servers_but_keeps_warm_reserve(bindings):
+    hub = _FakeHub()
+    pool = _pool(size=0)
+    stale = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+    fresh = datetime.now(timezone.utc).isoformat()
+    hub.users = {
+        "pool-warm": {
+            "name": "pool-warm",
+            "servers": {
+                POOL_SERVER_NAME: {"ready": True, "last_activity": stale}
+            },
+        },
+        "pool-used": {
+            "name": "pool-used",
+            "servers": {
+                POOL_SERVER_NAME: {"ready": True, "last_activity": stale}
+            },
+        },
+        "student@example.com": {
+            "name": "student@example.com",
+            "servers": {
+                "old": {"ready": True, "last_activity": stale},
+                "new": {"ready": True, "last_activity": fresh},
+            },
+        },
+    }
+    bindings["pool-used"] = {"hub_username": "pool-used"}
+
+    await pool.maintain(hub)
+
+    assert "pool-warm" in hub.users
+    assert "pool-used" not in hub.users
+    assert "pool-used" not in bindings
+    assert ("student@example.com", "old") in hub.stopped
+    assert ("student@example.com", "new") not in hub.stopped
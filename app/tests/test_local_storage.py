@@ -0,0 +1,60 @@
+import pytest
+
+from app.storage.local import LocalStorage
+
+
+def test_upload_download_and_delete(tmp_path):
+    storage = LocalStorage(tmp_path / "files", public_base_url="http://files")
+
+    uploaded = storage.upload_file(b"content", "a.ipynb", "assignments")
+    assert uploaded == {
+        "path": "/assignments/a.ipynb",
+        "link": "http://files/assignments/a.ipynb",
+    }
+    assert storage.file_exists("/assignments/a.ipynb")
+    assert storage.download_file("/assignments/a.ipynb") == b"content"
+
+    storage.delete_file("/assignments/a.ipynb")
+    assert not storage.file_exists("/assignments/a.ipynb")
+
+
+def test_revision_changes_on_overwrite(tmp_path):
+    storage = LocalStorage(tmp_path)
+    storage.upload_file_to_path(b"one", "/a.txt")
+    first = storage.get_metadata("/a.txt")
+    storage.upload_file_to_path(b"second", "/a.txt")
+    second = storage.get_metadata("/a.txt")
+
+    assert first.size == 3
+    assert second.size == 6
+    assert first.rev != second.rev
+
+
+def test_open_download_range(tmp_path):
+    storage = LocalStorage(tmp_path)
+    storage.upload_file_to_path(bytes(range(100)), "/data.bin")
+
+    metadata, stream = storage.open_download("/data.bin", byte_range=(10, 19))
+    try:
+        body = b"".join(stream.iter_content(chunk_size=4))
+    finally:
+        stream.close()
+
+    assert metadata.size == 100
+    assert stream.status_code == 206
+    assert body == bytes(range(10, 20))
+
+
+@pytest.mark.parametrize("path", ["relative.txt", "/../escape.txt", "/"])
+def test_rejects_unsafe_paths(tmp_path, path):
+    storage = LocalStorage(tmp_path / "files")
+
+    with pytest.raises(ValueError):
+        storage.upload_file_to_path(b"x", path)
+
+
+def test_link_requires_public_base_url(tmp_path):
+    storage = LocalStorage(tmp_path / "files")
+
+    with pytest.raises(RuntimeError):
+        storage.get_link("/assignments/a.ipynb")
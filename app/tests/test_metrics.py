@@ -0,0 +1,140 @@
+import urllib.request
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.metrics import MetricsRegistry
+from app.monitoring import collectors
+from app.monitoring.middleware import (
+    MetricsMiddleware,
+    http_request_duration_seconds,
+)
+from app.monitoring.server import start_metrics_server
+from app.storage.instrumented import (
+    InstrumentedStorage,
+    storage_errors_total,
+    storage_request_duration_seconds,
+)
+
+
+def test_render_text_uses_prometheus_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Запросы", ("path",))
+    depth = registry.gauge("queue_depth", "Очередь")
+    latency = registry.histogram("latency_seconds", "Время", buckets=(0.1, 1))
+    requests.inc(path='/a"b\\c')
+    depth.set(3)
+    latency.observe(0.5)
+
+    text = registry.render_text()
+
+    assert "# TYPE requests_total counter\n" in text
+    assert 'requests_total{path="/a\\"b\\\\c"} 1\n' in text
+    assert "# TYPE queue_depth gauge\nqueue_depth 3\n" in text
+    assert 'latency_seconds_bucket{le="0.1"} 0\n' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "latency_seconds_sum 0.5\n" in text
+
+
+def test_failing_collector_does_not_break_render():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("slots", "Слоты")
+
+    def _broken():
+        raise RuntimeError("down")
+
+    registry.add_collector(_broken)
+    registry.add_collector(lambda: gauge.set(2))
+
+    assert "slots 2\n" in registry.render_text()
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def _item(item_id: int):
+        return {"id": item_id}
+
+    before = http_request_duration_seconds.snapshot(
+        method="GET", route="/items/{item_id}", status="200"
+    )["count"]
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing/path")
+
+    assert http_request_duration_seconds.snapshot(
+        method="GET", route="/items/{item_id}", status="200"
+    )["count"] == before + 2
+    assert http_request_duration_seconds.snapshot(
+        method="GET", route="unmatched", status="404"
+    )["count"] >= 1
+
+
+class _Backend:
+    def file_exists(self, path):
+        return True
+
+    def delete_file(self, path):
+        raise FileNotFoundError(path)
+
+
+def test_instrumented_storage_counts_latency_and_errors():
+    storage = InstrumentedStorage(_Backend(), "fake")
+    errors = storage_errors_total.value(
+        backend="fake", operation="delete", error="FileNotFoundError"
+    )
+
+    assert storage.file_exists("/a") is True
+    with pytest.raises(FileNotFoundError):
+        storage.delete_file("/a")
+
+    assert storage_request_duration_seconds.snapshot(
+        backend="fake", operation="file_exists", outcome="ok"
+    )["count"] >= 1
+    assert storage_request_duration_seconds.snapshot(
+        backend="fake", operation="delete", outcome="error"
+    )["count"] >= 1
+    assert storage_errors_total.value(
+        backend="fake", operation="delete", error="FileNotFoundError"
+    ) == errors + 1
+
+
+def test_scheduler_collector_exports_queue_depth(monkeypatch):
+    stats = {
+        "capacity": 4,
+        "running": 2,
+        "queued": 5,
+        "admitted": 7,
+        "expected_wait_seconds": 20.0,
+    }
+    monkeypatch.setattr(
+        collectors,
+        "get_sandbox_scheduler",
+        lambda: type("Scheduler", (), {"stats": lambda self: stats})(),
+    )
+
+    collectors.collect_sandbox_scheduler()
+
+    assert collectors.sandbox_scheduler_tasks.value(state="queued") == 5
+    assert collectors.sandbox_scheduler_expected_wait_seconds.value() == 20.0
+
+
+def test_metrics_server_serves_registry():
+    server = start_metrics_server(0, host="127.0.0.1")
+    try:
+        port = server.server_address[1]
+        url = f"http://127.0.0.1:{port}/metrics"
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode("utf-8")
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in body
@@ -0,0 +1,128 @@
+from pathlib import Path
+
+import nbformat
+import pytest
+
+from app.assignment.services.notebook_service import NotebookService
+from app.exceptions import (
+    NotFoundSolutionsInAssignmentException,
+    NotFoundTestsInAssignmentException,
+)
+
+EXAMPLES = Path(__file__).resolve().parents[2] / "example_of_notebooks"
+
+
+def _notebook(*sources: str):
+    return nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell(source) for source in sources]
+    )
+
+
+SOLUTION = (
+    "def f(x):\n    ### BEGIN SOLUTION\n    return x\n    ### END SOLUTION"
+)
+TESTS = (
+    "# Tests 5 points.\nassert f(1) == 1\n"
+    "### BEGIN HIDDEN TESTS\nassert f(2) == 2\n### END HIDDEN TESTS\n"
+)
+
+
+def test_plan_describes_solutions_tests_and_points():
+    notebook = _notebook("import math", SOLUTION, TESTS)
+
+    plan = NotebookService.analyze_notebook(notebook)
+
+    assert plan.total_points == 5
+    assert [(cell.index, cell.points) for cell in plan.test_cells] == [(2, 5)]
+    assert plan.test_cells[0].source == TESTS
+    assert plan.solution_spans == {1: (1, 4)}
+    assert plan.hidden_test_spans == {2: (2, 6)}
+    assert plan.modified_sources == {
+        1: "def f(x):\n### WRITE SOLUTION HERE",
+        2: "# Tests 5 points.\nassert f(1) == 1",
+    }
+    assert plan.to_dict() == {
+        "version": 2,
+        "cells": 3,
+        "total_points": 5,
+        "tests": [{"index": 2, "points": 5, "source": TESTS}],
+        "preload": ["math"],
+    }
+
+
+def test_plan_lists_imported_modules_for_preload():
+    notebook = _notebook(
+        "import numpy as np, pandas as pd\n"
+        "from sklearn.linear_model import Ridge",
+        "import matplotlib.pyplot as plt  # графики\n"
+        "from . import local\nimport numpy",
+    )
+
+    plan = NotebookService.analyze_notebook(notebook)
+
+    assert plan.preload == [
+        "numpy", "pandas", "sklearn.linear_model", "matplotlib.pyplot"
+    ]
+
+
+def test_modified_notebook_is_a_copy():
+    notebook = _notebook(SOLUTION, TESTS)
+
+    plan = NotebookService.analyze_notebook(notebook)
+    modified = NotebookService.build_modified_notebook(notebook, plan)
+
+    assert notebook.cells[0].source == SOLUTION
+    assert modified.cells[0].source == "def f(x):\n### WRITE SOLUTION HERE"
+    assert modified.cells[0].id == notebook.cells[0].id
+    assert NotebookService.modify_notebook(notebook) == modified
+
+
+@pytest.mark.parametrize(
+    "sources, exception",
+    [
+        (
+            ["def f():\n    return 1", TESTS],
+            NotFoundSolutionsInAssignmentException,
+        ),
+        ([SOLUTION], NotFoundTestsInAssignmentException),
+        (
+            [SOLUTION, "# Tests 5 points.\nassert f(1)"],
+            NotFoundTestsInAssignmentException,
+        ),
+        # Маркер скрытых тестов не на отдельной строке не вырезается
+        (
+            [SOLUTION, TESTS.replace("HIDDEN TESTS\n", "HIDDEN TESTS \n")],
+            NotFoundTestsInAssignmentException,
+        ),
+    ],
+)
+def test_check_rejects_incomplete_notebook(sources, exception):
+    with pytest.raises(exception):
+        NotebookService.check_notebook(_notebook(*sources))
+
+
+def test_prepare_assignment_on_examples():
+    for path in sorted(EXAMPLES.glob("*/a*.ipynb")):
+        content = path.read_bytes()
+        prepared = NotebookService.prepare_assignment(content)
+        notebook = NotebookService.read_notebook(content)
+
+        assert prepared.original == content
+        total_points = NotebookService.get_total_points(notebook)
+        assert prepared.plan.total_points == total_points
+        modified = NotebookService.modify_notebook(notebook)
+        assert prepared.modified == nbformat.writes(modified).encode("utf-8")
+        sources = "".join(cell.source for cell in modified.cells)
+        assert "BEGIN SOLUTION" not in sources
+        assert "HIDDEN TESTS" not in sources
+
+
+def test_prepare_assignment_rejects_wrong_examples():
+    for path in sorted((EXAMPLES / "wrong_assignments").glob("*.ipynb")):
+        with pytest.raises(
+            (
+                NotFoundSolutionsInAssignmentException,
+                NotFoundTestsInAssignmentException,
+            )
+        ):
+            NotebookService.prepare_assignment(path.read_bytes())
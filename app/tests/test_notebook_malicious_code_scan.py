@@ -1,8 +1,17 @@
+import time
+
 import nbformat
 import pytest
 
 from app.exceptions import UnsafeNotebookCodeException
-from app.submissions.services.sandbox_runner import _scan_notebook_for_malicious_code
+from app.submissions.services.code_scanner import (
+    AST_MODE,
+    CodeFinding,
+    scan_notebook,
+)
+from app.submissions.services.sandbox_runner import (
+    _scan_notebook_for_malicious_code,
+)
 
 
 def _make_notebook_bytes(cells: list[nbformat.NotebookNode]) -> bytes:
@@ -35,3 +44,66 @@ def test_scan_blocks_malicious_patterns(source: str):
 
     with pytest.raises(UnsafeNotebookCodeException):
         _scan_notebook_for_malicious_code(notebook_bytes)
+
+
+def _notebook(*sources: str):
+    return nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell(source) for source in sources]
+    )
+
+
+def test_scan_reports_all_findings_with_cell_index():
+    notebook = _notebook(
+        "x = 1",
+        "import os\nos.remove('a')\nos.system('rm -rf /')",
+        "q = 'DROP TABLE t'",
+    )
+
+    assert scan_notebook(notebook) == [
+        CodeFinding(1, "os_remove"),
+        CodeFinding(1, "os_system_rm_rf"),
+        CodeFinding(2, "sql_drop_table"),
+    ]
+
+
+def test_ast_mode_ignores_strings_and_comments():
+    notebook = _notebook(
+        "# os.remove('data.csv') больше не нужен\n"
+        "help_text = 'shutil.rmtree(path)'",
+        "print('rm -rf is dangerous')",
+    )
+
+    assert scan_notebook(notebook, mode=AST_MODE) == []
+    assert scan_notebook(notebook) != []
+
+
+def test_ast_mode_resolves_imports_across_cells():
+    notebook = _notebook(
+        "import shutil as sh\nfrom os import remove",
+        "sh.rmtree('/data')\nremove('x')",
+        "import subprocess\nsubprocess.run(['bash', '-c', 'rm -rf /'])",
+        "!rm -rf /tmp",
+        "cursor.execute(f'DELETE FROM {table}')",
+        "def broken(:\n    os.rmdir('x')",
+    )
+
+    assert scan_notebook(notebook, mode=AST_MODE) == [
+        CodeFinding(1, "shutil_rmtree"),
+        CodeFinding(1, "os_remove"),
+        CodeFinding(2, "subprocess_rm_rf"),
+        CodeFinding(3, "rm_rf"),
+        CodeFinding(4, "sql_delete_from"),
+        # Ячейка не разбирается как Python - проверена regex-режимом
+        CodeFinding(5, "os_rmdir"),
+    ]
+
+
+def test_scan_limits_size_and_is_linear_on_unclosed_calls():
+    assert scan_notebook(_notebook("x = 1", "y = 2"), max_chars=8) == [
+        CodeFinding(1, "too_large")
+    ]
+
+    adversarial = _notebook("os.system(" * 50_000, "subprocess.run(" * 50_000)
+    started = time.monotonic()
+    assert scan_notebook(adversarial) == []
+    assert time.monotonic() - started < 2
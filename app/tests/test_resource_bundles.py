@@ -0,0 +1,106 @@
+import os
+import time
+
+from app.submissions.services import sandbox_runner
+from app.submissions.services.resource_bundles import ResourceBundleStore
+
+RESOURCES = [("data.csv", b"a,b\n1,2\n"), ("images/cat.png", b"png")]
+
+
+def test_stage_writes_bundle_once_and_read_only(tmp_path):
+    store = ResourceBundleStore(tmp_path / "bundles")
+
+    first = store.stage(RESOURCES)
+    inode = (first / "data.csv").stat().st_ino
+    second = store.stage(list(reversed(RESOURCES)))
+
+    assert first == second
+    assert (second / "data.csv").stat().st_ino == inode
+    assert (first / "images" / "cat.png").read_bytes() == b"png"
+    assert (first / "data.csv").stat().st_mode & 0o222 == 0
+
+
+def test_new_resource_version_gets_new_bundle(tmp_path):
+    store = ResourceBundleStore(tmp_path / "bundles")
+
+    first = store.stage(RESOURCES)
+    second = store.stage([("data.csv", b"changed")])
+
+    assert first != second
+    assert store.stage([]) is None
+
+
+def test_stage_skips_unsafe_paths(tmp_path):
+    store = ResourceBundleStore(tmp_path / "bundles")
+
+    bundle = store.stage([("../escape.txt", b"x"), ("ok.txt", b"y")])
+
+    assert [entry.name for entry in bundle.iterdir()] == ["ok.txt"]
+    assert not (tmp_path / "escape.txt").exists()
+
+
+def test_link_points_workspace_at_sandbox_path(tmp_path):
+    store = ResourceBundleStore(tmp_path / "bundles")
+    bundle = store.stage(RESOURCES)
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "data.csv").write_text("submission file")
+
+    store.link(bundle, workspace, f"/resources/{bundle.name}")
+
+    assert (workspace / "data.csv").read_text() == "submission file"
+    link = os.readlink(workspace / "images")
+    assert link == f"/resources/{bundle.name}/images"
+
+
+def test_cleanup_removes_expired_read_only_bundles(tmp_path):
+    store = ResourceBundleStore(tmp_path / "bundles", ttl_seconds=60)
+    old = store.stage(RESOURCES)
+    expired = time.time() - 120
+    os.utime(old, (expired, expired))
+
+    fresh = store.stage([("data.csv", b"new")])
+
+    assert fresh.is_dir()
+    assert not old.exists()
+
+
+def test_sandbox_mounts_bundles_read_only(tmp_path, monkeypatch):
+    store = ResourceBundleStore(tmp_path / "bundles")
+    monkeypatch.setattr(sandbox_runner, "get_resource_bundles", lambda: store)
+    monkeypatch.setattr(sandbox_runner, "_is_running_in_docker", lambda: False)
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+
+    sandbox_runner._write_resources(workspace, RESOURCES)
+    command = sandbox_runner._build_docker_run_command(["python"], workspace)
+    config = sandbox_runner._build_container_config(["python"], workspace)
+
+    bundle = next(store.root.iterdir())
+    link = os.readlink(workspace / "data.csv")
+    assert link == f"/resources/{bundle.name}/data.csv"
+    assert (
+        f"type=bind,source={store.root.resolve()},target=/resources,readonly"
+        in command
+    )
+    assert config["HostConfig"]["Mounts"][-1] == {
+        "Type": "bind",
+        "Source": str(store.root.resolve()),
+        "Target": "/resources",
+        "ReadOnly": True,
+    }
+
+
+def test_docker_without_host_dir_copies_resources(tmp_path, monkeypatch):
+    monkeypatch.setattr(sandbox_runner, "_is_running_in_docker", lambda: True)
+    monkeypatch.setattr(sandbox_runner, "SANDBOX_RESOURCE_BUNDLE_HOST_DIR", "")
+    monkeypatch.setattr(sandbox_runner, "_resource_bundles", None)
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+
+    sandbox_runner._write_resources(workspace, RESOURCES)
+
+    assert sandbox_runner.get_resource_bundles() is None
+    assert sandbox_runner._bundle_mount_args() == []
+    assert not (workspace / "data.csv").is_symlink()
+    assert (workspace / "data.csv").read_bytes() == b"a,b\n1,2\n"
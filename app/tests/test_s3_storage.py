@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.storage import s3
+from app.storage.s3 import S3Storage
+
+
+class _FakeClientError(Exception):
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class _FakeBody:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.closed = False
+
+    def iter_chunks(self, chunk_size: int):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeS3Client:
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def _get(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise _FakeClientError("404")
+        return self.objects[(Bucket, Key)]
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def head_object(self, Bucket, Key):
+        content = self._get(Bucket, Key)
+        return {"ETag": f'"etag-{len(content)}"', "ContentLength": len(content)}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.calls.append(kwargs)
+        content = self._get(Bucket, Key)
+        response = {
+            "ETag": f'"etag-{len(content)}"',
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+        }
+        if "Range" in kwargs:
+            start, end = map(int, kwargs["Range"][len("bytes="):].split("-"))
+            response["ContentRange"] = f"bytes {start}-{end}/{len(content)}"
+            response["ResponseMetadata"]["HTTPStatusCode"] = 206
+            content = content[start:end + 1]
+        response["ContentLength"] = len(content)
+        response["Body"] = _FakeBody(content)
+        return response
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = _FakeS3Client()
+    monkeypatch.setattr(
+        s3, "boto3", SimpleNamespace(client=lambda *args, **kwargs: client)
+    )
+    monkeypatch.setattr(s3, "ClientError", _FakeClientError)
+    return client
+
+
+def test_upload_download_and_delete(client):
+    storage = S3Storage("bucket", public_base_url="http://files")
+
+    uploaded = storage.upload_file(b"content", "a b.ipynb", "assignments")
+    assert uploaded == {
+        "path": "/assignments/a b.ipynb",
+        "link": "http://files/assignments/a%20b.ipynb",
+    }
+    assert client.objects == {("bucket", "assignments/a b.ipynb"): b"content"}
+    assert storage.file_exists("/assignments/a b.ipynb")
+    assert storage.download_file("/assignments/a b.ipynb") == b"content"
+
+    storage.delete_file("/assignments/a b.ipynb")
+    assert not storage.file_exists("/assignments/a b.ipynb")
+
+
+def test_link_defaults_to_endpoint_and_bucket(client):
+    storage = S3Storage("bucket", endpoint_url="http://minio:9000/")
+
+    assert storage.get_link("/a.txt") == "http://minio:9000/bucket/a.txt"
+
+
+def test_metadata_uses_etag_as_revision(client):
+    storage = S3Storage("bucket")
+    storage.upload_file_to_path(b"one", "/a.txt")
+
+    metadata = storage.get_metadata("/a.txt")
+
+    assert metadata.size == 3
+    assert metadata.rev == metadata.content_hash == "etag-3"
+
+
+def test_open_download_range_reports_full_size(client):
+    storage = S3Storage("bucket")
+    storage.upload_file_to_path(bytes(range(100)), "/data.bin")
+
+    metadata, stream = storage.open_download(
+        "/data.bin", rev="etag-100", byte_range=(10, 19)
+    )
+    try:
+        body = b"".join(stream.iter_content(chunk_size=4))
+    finally:
+        stream.close()
+
+    assert client.calls == [{"IfMatch": '"etag-100"', "Range": "bytes=10-19"}]
+    assert metadata.size == 100
+    assert stream.status_code == 206
+    assert body == bytes(range(10, 20))
+
+
+def test_file_exists_reraises_other_errors(client, monkeypatch):
+    storage = S3Storage("bucket")
+
+    def _denied(**kwargs):
+        raise _FakeClientError("AccessDenied")
+
+    monkeypatch.setattr(client, "head_object", _denied)
+
+    with pytest.raises(_FakeClientError):
+        storage.file_exists("/a.txt")
+
+
+def test_rejects_relative_paths(client):
+    storage = S3Storage("bucket")
+
+    with pytest.raises(ValueError):
+        storage.upload_file_to_path(b"x", "relative.txt")
+
+
+def test_requires_boto3(monkeypatch):
+    monkeypatch.setattr(s3, "boto3", None)
+
+    with pytest.raises(RuntimeError):
+        S3Storage("bucket")
@@ -0,0 +1,145 @@
+import subprocess
+
+import pytest
+
+from app.exceptions import ResourceLimitExceededException
+from app.submissions.services import sandbox_runner
+from app.submissions.services.sandbox_pool import (
+    SANDBOX_POOL_PROCESS_LABEL,
+    SandboxContainerPool,
+)
+
+
+class _FakeDocker:
+    def __init__(self):
+        self.commands: list[list[str]] = []
+        self.started = 0
+        self.timeout_exec = False
+        self.listed = ""
+
+    def __call__(self, command, *args, **kwargs):
+        self.commands.append(command)
+        if command[:3] == ["docker", "run", "-d"]:
+            self.started += 1
+            return subprocess.CompletedProcess(
+                command, 0, f"cid-{self.started}\n", ""
+            )
+        if command[:2] == ["docker", "inspect"]:
+            return subprocess.CompletedProcess(command, 0, "true\n", "")
+        if command[:2] == ["docker", "ps"]:
+            return subprocess.CompletedProcess(command, 0, self.listed, "")
+        if command[:2] == ["docker", "exec"] and self.timeout_exec:
+            raise subprocess.TimeoutExpired(cmd=command, timeout=1)
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    def removed(self) -> list[str]:
+        return [
+            container_id
+            for c in self.commands
+            if c[:3] == ["docker", "rm", "-f"]
+            for container_id in c[3:]
+        ]
+
+
+@pytest.fixture
+def fake_docker(monkeypatch):
+    fake = _FakeDocker()
+    monkeypatch.setattr(
+        "app.submissions.services.sandbox_pool.subprocess.run", fake
+    )
+    monkeypatch.setattr(
+        "app.submissions.services.sandbox_runner.subprocess.run", fake
+    )
+    return fake
+
+
+def test_pool_counts_hits_and_misses(fake_docker):
+    pool = SandboxContainerPool(["image", "sleep", "infinity"], size=2)
+    pool.fill()
+
+    first = pool.acquire()
+    second = pool.acquire()
+    stats = pool.stats()
+
+    assert {first.container_id, second.container_id} == {"cid-1", "cid-2"}
+    assert stats["hits"] == 2
+    assert stats["misses"] == 0
+    assert stats["idle"] == 0
+
+
+def test_pool_recycles_until_max_jobs(fake_docker):
+    pool = SandboxContainerPool(
+        ["image", "sleep", "infinity"], size=1, max_jobs_per_container=2
+    )
+    container = pool.acquire()
+    pool.release(container)
+    assert pool.acquire() is container
+
+    pool.release(container)
+
+    assert fake_docker.removed() == [container.container_id]
+    assert pool.stats()["total"] == 0
+
+
+def test_pool_falls_back_when_exhausted(fake_docker):
+    pool = SandboxContainerPool(
+        ["image", "sleep", "infinity"], size=1, acquire_timeout=0.01
+    )
+    pool.acquire()
+
+    assert pool.acquire() is None
+    assert pool.stats()["fallbacks"] == 1
+
+
+def test_run_in_container_uses_pool_and_drops_container_on_timeout(
+    fake_docker, monkeypatch, tmp_path
+):
+    pool = SandboxContainerPool(["image", "sleep", "infinity"], size=1)
+    monkeypatch.setattr(sandbox_runner, "get_sandbox_pool", lambda: pool)
+    monkeypatch.setattr(sandbox_runner, "get_tmpfs_quota", lambda: None)
+    monkeypatch.setattr(sandbox_runner, "_is_running_in_docker", lambda: False)
+    monkeypatch.setattr(sandbox_runner, "_workspace_root", lambda: tmp_path)
+    fake_docker.timeout_exec = True
+
+    with pytest.raises(ResourceLimitExceededException):
+        with sandbox_runner._workspace_context() as workspace:
+            sandbox_runner._run_in_container(
+                ["python", "-c", "pass"], workspace, 1
+            )
+
+    exec_commands = [
+        c for c in fake_docker.commands if c[:2] == ["docker", "exec"]
+    ]
+    assert exec_commands[0][exec_commands[0].index("-w") + 1] == (
+        f"/workspace/{workspace.name}"
+    )
+    assert exec_commands[0][exec_commands[0].index("cid-1") + 1 :] == [
+        "python",
+        "-c",
+        "pass",
+    ]
+    assert fake_docker.removed() == ["cid-1"]
+
+
+def test_pool_removes_only_containers_of_finished_processes(fake_docker):
+    cleaned = []
+    pool = SandboxContainerPool(
+        ["image", "sleep", "infinity"], size=1, on_destroy=cleaned.append
+    )
+    other = SandboxContainerPool(["image", "sleep", "infinity"], size=1)
+    fake_docker.listed = (
+        f"cid-live sandbox-live {other.process_id}\n"
+        "cid-dead sandbox-dead 999999999:1\n"
+        "cid-old sandbox-old \n"
+    )
+
+    pool._remove_orphans()
+    started = pool.acquire()
+
+    assert fake_docker.removed() == ["cid-dead", "cid-old"]
+    assert cleaned == ["sandbox-dead", "sandbox-old"]
+    run = next(
+        c for c in fake_docker.commands if c[:3] == ["docker", "run", "-d"]
+    )
+    assert f"{SANDBOX_POOL_PROCESS_LABEL}={pool.process_id}" in run
+    assert started is not None
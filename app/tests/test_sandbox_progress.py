@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.exceptions import SyntaxException
+from app.grading.progress import stream_evaluation
+from app.submissions.services.sandbox_progress import (
+    MAX_LINE_BYTES,
+    ProgressTail,
+    parse_event,
+)
+
+
+def test_parse_event_keeps_only_known_fields():
+    line = json.dumps(
+        {
+            "event": "finished",
+            "index": 3,
+            "points": 2,
+            "elapsed": 0.5,
+            "html": "<b>",
+        }
+    ).encode()
+
+    assert parse_event(line) == {
+        "event": "finished",
+        "index": 3,
+        "points": 2,
+        "elapsed": 0.5,
+    }
+    assert parse_event(b'{"event": "shell", "index": 1}') is None
+    started = parse_event(b'{"event": "started", "index": true}')
+    assert started == {"event": "started"}
+    assert parse_event(b"not json") is None
+
+
+def test_tail_reads_complete_lines_and_caps_events(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    events = []
+    tail = ProgressTail(path, events.append, max_events=3)
+
+    path.write_bytes(b'{"event": "started", "index": 0}\n{"event": "fini')
+    tail.read()
+    assert events == [{"event": "started", "index": 0}]
+
+    with open(path, "ab") as f:
+        f.write(b'shed", "index": 0}\n')
+        f.write(
+            b'{"event": "started", "index": 1, "pad": "'
+            + b"x" * MAX_LINE_BYTES
+        )
+        f.write(b'"}\n')
+        for index in range(1, 5):
+            line = json.dumps({"event": "started", "index": index})
+            f.write(line.encode() + b"\n")
+    tail.read()
+
+    assert [e["index"] for e in events] == [0, 0, 1]
+    assert tail.read() is False
+
+
+def test_tail_drains_file_on_exit(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    events = []
+
+    with ProgressTail(path, events.append, poll_seconds=60):
+        path.write_text('{"event": "restored", "steps": 2, "cells": 3}\n')
+
+    assert events == [{"event": "restored", "steps": 2, "cells": 3}]
+
+
+def test_tail_ignores_symlinks_and_fifos(tmp_path):
+    link = tmp_path / "link.jsonl"
+    link.symlink_to("/dev/zero")
+    fifo = tmp_path / "fifo.jsonl"
+    os.mkfifo(fifo)
+    events = []
+
+    for path in (link, fifo):
+        with ProgressTail(path, events.append, poll_seconds=0.01):
+            pass
+
+    assert events == []
+
+
+def test_tail_caps_total_bytes(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    path.write_bytes(b"x" * 10 * MAX_LINE_BYTES)
+    tail = ProgressTail(path, lambda event: None, max_events=2)
+
+    while tail.read():
+        pass
+
+    assert tail._offset == 2 * MAX_LINE_BYTES
+
+
+async def _collect(stream) -> list[tuple[str, dict]]:
+    messages = []
+    async for chunk in stream:
+        if chunk.startswith(":"):
+            continue
+        event, data = chunk.strip().split("\n")
+        messages.append(
+            (event[len("event: "):], json.loads(data[len("data: "):]))
+        )
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_stream_evaluation_relays_progress_then_result():
+    async def _run(progress):
+        def _sandbox():
+            progress({"event": "started", "index": 0})
+            progress({"event": "finished", "index": 0, "points": 1})
+
+        await asyncio.to_thread(_sandbox)
+        return {"score": 1, "feedback": []}
+
+    messages = await _collect(stream_evaluation(_run))
+
+    assert [event for event, _ in messages] == [
+        "job",
+        "progress",
+        "progress",
+        "result",
+    ]
+    assert messages[2][1] == {"event": "finished", "index": 0, "points": 1}
+    assert messages[-1][1] == {"score": 1, "feedback": []}
+
+
+@pytest.mark.asyncio
+async def test_stream_evaluation_reports_domain_error():
+    async def _run(progress):
+        raise SyntaxException
+
+    messages = await _collect(stream_evaluation(_run))
+
+    assert messages[-1] == (
+        "error",
+        {
+            "status_code": SyntaxException.status_code,
+            "detail": SyntaxException.detail,
+        },
+    )
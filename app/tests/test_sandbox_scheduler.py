@@ -0,0 +1,187 @@
+import asyncio
+import threading
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.exceptions import SandboxOverloadedException
+from app.grading import scheduler as module
+from app.grading.scheduler import (
+    SandboxScheduler,
+    assignment_due_at,
+    fair_order,
+)
+
+NOW = datetime(2026, 5, 20, 12, 0)
+
+
+def _entry(user_id, order, due_at=None, priority=0):
+    return SimpleNamespace(
+        user_id=user_id, order=order, due_at=due_at, priority=priority
+    )
+
+
+def test_fair_order_interleaves_users():
+    entries = [
+        _entry(1, 0),
+        _entry(1, 1),
+        _entry(1, 2),
+        _entry(2, 3),
+        _entry(3, 4),
+    ]
+
+    ordered = fair_order(entries, running={}, now=NOW, boost_seconds=3600)
+
+    assert [e.order for e in ordered] == [0, 3, 4, 1, 2]
+
+
+def test_fair_order_counts_running_jobs():
+    entries = [_entry(1, 0), _entry(2, 1)]
+
+    ordered = fair_order(entries, running={1: 1}, now=NOW, boost_seconds=3600)
+
+    assert [e.user_id for e in ordered] == [2, 1]
+
+
+def test_close_deadline_goes_first_but_not_before_priority():
+    far = NOW + timedelta(days=3)
+    soon = NOW + timedelta(minutes=5)
+    sooner = NOW + timedelta(minutes=2)
+    entries = [
+        _entry(1, 0, far),
+        _entry(2, 1, soon),
+        _entry(3, 2, sooner),
+        _entry(4, 3, sooner, priority=10),
+    ]
+
+    ordered = fair_order(entries, running={}, now=NOW, boost_seconds=3600)
+
+    assert [e.user_id for e in ordered] == [3, 2, 1, 4]
+
+
+def test_assignment_due_at_defaults_to_end_of_day():
+    assignment = SimpleNamespace(due_date=date(2026, 5, 20), due_time=None)
+
+    assert assignment_due_at(assignment) == datetime.combine(
+        date(2026, 5, 20), time.max
+    )
+    assert assignment_due_at(SimpleNamespace()) is None
+
+
+def test_default_capacity_limited_by_memory(monkeypatch):
+    monkeypatch.setattr(module.os, "cpu_count", lambda: 16)
+    pages = {"SC_PAGE_SIZE": 4096, "SC_PHYS_PAGES": 4 * 1024**3 // 4096}
+    monkeypatch.setattr(module.os, "sysconf", pages.__getitem__)
+
+    assert module.default_capacity() == 4
+
+
+@pytest.mark.asyncio
+async def test_scheduler_caps_concurrency_and_reports_position():
+    scheduler = SandboxScheduler(capacity=1, boost_seconds=3600)
+    release = threading.Event()
+    started = []
+
+    def _sandbox(name):
+        started.append(name)
+        release.wait(5)
+        return name
+
+    first = asyncio.create_task(scheduler.run(_sandbox, "a1", user_id=1))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(scheduler.run(_sandbox, "a2", user_id=1))
+    third = asyncio.create_task(scheduler.run(_sandbox, "b1", user_id=2))
+    await asyncio.sleep(0.05)
+
+    assert started == ["a1"]
+    stats = scheduler.stats()
+    assert (stats["capacity"], stats["running"], stats["queued"]) == (1, 1, 2)
+    assert scheduler.queue_position(2) == 1
+    assert scheduler.queue_position(1) == 2
+
+    release.set()
+    assert await asyncio.gather(first, second, third) == ["a1", "a2", "b1"]
+    assert started == ["a1", "b1", "a2"]
+    assert scheduler.stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_keeps_slot_until_sandbox_finishes():
+    scheduler = SandboxScheduler(capacity=1, boost_seconds=3600)
+    release = threading.Event()
+
+    task = asyncio.create_task(scheduler.run(release.wait, 5, user_id=1))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert scheduler.running_total == 1
+    release.set()
+    await asyncio.sleep(0.05)
+    assert scheduler.running_total == 0
+
+
+def test_admission_rejects_with_retry_after_when_wait_too_long(monkeypatch):
+    monkeypatch.setattr(
+        module.settings, "GRADING_ADMISSION_MAX_WAIT_SECONDS", 15
+    )
+    monkeypatch.setattr(module, "load_per_cpu", lambda: 0.1)
+    scheduler = SandboxScheduler(capacity=2, boost_seconds=3600)
+    scheduler.run_seconds = 10
+
+    with scheduler.admission(), scheduler.admission(), scheduler.admission():
+        # Два запуска идут, третий и четвертый ждут 10 с, пятый ждал бы 20 с
+        with scheduler.admission():
+            assert scheduler.expected_wait() == 20
+            with pytest.raises(SandboxOverloadedException) as error:
+                with scheduler.admission():
+                    pass
+
+    assert error.value.status_code == 429
+    assert error.value.headers == {"Retry-After": "5"}
+    assert scheduler.rejected == 1
+    assert scheduler.admitted == 0
+    with scheduler.admission():
+        assert scheduler.admitted == 1
+
+
+def test_admission_rejects_on_host_load_only_while_running(monkeypatch):
+    monkeypatch.setattr(
+        module.settings, "GRADING_ADMISSION_MAX_LOAD_PER_CPU", 2.0
+    )
+    monkeypatch.setattr(module, "load_per_cpu", lambda: 3.5)
+    scheduler = SandboxScheduler(capacity=4, boost_seconds=3600)
+    rejected_total = module.sandbox_admission_rejected_total
+    before = rejected_total.value(reason="load")
+
+    with scheduler.admission():
+        pass
+    scheduler.running_total = 1
+    with pytest.raises(SandboxOverloadedException):
+        with scheduler.admission():
+            pass
+
+    assert rejected_total.value(reason="load") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_wait_for_slot_does_not_shorten_sandbox_timeout():
+    scheduler = SandboxScheduler(capacity=1, boost_seconds=3600)
+    release = threading.Event()
+    received = []
+
+    def _sandbox(timeout_seconds):
+        received.append(timeout_seconds)
+        release.wait(5)
+
+    first = asyncio.create_task(scheduler.run(_sandbox, 30, user_id=1))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(scheduler.run(_sandbox, 30, user_id=2))
+    await asyncio.sleep(0.2)
+    release.set()
+    await asyncio.gather(first, second)
+
+    assert received == [30, 30]
+    assert scheduler.run_seconds < module.INITIAL_RUN_SECONDS
@@ -48,3 +48,24 @@ def test_grade_notebook_maps_timeout_to_resource_limit(monkeypatch):
             [],
             5,
         )
+
+
+def test_execute_and_grade_notebook_maps_timeout_to_resource_limit(monkeypatch):
+    submission_bytes = _make_notebook_bytes("x = 1")
+    tutor_bytes = _make_notebook_bytes("x = 1")
+
+    def _raise_timeout(*args, **kwargs):
+        raise subprocess.TimeoutExpired(cmd=["docker"], timeout=5)
+
+    monkeypatch.setattr(
+        "app.submissions.services.sandbox_runner.subprocess.run",
+        _raise_timeout,
+    )
+
+    with pytest.raises(ResourceLimitExceededException):
+        SandboxNotebookRunner.execute_and_grade_notebook(
+            submission_bytes,
+            tutor_bytes,
+            [],
+            5,
+        )
@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.submissions.services import sandbox_runner, sandbox_workspaces
+from app.submissions.services.sandbox_pool import PooledContainer
+from app.submissions.services.sandbox_workspaces import (
+    TmpfsWorkspaceQuota,
+    directory_size,
+)
+
+
+def test_quota_rejects_large_runs_and_exhausted_mount(tmp_path):
+    quota = TmpfsWorkspaceQuota(
+        tmp_path / "tmpfs", max_run_bytes=100, total_bytes=300
+    )
+
+    assert quota.reserve(101) == (0, "too_large")
+    assert quota.reserve(100) == (200, None)
+    assert quota.reserve(60) == (0, "quota")
+
+    quota.release(200)
+    assert quota.reserve(60) == (120, None)
+    assert quota.reserved == 120
+
+
+def test_quota_sends_runs_to_disk_when_tmpfs_is_full(tmp_path, monkeypatch):
+    quota = TmpfsWorkspaceQuota(tmp_path / "tmpfs", max_run_bytes=100)
+    usage = SimpleNamespace(total=10_000, free=150)
+    monkeypatch.setattr(
+        sandbox_workspaces.shutil, "disk_usage", lambda _: usage
+    )
+
+    # Квоты хватает, но место уже занято файлами, записанными во время запусков
+    assert quota.reserve(100) == (0, "full")
+    assert quota.reserve(50) == (100, None)
+
+
+def test_directory_size_does_not_follow_links(tmp_path):
+    (tmp_path / "submission.ipynb").write_bytes(b"x" * 10)
+    big = tmp_path.parent / f"{tmp_path.name}-big.bin"
+    big.write_bytes(b"x" * 1000)
+    (tmp_path / "data.bin").symlink_to(big)
+
+    assert directory_size(tmp_path) < 1000
+
+
+def _use_quota(monkeypatch, quota):
+    monkeypatch.setattr(sandbox_runner, "get_tmpfs_quota", lambda: quota)
+
+
+def test_workspace_uses_tmpfs_and_releases_reservation(tmp_path, monkeypatch):
+    quota = TmpfsWorkspaceQuota(
+        tmp_path / "tmpfs", max_run_bytes=1000, total_bytes=10_000
+    )
+    _use_quota(monkeypatch, quota)
+    observed = []
+    monkeypatch.setattr(
+        sandbox_runner.sandbox_workspace_bytes,
+        "observe",
+        lambda value, **labels: observed.append((value, labels)),
+    )
+
+    with sandbox_runner._workspace_context(500) as workspace:
+        assert workspace.parent == quota.root
+        assert quota.reserved == 1000
+        (workspace / "submission.ipynb").write_bytes(b"x" * 42)
+
+    assert quota.reserved == 0
+    assert not workspace.exists()
+    assert observed == [(42, {"storage": "tmpfs"})]
+
+
+def test_workspace_falls_back_to_disk_when_over_cap(tmp_path, monkeypatch):
+    quota = TmpfsWorkspaceQuota(tmp_path / "tmpfs", max_run_bytes=100)
+    _use_quota(monkeypatch, quota)
+    disk_root = tmp_path / "disk"
+    disk_root.mkdir()
+    monkeypatch.setattr(sandbox_runner, "_workspace_root", lambda: disk_root)
+    fallback_total = sandbox_runner.sandbox_workspace_fallback_total
+    before = fallback_total.value(reason="too_large")
+
+    with sandbox_runner._workspace_context(101) as workspace:
+        assert workspace.parent == disk_root
+
+    after = fallback_total.value(reason="too_large")
+    assert after == before + 1
+    assert quota.reserved == 0
+
+
+def test_pool_containers_see_only_their_workspaces(tmp_path, monkeypatch):
+    quota = TmpfsWorkspaceQuota(tmp_path / "tmpfs")
+    _use_quota(monkeypatch, quota)
+    monkeypatch.setattr(sandbox_runner, "_is_running_in_docker", lambda: False)
+    monkeypatch.setattr(sandbox_runner, "_workspace_root", lambda: tmp_path)
+    container = PooledContainer(container_id="cid-1", name="sandbox-1")
+    released = []
+    pool = SimpleNamespace(
+        acquire=lambda: container,
+        release=lambda c, healthy=True: released.append((c, healthy)),
+    )
+    monkeypatch.setattr(sandbox_runner, "get_sandbox_pool", lambda: pool)
+
+    run_args = sandbox_runner._build_pool_run_args("sandbox-1")
+    with sandbox_runner._workspace_context(10) as workspace:
+        lease = sandbox_runner._pool_leases[workspace]
+
+    slot = quota.root / "pool" / "sandbox-1"
+    mounts = [arg for arg in run_args if arg.startswith("type=bind,")]
+    assert f"source={slot.resolve()},target=/workspace-tmpfs" in "".join(mounts)
+    assert f"source={tmp_path.resolve()},target=" not in "".join(mounts)
+    assert workspace.parent == slot
+    assert lease.workdir == f"/workspace-tmpfs/{workspace.name}"
+    assert released == [(container, True)]
+
+    sandbox_runner._remove_pool_slots("sandbox-1")
+    assert not slot.exists()
+    assert not (tmp_path / "pool" / "sandbox-1").exists()
+
+
+def test_pool_container_is_released_when_workspace_setup_fails(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(sandbox_runner, "get_tmpfs_quota", lambda: None)
+    monkeypatch.setattr(sandbox_runner, "_is_running_in_docker", lambda: False)
+    missing = tmp_path / "file"
+    missing.write_text("")
+    monkeypatch.setattr(sandbox_runner, "_workspace_root", lambda: missing)
+    container = PooledContainer(container_id="cid-1", name="sandbox-1")
+    released = []
+    pool = SimpleNamespace(
+        acquire=lambda: container,
+        release=lambda c, healthy=True: released.append((c, healthy)),
+    )
+    monkeypatch.setattr(sandbox_runner, "get_sandbox_pool", lambda: pool)
+
+    with pytest.raises(OSError):
+        with sandbox_runner._workspace_context(10):
+            pass
+
+    assert released == [(container, True)]
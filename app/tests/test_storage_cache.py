@@ -0,0 +1,120 @@
+import threading
+import time
+
+from app.storage.base import FileMetadata
+from app.storage.cache import StorageFileCache
+
+
+class _FakeStorage:
+    def __init__(self, files: dict[str, bytes], delay: float = 0.0):
+        self.files = files
+        self.delay = delay
+        self.downloads = 0
+        self.metadata_calls = 0
+        self._lock = threading.Lock()
+
+    def _metadata(self, path):
+        return FileMetadata(
+            path=path,
+            size=len(self.files[path]),
+            rev="1",
+            content_hash=f"hash-{self.files[path].hex()}",
+        )
+
+    def get_metadata(self, path):
+        with self._lock:
+            self.metadata_calls += 1
+        return self._metadata(path)
+
+    def download_file_with_metadata(self, path):
+        with self._lock:
+            self.downloads += 1
+        time.sleep(self.delay)
+        return self._metadata(path), self.files[path]
+
+    def download_file(self, path):
+        return self.download_file_with_metadata(path)[1]
+
+
+def _cache(tmp_path, service, max_bytes=1024, revalidate_seconds=60):
+    return StorageFileCache(
+        service,
+        root=tmp_path,
+        max_bytes=max_bytes,
+        revalidate_seconds=revalidate_seconds,
+    )
+
+
+def test_cache_hits_and_content_dedup(tmp_path):
+    service = _FakeStorage({"/a.ipynb": b"same", "/b.ipynb": b"same"})
+    cache = _cache(tmp_path, service)
+
+    assert cache.get("/a.ipynb") == b"same"
+    assert cache.get("/a.ipynb") == b"same"
+    # Тот же content_hash по другому пути не скачивается повторно
+    assert cache.get("/b.ipynb") == b"same"
+
+    stats = cache.stats()
+    assert service.downloads == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["bytes_saved"] == 8
+    assert stats["entries"] == 1
+
+
+def test_invalidate_picks_up_new_content(tmp_path):
+    service = _FakeStorage({"/a.ipynb": b"old"})
+    cache = _cache(tmp_path, service)
+    cache.get("/a.ipynb")
+
+    service.files["/a.ipynb"] = b"new"
+    cache.invalidate("/a.ipynb")
+
+    assert cache.get("/a.ipynb") == b"new"
+    assert service.downloads == 2
+
+
+def test_cache_survives_restart_with_revalidation(tmp_path):
+    service = _FakeStorage({"/a.ipynb": b"data"})
+    _cache(tmp_path, service).get("/a.ipynb")
+
+    restarted = _cache(tmp_path, service)
+    assert restarted.get("/a.ipynb") == b"data"
+    assert service.downloads == 1
+    assert service.metadata_calls == 2
+
+
+def test_lru_eviction_respects_size_limit(tmp_path):
+    service = _FakeStorage({"/a": b"a" * 6, "/b": b"b" * 6, "/c": b"c" * 6})
+    cache = _cache(tmp_path, service, max_bytes=12)
+
+    cache.get("/a")
+    cache.get("/b")
+    cache.get("/a")
+    cache.get("/c")
+
+    stats = cache.stats()
+    assert stats["size_bytes"] <= 12
+    assert stats["evictions"] == 1
+    cache.get("/a")
+    assert service.downloads == 3
+    cache.get("/b")
+    assert service.downloads == 4
+
+
+def test_concurrent_requests_share_single_download(tmp_path):
+    service = _FakeStorage({"/a.ipynb": b"payload"}, delay=0.2)
+    cache = _cache(tmp_path, service)
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("/a.ipynb")))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b"payload"] * 20
+    assert service.downloads == 1
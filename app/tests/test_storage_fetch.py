@@ -0,0 +1,59 @@
+import threading
+import time
+
+import pytest
+
+from app.exceptions import AssignmentFilesUnavailableException
+from app.storage.fetch import fetch_files
+
+
+@pytest.mark.asyncio
+async def test_fetch_files_runs_concurrently_and_keeps_order():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def _fetch(path):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return path.encode()
+
+    paths = [f"/file_{index}" for index in range(6)]
+    started = time.monotonic()
+    result = await fetch_files(
+        paths, fetch=_fetch, concurrency=3, timeout_seconds=5
+    )
+
+    assert result == [path.encode() for path in paths]
+    assert peak == 3
+    assert time.monotonic() - started < 0.25
+
+
+@pytest.mark.asyncio
+async def test_fetch_files_wraps_errors():
+    def _fetch(path):
+        raise ConnectionError(path)
+
+    with pytest.raises(AssignmentFilesUnavailableException):
+        await fetch_files(
+            ["/a", "/b"], fetch=_fetch, concurrency=2, timeout_seconds=5
+        )
+
+
+@pytest.mark.asyncio
+async def test_fetch_files_shares_deadline():
+    def _fetch(path):
+        time.sleep(0.3)
+        return b""
+
+    started = time.monotonic()
+    with pytest.raises(AssignmentFilesUnavailableException):
+        await fetch_files(
+            ["/a", "/b", "/c"], fetch=_fetch, concurrency=1, timeout_seconds=0.4
+        )
+    assert time.monotonic() - started < 0.6
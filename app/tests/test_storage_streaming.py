@@ -0,0 +1,106 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.storage import streaming
+from app.storage.base import FileMetadata
+from app.storage.streaming import parse_range, stream_storage_file
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+class _FakeStream:
+    def __init__(self, body: bytes, status_code: int):
+        self.body = body
+        self.status_code = status_code
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.body), 1000):
+            yield self.body[offset : offset + 1000]
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeStorage:
+    def __init__(self, honour_range: bool = True):
+        self.honour_range = honour_range
+        self.responses = []
+
+    def get_metadata(self, path):
+        return FileMetadata(
+            path=path, size=len(PAYLOAD), rev="r1", content_hash="abc"
+        )
+
+    def open_download(self, path, rev=None, byte_range=None):
+        if byte_range is not None and self.honour_range:
+            start, end = byte_range
+            response = _FakeStream(PAYLOAD[start : end + 1], 206)
+        else:
+            response = _FakeStream(PAYLOAD, 200)
+        self.responses.append(response)
+        return None, response
+
+
+def _client(monkeypatch, service):
+    monkeypatch.setattr(streaming, "get_storage", lambda: service)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def _file(request: Request):
+        return await stream_storage_file(
+            request, "/file.bin", media_type="application/octet-stream"
+        )
+
+    return TestClient(app)
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=10-19", 100) == (10, 19)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-1000", 100) == (0, 99)
+    assert parse_range("bytes=100-", 100) is False
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+
+def test_full_download_streams_and_sets_etag(monkeypatch):
+    service = _FakeStorage()
+    response = _client(monkeypatch, service).get("/file")
+
+    assert response.status_code == 200
+    assert response.content == PAYLOAD
+    assert response.headers["etag"] == '"abc"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert service.responses[0].closed
+
+
+def test_if_none_match_returns_304(monkeypatch):
+    service = _FakeStorage()
+    response = _client(monkeypatch, service).get(
+        "/file", headers={"If-None-Match": '"abc"'}
+    )
+
+    assert response.status_code == 304
+    assert not service.responses
+
+
+def test_range_request(monkeypatch):
+    for honour_range in (True, False):
+        service = _FakeStorage(honour_range=honour_range)
+        response = _client(monkeypatch, service).get(
+            "/file", headers={"Range": "bytes=1500-2600"}
+        )
+
+        assert response.status_code == 206
+        assert response.content == PAYLOAD[1500:2601]
+        content_range = response.headers["content-range"]
+        assert content_range == f"bytes 1500-2600/{len(PAYLOAD)}"
+
+
+def test_unsatisfiable_range(monkeypatch):
+    response = _client(monkeypatch, _FakeStorage()).get(
+        "/file", headers={"Range": f"bytes={len(PAYLOAD)}-"}
+    )
+    assert response.status_code == 416
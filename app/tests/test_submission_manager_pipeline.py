@@ -1,6 +1,16 @@
+import json
+from types import SimpleNamespace
+
+import nbformat
 import pytest
 
-from app.submissions.services.submission_manager_service import SubmissionManagerService
+from app.assignment.services.notebook_service import GRADING_PLAN_VERSION
+from app.exceptions import EndedAttemptsException
+from app.submissions.services import sandbox_runner
+from app.submissions.services import submission_manager_service as module
+from app.submissions.services.submission_manager_service import (
+    SubmissionManagerService,
+)
 
 
 class _FakeUploadFile:
@@ -35,3 +45,202 @@ async def test_upload_path_uses_bytes_pipeline(monkeypatch):
     )
 
     assert result == expected_id
+
+
+@pytest.mark.asyncio
+async def test_combined_pipeline_checks_attempts_before_sandbox(monkeypatch):
+    async def _assignment(*args, **kwargs):
+        return SimpleNamespace(
+            number_of_attempts=3, execution_timeout_seconds=5
+        )
+
+    async def _submission(*args, **kwargs):
+        return SimpleNamespace(id="sub-id", number_of_attempts=3)
+
+    def _sandbox(*args, **kwargs):
+        raise AssertionError("sandbox must not start")
+
+    monkeypatch.setattr(
+        module.NotebookService, "check_date_submission", _assignment
+    )
+    monkeypatch.setattr(module.SubmissionsDAO, "find_one_or_none", _submission)
+    monkeypatch.setattr(
+        module.SandboxNotebookRunner, "execute_and_grade_notebook", _sandbox
+    )
+
+    notebook_bytes = nbformat.writes(nbformat.v4.new_notebook()).encode("utf-8")
+    with pytest.raises(EndedAttemptsException):
+        await SubmissionManagerService.process_and_evaluate_submission_bytes(
+            session=None,
+            assignment_id="assignment-id",
+            submission_bytes=notebook_bytes,
+            user_id=1,
+            user_email="student@example.com",
+        )
+
+
+@pytest.mark.asyncio
+async def test_evaluate_reuses_cached_result_for_identical_inputs(monkeypatch):
+    notebook_bytes = nbformat.writes(nbformat.v4.new_notebook()).encode("utf-8")
+    cache = {}
+    sandbox_runs = []
+    attempts = []
+
+    async def _submission_file(*args, **kwargs):
+        return SimpleNamespace(file_id="/submissions/1.ipynb", file_link="link")
+
+    async def _assignment(*args, **kwargs):
+        return SimpleNamespace(execution_timeout_seconds=5)
+
+    async def _grading_files(*args, **kwargs):
+        return notebook_bytes, [("data.csv", b"1,2")]
+
+    async def _cache_get(session, key, ttl_seconds):
+        return cache.get(key)
+
+    async def _cache_put(session, key, total_points, feedback, ttl_seconds):
+        cache[key] = SimpleNamespace(
+            total_points=total_points, feedback=feedback
+        )
+
+    def _grade(*args, **kwargs):
+        sandbox_runs.append(args)
+        return 7, [3]
+
+    async def _record_attempt(**kwargs):
+        attempts.append(kwargs)
+
+    monkeypatch.setattr(
+        module.SubmissionFilesDAO, "find_one_or_none", _submission_file
+    )
+    monkeypatch.setattr(module.AssignmentDAO, "find_one_or_none", _assignment)
+    monkeypatch.setattr(
+        module,
+        "get_storage",
+        lambda: SimpleNamespace(download_file=lambda path: notebook_bytes),
+    )
+    monkeypatch.setattr(
+        SubmissionManagerService, "_load_grading_files", _grading_files
+    )
+    monkeypatch.setattr(
+        SubmissionManagerService, "_record_attempt", _record_attempt
+    )
+    monkeypatch.setattr(module, "sandbox_fingerprint", lambda: "image:driver")
+    monkeypatch.setattr(module.GradingResultCacheDAO, "get", _cache_get)
+    monkeypatch.setattr(module.GradingResultCacheDAO, "put", _cache_put)
+    monkeypatch.setattr(module.SandboxNotebookRunner, "grade_notebook", _grade)
+
+    submission = SimpleNamespace(id="sub-id", user_id=1, number_of_attempts=0)
+    for _ in range(2):
+        result = await SubmissionManagerService.evaluate_submission(
+            session=SimpleNamespace(info={}),
+            assignment_id="assignment-id",
+            user_email="student@example.com",
+            submission_service=submission,
+        )
+        assert result == (7, [3])
+
+    assert len(sandbox_runs) == 1
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_worker_session_is_committed_before_sandbox(monkeypatch):
+    events = []
+
+    class _Session:
+        info = {module.RELEASE_SESSION_FOR_SANDBOX: True}
+
+        async def commit(self):
+            events.append("commit")
+
+    class _Scheduler:
+        async def run(self, func, *args, user_id, due_at=None, **kwargs):
+            events.append("sandbox")
+            return func(*args, **kwargs)
+
+    monkeypatch.setattr(module, "get_sandbox_scheduler", _Scheduler)
+
+    result = await SubmissionManagerService._run_sandbox(
+        _Session(), SimpleNamespace(), 1, lambda value: value, 42
+    )
+
+    assert result == 42
+    assert events == ["commit", "sandbox"]
+
+
+def test_sandbox_fingerprint_covers_driver(monkeypatch, tmp_path):
+    monkeypatch.setattr(sandbox_runner, "_sandbox_image_id", lambda: "image")
+    fingerprint = sandbox_runner.sandbox_fingerprint()
+    assert fingerprint == sandbox_runner.sandbox_fingerprint()
+
+    driver = tmp_path / "grading_driver.py"
+    driver.write_text("changed")
+    monkeypatch.setattr(sandbox_runner, "GRADING_DRIVER_PATH", driver)
+    assert sandbox_runner.sandbox_fingerprint() != fingerprint
+
+
+@pytest.mark.asyncio
+async def test_grading_files_use_stored_plan_and_backfill_old_assignments(
+    monkeypatch,
+):
+    plan = {
+        "version": GRADING_PLAN_VERSION,
+        "cells": 1,
+        "total_points": 5,
+        "tests": [],
+    }
+    tutor = nbformat.v4.new_notebook(
+        cells=[nbformat.v4.new_code_cell("# Tests 5 points.\nassert True")]
+    )
+    downloads = []
+    updates = []
+
+    async def _resources(session, assignment_id):
+        return [SimpleNamespace(file_id="/assignments/a_resource_1_data.csv")]
+
+    async def _original(*args, **kwargs):
+        return SimpleNamespace(file_id="/assignments/a_original.ipynb")
+
+    async def _fetch(file_ids):
+        downloads.append(list(file_ids))
+        tutor_bytes = nbformat.writes(tutor).encode("utf-8")
+        return [
+            tutor_bytes if path.endswith(".ipynb") else b"1"
+            for path in file_ids
+        ]
+
+    async def _update(session, model_id, **data):
+        updates.append(data)
+
+    monkeypatch.setattr(
+        SubmissionManagerService, "_find_resource_files", _resources
+    )
+    monkeypatch.setattr(module.AssignmentFileDAO, "find_one_or_none", _original)
+    monkeypatch.setattr(module, "fetch_files", _fetch)
+    monkeypatch.setattr(module.AssignmentDAO, "update", _update)
+
+    stored = SimpleNamespace(id="a", grading_plan=plan)
+    plan_bytes, resources = await SubmissionManagerService._load_grading_files(
+        None, stored
+    )
+    assert json.loads(plan_bytes) == plan
+    assert resources == [("data.csv", b"1")]
+    assert downloads == [["/assignments/a_resource_1_data.csv"]]
+
+    old = SimpleNamespace(id="a", grading_plan=None)
+    plan_bytes, _ = await SubmissionManagerService._load_grading_files(
+        None, old
+    )
+    backfilled = json.loads(plan_bytes)
+    assert backfilled["tests"] == [
+        {"index": 0, "points": 5, "source": "# Tests 5 points.\nassert True"}
+    ]
+    assert updates == [{"grading_plan": backfilled}]
+
+    outdated = SimpleNamespace(id="a", grading_plan={**plan, "version": 0})
+    plan_bytes, _ = await SubmissionManagerService._load_grading_files(
+        None, outdated
+    )
+    assert json.loads(plan_bytes) == backfilled
+    assert len(updates) == 2
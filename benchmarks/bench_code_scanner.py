@@ -0,0 +1,103 @@
+"""Проверка кода ячеек на враждебных входах: прежний сканер и code_scanner
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_code_scanner --sizes 10000 20000 40000 400000
+
+Для каждого входа и размера (в символах одной ячейки) печатается время
+прежнего сканера (десять re.search по ячейке с шаблонами [^)]*) и нового
+в режимах regex и ast. Прежний сканер запускается только до
+--legacy-max-chars: дальше он работает десятки секунд.
+"""
+
+import argparse
+import re
+import time
+
+import nbformat
+
+from app.submissions.services.code_scanner import (
+    AST_MODE,
+    REGEX_MODE,
+    scan_notebook,
+)
+
+LEGACY_PATTERNS = (
+    (r"\brm\s+-rf\b", "rm_rf"),
+    (r"\bos\.remove\s*\(", "os_remove"),
+    (r"\bos\.rmdir\s*\(", "os_rmdir"),
+    (r"\bshutil\.rmtree\s*\(", "shutil_rmtree"),
+    (r"\bos\.system\s*\([^)]*\brm\s+-rf\b", "os_system_rm_rf"),
+    (
+        r"\bsubprocess\.(?:run|call|Popen|check_call|check_output)\s*\([^)]*\brm\s+-rf\b",
+        "subprocess_rm_rf",
+    ),
+    (r"\bDROP\s+TABLE\b", "sql_drop_table"),
+    (r"\bTRUNCATE\s+TABLE\b", "sql_truncate_table"),
+    (r"\bDELETE\s+FROM\b", "sql_delete_from"),
+    (r"\bALTER\s+TABLE\b", "sql_alter_table"),
+)
+
+ADVERSARIAL_INPUTS = {
+    "unclosed os.system(": "os.system(",
+    "unclosed subprocess.run(": "subprocess.run(",
+    "rm -rf without call": "x = 'rm -rf'\n",
+    "benign code": "values = [math.sqrt(i) for i in range(10)]\n",
+}
+
+
+def legacy_scan(notebook) -> list[tuple[int, str]]:
+    findings = []
+    for index, cell in enumerate(notebook.cells):
+        if cell.get("cell_type") != "code":
+            continue
+        source = cell.get("source", "")
+        for pattern, kind in LEGACY_PATTERNS:
+            if re.search(pattern, source, re.IGNORECASE | re.MULTILINE):
+                findings.append((index, kind))
+                break
+    return findings
+
+
+def measure(func) -> float:
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 20_000, 40_000, 400_000],
+    )
+    parser.add_argument("--legacy-max-chars", type=int, default=40_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'input':<28} {'chars':>8} {'legacy ms':>10} "
+        f"{'regex ms':>9} {'ast ms':>8}"
+    )
+    for name, chunk in ADVERSARIAL_INPUTS.items():
+        for size in args.sizes:
+            source = chunk * (size // len(chunk))
+            notebook = nbformat.v4.new_notebook(
+                cells=[nbformat.v4.new_code_cell(source)]
+            )
+            legacy = (
+                f"{measure(lambda: legacy_scan(notebook)):>10.1f}"
+                if size <= args.legacy_max_chars
+                else f"{'-':>10}"
+            )
+            regex = measure(lambda: scan_notebook(notebook, mode=REGEX_MODE))
+            ast_mode = measure(lambda: scan_notebook(notebook, mode=AST_MODE))
+            print(
+                f"{name:<28} {len(source):>8} {legacy} "
+                f"{regex:>9.1f} {ast_mode:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
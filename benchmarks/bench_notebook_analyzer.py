@@ -0,0 +1,134 @@
+"""Сравнение обработки блокнота задания до и после однопроходного анализатора
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_notebook_analyzer --repeat 20 --images 40
+
+Для каждого блокнота из example_of_notebooks (и синтетического блокнота
+с картинками в выводе ячеек) замеряется путь загрузки задания: разбор,
+проверка, подсчет баллов и сериализация исходного и модифицированного
+блокнотов. Перед замером проверяется, что результаты совпадают.
+"""
+
+import argparse
+import base64
+import glob
+import os
+import re
+import time
+
+import nbformat
+
+from app.assignment.services.notebook_service import NotebookService
+
+
+def legacy_prepare(content: bytes):
+    """Прежний путь загрузки: три прохода по ячейкам и две сериализации"""
+    notebook = nbformat.reads(content.decode("utf-8"), as_version=4)
+    for cell in notebook.cells:
+        if cell.cell_type == "code" and "def" in cell.source:
+            assert "### BEGIN SOLUTION" in cell.source
+    grade = 0
+    for cell in notebook.cells:
+        if cell.cell_type == "code":
+            match = re.search(r"# Tests (\d+) points", cell.source)
+            if match:
+                grade += int(match.group(1))
+    original = nbformat.writes(notebook).encode("utf-8")
+    for cell in notebook.cells:
+        if cell.cell_type != "code":
+            continue
+        lines = cell.source.split("\n")
+        if (
+            "### BEGIN SOLUTION" in cell.source
+            and "### END SOLUTION" in cell.source
+        ):
+            for i, line in enumerate(lines):
+                if "### BEGIN SOLUTION" in line.strip():
+                    begin = i + 1
+                    break
+            for j, line in enumerate(lines):
+                if "### END SOLUTION" in line.strip():
+                    end = j
+                    break
+            if begin > 0 and end > 0:
+                lines[begin - 1 : end + 1] = ["### WRITE SOLUTION HERE"]
+                cell.source = "\n".join(lines)
+        if (
+            "### BEGIN HIDDEN TESTS" in cell.source
+            and "### END HIDDEN TESTS" in cell.source
+        ):
+            begin = lines.index("### BEGIN HIDDEN TESTS")
+            end = lines.index("### END HIDDEN TESTS") + 1
+            lines[begin : end + 1] = []
+            cell.source = "\n".join(lines)
+    modified = nbformat.writes(notebook).encode("utf-8")
+    return grade, original, modified
+
+
+def with_images(content: bytes, images: int, image_bytes: int) -> bytes:
+    """Добавляет в блокнот ячейки с картинками, как после plt.show()"""
+    notebook = nbformat.reads(content.decode("utf-8"), as_version=4)
+    image = base64.b64encode(os.urandom(image_bytes)).decode()
+    for _ in range(images):
+        cell = nbformat.v4.new_code_cell("plt.show()")
+        if notebook.nbformat_minor < 5:
+            del cell["id"]
+        cell.outputs = [
+            nbformat.v4.new_output("display_data", data={"image/png": image})
+        ]
+        notebook.cells.append(cell)
+    return nbformat.writes(notebook).encode("utf-8")
+
+
+def measure(func, content: bytes, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def check_equivalence(content: bytes):
+    grade, original, modified = legacy_prepare(content)
+    prepared = NotebookService.prepare_assignment(content)
+    assert prepared.plan.total_points == grade
+    assert nbformat.reads(prepared.original.decode(), 4) == nbformat.reads(
+        original.decode(), 4
+    )
+    assert prepared.modified == modified
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--image-bytes", type=int, default=150_000)
+    args = parser.parse_args()
+
+    notebooks = {}
+    for path in sorted(glob.glob("example_of_notebooks/*/a*.ipynb")):
+        with open(path, "rb") as file:
+            notebooks[path] = file.read()
+    if args.images:
+        base = notebooks["example_of_notebooks/simple_assignments/a1.ipynb"]
+        notebooks[f"a1 + {args.images} images"] = with_images(
+            base, args.images, args.image_bytes
+        )
+
+    print(
+        f"{'notebook':<56} {'KB':>8} {'legacy ms':>10} {'new ms':>8} {'x':>6}"
+    )
+    for name, content in notebooks.items():
+        check_equivalence(content)
+        legacy = measure(legacy_prepare, content, args.repeat)
+        current = measure(
+            NotebookService.prepare_assignment, content, args.repeat
+        )
+        print(
+            f"{name:<56} {len(content) / 1024:>8.0f} "
+            f"{legacy:>10.2f} {current:>8.2f} {legacy / current:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Работа хоста на одно решение до и после разбора notebook один раз
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_submission_pipeline --sizes 1 20 --repeat 5
+
+Замеряется только то, что делает сервер вокруг sandbox при отправке
+решения (process_and_upload_submission_bytes): разбор, проверка кода ячеек,
+сериализация до и после исполнения. Контейнер заменен функцией, которая
+возвращает notebook без изменений. Notebook студента - код с картинками
+в output'ах (как после plt.show()) до нужного размера в мегабайтах.
+Для каждого размера печатаются процессорное время и пик выделенной
+памяти (tracemalloc) на одно решение.
+"""
+
+import argparse
+import base64
+import os
+import time
+import tracemalloc
+
+import nbformat
+
+from app.submissions.services.sandbox_runner import (
+    _scan_notebook_for_malicious_code,
+)
+from app.submissions.services.submission_manager_service import (
+    SubmissionManagerService,
+)
+
+IMAGE_BYTES = 120_000
+
+
+def make_submission(size_mb: float) -> bytes:
+    notebook = nbformat.v4.new_notebook()
+    image = base64.b64encode(os.urandom(IMAGE_BYTES)).decode()
+    index = 0
+    while len(image) * len(notebook.cells) < size_mb * 1024 * 1024:
+        cell = nbformat.v4.new_code_cell(
+            f"plt.plot(data[{index}])\nplt.title('chart {index}')\nplt.show()"
+        )
+        cell.outputs = [
+            nbformat.v4.new_output("display_data", data={"image/png": image})
+        ]
+        notebook.cells.append(cell)
+        index += 1
+    return nbformat.writes(notebook).encode("utf-8")
+
+
+def sandbox(content: bytes) -> bytes:
+    return content
+
+
+def legacy_pipeline(submission_bytes: bytes) -> bytes:
+    """Прежний путь: пять разборов и сериализаций notebook на хосте"""
+    notebook = nbformat.reads(submission_bytes.decode("utf-8"), as_version=4)
+    notebook_bytes = nbformat.writes(notebook).encode("utf-8")
+    _scan_notebook_for_malicious_code(notebook_bytes)
+    executed = nbformat.reads(
+        sandbox(notebook_bytes).decode("utf-8"), as_version=4
+    )
+    return nbformat.writes(executed).encode("utf-8")
+
+
+def current_pipeline(submission_bytes: bytes) -> bytes:
+    notebook = SubmissionManagerService._read_notebook(submission_bytes)
+    _scan_notebook_for_malicious_code(submission_bytes, notebook)
+    return sandbox(submission_bytes)
+
+
+def measure(func, content: bytes, repeat: int) -> tuple[float, float]:
+    """Возвращает (мс процессорного времени, пик памяти в МБ) на запуск"""
+    started = time.process_time()
+    for _ in range(repeat):
+        func(content)
+    cpu_ms = (time.process_time() - started) / repeat * 1000
+
+    tracemalloc.start()
+    func(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 20])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'MB':>6} {'legacy ms':>10} {'legacy MB':>10} "
+        f"{'new ms':>8} {'new MB':>8}"
+    )
+    for size in args.sizes:
+        content = make_submission(size)
+        legacy_cpu, legacy_peak = measure(legacy_pipeline, content, args.repeat)
+        cpu, peak = measure(current_pipeline, content, args.repeat)
+        print(
+            f"{len(content) / 1024 / 1024:>6.1f} {legacy_cpu:>10.1f} "
+            f"{legacy_peak:>10.1f} {cpu:>8.1f} {peak:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -90,8 +90,21 @@ def _safe_name(value: str) -> str:
     return safe.strip("-")[:120] or "srv"
 
 
+pool_user_prefix = os.getenv("JUPYTERHUB_POOL_USER_PREFIX", "autograder-pool-")
+
+
 async def _per_assignment_volume(spawner):
     """Cоздаёт отдельный volume на каждый сервер"""
+    if spawner.user.name.startswith(pool_user_prefix):
+        # Серверы из пула одноразовые: черновик хранится в Dropbox,
+        # а именованный volume пережил бы удаление пользователя пула
+        spawner.volumes = {}
+        spawner.extra_host_config = {
+            **spawner.extra_host_config,
+            "tmpfs": {"/home/jovyan/work": "uid=1000,size=512m"},
+        }
+        spawner.notebook_dir = "/home/jovyan/work"
+        return
     username = _safe_name(spawner.user.name)
     server_name = _safe_name(spawner.name or "default")
     volume_name = f"jhub-{username}-{server_name}"
@@ -121,6 +134,8 @@ c.JupyterHub.load_roles = [
             "read:servers",
             "admin:servers",
             "tokens",
+            # выдача студенту доступа к серверу из пула
+            "shares",
         ],
     }
 ]